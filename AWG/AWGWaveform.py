@@ -5,6 +5,7 @@ author: jmizrahi
 """
 
 import logging
+from functools import lru_cache
 
 import numpy
 import sympy
@@ -16,6 +17,14 @@ from modules.quantity import Q
 from modules.enum import enum
 from .AWGSegmentModel import nodeTypes
 
+tSymbol = sympy.Symbol('t')
+
+
+@lru_cache(maxsize=256)
+def lambdified(sympyExpr, tVar=tSymbol):
+    """numpy function of tVar for sympyExpr, compiled once per expression"""
+    return sympy.lambdify(tVar, sympyExpr, "numpy")
+
 
 class AWGWaveform(object):
     """waveform object for AWG channels. Responsible for parsing and evaluating waveforms.
@@ -89,9 +98,8 @@ class AWGWaveform(object):
     def updateSegmentDependencies(self, nodeList):
         for node in nodeList:
             if node.nodeType==nodeTypes.segment:
-                node.stack = node.expression._parse_expression(node.equation)
-                nodeDependencies = node.expression.findDependencies(node.stack)
-                self.dependencies.update(nodeDependencies)
+                node.stack = node.expression.compile(node.equation)
+                self.dependencies.update(node.stack.dependencies)
                 if isIdentifier(node.duration):
                     self.dependencies.add(node.duration)
             elif node.nodeType==nodeTypes.segmentSet:
@@ -101,8 +109,17 @@ class AWGWaveform(object):
 
     def evaluate(self):
         """evaluate the waveform"""
-        _, sampleList = self.evaluateSegments(self.segmentDataRoot.children)
-        return self.compliantSampleList(sampleList)
+        pieces = list()
+        self._evaluateSegments(self.segmentDataRoot.children, 0, pieces)
+        numSamples = min(sum(len(piece) for piece in pieces), self.maxSamples)
+        sampleList = numpy.empty(numSamples + self.paddingLength(numSamples))
+        position = 0
+        for piece in pieces:
+            piece = piece[:numSamples - position]
+            sampleList[position:position + len(piece)] = piece
+            position += len(piece)
+        sampleList[numSamples:] = self.padValue
+        return sampleList
 
     def evaluateSegments(self, nodeList, startStep=0):
         """Evaluate the list of nodes in nodeList.
@@ -112,20 +129,46 @@ class AWGWaveform(object):
         Returns:
             startStep, sampleList: The step at which the next waveform begins, together with a list of samples
         """
-        sampleList = numpy.array([])
+        pieces = list()
+        startStep = self._evaluateSegments(nodeList, startStep, pieces)
+        return startStep, numpy.concatenate(pieces) if pieces else numpy.array([])
+
+    def _evaluateSegments(self, nodeList, startStep, pieces):
+        """Append the sample arrays of the nodes in nodeList to pieces and return the step at which the
+        next waveform begins. Segment sets that do not depend on 't' are evaluated once and repeated."""
         for node in nodeList:
             if node.enabled:
                 if node.nodeType==nodeTypes.segment:
                     duration = self.settings.varDict[node.duration]['value'] if isIdentifier(node.duration) else self.expression.evaluateAsMagnitude(node.duration)
                     startStep, newSamples = self.evaluateEquation(node, duration, startStep)
-                    sampleList = numpy.append(sampleList, newSamples)
+                    pieces.append(newSamples)
                 elif node.nodeType==nodeTypes.segmentSet:
                     repMag = self.settings.varDict[node.repetitions]['value'] if isIdentifier(node.repetitions) else self.expression.evaluateAsMagnitude(node.repetitions)
-                    repetitions = int(repMag.to_base_units().val) #convert to float, then to integer
-                    for n in range(repetitions):
-                        startStep, newSamples = self.evaluateSegments(node.children, startStep) #recursive
-                        sampleList = numpy.append(sampleList, newSamples)
-        return startStep, sampleList
+                    repetitions = int(repMag.to_base_units().m) #convert to float, then to integer
+                    if repetitions > 1 and not self.isTimeDependent(node.children):
+                        setPieces = list()
+                        startStep = self._evaluateSegments(node.children, startStep, setPieces)
+                        pieces.extend(setPieces)
+                        block = numpy.concatenate(setPieces) if setPieces else numpy.array([])
+                        numSamples = max(0, min(len(block)*(repetitions-1), self.maxSamples-startStep))
+                        if numSamples > 0:
+                            pieces.append(numpy.resize(block, numSamples)) #resize repeats the block
+                            startStep += numSamples
+                    else:
+                        for n in range(repetitions):
+                            startStep = self._evaluateSegments(node.children, startStep, pieces) #recursive
+        return startStep
+
+    def isTimeDependent(self, nodeList):
+        """True if any enabled segment in nodeList (or its segment sets) depends on 't'"""
+        for node in nodeList:
+            if node.enabled:
+                if node.nodeType==nodeTypes.segment:
+                    if 't' in self.expression.compile(node.equation).dependencies:
+                        return True
+                elif node.nodeType==nodeTypes.segmentSet and self.isTimeDependent(node.children):
+                    return True
+        return False
 
     def evaluateEquation(self, node, duration, startStep):
         """Evaluate the waveform of the specified node's equation.
@@ -162,15 +205,15 @@ class AWGWaveform(object):
         try:
             node.expression.variabledict = {varName:varValueTextDict['value'] for varName, varValueTextDict in self.settings.varDict.items()}
             node.expression.variabledict.update({'t':Q(1, 'us')})
-            node.expression.evaluateWithStack(node.stack[:])  # TODO: does not exist anymore
+            node.expression.evaluate(node.equation, node.expression.variabledict)
             error = False
-        except ValueError:
+        except (ValueError, TypeError):
             logging.getLogger(__name__).warning("Must be dimensionless!")
             error = True
             nextSegmentStartStep = startStep
             sampleList = numpy.array([])
         if not error:
-            varValueDict = {varName:varValueTextDict['value'].to_base_units().val for varName, varValueTextDict in self.settings.varDict.items()}
+            varValueDict = {varName:varValueTextDict['value'].to_base_units().m for varName, varValueTextDict in self.settings.varDict.items()}
             varValueDict['t'] = sympy.Symbol('t')
             sympyExpr = parse_expr(node.equation, varValueDict) #parse the equation
             key = str(sympyExpr)
@@ -232,13 +275,27 @@ class AWGWaveform(object):
         if numSamples <= 0:
             sampleList = numpy.array([])
         else:
-            func = sympy.lambdify(tVar, sympyExpr, "numpy") #turn string into a python function
-            clippedFunc = lambda t: max(self.minAmplitude, min(self.maxAmplitude, func(t))) #clip at min and max amplitude
-            vectorFunc = numpy.vectorize(clippedFunc, otypes=[numpy.float64]) #vectorize the function
+            func = lambdified(sympyExpr, tVar)
             step = self.stepsize.m_as('s')
-            sampleList = vectorFunc( (numpy.arange(numSamples)+startStep)*step ) #apply the function to each time step value
+            sampleList = numpy.array(func( (numpy.arange(numSamples)+startStep)*step ), dtype=numpy.float64) #apply the function to all time steps
+            if sampleList.shape != (numSamples,): #constant expressions evaluate to a scalar
+                sampleList = numpy.full(numSamples, sampleList, dtype=numpy.float64)
+            sampleList[numpy.isnan(sampleList)] = self.maxAmplitude #as min(maxAmplitude, nan)
+            numpy.clip(sampleList, self.minAmplitude, self.maxAmplitude, out=sampleList) #clip at min and max amplitude
         return sampleList
 
+    def paddingLength(self, numSamples):
+        """number of pad values to append to numSamples samples to satisfy minSamples and sampleChunkSize"""
+        if numSamples < self.minSamples:
+            extraNumSamples = self.minSamples - numSamples #make sure there are at least minSamples
+            if self.minSamples % self.sampleChunkSize != 0: #This should always be False if minSamples and sampleChunkSize are internally consistent
+                extraNumSamples += self.sampleChunkSize - (self.minSamples % self.sampleChunkSize)
+        elif numSamples % self.sampleChunkSize != 0:
+            extraNumSamples = self.sampleChunkSize - (numSamples % self.sampleChunkSize)
+        else:
+            extraNumSamples = 0
+        return extraNumSamples
+
     def compliantSampleList(self, sampleList):
         """Make the sample list compliant with the capabilities of the AWG
         Args:
@@ -249,16 +306,7 @@ class AWGWaveform(object):
         numSamples = len(sampleList)
         if numSamples > self.maxSamples:
             sampleList = sampleList[:self.maxSamples]
-        if numSamples < self.minSamples:
-            extraNumSamples = self.minSamples - numSamples #make sure there are at least minSamples
-            if self.minSamples % self.sampleChunkSize != 0: #This should always be False if minSamples and sampleChunkSize are internally consistent
-                extraNumSamples += self.sampleChunkSize - (self.minSamples % self.sampleChunkSize)
-        elif numSamples % self.sampleChunkSize != 0:
-            extraNumSamples = self.sampleChunkSize - (numSamples % self.sampleChunkSize)
-        else:
-            extraNumSamples = 0
-        sampleList = numpy.append(sampleList, [self.padValue]*extraNumSamples)
-        return sampleList
+        return numpy.append(sampleList, [self.padValue]*self.paddingLength(numSamples))
 
 if __name__ == '__main__':
     from AWG.AWGSegmentModel import AWGSegmentNode, AWGSegment, AWGSegmentSet
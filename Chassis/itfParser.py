@@ -4,7 +4,12 @@
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
 import collections
+import glob
+import hashlib
+import logging
+import os
 
+import numpy
 from numpy import float64, append
 
 from .fileParser import fileParser
@@ -163,6 +168,88 @@ class itfParser(fileParser):
         return floatData
 
 
+    ## This function reads all lines of the itf file at once and sorts
+    #  the data by the electrode map like eMapReadLine.
+    #
+    #  This function returns a 2D numpy float64 array with one row per
+    #  line in the file and one column per analog output. Values missing
+    #  in a line are nan. If useCache is True the array is stored in a
+    #  binary sidecar file next to the itf file and memory mapped by
+    #  subsequent calls as long as the itf file and the electrode map
+    #  file are unchanged.
+    #  @param self The object pointer.
+    #  @param eMapFilePath The file path to the eletrode map.
+    #  @param useCache Use and write the binary sidecar file.
+    def eMapReadMatrix(self, eMapFilePath=None, useCache=True):
+        eMapFilePath = eMapFilePath or self.eMapFilePath
+        elect, aoNums, dNums = self._getEmapData(eMapFilePath)
+        if self.tableHeader == []:
+            self.fileObj.seek(0)
+            self._parseHeader()
+        cachePath = self._cachePath(eMapFilePath) if useCache else None
+        if cachePath is not None and os.path.exists(cachePath):
+            try:
+                return numpy.load(cachePath, mmap_mode='r')
+            except (OSError, ValueError) as e:
+                logging.getLogger(__name__).warning("Cannot read voltage cache '{0}': {1}".format(cachePath, e))
+        self.fileObj.seek(self._dataOffset)
+        data = self._readMatrix(self.fileObj.read().splitlines())
+        # column index of each electrode in sorted ao order, missing electrodes are mapped to a nan column
+        columns = dict((name, index) for index, name in enumerate(self.tableHeader))
+        electrodes = [elect[aoNums.index(j)] for j in aoNums]
+        matrix = data[:, [columns.get(e, data.shape[1]-1) for e in electrodes]]
+        if cachePath is not None:
+            self._writeCache(cachePath, matrix)
+        return matrix
+
+    ## Parse the data lines into a 2D array in table header order. Like
+    #  readline a line ends at the first empty field. The array has an
+    #  additional last column of nan.
+    def _readMatrix(self, lines):
+        width = len(self.tableHeader)
+        rows = [line.strip().split('\t') for line in lines]
+        if rows and all(len(row) == width and '' not in row for row in rows):
+            return numpy.hstack((numpy.array(rows, dtype=float64), numpy.full((len(rows), 1), numpy.nan)))
+        data = numpy.full((len(rows), width + 1), numpy.nan)
+        for index, row in enumerate(rows):
+            if '' in row:
+                row = row[:row.index('')]
+            row = row[:width]
+            data[index, :len(row)] = numpy.array(row, dtype=float64)
+        return data
+
+    ## Path of the binary sidecar file of the open itf file for the
+    #  given electrode map. The name contains a digest of the paths,
+    #  modification times and sizes of both files.
+    def _cachePath(self, eMapFilePath):
+        try:
+            path = os.path.abspath(self.fileObj.name)
+            key = list()
+            for filename in (path, os.path.abspath(eMapFilePath)):
+                stat = os.stat(filename)
+                key.extend((filename, stat.st_mtime_ns, stat.st_size))
+        except (AttributeError, TypeError, OSError):
+            return None
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+        directory, name = os.path.split(path)
+        return os.path.join(directory, '.{0}.{1}.npy'.format(name, digest))
+
+    ## Write matrix to the sidecar file cachePath and remove sidecar
+    #  files of previous versions of the itf file.
+    def _writeCache(self, cachePath, matrix):
+        directory, name = os.path.split(cachePath)
+        stale = glob.glob(os.path.join(directory, glob.escape(name.rsplit('.', 2)[0]) + '.*.npy'))
+        try:
+            temporary = cachePath + '.tmp'
+            with open(temporary, 'wb') as f:
+                numpy.save(f, matrix)
+            os.replace(temporary, cachePath)
+            for filename in stale:
+                if filename != cachePath:
+                    os.remove(filename)
+        except OSError as e:
+            logging.getLogger(__name__).info("Cannot write voltage cache '{0}': {1}".format(cachePath, e))
+
     ## This function will read the number of lines specified by the
     #  numLines argument and return the data as a dictionary.
     #  @param self The object pointer.
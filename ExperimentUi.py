@@ -120,7 +120,9 @@ class ExperimentUi(WidgetContainerBase,WidgetContainerForm):
                 SyntaxError('Failed to load {0}'.format(str(filename)))
 
     def __enter__(self):
-        self.pulser = PulserHardware()
+        sharedDataTransport = self.project.isEnabled('software', 'Shared Memory Data Transport')
+        ringSize = next(iter(sharedDataTransport.values())).get('ringSize') if sharedDataTransport else None
+        self.pulser = PulserHardware(sharedDataRingSize=(ringSize or 16*1024*1024) if sharedDataTransport else 0)
         return self
     
     def __exit__(self, excepttype, value, traceback):
@@ -19,7 +19,7 @@ from datetime import datetime, timedelta
 import pytz
 
 import PyQt5.uic
-from PyQt5 import QtCore, QtNetwork, QtWidgets
+from PyQt5 import QtCore, QtWidgets
 from pyqtgraph.parametertree.Parameter import Parameter
 
 from dedicatedCounters.LoadingHistoryModel import LoadingHistoryModel
@@ -60,6 +60,7 @@ from dedicatedCounters.OverrideRecord import OverrideRecord
 from collections import defaultdict
 from dedicatedCounters.CounterSetting import AdjustType
 from ProjectConfig.Project import getProject
+from wavemeter.WavemeterClient import wavemeterClient
 
 uipath = os.path.join(os.path.dirname(__file__), '..', 'ui/AutoLoad.ui')
 UiForm, UiBase = PyQt5.uic.loadUiType(uipath)
@@ -403,10 +404,10 @@ class AutoLoad(UiForm, UiBase):
         self.interlockTableView.resizeColumnsToContents()
         self.interlockTableView.setSortingEnabled(True)
         if self.wavemeterAvailable:
-            self.am = QtNetwork.QNetworkAccessManager()
-            self.checkFreqsInRange() #Begins the loop which continually checks if frequencies are in range
-            for ilChannel in list(self.settings.interlock.values()):
-                self.getWavemeterData(ilChannel.channel)
+            self.wavemeter = wavemeterClient(self.wavemeterAddress)
+            self.wavemeterChannels = set()
+            self.checkFreqsInRange()
+            self.updateWavemeterSubscriptions() #the shared wavemeter client reads all enabled channels once per second
         else:
 
             self.useInterlockGui.setEnabled(False)
@@ -579,6 +580,8 @@ class AutoLoad(UiForm, UiBase):
     def onRemoveChannel(self):
         for index in sorted(unique([ i.row() for i in self.interlockTableView.selectedIndexes() ]), reverse=True):
             self.tableModel.removeChannel(index)
+        if self.wavemeterAvailable:
+            self.updateWavemeterSubscriptions()
         self.autoSave()
 
     def onStateChanged(self, name, state):
@@ -590,47 +593,35 @@ class AutoLoad(UiForm, UiBase):
         self.settings.useInterlock = self.useInterlockGui.isChecked()
         self.autoSave()
 
-    def onWavemeterError(self, channel, reply, error):
-        """Print out received error"""
-        logging.getLogger(__name__).warning("Error {0} accessing wavemeter at '{1}'".format(error, self.wavemeterAddress))
-        reply.finished.disconnect()  # necessary to make reply garbage collectable
-        reply.error.disconnect()
-        reply.deleteLater()
-        del reply
+    def updateWavemeterSubscriptions(self):
+        """Subscribe to the readings of the enabled interlock channels"""
+        channels = set(int(ilChannel.channel) for ilChannel in self.settings.interlock.values() if ilChannel.enable)
+        for channel in self.wavemeterChannels - channels:
+            self.wavemeter.unsubscribe(channel, self.onWavemeterData)
+        for channel in channels - self.wavemeterChannels:
+            self.wavemeter.subscribe(channel, self.onWavemeterData)
+        self.wavemeterChannels = channels
 
     def getWavemeterData(self, channel):
-        """Get the data from the wavemeter at the specified channel."""
-        if channel in self.settings.interlock:
-            if self.settings.interlock[channel].enable:
-                address = self.wavemeterAddress + "/wavemeter/wavemeter/wavemeter-status?channel={0}".format(int(channel))
-                reply = self.am.get( QtNetwork.QNetworkRequest(QtCore.QUrl(address)))
-                reply.error.connect(functools.partial(self.onWavemeterError, int(channel),  reply) )
-                reply.finished.connect(functools.partial(self.onWavemeterData, int(channel), reply))
-            else:
-                self.checkFreqsInRange()
+        """Start reading the wavemeter channel if it is enabled in the interlock."""
+        self.updateWavemeterSubscriptions()
+        self.checkFreqsInRange()
 
-    def onWavemeterData(self, channel, reply):
-        """Execute when reply is received from the wavemeter. Display it on the
+    def onWavemeterData(self, channel, result):
+        """Execute when a reading of a subscribed channel is received from the wavemeter. Display it on the
            GUI, and check whether it is in range."""
-        if channel in self.settings.interlock:
+        if channel in self.settings.interlock and self.settings.interlock[channel].enable:
             ilChannel = self.settings.interlock[channel]
-            if reply.error()==0:
-                value = float(reply.readAll())
-                self.tableModel.setCurrent( channel, round(value, 4) )
-                if ilChannel.lastReading==value:
-                    ilChannel.identicalCount += 1
-                else:
-                    ilChannel.identicalCount = 0
-                ilChannel.lastReading = value
-            #freq_string = "{0:.4f}".format(self.channelResult[channel]) + " GHz"
-        #read the wavemeter channel once per second
-            if ilChannel.enable:
-                QtCore.QTimer.singleShot(1000, functools.partial(self.getWavemeterData, channel))
+            value = result.m_as('GHz')
+            self.tableModel.setCurrent( channel, round(value, 4) )
+            if ilChannel.lastReading==value:
+                ilChannel.identicalCount += 1
+            else:
+                ilChannel.identicalCount = 0
+            ilChannel.lastReading = value
+        else:
+            self.updateWavemeterSubscriptions()
         self.checkFreqsInRange()
-        reply.finished.disconnect()  # necessary to make reply garbage collectable
-        reply.error.disconnect()
-        reply.deleteLater()
-        del reply
 
     def checkFreqsInRange(self):
         """Check whether all laser frequencies being used by the interlock are in range.
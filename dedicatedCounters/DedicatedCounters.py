@@ -23,7 +23,7 @@ from trace.pens import penList
 from dedicatedCounters.StatusDisplay import StatusDisplay
 from pyqtgraph.dockarea import Dock, DockArea
 from uiModules.DateTimePlotWidget import DateTimePlotWidget
-from modules.RollingUpdate import rollingUpdate
+from modules.ColumnBuffer import ColumnBuffer
 from uiModules.BlockAutoRange import BlockAutoRange
 from modules.quantity import is_Q, Q
 
@@ -49,8 +49,8 @@ class DedicatedCounters(DedicatedCountersForm, DedicatedCountersBase ):
         self.configName = 'DedicatedCounter'
         self.pulserHardware = pulserHardware
         self.state = self.OpStates.idle
-        self.xData = [numpy.array([])]*20
-        self.yData = [numpy.array([])]*20
+        self.xData = [ColumnBuffer(numpy.float64) for _ in range(20)]
+        self.yData = [ColumnBuffer(numpy.float64) for _ in range(20)]
         self.refValue = [None] * 20
         self.integrationTime = 0
         self.integrationTimeLookup = dict()
@@ -188,8 +188,8 @@ class DedicatedCounters(DedicatedCountersForm, DedicatedCountersBase ):
                     for eIdx in set(mycurves) - set(counterIndexList) - set(i + 16 for i in adcIndexList):
                         curve = mycurves.pop(eIdx)
                         self.plotDict[windowName]['view'].removeItem(curve)
-                        self.xData[eIdx] = numpy.array([])
-                        self.yData[eIdx] = numpy.array([])
+                        self.xData[eIdx] = ColumnBuffer(numpy.float64)
+                        self.yData[eIdx] = ColumnBuffer(numpy.float64)
 
     def saveConfig(self):
         self.config[self.configName+'.pos'] = self.pos()
@@ -246,8 +246,8 @@ class DedicatedCounters(DedicatedCountersForm, DedicatedCountersBase ):
             for n in range(20):
                 if len(self.xData[n])>0 and len(self.yData[n])>0:
                     trace = TraceCollection()
-                    trace.x = self.xData[n]
-                    trace.y = self.yData[n]
+                    trace.x = self.xData[n].array.copy()
+                    trace.y = self.yData[n].array.copy()
                     if n < 16:
                         trace.description["counter"] = str(plotName)
                     else:
@@ -258,12 +258,12 @@ class DedicatedCounters(DedicatedCountersForm, DedicatedCountersBase ):
         logger.info("saving dedicated counters")
     
     def onClear(self):
-        self.xData = [numpy.array([])]*20
-        self.yData = [numpy.array([])]*20
+        self.xData = [ColumnBuffer(numpy.float64) for _ in range(20)]
+        self.yData = [ColumnBuffer(numpy.float64) for _ in range(20)]
         self.tick = 0
         for name, subdict in self.curvesDict.items():
             for n in list(subdict.keys()):
-                subdict[n].setData(self.xData[n], self.yData[n])
+                subdict[n].setData(self.xData[n].array, self.yData[n].array)
 
     def onData(self, data):
         self.tick += 1
@@ -281,8 +281,7 @@ class DedicatedCounters(DedicatedCountersForm, DedicatedCountersBase ):
         for index, value in enumerate(data.data[:16]):
             if value is not None:
                 y = self.settings.displayUnit.convert(value, msIntegrationTime)
-                self.yData[index] = rollingUpdate(self.yData[index], y, self.settings.pointsToKeep)
-                self.xData[index] = rollingUpdate(self.xData[index], data.timestamp, self.settings.pointsToKeep)
+                self.appendPoint(index, data.timestamp, y)
         for index, value in enumerate(data.analogValues):
             if value is not None:
                 myindex = 16 + index
@@ -295,19 +294,24 @@ class DedicatedCounters(DedicatedCountersForm, DedicatedCountersBase ):
                         y = value.m
                 else:
                     y = value
-                self.yData[myindex] = rollingUpdate(self.yData[myindex], y, self.settings.pointsToKeep)
-                self.xData[myindex] = rollingUpdate(self.xData[myindex], data.timestamp, self.settings.pointsToKeep)
+                self.appendPoint(myindex, data.timestamp, y)
         for name, plotwin in self.curvesDict.items():
             if plotwin:
                 with BlockAutoRange(next(iter(plotwin.values()))):
                     for index, plotdata in plotwin.items():
-                        plotdata.setData(self.xData[index], self.yData[index])
+                        plotdata.setData(self.xData[index].array, self.yData[index].array)
         self.statusDisplay.setData(data)
         self.dataAvailable.emit(data)
         # logging.getLogger(__name__).info("Max bytes read {0}".format(data.maxBytesRead))
         self.statusDisplay.setData(data)
         self.dataAvailable.emit(data)
  
+    def appendPoint(self, index, x, y):
+        """append to the rolling buffers of index, keeping the last pointsToKeep points"""
+        for buffer, value in ((self.xData[index], x), (self.yData[index], y)):
+            buffer.setMaxLength(int(self.settings.pointsToKeep))
+            buffer.append(value)
+
     def convertAnalog(self, data):
         converted = list()
         for channel, cal in enumerate(self.analogCalbrations):
@@ -8,16 +8,14 @@ import logging
 
 from PyQt5 import QtCore
 
-from modules.RollingUpdate import rollingUpdate
 from trace.PlottedTrace import PlottedTrace 
 from trace.TraceCollection import TraceCollection
-from operator import attrgetter, methodcaller
 import numpy
 import functools
 from modules.DataDirectory import DataDirectory
 from datetime import datetime
 
-from .controller.ControllerClient import frequencyQuantum, voltageQuantum, binToFreq, binToVoltage, sampleTime
+from .controller.ControllerClient import frequencyQuantum, voltageQuantum, binToFreq, binToVoltage, sampleTime, binToFreqHz, binToVoltageV
 from modules.quantity import Q
 import math
 from digitalLock.controller.ControllerClient import voltageQuantumExternal
@@ -52,7 +50,7 @@ class LockStatus(Form, Base):
         self.controller = controller
         self.config = config
         self.lockSettings = None
-        self.lastLockData = list()
+        self.lastLockData = None
         self.traceui = traceui
         self.errorSigCurve = None
         self.trace = None
@@ -195,38 +193,71 @@ class LockStatus(Form, Base):
         status.time = item.samples * sampleTime.m_as('s')
         return status
     
+    def statusColumns(self, data):
+        """status of all records in the columnar StreamData data as float arrays, frequencies in Hz, voltages in V"""
+        if self.lockSettings is None:
+            return None
+        status = StatusData()
+        samples = data.samples.astype(numpy.float64)
+        harmonic = float(self.lockSettings.harmonic)
+        outputFrequency = self.lockSettings.outputFrequency.m_as('Hz')
+        status.regulatorFrequency = binToFreqHz(data.freqSum / samples)
+        status.referenceFrequency = self.lockSettings.referenceFrequency.m_as('Hz') + status.regulatorFrequency
+        status.referenceFrequencyMin = binToFreqHz(data.freqMin)
+        status.referenceFrequencyMax = binToFreqHz(data.freqMax)
+        status.outputFrequency = outputFrequency + status.regulatorFrequency * harmonic
+        status.outputFrequencyMin = outputFrequency + status.referenceFrequencyMin * harmonic
+        status.outputFrequencyMax = outputFrequency + status.referenceFrequencyMax * harmonic
+
+        status.errorSigAvg = binToVoltageV(data.errorSigSum / samples)
+        status.errorSigMin = binToVoltageV(data.errorSigMin)
+        status.errorSigMax = binToVoltageV(data.errorSigMax)
+        status.errorSigRMS = binToVoltageV(numpy.sqrt(data.errorSigSumSq / samples))
+
+        encoding = self.hardwareSettings.onBoardADCEncoding
+        status.externalMin = decodeMg(data.externalMin, encoding).m_as('V')
+        status.externalMax = decodeMg(data.externalMax, encoding).m_as('V')
+        counted = data.externalCount > 0
+        externalAvg = data.externalSum / numpy.where(counted, data.externalCount, 1)
+        status.externalAvg = numpy.where(counted, decodeMg(externalAvg, encoding).m_as('V'), numpy.nan)
+        status.lockStatus = data.lockStatus if self.lockSettings.mode & 1 else numpy.full(len(data), -1)
+        status.time = samples * sampleTime.m_as('s')
+        return status
+
     logFrequency = ['regulatorFrequency', 'referenceFrequency', 'referenceFrequencyMin', 'referenceFrequencyMax', 
                       'outputFrequency', 'outputFrequencyMin', 'outputFrequencyMax']
     logVoltage = ['errorSigAvg', 'errorSigMin', 'errorSigMax', 'errorSigRMS', 'externalAvg', 'externalMin', 'externalMax']                 
     def writeToLogFile(self, status):
+        """write the locked records of the status columns to the log file"""
         if self.lockSettings and self.lockSettings.mode & 1 == 1:  # if locked
+            locked = numpy.flatnonzero(status.lockStatus==3)
+            if len(locked)==0:
+                return
             if not self.logFile:
                 self.logFile = open( DataDirectory().sequencefile("LockLog.txt")[0], "w" )
                 self.logFile.write( " ".join( self.logFrequency + self.logVoltage ) )
                 self.logFile.write( "\n" )
-            self.logFile.write( "{0} ".format(datetime.now()))
-            self.logFile.write(  " ".join( map( repr, list(map( methodcaller('m_as', 'Hz'), (getattr(status, field) for field in self.logFrequency) )) ) ) )
-            self.logFile.write(  " ".join( map( repr, list(map( methodcaller('m_as', 'mV'), (getattr(status, field) for field in self.logVoltage) )) ) ) )
-            self.logFile.write("\n")
+            frequencies = numpy.column_stack([getattr(status, field)[locked] for field in self.logFrequency]).tolist()
+            voltages = (1000 * numpy.column_stack([getattr(status, field)[locked] for field in self.logVoltage])).tolist()
+            now = datetime.now()
+            for frequency, voltage in zip(frequencies, voltages):
+                self.logFile.write( "{0} ".format(now))
+                self.logFile.write( " ".join( map( repr, frequency ) ) )
+                self.logFile.write( " ".join( map( repr, voltage ) ) )
+                self.logFile.write("\n")
             self.logFile.flush()
         
     background = { -1: "#eeeeee", 0: "#ff0000", 3: "#00ff00", 1:"#ffff00", 2:"#ffff00" }
     statusText = { -1: "Unlocked", 0:"No Light", 3: "Locked", 1: "Partly no light", 2: "Partly no light"}
     def onData(self, data=None ):
         logger = logging.getLogger()
-        logger.debug( "received streaming data {0} {1}".format(len(data), data[-1] if len(data)>0 else ""))
-        if data is not None:
-            self.lastLockData = list()
-            for item in data:
-                converted = self.convertStatus(item)
-                if converted is not None:
-                    self.lastLockData.append( converted )
-                    if converted.lockStatus==3:
-                        self.writeToLogFile(converted)
-        if self.lastLockData is not None:
-            self.plotData()
-            if self.lastLockData:
-                item = self.lastLockData[-1]
+        logger.debug( "received streaming data {0}".format(len(data) if data is not None else None))
+        if data is not None and len(data)>0:
+            self.lastLockData = self.statusColumns(data)
+            if self.lastLockData is not None:
+                self.writeToLogFile(self.lastLockData)
+                self.plotData()
+                item = self.convertStatus(data[-1])
                 
                 self.referenceFreqLabel.setText( str(item.referenceFrequency) )
                 self.referenceFreqRangeLabel.setText( str(item.referenceFrequencyDelta) )
@@ -244,17 +275,18 @@ class LockStatus(Form, Base):
                 self.statusLabel.setStyleSheet( "QLabel {{ background: {0} }}".format( self.background[item.lockStatus]) )
                 self.statusLabel.setText( self.statusText[item.lockStatus] )
                 self.newDataAvailable.emit( item )
-        else:
+        if self.lastLockData is None:
             logger.info("no lock control information")
             
     def plotData(self):
-        if len(self.lastLockData)>0:
-            to_plot = list(zip(*(attrgetter('errorSigAvg', 'errorSigMin', 'errorSigMax', 'time')(e) for e in self.lastLockData)))
-            x = numpy.arange( self.lastXValue, self.lastXValue+len(to_plot[0] ))
-            self.lastXValue += len(to_plot[0] )
-            y = numpy.array([v.m_as('V') for v in to_plot[0]])
-            bottom = numpy.array([(v0 - v1).m_as('V') for v0, v1 in zip(to_plot[0], to_plot[1])])
-            top = numpy.array([(v2 - v0).m_as('V') for v0, v2 in zip(to_plot[0], to_plot[2])])
+        status = self.lastLockData
+        if status is not None and len(status.time)>0:
+            maxSamples = int(self.settings.maxSamples)
+            x = numpy.arange( self.lastXValue, self.lastXValue+len(status.time) )
+            self.lastXValue += len(status.time)
+            y = status.errorSigAvg
+            bottom = status.errorSigAvg - status.errorSigMin
+            top = status.errorSigMax - status.errorSigAvg
             if self.trace is None:
                 self.trace = TraceCollection()
                 self.trace['x'] = x
@@ -263,10 +295,10 @@ class LockStatus(Form, Base):
                 self.trace['top'] = top
                 self.trace.name = "History"
             else:
-                self.trace['x'] = rollingUpdate(self.trace['x'], x, self.settings.maxSamples)
-                self.trace['y'] = rollingUpdate(self.trace['y'], y, self.settings.maxSamples)
-                self.trace['bottom'] = rollingUpdate(self.trace['bottom'], bottom, self.settings.maxSamples)
-                self.trace['top'] = rollingUpdate(self.trace['top'], top, self.settings.maxSamples)
+                self.trace.extendColumn('x', x, maxSamples)
+                self.trace.extendColumn('y', y, maxSamples)
+                self.trace.extendColumn('bottom', bottom, maxSamples)
+                self.trace.extendColumn('top', top, maxSamples)
             if self.errorSigCurve is None:
                 self.errorSigCurve = PlottedTrace(self.trace, self.plotDict[self.settings.errorSigPlot]['view'], pen=-1, style=PlottedTrace.Styles.points, name="Error Signal", windowName=self.settings.errorSigPlot)  #@UndefinedVariable 
                 self.errorSigCurve.plot()
@@ -274,13 +306,12 @@ class LockStatus(Form, Base):
             else:
                 self.errorSigCurve.replot()            
                
-            to_plot = list(zip(*(attrgetter('regulatorFrequency', 'referenceFrequencyMin', 'referenceFrequencyMax')(e) for e in self.lastLockData)))
-            y = numpy.array([v.m_as('Hz') for v in to_plot[0]])
-            bottom = numpy.array([(v0 - v1).m_as('Hz') for v0, v1 in zip(to_plot[0], to_plot[1])])
-            top = numpy.array([(v2 - v0).m_as('Hz') for v0, v2 in zip(to_plot[0], to_plot[2])])
-            self.trace['freq'] = rollingUpdate(self.trace['freq'], y, self.settings.maxSamples)
-            self.trace['freqBottom'] = rollingUpdate(self.trace['freqBottom'], bottom, self.settings.maxSamples)
-            self.trace['freqTop'] = rollingUpdate(self.trace['freqTop'], top, self.settings.maxSamples)
+            y = status.regulatorFrequency
+            bottom = status.regulatorFrequency - status.referenceFrequencyMin
+            top = status.referenceFrequencyMax - status.regulatorFrequency
+            self.trace.extendColumn('freq', y, maxSamples)
+            self.trace.extendColumn('freqBottom', bottom, maxSamples)
+            self.trace.extendColumn('freqTop', top, maxSamples)
             if self.freqCurve is None:
                 self.freqCurve = PlottedTrace(self.trace, self.plotDict[self.settings.frequencyPlot]['view'], pen=-1, style=PlottedTrace.Styles.points, name="Repetition rate", #@UndefinedVariable
                                               xColumn='x', yColumn='freq', topColumn='freqTop', bottomColumn='freqBottom', windowName=self.settings.frequencyPlot)  
@@ -0,0 +1,168 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Vectorized decoder for the digital lock stream and scope pipes.
+
+The stream pipe delivers 64 byte records (struct format 'QhhIQQQQHHIQ'). The buffer is
+viewed as an array of StreamRecordDtype, the alignment markers of all records are checked
+at once and the 48 and 72 bit two's complement fields are sign extended in bulk. The
+result is a columnar StreamData with one numpy array per field. Scope words (8 bytes:
+16 bit error signal, 47 bit frequency) are decoded the same way into ScopeData.
+"""
+import numpy
+
+StreamRecordDtype = numpy.dtype([('errorSig', '<u8'), ('errorSigMax', '<i2'), ('errorSigMin', '<i2'),
+                                 ('samples', '<u4'), ('freq0', '<u8'), ('freq1', '<u8'), ('freq2', '<u8'),
+                                 ('errorSigSumSq', '<u8'), ('externalMax', '<u2'), ('externalMin', '<u2'),
+                                 ('externalCount', '<u4'), ('externalSum', '<u8')])
+RecordSize = StreamRecordDtype.itemsize
+
+MarkerMask = numpy.uint64(0xffff000000000000)
+ErrorSigMarker = numpy.uint64(0xfefe000000000000)
+FreqMarker = numpy.uint64(0xefef000000000000)
+ScopeEndMarker = numpy.uint64(0xffffffffffffffff)
+Mask44 = numpy.uint64(0xfffffffffff)
+Shift8 = numpy.uint64(8)
+Shift16 = numpy.uint64(16)
+Shift17 = numpy.uint64(17)
+Shift46 = numpy.uint64(46)
+Shift48 = numpy.uint64(48)
+Shift56 = numpy.uint64(56)
+
+
+def signExtend48(values):
+    """two's complement of the lower 48 bits of the uint64 array values"""
+    return (values << Shift16).view(numpy.int64) >> 16
+
+
+def signExtend72(high, low):
+    """two's complement of the 72 bit values (high << 8) | low as float64.
+
+    high holds the upper 64 bits, low the lowest 8 bits. The value is split into two
+    parts that are exactly representable, the result is thus rounded exactly like float()
+    of the python integer."""
+    high = high.view(numpy.int64)
+    return (high >> 32).astype(numpy.float64) * float(1 << 40) + \
+        ((high & 0xffffffff) * 256 + low.astype(numpy.int64)).astype(numpy.float64)
+
+
+class StreamDataItem:
+    def __init__(self):
+        self.samples = 0
+        self.errorSigSum = 0
+        self.errorSigMin = 0
+        self.errorSigMax = 0
+        self.errorSigSumSq = 0;
+        self.freqSum = 0
+        self.freqMin = 0
+        self.freqMax = 0
+
+
+class StreamData(object):
+    """Columnar stream records, every field in fields is a numpy array with one entry per record.
+
+    Indexing and iteration return StreamDataItem objects for code working on single records."""
+    fields = ('samples', 'errorSigSum', 'errorSigMin', 'errorSigMax', 'errorSigSumSq', 'freqSum', 'freqMin',
+              'freqMax', 'externalMin', 'externalMax', 'externalCount', 'externalSum', 'lockStatus')
+    dtypes = {'freqSum': numpy.float64, 'errorSigSumSq': numpy.uint64}
+
+    def __init__(self, columns=None):
+        self.overrun = False
+        for field in self.fields:
+            setattr(self, field, numpy.array(columns[field]) if columns is not None
+                    else numpy.zeros(0, dtype=self.dtypes.get(field, numpy.int64)))
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("StreamData index out of range")
+        item = StreamDataItem()
+        for field in self.fields:
+            value = getattr(self, field)[index]
+            setattr(item, field, float(value) if field == 'freqSum' else int(value))
+        return item
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def extend(self, other):
+        for field in self.fields:
+            setattr(self, field, numpy.concatenate((getattr(self, field), getattr(other, field))))
+        self.overrun = self.overrun or other.overrun
+
+
+class ScopeData:
+    def __init__(self):
+        self.errorSig = numpy.zeros(0, dtype=numpy.int64)
+        self.frequency = numpy.zeros(0, dtype=numpy.int64)
+
+    def extend(self, errorSig, frequency):
+        self.errorSig = numpy.concatenate((self.errorSig, errorSig))
+        self.frequency = numpy.concatenate((self.frequency, frequency))
+
+
+def firstMisaligned(records):
+    """index of the first record with invalid alignment markers or None"""
+    invalid = ((records['errorSig'] & MarkerMask) != ErrorSigMarker) | ((records['freq2'] & MarkerMask) != FreqMarker)
+    if invalid.any():
+        return int(invalid.argmax())
+    return None
+
+
+def decodeStreamRecords(records):
+    """convert an array of StreamRecordDtype to StreamData, records without samples are skipped"""
+    records = records[records['samples'] > 0]
+    freq1 = records['freq1']
+    externalSum = records['externalSum']
+    columns = {'samples': records['samples'].astype(numpy.int64),
+               'errorSigSum': signExtend48(records['errorSig']),
+               'errorSigMin': records['errorSigMin'].astype(numpy.int64),
+               'errorSigMax': records['errorSigMax'].astype(numpy.int64),
+               'errorSigSumSq': records['errorSigSumSq'],
+               'freqSum': signExtend72(records['freq0'], freq1 >> Shift56),
+               'freqMin': signExtend48(freq1),
+               'freqMax': signExtend48(records['freq2']),
+               'externalMin': records['externalMin'].astype(numpy.int64),
+               'externalMax': records['externalMax'].astype(numpy.int64),
+               'externalCount': records['externalCount'].astype(numpy.int64),
+               'externalSum': (externalSum & Mask44).astype(numpy.int64),
+               'lockStatus': ((externalSum >> Shift46) & numpy.uint64(0x3)).astype(numpy.int64)}
+    return StreamData(columns)
+
+
+def decodeStreamBuffer(buffer):
+    """decode all complete records in buffer.
+
+    Returns (StreamData, consumed) where consumed is the number of bytes that have been
+    processed. If a record with invalid alignment markers is found, only the records
+    before it are decoded and consumed skips 2 bytes beyond the start of the invalid record."""
+    records = numpy.frombuffer(buffer, dtype=StreamRecordDtype, count=len(buffer) // RecordSize)
+    misaligned = firstMisaligned(records)
+    if misaligned is None:
+        return decodeStreamRecords(records), len(records) * RecordSize
+    return decodeStreamRecords(records[:misaligned]), misaligned * RecordSize + 2
+
+
+def decodeScopeWords(words):
+    """return (errorSig, frequency) of the uint64 scope words"""
+    errorSig = (words >> Shift48).astype(numpy.uint16).view(numpy.int16).astype(numpy.int64)
+    frequency = (words << Shift17).view(numpy.int64) >> 17
+    return errorSig, frequency
+
+
+def scopeSegments(buffer):
+    """split the scope buffer at the end markers.
+
+    Returns the list of decoded (errorSig, frequency) segments, every segment except
+    the last one is terminated by an end marker."""
+    words = numpy.frombuffer(buffer, dtype=numpy.uint64, count=len(buffer) // 8)
+    bounds = numpy.flatnonzero(words == ScopeEndMarker).tolist()
+    starts = [0] + [bound + 1 for bound in bounds]
+    return [decodeScopeWords(words[start:stop]) for start, stop in zip(starts, bounds + [len(words)])]
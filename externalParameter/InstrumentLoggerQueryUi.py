@@ -18,7 +18,6 @@ import logging
 from modules import WeakMethod 
 import weakref
 from modules.NamedTimespan import getRelativeDatetime, timespans
-import pytz
 from .externalParameter.persistence import DBPersist
 from ProjectConfig.Project import getProject
 from copy import deepcopy
@@ -153,18 +152,14 @@ class InstrumentLoggerQueryUi(Form, Base):
     def doCreatePlot(self, space, parameter, fromTime, toTime, plotName, steps, forceUpdate=False ):
         ref, _ = self.cache.get( ( space, parameter ), (lambda: None, None)) 
         plottedTrace = ref() if (self.parameters.updatePrevious or forceUpdate) else None # get plottedtrace from the weakref if exists           
-        result = self.connection.getHistory( space, parameter, fromTime, toTime )
-        if not result:
+        result = self.connection.getHistoryArrays( space, parameter, fromTime, toTime )
+        if len(result)==0:
             logging.getLogger(__name__).warning("Database query returned empty set")
-        elif len(result)>0:
-            #time = [(pytz.utc.localize(e.upd_date) - datetime(1970,1,1, tzinfo=pytz.utc)).total_seconds() for e in result]
-            if result[0].upd_date.tzinfo is not None:
-                time = [(e.upd_date - datetime(1970, 1, 1, tzinfo=pytz.utc)).total_seconds() for e in result]
-            else:
-                time = [(e.upd_date-datetime.fromtimestamp(0)).total_seconds() for e in result]
-            value = [e.value for e in result]
-            bottom = [e.value - e.bottom if e.bottom is not None else e.value for e in result]
-            top = [e.top -e.value if e.top is not None else e.value for e in result]
+        else:
+            time = result.time.tolist()
+            value = result.value
+            bottom = numpy.where(numpy.isnan(result.bottom), result.value, result.value - result.bottom)
+            top = numpy.where(numpy.isnan(result.top), result.value, result.top - result.value)
             if plottedTrace is None:  # make a new plotted trace
                 trace = TraceCollection(record_timestamps=False)
                 trace.name = parameter + "_Query"
@@ -141,21 +141,13 @@ class DataHandling(object):
                 traceui.addTrace( self.plottedTrace, pen=-1)
                 traceui.resizeColumnsToContents()
             else:
-                if self.maximumPoints==0 or len(self.trace.x)<self.maximumPoints:
-                    self.trace.x = numpy.append( self.trace.x, takentime )
-                    self.trace.y = numpy.append( self.trace.y, value )
-                    if maxval is not None:
-                        self.trace.top = numpy.append( self.trace.top, maxval - value )
-                    if minval is not None:
-                        self.trace.bottom = numpy.append( self.trace.bottom, value - minval )
-                else:
-                    maxPoints = int(self.maximumPoints)
-                    self.trace.x = numpy.append( self.trace.x[-maxPoints:], takentime )
-                    self.trace.y = numpy.append( self.trace.y[-maxPoints:], value )
-                    if maxval is not None:
-                        self.trace.top = numpy.append( self.trace.top[-maxPoints:], maxval - value )
-                    if minval is not None:
-                        self.trace.bottom = numpy.append( self.trace.bottom[-maxPoints:], value - minval )                
+                maxPoints = int(self.maximumPoints)
+                self.trace.appendColumn('x', takentime, maxPoints)
+                self.trace.appendColumn('y', value, maxPoints)
+                if maxval is not None:
+                    self.trace.appendColumn('top', maxval - value, maxPoints)
+                if minval is not None:
+                    self.trace.appendColumn('bottom', value - minval, maxPoints)
                 self.plottedTrace.replot()            
 
 
@@ -4,6 +4,8 @@
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
 
+import atexit
+
 from persist.ValueHistory import ValueHistoryStore
 from datetime import datetime
 from ProjectConfig.Project import getProject
@@ -25,6 +27,7 @@ class DBPersist:
         if DBPersist.store is None:
             DBPersist.store = ValueHistoryStore(dbConnection)
             DBPersist.store.open_session()
+            atexit.register(DBPersist.store.close_session)   # write the values still queued in the background writer
         self.initialized = True
         
     def persist(self, space, source, time, value, minval=None, maxval=None, unit=None):
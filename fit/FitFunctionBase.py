@@ -85,6 +85,8 @@ class FitFunctionBase(object, metaclass=FitFunctionMeta):
         state.pop('laguerreTable', None)
         state.pop('pnCacheBeta', None )
         state.pop('pnTable', None)
+        state.pop('frequencies', None)
+        state.pop('probabilities', None)
         self.__dict__ = state
         self.__dict__.setdefault( 'useSmartStartValues', False )
         self.__dict__.setdefault( 'startParameterExpressions', None )
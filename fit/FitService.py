@@ -0,0 +1,118 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Process pool for least squares fits
+
+A FitJob carries the fit function as StoredFitFunction together with the data to be
+fitted. The FitService runs batches of jobs in worker processes and returns FitResults
+holding the fitted parameters, confidence intervals and results. Results of batches
+submitted with a callback are delivered asynchronously as the fits finish, the callback
+is called from a thread of the pool (use a queued Qt signal to get back to the GUI).
+
+The fit function has to be evaluated (start parameter and bounds expressions) before
+the job is created, the workers have no access to the global variables.
+"""
+import numpy
+
+from fit.StoredFitFunction import StoredFitFunction
+from modules.ProcessPoolService import ProcessPoolService
+
+
+def initializeWorker():
+    """register all fit functions in the worker process"""
+    from fit import FitFunctions  #@UnusedImport
+
+
+def traceSigma(plottedTrace):
+    """error bars of plottedTrace used as sigma in fits"""
+    if plottedTrace.hasHeightColumn:
+        return plottedTrace.height
+    if plottedTrace.hasTopColumn and plottedTrace.hasBottomColumn:
+        return abs(plottedTrace.top + plottedTrace.bottom)
+    return None
+
+
+class FitJob(object):
+    def __init__(self, fitfunction, x, y, sigma=None, key=None):
+        self.fitfunction = StoredFitFunction.fromFitfunction(fitfunction)
+        self.x = numpy.array(x, dtype=numpy.float64)
+        self.y = numpy.array(y, dtype=numpy.float64)
+        self.sigma = numpy.array(sigma, dtype=numpy.float64) if sigma is not None else None
+        self.key = key
+
+
+class FitResult(object):
+    """Outcome of a FitJob, error is the error message if the fit failed"""
+    def __init__(self, key, fitfunction=None, chisq=None, dof=None, error=None):
+        self.key = key
+        self.fitfunction = fitfunction
+        self.chisq = chisq
+        self.dof = dof
+        self.error = error
+
+    @property
+    def parameters(self):
+        return list(self.fitfunction.parameters)
+
+    @property
+    def parametersConfidence(self):
+        return list(self.fitfunction.parametersConfidence)
+
+    @property
+    def results(self):
+        return dict((name, result.value) for name, result in self.fitfunction.results.items())
+
+    def applyTo(self, fitfunction):
+        """copy the fitted values to fitfunction as if fitfunction.leastsq had been called"""
+        if self.error is not None:
+            raise FitServiceException(self.error)
+        fitfunction.parameters = self.parameters
+        fitfunction.parametersConfidence = self.parametersConfidence
+        for name, value in self.results.items():
+            if name in fitfunction.results:
+                fitfunction.results[name].value = value
+        fitfunction.chisq = self.chisq
+        fitfunction.dof = self.dof
+        fitfunction.update(fitfunction.parameters)
+        return fitfunction
+
+
+class FitServiceException(Exception):
+    pass
+
+
+def runFitJob(job):
+    """fit a single job, executed in the worker processes"""
+    try:
+        fitfunction = job.fitfunction.fitfunction()
+        fitfunction.leastsq(job.x, job.y, sigma=job.sigma)
+        return FitResult(job.key, StoredFitFunction.fromFitfunction(fitfunction), fitfunction.chisq, fitfunction.dof)
+    except Exception as e:
+        return FitResult(job.key, error="{0}: {1}".format(e.__class__.__name__, e))
+
+
+class FitService(ProcessPoolService):
+    name = "fit service"
+    runJob = staticmethod(runFitJob)
+    initializer = staticmethod(initializeWorker)
+
+    def errorResult(self, job, error):
+        return FitResult(job.key, error=error)
+
+    def fitBatch(self, jobs, timeout=None):
+        """fit all jobs in parallel and return the FitResults in the order of jobs"""
+        return self.runBatch(jobs, timeout)
+
+
+_fitService = None
+
+
+def fitService():
+    """fit service shared by all fit user interfaces"""
+    global _fitService
+    if _fitService is None:
+        _fitService = FitService()
+    return _fitService
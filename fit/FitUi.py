@@ -17,6 +17,7 @@ from uiModules.MagnitudeSpinBoxDelegate import MagnitudeSpinBoxDelegate
 from modules.PyqtUtility import BlockSignals
 from modules.GuiAppearance import restoreGuiState, saveGuiState   #@UnresolvedImport
 from fit.StoredFitFunction import StoredFitFunction               #@UnresolvedImport
+from fit.FitService import FitJob, fitService, traceSigma
 
 import os
 uipath = os.path.join(os.path.dirname(__file__), '..', 'ui/FitUi.ui')
@@ -30,6 +31,7 @@ class Parameters(AttributeComparisonEquality):
             
 class FitUi(fitForm, QtWidgets.QWidget):
     analysisNamesChanged = QtCore.pyqtSignal(object)
+    fitResultReady = QtCore.pyqtSignal(object)
     def __init__(self, traceui, config, parentname, globalDict=None, parent=None):
         QtWidgets.QWidget.__init__(self, parent)
         fitForm.__init__(self)
@@ -48,6 +50,8 @@ class FitUi(fitForm, QtWidgets.QWidget):
             self.analysisDefinitions = dict()
         self.parameters = self.config.get(self.configname+".Parameters", Parameters())
         self.globalDict = globalDict
+        self.pendingFits = dict()
+        self.fitResultReady.connect( self.onFitResult )
             
     def setupUi(self,widget, showCombos=True ):
         fitForm.setupUi(self, widget)
@@ -145,18 +149,32 @@ class FitUi(fitForm, QtWidgets.QWidget):
             self.fitfunctionTableModel.startDataChanged()     
         
     def onFit(self):
-        """Fit the selected traces using the current fit settings"""
-        for plottedTrace in self.traceui.selectedTraces(useLastIfNoSelection=True, allowUnplotted=False):
-            self.fit(plottedTrace)
+        """Fit the selected traces using the current fit settings. Several traces are fitted in parallel by the fit service."""
+        plottedTraces = self.traceui.selectedTraces(useLastIfNoSelection=True, allowUnplotted=False)
+        if len(plottedTraces) > 1:
+            jobs = list()
+            for plottedTrace in plottedTraces:
+                self.pendingFits[id(plottedTrace)] = plottedTrace
+                jobs.append(FitJob(self.fitfunction, plottedTrace.x, plottedTrace.y, traceSigma(plottedTrace), key=id(plottedTrace)))
+            fitService().submitBatch(jobs, callback=self.fitResultReady.emit)
+        else:
+            for plottedTrace in plottedTraces:
+                self.fit(plottedTrace)
 
     def fit(self, plottedTrace):
         """Fit plottedTrace using the current fit settings"""
-        sigma = None
-        if plottedTrace.hasHeightColumn:
-            sigma = plottedTrace.height
-        elif plottedTrace.hasTopColumn and plottedTrace.hasBottomColumn:
-            sigma = abs(plottedTrace.top + plottedTrace.bottom)
-        self.fitfunction.leastsq(plottedTrace.x, plottedTrace.y, sigma=sigma)
+        self.fitfunction.leastsq(plottedTrace.x, plottedTrace.y, sigma=traceSigma(plottedTrace))
+        self.fitFinished(plottedTrace)
+
+    def onFitResult(self, result):
+        plottedTrace = self.pendingFits.pop(result.key)
+        try:
+            result.applyTo(self.fitfunction)
+            self.fitFinished(plottedTrace)
+        except Exception as e:
+            logging.getLogger(__name__).error("Fit of trace '{0}' failed with error '{1}'".format(plottedTrace.name, e))
+
+    def fitFinished(self, plottedTrace):
         plottedTrace.fitFunction = copy.deepcopy(self.fitfunction)
         plottedTrace.plot(-2)
         self.fitfunctionTableModel.fitDataChanged()
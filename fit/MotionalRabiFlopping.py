@@ -4,9 +4,9 @@
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
 
-from numpy import pi, cos, sqrt, sin, exp, dot, array, outer
+from numpy import pi, cos, sqrt, sin, exp, dot, array, outer, arange, asarray, minimum, maximum, zeros, multiply, concatenate
 from scipy import constants
-from scipy.special import genlaguerre
+from scipy.special import genlaguerre, eval_genlaguerre, gammaln
 
 from .FitFunctionBase import ResultRecord
 from fit.FitFunctionBase import FitFunctionBase
@@ -14,6 +14,9 @@ from modules.quantity import Q
 import logging
 from functools import lru_cache
 
+MaxPhononNumber = 200
+MaxMatrixSize = 1 << 20   # elements of the (x, n) matrix evaluated at once
+
 def factorialRatio(ng, nl):
     r = 1
     for i in range(int(nl)+1, int(ng)+1):
@@ -29,24 +32,49 @@ def transitionAmplitude(eta, n, m):
 
 @lru_cache(maxsize=20)
 def laguerreTable(eta, delta_n):
+    """transitionAmplitude(eta, n, n+delta_n) for n in 0..MaxPhononNumber-1 evaluated for all n at once"""
     logging.getLogger(__name__).info( "Calculating Laguerre Table for eta={0} delta_n={1}".format(eta, delta_n) )
-    laguerreTable = array([ transitionAmplitude(eta, n, n+delta_n) for n in range(200) ])
-    return laguerreTable
+    n = arange(MaxPhononNumber, dtype=float)
+    m = n + delta_n
+    valid = m >= 0
+    nl = minimum(n, m)[valid]
+    ng = maximum(n, m)[valid]
+    d = abs(delta_n)
+    eta2 = eta*eta
+    table = zeros(MaxPhononNumber)
+    table[valid] = exp(-eta2/2) * pow(eta, d) * eval_genlaguerre(nl, d, eta2) / sqrt(exp(gammaln(ng+1) - gammaln(nl+1)))
+    return table
 
 @lru_cache(maxsize=20)
 def probabilityTable(nBar):
+    """thermal occupation probabilities for n in 0..MaxPhononNumber-1"""
     logger = logging.getLogger(__name__)
     logger.info( "Calculating Probability Table for nBar {0}".format(nBar) )
-    current = 1/(nBar+1.)
-    factor = nBar/(nBar+1.)
-    a = [current]
-    for _ in range(1, 200):
-        current *= factor
-        a.append( current )
-    a = array(a)
+    a = (nBar/(nBar+1.))**arange(MaxPhononNumber) / (nBar+1.)
     logger.info( 1-sum(a) )
     return a
 
+@lru_cache(maxsize=20)
+def floppingTables(eta, delta_n, nBar, eta_2=None, nBar_2=None):
+    """Rabi frequency factors and occupation probabilities of all contributing (n) or (n, n_2) states.
+    States with zero probability are dropped."""
+    frequencies = laguerreTable(eta, delta_n)
+    probabilities = probabilityTable(nBar)
+    if eta_2 is not None:
+        frequencies = outer(frequencies, laguerreTable(eta_2, 0)).ravel()
+        probabilities = outer(probabilities, probabilityTable(nBar_2)).ravel()
+    nonzero = probabilities != 0
+    return frequencies[nonzero], probabilities[nonzero]
+
+def flopping(x, omega, frequencies, probabilities):
+    """sum over n of p_n sin^2(omega x f_n) for all x as (x, n) matrix products"""
+    x = asarray(x, dtype=float)
+    if x.ndim == 0:
+        return dot(probabilities, sin((omega * x) * frequencies)**2)
+    blocksize = max(1, MaxMatrixSize // len(frequencies))
+    return concatenate([dot(sin(multiply.outer(omega * x[start:start+blocksize], frequencies))**2, probabilities)
+                        for start in range(0, len(x), blocksize)]) if len(x) else zeros(0)
+
 
 class MotionalRabiFlopping(FitFunctionBase):
     name = "MotionalRabiFlopping"
@@ -77,25 +105,18 @@ class MotionalRabiFlopping(FitFunctionBase):
                
     def updateTables(self, nBar):
         A, n, omega, mass, angle, trapFrequency, wavelength, delta_n = self.parameters #@UnusedVariable
-        secfreq = trapFrequency.m_as('Hz') * 10**6
+        secfreq = trapFrequency.m_as('Hz')
         m = mass * constants.m_p
         eta = ( (2*pi/(wavelength*10**-9))*cos(angle*pi/180)
                      * sqrt(constants.hbar/(2*m*2*pi*secfreq)) )
         self.laguerreTable = laguerreTable(eta, delta_n)
         self.pnTable = probabilityTable(nBar)
+        self.frequencies, self.probabilities = floppingTables(eta, delta_n, nBar)
             
     def residuals(self, p, y, x, sigma):
         A, n, omega, mass, angle, trapFrequency, wavelength, delta_n = self.allFitParameters(self.parameters if p is None else p) #@UnusedVariable
         self.updateTables(n)
-        if hasattr(x, '__iter__'):
-            result = list()
-            for xn in x:
-                valueList = sin((omega * xn )* self.laguerreTable )**2
-                value = A*dot( self.pnTable, valueList )
-                result.append(value)
-        else:
-            valueList = sin(omega * self.laguerreTable * x)**2
-            result = A*dot( self.pnTable, valueList )
+        result = A*flopping(x, omega, self.frequencies, self.probabilities)
         if sigma is not None:
             return (y-result)/sigma
         else:
@@ -104,20 +125,10 @@ class MotionalRabiFlopping(FitFunctionBase):
     def value(self,x,p=None):
         A, n, omega, mass, angle, trapFrequency, wavelength, delta_n = self.parameters if p is None else p  #@UnusedVariable
         self.updateTables(n)
-        if hasattr(x, '__iter__'):
-            result = list()
-            for xn in x:
-                valueList = sin((omega * xn )* self.laguerreTable )**2
-                value = A*dot( self.pnTable, valueList )
-                result.append(value)
-        else:
-            valueList = sin(omega * self.laguerreTable * x)**2
-            result = A*dot( self.pnTable, valueList )
-        return result
+        return A*flopping(x, omega, self.frequencies, self.probabilities)
                 
      
      
-     
 class TwoModeMotionalRabiFlopping(FitFunctionBase):
     name = "TwoModeMotionalRabiFlopping"
     functionString =  'Two Mode Motional Rabi Flopping'
@@ -152,8 +163,8 @@ class TwoModeMotionalRabiFlopping(FitFunctionBase):
                
     def updateTables(self, p):
         A, n, omega, mass, angle, trapFrequency, wavelength, delta_n, n_2, trapFrequency_2 = p #@UnusedVariable
-        secfreq = trapFrequency.m_as('Hz') * 10**6
-        secfreq2 = trapFrequency_2.m_as('Hz') * 10**6
+        secfreq = trapFrequency.m_as('Hz')
+        secfreq2 = trapFrequency_2.m_as('Hz')
         m = mass * constants.m_p
         eta = ( (2*pi/(wavelength*10**-9))*cos(angle*pi/180)
                      * sqrt(constants.hbar/(2*m*2*pi*secfreq)) )
@@ -163,6 +174,7 @@ class TwoModeMotionalRabiFlopping(FitFunctionBase):
         self.laguerreTable2 = laguerreTable(eta2, 0)
         self.pnTable = probabilityTable(n)
         self.pnTable2 = probabilityTable(n_2)
+        self.frequencies, self.probabilities = floppingTables(eta, delta_n, n, eta2, n_2)
             
     def residuals(self, p, y, x, sigma):
         result = self.value(x, self.allFitParameters(p))
@@ -175,16 +187,4 @@ class TwoModeMotionalRabiFlopping(FitFunctionBase):
         myp=self.parameters if p is None else p
         A, n, omega, mass, angle, trapFrequency, wavelength, delta_n, n_2, trapFrequency_2 = myp  #@UnusedVariable
         self.updateTables(myp)
-        if hasattr(x, '__iter__'):
-            result = list()
-            for xn in x:
-                valueList = sin((omega * xn )* outer( self.laguerreTable, self.laguerreTable2).flatten()  )**2
-                value = A*dot( outer( self.pnTable, self.pnTable2).flatten(), valueList )
-                result.append(value)
-        else:
-            valueList = sin(omega * outer( self.laguerreTable, self.laguerreTable2).flatten()  * x)**2
-            result = A*dot( outer( self.pnTable, self.pnTable2).flatten(), valueList )
-        return result
-                
-        
-   
+        return A*flopping(x, omega, self.frequencies, self.probabilities)
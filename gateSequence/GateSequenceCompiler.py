@@ -3,8 +3,23 @@
 # This Software is released under the GPL license detailed
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
+"""
+Compiler of gate sequences into the RAM image read by the pulse program
+
+Every gate is compiled once into its encoded words. A compiled gate is kept until its
+definition or the value of one of the variables used by its expressions changes, so a
+change of a global variable only recompiles the gates depending on it.
+
+gateSequencesCompile stores every distinct gate sequence once, identical sequences share
+the start address. The layout of the RAM image (which gate word goes to which address)
+only depends on the sequences and the number of words of every gate, it is computed once
+per sequence list and the image is filled with a single numpy gather from the table of
+compiled gates.
+"""
 import logging
 
+import numpy
+
 from modules.Expression import Expression
 from modules.quantity import Q, is_Q
 
@@ -16,6 +31,9 @@ class GateSequenceCompiler(object):
     def __init__(self, pulseProgram ):
         self.pulseProgram = pulseProgram
         self.compiledGates = dict()
+        self.gateWords = dict()         # gate name -> uint64 array of the encoded words
+        self.gateCache = dict()         # gate name -> (definition, dependency values)
+        self.layout = None
         
     """Compile all gate sequences into binary representation
         returns tuple of start address list and bytearray data"""
@@ -23,15 +41,53 @@ class GateSequenceCompiler(object):
         logger = logging.getLogger(__name__)
         logger.info( "compiling {0} gateSequences.".format(len(gatesets.GateSequenceDict)) )
         self.gateCompile( gatesets.gateDefinition )
+        gatenames = sorted(self.gateWords)
+        wordCounts = [len(self.gateWords[name]) for name in gatenames]
+        layout = self.layout
+        if layout is None or layout[0] is not gatesets.GateSequenceDict or layout[1] != len(gatesets.GateSequenceDict) or layout[2] != (gatenames, wordCounts):
+            layout = self.layout = (gatesets.GateSequenceDict, len(gatesets.GateSequenceDict), (gatenames, wordCounts)) + \
+                self.sequenceLayout(list(gatesets.GateSequenceDict.values()), gatenames, wordCounts)
+        addresses, headers, lengths, destination, source = layout[3:]
+        table = numpy.concatenate([self.gateWords[name] for name in gatenames] + [numpy.zeros(0, dtype=numpy.uint64)])
+        data = numpy.empty(len(headers) + len(destination), dtype=numpy.uint64)
+        data[headers] = lengths
+        data[destination] = table[source]
+        return list(addresses), data.tolist()
+
+    def sequenceLayout(self, gatesets, gatenames, wordCounts):
+        """addresses of the gatesets and the positions in the data of the distinct gatesets:
+        the position and value of the length headers and the position and index into the
+        concatenated words of gatenames of the gate words"""
+        gateIndex = dict((name, index) for index, name in enumerate(gatenames))
+        wordCounts = numpy.array(wordCounts, dtype=numpy.int64)
+        gateStarts = numpy.cumsum(wordCounts) - wordCounts
         addresses = list()
-        data = list()
-        index = 0
-        for gateset in list(gatesets.GateSequenceDict.values()):
-            gatesetdata = self.gateSequenceCompile( gateset )
-            addresses.append(index)
-            data.extend(gatesetdata)
-            index += len(gatesetdata)*8
-        return addresses, data
+        distinct = dict()
+        gates = list()        # gates of the distinct gatesets
+        gateCounts = list()   # number of gates of the distinct gatesets
+        for gateset in gatesets:
+            key = tuple(gateset)
+            sequence = distinct.get(key)
+            if sequence is None:
+                sequence = distinct[key] = len(gateCounts)
+                gates.extend(key)
+                gateCounts.append(len(key))
+            addresses.append(sequence)
+        try:
+            gates = numpy.fromiter(map(gateIndex.__getitem__, gates), dtype=numpy.int64, count=len(gates))
+        except KeyError as e:
+            raise GateSequenceCompilerException("Gate {0} used in gate sequence is not defined".format(e))
+        gateCounts = numpy.array(gateCounts, dtype=numpy.int64)
+        sequenceOfGate = numpy.repeat(numpy.arange(len(gateCounts)), gateCounts)
+        words = wordCounts[gates] if len(gates) else numpy.zeros(0, dtype=numpy.int64)
+        sequenceWords = numpy.bincount(sequenceOfGate, weights=words, minlength=len(gateCounts)).astype(numpy.int64)
+        headers = numpy.cumsum(sequenceWords + 1) - sequenceWords - 1
+        # word k of the concatenated gate words of all distinct gatesets
+        wordStarts = numpy.cumsum(words) - words
+        source = numpy.repeat(gateStarts[gates] - wordStarts, words) + numpy.arange(words.sum())
+        destination = numpy.arange(len(source)) + numpy.repeat(sequenceOfGate, words) + 1
+        lengths = sequenceWords // self.pulseListLength
+        return (headers[addresses] * 8).tolist(), headers, lengths.astype(numpy.uint64), destination, source
     
     """Compile one gateset into its binary representation"""
     def gateSequenceCompile(self, gateset ):
@@ -43,17 +99,30 @@ class GateSequenceCompiler(object):
             length += len(thisCompiledGate)//self.pulseListLength
         return [length] + data
 
-    """Compile each gate definition into its binary representation"""
+    """Compile each gate definition into its binary representation,
+       gates are only recompiled if the definition or a variable they depend on changed"""
     def gateCompile(self, gateDefinition ):
         logger = logging.getLogger(__name__)
         variables = self.pulseProgram.variables()
         pulseList = list(gateDefinition.PulseDefinition.values())
         self.pulseListLength = len(pulseList)
+        pulses = tuple((pulse.name, pulse.encoding) for pulse in pulseList)
+        for gatename in list(self.gateWords):
+            if gatename not in gateDefinition.Gates:
+                self.gateWords.pop(gatename)
+                self.gateCache.pop(gatename, None)
+                self.compiledGates.pop(gatename, None)
         for gatename, gate in gateDefinition.Gates.items():  # for all defined gates
+            definition = (pulses, tuple(gate.pulsedict))
+            cached = self.gateCache.get(gatename)
+            if cached is not None and cached[0] == definition and self.dependencyValues(cached[1], variables) == cached[1]:
+                continue
             data = list()
+            dependencies = set()
             gateLength = 0
             for name, strvalue in gate.pulsedict:
-                result = self.expression.evaluate(strvalue, variables )
+                result, names = self.expression.evaluate(strvalue, variables, listDependencies=True )
+                dependencies.update(names)
                 if name!=pulseList[ gateLength % self.pulseListLength ].name:
                     raise GateSequenceCompilerException("In gate {0} entry {1} found '{2}' expected '{3}'".format(gatename, gateLength, name, pulseList[ gateLength % self.pulseListLength ]))
                 encoding = gateDefinition.PulseDefinition[name].encoding
@@ -62,7 +131,17 @@ class GateSequenceCompiler(object):
             if gateLength % self.pulseListLength != 0:
                 raise GateSequenceCompilerException("In gate {0} number of entries ({1}) is not a multiple of the pulse definition length ({2})".format(gatename, gateLength, self.pulseListLength))
             self.compiledGates[gatename] = data
+            self.gateWords[gatename] = numpy.array(data, dtype=numpy.uint64)
+            if '__exprfunc__' in dependencies:   # functions can change without notice
+                self.gateCache.pop(gatename, None)
+            else:
+                self.gateCache[gatename] = (definition, self.dependencyValues(dict.fromkeys(dependencies), variables))
             logger.info( "compiled {0} to {1}".format(gatename, data) )
+
+    @staticmethod
+    def dependencyValues(dependencies, variables):
+        """values of the variables named in dependencies"""
+        return dict((name, variables.get(name)) for name in dependencies)
                 
         
 if __name__=="__main__":
@@ -18,7 +18,6 @@ import functools
 import logging
 import time
 
-import itertools
 
 from persist.StringTable import DataStore
 from trace import Traceui
@@ -37,7 +36,7 @@ from pyqtgraph.exporters.SVGExporter import SVGExporter
 
 from .AverageViewTable import AverageViewTable
 from . import MainWindowWidget
-from trace import RawData
+from trace.RawData import RawData, DataRecorder
 from scan.ScanControl import ScanControl
 from scan.EvaluationControl import EvaluationControl
 from .ScanProgress import ScanProgress
@@ -365,7 +364,7 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
         else:
             self.callWhenDoneAdjusting(self.startScan)
         if self.context.scan.saveRawData and self.context.scan.rawFilename:
-            self.context.rawDataFile = open(DataDirectory.DataDirectory().sequencefile(self.context.scan.rawFilename)[0], 'w')
+            self.context.rawDataFile = DataRecorder(DataDirectory.DataDirectory().sequencefile(self.context.scan.rawFilename)[0])
         self.context.dataFinalized = False
 
     def startScan(self):
@@ -404,7 +403,7 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
             self.pulserHardware.ppFlushData()
             self.pulserHardware.ppClearWriteFifo()
             self.pulserHardware.ppUpload(self.context.PulseProgramBinary)
-            self.pulserHardware.ppWriteData(mycode)
+            self.writeScanCode(mycode)
             self.displayUi.onClear()
             self.timestampsNewRun = True
             if self.context.plottedTraceList and self.traceui.unplotLastTrace:
@@ -417,6 +416,16 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
             self.context.histogramBuffer = defaultdict( list )
             self.context.scanMethod.startScan()
 
+    def writeScanCode(self, code, startIndex=0):
+        """write the code of the first points to the input FIFO. If the generator asks for a refill
+        the pulser server keeps the FIFO filled from startIndex on and code is not used."""
+        refill = self.context.generator.refillCode()
+        if refill is not None:
+            self.pulserHardware.ppSetScanCode(*refill)
+            self.pulserHardware.ppStartRefill(startIndex)
+        else:
+            self.pulserHardware.ppWriteData(code)
+
     def onContinue(self):
         if self.progressUi.is_interrupted:
             logging.getLogger(__name__).info("Received ion reappeared signal, will continue.")
@@ -427,7 +436,7 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
         if self.progressUi.state in [self.OpStates.paused, self.OpStates.interrupted]:
             self.pulserHardware.ppFlushData()
             self.pulserHardware.ppClearWriteFifo()
-            self.pulserHardware.ppWriteData(self.context.generator.restartCode(self.context.currentIndex))
+            self.writeScanCode(self.context.generator.restartCode(self.context.currentIndex), self.context.currentIndex)
             logger.info( "Starting" )
             self.pulserHardware.ppStart()
             self.progressUi.resumeRunning(self.context.currentIndex)
@@ -473,7 +482,7 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
         logger = logging.getLogger(__name__)
         self.pulserHardware.ppFlushData()
         self.pulserHardware.ppClearWriteFifo()
-        self.pulserHardware.ppWriteData(self.context.generator.restartCode(self.context.currentIndex))
+        self.writeScanCode(self.context.generator.restartCode(self.context.currentIndex), self.context.currentIndex)
         logger.info( "Resuming" )
         self.pulserHardware.ppStart()
         self.progressUi.setData(self.context.progressData)
@@ -552,9 +561,7 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
         logger.info( "onData {0} {1} {2}".format( self.context.currentIndex, dict((i, len(data.count[i])) for i in sorted(data.count.keys())), data.scanvalue ) )
         x = self.context.generator.xValue(self.context.currentIndex, data)
         if self.context.rawDataFile is not None:
-            self.context.rawDataFile.write( data.dataString() )
-            self.context.rawDataFile.write( '\n' )
-            self.context.rawDataFile.flush()
+            self.context.rawDataFile.record( data )
         self.context.scanMethod.onData( data, queuesize, x )
 
     def dataMiddlePart(self, data, queuesize, x):
@@ -654,8 +661,7 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
                     if trace.autoSave:
                         trace.save()
             if saveData:
-                failedList = self.dataAnalysis()
-                self.registerMeasurement(failedList)
+                self.dataAnalysis()
             if self.context.scan.histogramSave:
                 self.onSaveHistogram(self.context.scan.histogramFilename if self.context.scan.histogramFilename else None)
             self.context.dataFinalized = reason
@@ -663,16 +669,18 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
             self.allDataSignal.emit(allData)
         
     def dataAnalysis(self):
+        """fit and push the evaluations, the measurement is registered when the fits are done"""
         if self.context.analysisName != self.analysisControlWidget.currentAnalysisName:
             self.analysisControlWidget.onLoadAnalysisConfiguration( self.context.analysisName )
-        return self.analysisControlWidget.analyze(dict(((evaluation.name, plottedTrace) for evaluation, plottedTrace in zip(self.context.evaluation.evalList, self.context.plottedTraceList))))
+        self.analysisControlWidget.analyze(dict(((evaluation.name, plottedTrace) for evaluation, plottedTrace in zip(self.context.evaluation.evalList, self.context.plottedTraceList))),
+                                           functools.partial(self.registerMeasurement, context=self.context))
                 
             
     def showTimestamps(self, data):
         bins = int(self.context.evaluation.roiWidth / self.context.evaluation.binwidth)
         multiplier = self.pulserHardware.timestep.m_as('ms')
         myrange = (self.context.evaluation.roiStart.m_as('ms')/multiplier, (self.context.evaluation.roiStart+self.context.evaluation.roiWidth).m_as('ms')/multiplier)
-        y, x = numpy.histogram(itertools.chain(*data.timestamp[self.context.evaluation.timestampsChannel]),
+        y, x = numpy.histogram(data.timestamp.flat(self.context.evaluation.timestampsChannel),
                                range=myrange,
                                bins=bins)
         x = x[0:-1] * multiplier
@@ -683,12 +691,12 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
             self.context.currentTimestampTrace.y += y
             self.plottedTimestampTrace.replot()
             if self.context.currentTimestampTrace.rawdata:
-                self.context.currentTimestampTrace.rawdata.addInt(itertools.chain(*data.timestamp[self.context.evaluation.timestampsChannel]))
+                self.context.currentTimestampTrace.rawdata.addInt(data.timestamp.flat(self.context.evaluation.timestampsChannel))
         else:    
             self.context.currentTimestampTrace = TraceCollection()
             if self.context.evaluation.saveRawData:
                 self.context.currentTimestampTrace.rawdata = RawData()
-                self.context.currentTimestampTrace.rawdata.addInt(itertools.chain(data.timestamp[self.context.evaluation.timestampsChannel]))
+                self.context.currentTimestampTrace.rawdata.addInt(data.timestamp.flat(self.context.evaluation.timestampsChannel))
             self.context.currentTimestampTrace.x = x
             self.context.currentTimestampTrace.y = y
             self.context.currentTimestampTrace.name = self.context.scan.settingsName
@@ -903,13 +911,14 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
         self.scanTargetDict[target] = parameterdict
         self.scanControlWidget.updateScanTarget(target, list(parameterdict.keys()) )
 
-    def registerMeasurement(self, failedList):
+    def registerMeasurement(self, failedList, context=None):
+        context = context if context is not None else self.context
         failedEntry = ", ".join((name for target, name in failedList)) if failedList else None
-        measurement = Measurement(scanType= 'Scan', scanName=self.context.scan.settingsName, scanParameter=self.context.scan.scanParameter, scanTarget=self.context.scan.scanTarget,
-                                  scanPP = self.context.scan.loadPPName,
-                                  evaluation=self.context.evaluation.settingsName,
-                                  startDate=self.context.plottedTraceList[0].traceCollection.description['traceCreation'] if self.context.plottedTraceList else datetime.now(pytz.utc),
-                                  duration=None, filename=self.context.plottedTraceList[0].traceCollection.filename if self.context.plottedTraceList else "none",
+        measurement = Measurement(scanType= 'Scan', scanName=context.scan.settingsName, scanParameter=context.scan.scanParameter, scanTarget=context.scan.scanTarget,
+                                  scanPP = context.scan.loadPPName,
+                                  evaluation=context.evaluation.settingsName,
+                                  startDate=context.plottedTraceList[0].traceCollection.description['traceCreation'] if context.plottedTraceList else datetime.now(pytz.utc),
+                                  duration=None, filename=context.plottedTraceList[0].traceCollection.filename if context.plottedTraceList else "none",
                                   comment=None, longComment=None, failedAnalysis=failedEntry)
         # add parameters
         space = self.measurementLog.container.getSpace('PulseProgram')
@@ -939,7 +948,7 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
                 measurement.results.append( Result(name=fullName, value=pushvar.value, bottom=pushvar.minimum if pushvar.minimum else None,
                                                                                        top=pushvar.maximum if pushvar.maximum else None))   
         # add Plots
-        measurement.plottedTraceList = self.context.plottedTraceList
+        measurement.plottedTraceList = context.plottedTraceList
         self.measurementLog.container.addMeasurement( measurement )
             
                 
\ No newline at end of file
@@ -18,6 +18,16 @@ OpStates = enum.enum('idle', 'running', 'paused', 'starting', 'stopping', 'inter
 NoneScanCode = [4095, 0]  # TODO: should use the pulserconfiguration dataMemorySize
 MaxWordsInFifo = 2040
 
+
+def appendTraceData(traceList, x, evaluated, timeinterval, maxPoints=0):
+    """append the evaluated results of one scan point to the plotted traces.
+    If maxPoints > 0 only the last maxPoints points are kept."""
+    if evaluated and traceList:
+        traceList[0].appendX(x, timeinterval, maxPoints)
+    for trace, (y, error, raw) in zip(traceList, evaluated):
+        trace.appendY(y, error, raw, maxPoints)
+
+
 class ParameterScanGenerator:
     expression = Expression()
     def __init__(self, scan):
@@ -63,6 +73,14 @@ class ParameterScanGenerator:
             self.scan.xUnit = str(value.to_compact().units)
         return value.m_as(self.scan.xUnit)
         
+    def refillCode(self):
+        """scan code and words per point if the pulser server keeps the FIFO filled,
+        None if the code does not need a refill or is written by dataNextCode"""
+        if self.maxUpdatesToWrite is not None or len(self.scan.code) <= MaxWordsInFifo:
+            return None
+        self.nextIndexToWrite = len(self.scan.code)
+        return self.scan.code, 2*self.numUpdatedVariables
+
     def dataNextCode(self, experiment ):
         if self.nextIndexToWrite<len(self.scan.code):
             start = self.nextIndexToWrite
@@ -77,15 +95,7 @@ class ParameterScanGenerator:
         return self.scan.start.m_as(self.scan.xUnit), self.scan.stop.m_as(self.scan.xUnit)
                                      
     def appendData(self, traceList, x, evaluated, timeinterval):
-        if evaluated and traceList:
-            traceList[0].x = numpy.append(traceList[0].x, x)
-            traceList[0].timeintervalAppend(timeinterval)
-        for trace, (y, error, raw) in zip(traceList, evaluated):                                  
-            trace.y = numpy.append(trace.y, y)
-            trace.raw = numpy.append(trace.raw, raw)
-            if error is not None:
-                trace.bottom = numpy.append(trace.bottom, error[0])
-                trace.top = numpy.append(trace.top, error[1])
+        appendTraceData(traceList, x, evaluated, timeinterval)
                 
     def expected(self, index):
         return None
@@ -106,6 +116,9 @@ class StepInPlaceGenerator:
     def restartCode(self, currentIndex):
         return self.scan.code * 5
         
+    def refillCode(self):
+        return None
+
     def dataNextCode(self, experiment):
         return self.scan.code
         
@@ -116,26 +129,7 @@ class StepInPlaceGenerator:
         return []
 
     def appendData(self, traceList, x, evaluated, timeinterval):
-        steps = self.scan.maxPoints
-        if evaluated and traceList:
-            if len(traceList[0].x)<steps or steps==0:
-                traceList[0].x = numpy.append(traceList[0].x, x)
-                traceList[0].timeintervalAppend(timeinterval)
-                for trace, (y, error, raw) in zip(traceList, evaluated):                                  
-                    trace.y = numpy.append(trace.y, y)
-                    trace.raw = numpy.append(trace.raw, raw)
-                    if error is not None:
-                        trace.bottom = numpy.append(trace.bottom, error[0])
-                        trace.top = numpy.append(trace.top, error[1])
-            else:
-                traceList[0].x = numpy.append(traceList[0].x[-steps+1:], x)
-                traceList[0].timeintervalAppend(timeinterval, steps)
-                for trace, (y, error, raw) in zip(traceList, evaluated):                                  
-                    trace.y = numpy.append(trace.y[-steps+1:], y)
-                    trace.raw = numpy.append(trace.raw[-steps+1:], raw)
-                    if error is not None:
-                        trace.bottom = numpy.append(trace.bottom[-steps+1:], error[0])
-                        trace.top = numpy.append(trace.top[-steps+1:], error[1])
+        appendTraceData(traceList, x, evaluated, timeinterval, self.scan.maxPoints)
 
     def dataOnFinal(self, experiment, currentState):
         experiment.onStop()                   
@@ -159,6 +153,9 @@ class FreerunningGenerator:
     def restartCode(self, currentIndex):
         return []
         
+    def refillCode(self):
+        return None
+
     def dataNextCode(self, experiment):
         return None
         
@@ -169,15 +166,7 @@ class FreerunningGenerator:
         return []
 
     def appendData(self, traceList, x, evaluated, timeinterval):
-        if evaluated and traceList:
-            traceList[0].x = numpy.append(traceList[0].x, x)
-            traceList[0].timeintervalAppend(timeinterval)
-            for trace, (y, error, raw) in zip(traceList, evaluated):                                  
-                trace.y = numpy.append(trace.y, y)
-                trace.raw = numpy.append(trace.raw, raw)
-                if error is not None:
-                    trace.bottom = numpy.append(trace.bottom, error[0])
-                    trace.top = numpy.append(trace.top, error[1])
+        appendTraceData(traceList, x, evaluated, timeinterval)
 
     def dataOnFinal(self, experiment, currentState):
         experiment.onStop()                   
@@ -240,6 +229,14 @@ class GateSequenceScanGenerator:
     def xValue(self, index, data):
         return self.scan.index[index]
 
+    def refillCode(self):
+        """scan code and words per point if the pulser server keeps the FIFO filled,
+        None if the code does not need a refill or is written by dataNextCode"""
+        if self.maxUpdatesToWrite is not None or len(self.scan.code) <= self.maxWordsToWrite:
+            return None
+        self.nextIndexToWrite = len(self.scan.code)
+        return self.scan.code, 2*self.numUpdatedVariables
+
     def dataNextCode(self, experiment):
         if self.nextIndexToWrite<len(self.scan.code):
             start = self.nextIndexToWrite
@@ -251,15 +248,7 @@ class GateSequenceScanGenerator:
         return [0, len(self.scan.list)]
 
     def appendData(self, traceList, x, evaluated, timeinterval):
-        if evaluated and traceList:
-            traceList[0].x = numpy.append(traceList[0].x, x)
-            traceList[0].timeintervalAppend(timeinterval)
-        for trace, (y, error, raw) in zip(traceList, evaluated):                                  
-            trace.y = numpy.append(trace.y, y)
-            trace.raw = numpy.append(trace.raw, raw)
-            if error is not None:
-                trace.bottom = numpy.append(trace.bottom, error[0])
-                trace.top = numpy.append(trace.top, error[1])
+        appendTraceData(traceList, x, evaluated, timeinterval)
 
     def dataOnFinal(self, experiment, currentState):
         experiment.onStop()
@@ -61,6 +61,7 @@ class InternalScanMethod(object):
             mycode = self.experiment.context.generator.dataNextCode(self )
             if mycode:
                 self.experiment.pulserHardware.ppWriteData(mycode)
+            self.experiment.pulserHardware.acknowledgePoints( self.experiment.context.currentIndex )
             self.experiment.progressUi.onData( self.experiment.context.currentIndex )
    
 class ExternalScanMethod(InternalScanMethod):
@@ -33,6 +33,8 @@ class Parameters(AttributeComparisonEquality):
         self.spaceParamCache = dict()
 
 class ValueHistoryUi(Form, Base):
+    maximumRows = 10000   # longer histories are downsampled by the database
+    
     def __init__(self, config, dbConnection, parent=None):
         Base.__init__(self, parent)
         Form.__init__(self)
@@ -102,11 +104,12 @@ class ValueHistoryUi(Form, Base):
         self.doLoad( self.parameters.space, self.parameters.parameter, self.parameters.fromTime )
 
     def doLoad(self, space, parameter, fromTime ):
-        result = self.connection.getHistory( space, parameter, fromTime, datetime.now() )
-        if not result:
+        result = self.connection.getHistoryArrays( space, parameter, fromTime, datetime.now(), maxPoints=self.maximumRows )
+        if len(result)==0:
             logging.getLogger(__name__).warning("Database query returned empty set")
-        elif len(result)>0:
-            self.data = [(e.upd_date, Q(e.value, e.unit)) for e in reversed(result)]
+        else:
+            self.data = [(datetime.fromtimestamp(t, tzlocal()), Q(value, unit)) for t, value, unit in
+                         zip(result.time[::-1].tolist(), result.value[::-1].tolist(), result.unit[::-1])]
             self.dataModel.setDataTable(self.data)
                 
            
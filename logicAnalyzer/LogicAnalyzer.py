@@ -7,6 +7,7 @@ import logging
 import os
 from _functools import partial
 
+import numpy
 import PyQt5.uic
 from PyQt5 import QtCore, QtWidgets
 from pyqtgraph.graphicsItems.PlotCurveItem import PlotCurveItem
@@ -15,10 +16,10 @@ from pyqtgraph.graphicsItems.ViewBox import ViewBox
 
 from logicAnalyzer.LogicAnalyzerSignalTableModel import LogicAnalyzerSignalTableModel
 from logicAnalyzer.LogicAnalyzerTraceTableModel import LogicAnalyzerTraceTableModel
-from modules import dictutil
+from logicAnalyzer.LogicAnalyzerTransitions import bitPlanes, stepTraces, TransitionTable
 from modules.AttributeComparisonEquality import AttributeComparisonEquality
 from modules.GuiAppearance import restoreGuiState, saveGuiState
-from modules.Utility import flatten, unique
+from modules.Utility import unique
 from modules.concatenate_iter import concatenate_iter
 from modules.enum import enum
 from trace.pens import penList
@@ -40,13 +41,6 @@ class Settings(AttributeComparisonEquality):
     def __setstate__(self, state):
         self.__dict__ = state
 
-def bitEvaluate(numChannels, thisval, lastval=None, channelOffset=0, trigger=False):
-    offValue = 0 if trigger else -1
-    if lastval is None:
-        return [(bit+channelOffset, 1 if thisval&(1<<bit) else offValue) for bit in range(numChannels)]
-    return [(bit+channelOffset, 0 if thisval&(1<<bit)==lastval&(1<<bit) else 1 if thisval&(1<<bit) else offValue) for bit in range(numChannels)]
-   
-
 class LogicAnalyzer(Form, Base ):
     OpStates = enum('stopped', 'running', 'single', 'idle') #added idle in response to exception
     def __init__(self,config,pulserHardware,channelNameData, parent=None):
@@ -117,54 +111,37 @@ class LogicAnalyzer(Form, Base ):
         
     def onData(self, logicData):
         logger = logging.getLogger(__name__)
-        logger.debug( str(logicData) )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug( str(logicData) )
         logger.debug( "Wordcount: {0}".format(logicData.wordcount))
         self.logicData = logicData
         offset = 0
+        enabledList = self.signalTableModel.enabledList
+        stopX = logicData.stopMarker * self.settings.scaling
         if logicData.data:
-            self.xData, self.yData = list(zip( *logicData.data ))
-            self.xData = [ x * self.settings.scaling for x in self.xData ]  # convert tuple to list
-            self.xData.append( logicData.stopMarker * self.settings.scaling )
-            self.yDataBundle = [list() for _ in range(self.settings.numChannels)]
-            for i in range(self.settings.numChannels):
-                if self.signalTableModel.enabledList[i]:
-                    for value in self.yData:
-                        self.yDataBundle[i].append(offset+self.settings.height if value&(1<<i) else offset )
-                    offset += 1
+            self.xData = numpy.append(logicData.data.time * self.settings.scaling, stopX)
+            self.yData = logicData.data.pattern
+            self.yDataBundle, offset = stepTraces(bitPlanes(self.yData, self.settings.numChannels),
+                                                  enabledList, offset, self.settings.height)
         nextChannel = self.settings.numChannels
         if logicData.auxData:
-            self.xAuxData, self.yAuxData = list(zip( *logicData.auxData ))
-            self.xAuxData = [ x * self.settings.scaling for x in self.xAuxData ]  # convert tuple to list
-            self.xAuxData.append( logicData.stopMarker * self.settings.scaling )
-            self.yAuxDataBundle = [list() for _ in range(self.settings.numAuxChannels)]
-            for i in range(self.settings.numAuxChannels):
-                if self.signalTableModel.enabledList[nextChannel+i]:
-                    for value in self.yAuxData:
-                        self.yAuxDataBundle[i].append(offset+self.settings.height if value&(1<<i) else offset )
-                    offset += 1
+            self.xAuxData = numpy.append(logicData.auxData.time * self.settings.scaling, stopX)
+            self.yAuxData = logicData.auxData.pattern
+            self.yAuxDataBundle, offset = stepTraces(bitPlanes(self.yAuxData, self.settings.numAuxChannels),
+                                                     enabledList[nextChannel:], offset, self.settings.height)
         nextChannel += self.settings.numAuxChannels
         if logicData.trigger:
-            self.xTrigger, self.yTrigger = list(zip( *logicData.trigger ))
-            self.xTrigger = list(flatten([ (x* self.settings.scaling, x* self.settings.scaling+self.settings.triggerWidth)  for x in self.xTrigger ]))  # convert tuple to list
-            self.yTrigger = list(flatten([ (y, 0) for y in self.yTrigger ]))
-            self.xTrigger.append( logicData.stopMarker * self.settings.scaling )
-            self.yTriggerBundle = [list() for _ in range(self.settings.numTriggerChannels)]
-            for i in range(self.settings.numTriggerChannels):
-                if self.signalTableModel.enabledList[nextChannel+i]:
-                    for value in self.yTrigger:
-                        self.yTriggerBundle[i].append(offset+self.settings.height if value&(1<<i) else offset )
-                    offset += 1
+            x = logicData.trigger.time * self.settings.scaling
+            self.xTrigger = numpy.append(numpy.column_stack((x, x+self.settings.triggerWidth)).ravel(), stopX)
+            self.yTrigger = numpy.column_stack((logicData.trigger.pattern, numpy.zeros_like(logicData.trigger.pattern))).ravel()
+            self.yTriggerBundle, offset = stepTraces(bitPlanes(self.yTrigger, self.settings.numTriggerChannels),
+                                                     enabledList[nextChannel:], offset, self.settings.height)
         nextChannel += self.settings.numTriggerChannels
         if logicData.gateData:
-            self.xGateData, self.yGateData = list(zip( *logicData.gateData ))
-            self.xGateData = [ x * self.settings.scaling for x in self.xGateData ]  # convert tuple to list
-            self.xGateData.append( logicData.stopMarker * self.settings.scaling )
-            self.yGateDataBundle = [list() for _ in range(self.settings.numGateChannels)]
-            for i in range(self.settings.numGateChannels):
-                if self.signalTableModel.enabledList[nextChannel+i]:
-                    for value in self.yGateData:
-                        self.yGateDataBundle[i].append(offset+self.settings.height if value&(1<<i) else offset )
-                    offset += 1
+            self.xGateData = numpy.append(logicData.gateData.time * self.settings.scaling, stopX)
+            self.yGateData = logicData.gateData.pattern
+            self.yGateDataBundle, offset = stepTraces(bitPlanes(self.yGateData, self.settings.numGateChannels),
+                                                      enabledList[nextChannel:], offset, self.settings.height)
         self.plotData()
         if self.state==self.OpStates.single:
             self.setStatusStopped()
@@ -172,31 +149,17 @@ class LogicAnalyzer(Form, Base ):
             
             
     def evaluateData(self, logicData):
-        self.pulseData = dict()
-        if logicData.data:
-            lastval = None
-            for clockcycle, value in logicData.data:
-                dictutil.getOrInsert(self.pulseData, clockcycle * self.settings.scaling, dict()).update( bitEvaluate(self.settings.numChannels, value, lastval) )
-                lastval = value
-            self.pulseData[logicData.stopMarker * self.settings.scaling] = dict()
-        inext = self.settings.numChannels
-        if logicData.auxData:
-            lastval = None
-            for clockcycle, value in logicData.auxData:
-                dictutil.getOrInsert(self.pulseData, clockcycle * self.settings.scaling, dict()).update( bitEvaluate(self.settings.numAuxChannels, value, lastval, inext)  )
-                lastval = value
-        inext += self.settings.numAuxChannels
-        if logicData.trigger:
-            lastval = None
-            for clockcycle, value in logicData.trigger:
-                dictutil.getOrInsert(self.pulseData, clockcycle * self.settings.scaling, dict()).update( bitEvaluate(self.settings.numTriggerChannels, value, lastval, inext, trigger=True) )
-                lastval = value
-        inext += self.settings.numTriggerChannels
-        if logicData.gateData:
-            lastval = None
-            for clockcycle, value in logicData.gateData:
-                dictutil.getOrInsert(self.pulseData, clockcycle * self.settings.scaling, dict()).update( bitEvaluate(self.settings.numGateChannels, value, lastval, inext)  )
-                lastval = value
+        settings = self.settings
+        self.pulseData = TransitionTable(settings.numChannels + settings.numAuxChannels + settings.numTriggerChannels + settings.numGateChannels,
+                                         settings.scaling)
+        self.pulseData.addGroup(logicData.data.time, logicData.data.pattern, settings.numChannels, 0)
+        inext = settings.numChannels
+        self.pulseData.addGroup(logicData.auxData.time, logicData.auxData.pattern, settings.numAuxChannels, inext)
+        inext += settings.numAuxChannels
+        self.pulseData.addGroup(logicData.trigger.time, logicData.trigger.pattern, settings.numTriggerChannels, inext, trigger=True)
+        inext += settings.numTriggerChannels
+        self.pulseData.addGroup(logicData.gateData.time, logicData.gateData.pattern, settings.numGateChannels, inext)
+        self.pulseData.build(logicData.stopMarker if logicData.data else None)
         self.traceTableModel.setPulseData(self.pulseData)
         self.traceTableView.resizeColumnsToContents()
            
@@ -219,7 +182,7 @@ class LogicAnalyzer(Form, Base ):
             if self.curveBundle is None:
                 self.curveBundle = list()
                 for i, yData in enumerate(self.yDataBundle):
-                    if yData:
+                    if yData is not None:
                         curve = PlotCurveItem(self.xData, yData, stepMode=True, fillLevel=offset, brush=penList[1][4], pen=penList[1][0]) 
                         self._graphicsView.addItem( curve )
                         self.curveBundle.append( curve )
@@ -232,7 +195,7 @@ class LogicAnalyzer(Form, Base ):
                         self.curveBundle.append( None )
             else:
                 for curve, yData in zip(self.curveBundle, self.yDataBundle):
-                    if yData:
+                    if yData is not None:
                         if curve:
                             curve.setData(x=self.xData, y=yData)
                             
@@ -241,7 +204,7 @@ class LogicAnalyzer(Form, Base ):
             if self.curveAuxBundle is None:
                 self.curveAuxBundle = list()
                 for i, yAuxData in enumerate(self.yAuxDataBundle):
-                    if yAuxData:
+                    if yAuxData is not None:
                         curve = PlotCurveItem(self.xAuxData, yAuxData, stepMode=True, fillLevel=offset, brush=penList[2][4], pen=penList[2][0])
                         self._graphicsView.addItem( curve )
                         self.curveAuxBundle.append( curve )
@@ -255,7 +218,7 @@ class LogicAnalyzer(Form, Base ):
                         
             else:
                 for curve, yAuxData in zip(self.curveAuxBundle, self.yAuxDataBundle):
-                    if yAuxData:
+                    if yAuxData is not None:
                         if curve:
                             curve.setData(x=self.xAuxData, y=yAuxData)
         nextChannel += self.settings.numAuxChannels
@@ -263,7 +226,7 @@ class LogicAnalyzer(Form, Base ):
             if self.curveTriggerBundle is None:
                 self.curveTriggerBundle = list()
                 for i, yTrigger in enumerate(self.yTriggerBundle):
-                    if yTrigger:
+                    if yTrigger is not None:
                         curve = PlotCurveItem(self.xTrigger, yTrigger, stepMode=True, fillLevel=offset, brush=penList[3][4], pen=penList[3][0]) 
                         self._graphicsView.addItem( curve )
                         self.curveTriggerBundle.append( curve )
@@ -277,7 +240,7 @@ class LogicAnalyzer(Form, Base ):
                         
             else:
                 for curve, yTrigger in zip(self.curveTriggerBundle, self.yTriggerBundle):
-                    if yTrigger:
+                    if yTrigger is not None:
                         if curve:
                             curve.setData(x=self.xTrigger, y=yTrigger)
         nextChannel = self.settings.numTriggerChannels
@@ -285,7 +248,7 @@ class LogicAnalyzer(Form, Base ):
             if self.curveGateBundle is None:
                 self.curveGateBundle = list()
                 for i, yGateData in enumerate(self.yGateDataBundle):
-                    if yGateData:
+                    if yGateData is not None:
                         curve = PlotCurveItem(self.xGateData, yGateData, stepMode=True, fillLevel=offset, brush=penList[2][4], pen=penList[2][0])
                         self._graphicsView.addItem( curve )
                         self.curveGateBundle.append( curve )
@@ -299,7 +262,7 @@ class LogicAnalyzer(Form, Base ):
                         
             else:
                 for curve, yGateData in zip(self.curveGateBundle, self.yGateDataBundle):
-                    if yGateData:
+                    if yGateData is not None:
                         if curve:
                             curve.setData(x=self.xGateData, y=yGateData)
         self.lastEnabledChannels = list( self.signalTableModel.enabledList )
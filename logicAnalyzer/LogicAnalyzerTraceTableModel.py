@@ -3,42 +3,40 @@
 # This Software is released under the GPL license detailed
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
+import numpy
 from PyQt5 import QtCore, QtGui
 
-
-def anyNonZero( dictionary, keys ):
-    for key in keys:
-        if dictionary.get(key, None):
-            return True
-    return False
-
     
 class LogicAnalyzerTraceTableModel(QtCore.QAbstractTableModel):
+    """Rows of the TransitionTable with a transition in any enabled channel.
+    Rows are made available to the view in batches of fetchSize as it scrolls (canFetchMore/fetchMore)."""
+    fetchSize = 1000
     def __init__(self, config, signalTableModel, parent=None, *args): 
         QtCore.QAbstractTableModel.__init__(self, parent, *args)
         self.config = config 
         self.signalTableModel = signalTableModel
-        self.dataLookup = { (QtCore.Qt.DisplayRole, 0): lambda row: self.pulseData[row][0],
-                            (QtCore.Qt.DisplayRole, 1): lambda row: self.pulseData[row][0]-self.referenceTime
+        self.dataLookup = { (QtCore.Qt.DisplayRole, 0): lambda row: self.rowTime(row),
+                            (QtCore.Qt.DisplayRole, 1): lambda row: self.rowTime(row)-self.referenceTime
                      }
-        self.pulseData = None
-        self.rawPulseData = None
+        self.transitionTable = None
+        self.rows = numpy.zeros(0, dtype=numpy.int64)
+        self.fetchedRows = 0
         self.referenceTime = 0
         self.onEnabledChannelsChanged()
         self.signalTableModel.enableChanged.connect( self.onEnabledChannelsChanged )
         
-    def eliminateEmptyRows(self, rawPulseData):
-        significantPulseData = list()
-        for record in rawPulseData:
-            if anyNonZero( record[1], self.enabledSignalLookup ):
-                significantPulseData.append(record)    
-        return significantPulseData            
+    def eliminateEmptyRows(self):
+        if self.transitionTable is not None:
+            self.rows = self.transitionTable.significantRows(self.enabledSignalLookup)
+        else:
+            self.rows = numpy.zeros(0, dtype=numpy.int64)
+        self.fetchedRows = min(len(self.rows), self.fetchSize)
         
-    def setPulseData(self, pulseData):
+    def setPulseData(self, transitionTable):
         self.beginResetModel()
-        self.rawPulseData = list(sorted(pulseData.items()))
+        self.transitionTable = transitionTable
         self.headerDataChanged.emit( QtCore.Qt.Horizontal, 0, len(self.enabledSignalLookup) )
-        self.pulseData = self.eliminateEmptyRows(self.rawPulseData)
+        self.eliminateEmptyRows()
         self.endResetModel()
         
     def onEnabledChannelsChanged(self):
@@ -47,28 +45,42 @@ class LogicAnalyzerTraceTableModel(QtCore.QAbstractTableModel):
         for channel, enabled in enumerate(self.signalTableModel.enabledList):
             if enabled:
                 self.enabledSignalLookup.append(channel)
-        if self.rawPulseData:
-            self.pulseData = self.eliminateEmptyRows(self.rawPulseData)
+        self.eliminateEmptyRows()
         self.endResetModel()
         self.headerDataChanged.emit( QtCore.Qt.Horizontal, 0, len(self.enabledSignalLookup) )
+
+    def rowTime(self, row):
+        return float(self.transitionTable.times[self.rows[row]])
         
     def setReferenceTime(self, time):
         self.referenceTime = time
         self.dataChanged.emit( self.createIndex(0, 1), self.createIndex(self.rowCount(), 1))
         
     def setReferenceTimeCell(self, index):
-        self.referenceTime = self.pulseData[index.row()][0]
+        self.referenceTime = self.rowTime(index.row())
         self.dataChanged.emit( self.createIndex(0, 1), self.createIndex(self.rowCount(), 1))
         
     def rowCount(self, parent=QtCore.QModelIndex()): 
-        return len(self.pulseData) if self.pulseData else 0
+        return self.fetchedRows
         
     def columnCount(self, parent=QtCore.QModelIndex()): 
         return 2 + len(self.enabledSignalLookup)
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and self.fetchedRows < len(self.rows)
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        count = min(self.fetchSize, len(self.rows) - self.fetchedRows)
+        if count > 0:
+            self.beginInsertRows(QtCore.QModelIndex(), self.fetchedRows, self.fetchedRows + count - 1)
+            self.fetchedRows += count
+            self.endInsertRows()
  
     colorLookup = { -1: QtGui.QColor(QtCore.Qt.red), 1: QtGui.QColor(QtCore.Qt.green), 0: QtGui.QColor(QtCore.Qt.white), None: QtGui.QColor(QtCore.Qt.white) }
     def pulseDataLookup(self, timestep, signal):
-        return self.colorLookup[self.pulseData[timestep][1].get(signal, None)]
+        if signal >= self.transitionTable.numChannels:
+            return self.colorLookup[None]
+        return self.colorLookup[int(self.transitionTable.codes[self.rows[timestep], signal])]
     
     def data(self, index, role): 
         if index.isValid():
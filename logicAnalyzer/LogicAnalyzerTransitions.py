@@ -0,0 +1,83 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Bit plane extraction and transition tables of logic analyzer captures.
+
+The patterns of a capture are unpacked into bit planes, an array with one row per
+sample and one column per channel. Step traces for plotting and the transition table
+shown in the trace table are computed from the bit planes for all channels at once.
+"""
+import numpy
+
+
+def bitPlanes(patterns, numChannels):
+    """(len(patterns), numChannels) uint8 array of the lowest numChannels bits of the 64 bit patterns"""
+    patterns = numpy.ascontiguousarray(patterns, dtype='<u8')
+    return numpy.unpackbits(patterns.view(numpy.uint8).reshape(-1, 8), axis=1, bitorder='little')[:, :numChannels]
+
+
+def transitionCodes(planes, trigger=False):
+    """transition of every bit: 1 if it is set and changed, -1 (0 for trigger channels) if it is cleared
+    and changed, 0 if it is unchanged. The first sample counts as changed."""
+    codes = numpy.where(planes, 1, 0 if trigger else -1).astype(numpy.int8)
+    if len(codes) > 1:
+        codes[1:][planes[1:] == planes[:-1]] = 0
+    return codes
+
+
+def stepTraces(planes, enabled, offset, height):
+    """y values of the step traces of the enabled channels, None for channels that are not enabled.
+    Enabled channels are stacked starting at offset, returns the traces and the next free offset."""
+    traces = list()
+    for channel in range(planes.shape[1]):
+        if enabled[channel]:
+            traces.append(planes[:, channel] * height + offset)
+            offset += 1
+        else:
+            traces.append(None)
+    return traces, offset
+
+
+class TransitionTable(object):
+    """Transitions of all channels at the union of the sample times of all channel groups.
+
+    times holds the sorted sample times (including the stop marker) multiplied by scaling,
+    codes the int8 transition codes with one row per time and one column per channel. Groups
+    without a sample at a given time have code 0 there."""
+    def __init__(self, numChannels, scaling=1):
+        self.numChannels = numChannels
+        self.scaling = scaling
+        self.groups = list()
+        self.times = numpy.zeros(0)
+        self.codes = numpy.zeros((0, numChannels), dtype=numpy.int8)
+
+    def addGroup(self, times, patterns, numChannels, channelOffset, trigger=False):
+        self.groups.append((numpy.asarray(times, dtype=numpy.int64), patterns, numChannels, channelOffset, trigger))
+
+    def build(self, stopMarker=None):
+        """compute times and codes from the groups added so far"""
+        allTimes = [times for times, _, _, _, _ in self.groups]
+        if stopMarker is not None:
+            allTimes.append(numpy.array([stopMarker], dtype=numpy.int64))
+        clockTimes = numpy.unique(numpy.concatenate(allTimes)) if allTimes else numpy.zeros(0, dtype=numpy.int64)
+        self.codes = numpy.zeros((len(clockTimes), self.numChannels), dtype=numpy.int8)
+        for times, patterns, numChannels, channelOffset, trigger in self.groups:
+            if len(times):
+                rows = numpy.searchsorted(clockTimes, times)
+                self.codes[rows, channelOffset:channelOffset + numChannels] = \
+                    transitionCodes(bitPlanes(patterns, numChannels), trigger)
+        self.times = clockTimes * self.scaling
+        return self
+
+    def __len__(self):
+        return len(self.times)
+
+    def significantRows(self, channels):
+        """indices of the rows with a transition in any of channels"""
+        channels = [channel for channel in channels if channel < self.numChannels]
+        if len(channels) == 0 or len(self.times) == 0:
+            return numpy.zeros(0, dtype=numpy.int64)
+        return numpy.flatnonzero(self.codes[:, channels].any(axis=1))
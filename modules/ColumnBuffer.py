@@ -0,0 +1,103 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import numpy
+
+
+class ColumnBuffer(object):
+    """Growable typed numpy buffer with amortized constant time append.
+
+    The values are buffer[start:start + length]. If maxLength is larger than 0 only the
+    last maxLength values are kept (rolling window). Growing or compacting allocates a
+    new buffer, values visible in an array returned earlier are never overwritten.
+    Integer buffers are converted to float64 when float values are added."""
+    __slots__ = ('buffer', 'start', 'length', 'maxLength')
+
+    def __init__(self, dtype=numpy.int64, values=None, maxLength=0):
+        self.buffer = numpy.empty(16, dtype=dtype)
+        self.start = 0
+        self.length = 0
+        self.maxLength = maxLength
+        if values is not None:
+            self.extend(values)
+
+    def __getstate__(self):
+        return (self.array.copy(), self.maxLength)
+
+    def __setstate__(self, state):
+        self.buffer = state[0]
+        self.maxLength = state[1] if len(state) > 1 else 0
+        self.start = 0
+        self.length = len(self.buffer)
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def array(self):
+        return self.buffer[self.start:self.start + self.length]
+
+    @property
+    def dtype(self):
+        return self.buffer.dtype
+
+    def reserve(self, length):
+        """make room for length values without further reallocation"""
+        if self.start + length > len(self.buffer):
+            self._reallocate(self.array, length)
+
+    def setMaxLength(self, maxLength):
+        """change the rolling window length, 0 keeps all values"""
+        self.maxLength = maxLength
+        if 0 < maxLength < self.length:
+            self.start += self.length - maxLength
+            self.length = maxLength
+
+    def _reallocate(self, values, capacity):
+        buffer = numpy.empty(max(capacity, 16), dtype=self.buffer.dtype)
+        buffer[:len(values)] = values
+        self.buffer = buffer
+        self.start = 0
+        self.length = len(values)
+
+    def _toFloat(self):
+        self.buffer = self.buffer.astype(numpy.float64)
+
+    def extend(self, values):
+        original, values = values, numpy.asarray(values)
+        if values.dtype.kind == 'f' and self.buffer.dtype.kind != 'f':
+            # lists of python ints above the int64 range are converted to float by asarray
+            unsigned = self.buffer.dtype.kind == 'u' and not isinstance(original, numpy.ndarray)
+            exact = numpy.asarray(original, dtype=self.buffer.dtype) if unsigned else None
+            if exact is not None and numpy.array_equal(exact.astype(numpy.float64), values):
+                values = exact
+            else:
+                self._toFloat()
+        newLength = self.length + len(values)
+        drop = newLength - self.maxLength if 0 < self.maxLength < newLength else 0
+        end = self.start + self.length
+        if end + len(values) <= len(self.buffer):
+            self.buffer[end:end + len(values)] = values
+            self.start += drop
+            self.length = newLength - drop
+        else:
+            oldLength = self.length
+            self._reallocate(self.array[drop:], 2 * (newLength - drop))
+            values = values[max(0, drop - oldLength):]
+            self.buffer[self.length:self.length + len(values)] = values
+            self.length += len(values)
+
+    def append(self, value):
+        if isinstance(value, float) and self.buffer.dtype.kind != 'f':
+            self._toFloat()
+        end = self.start + self.length
+        if end < len(self.buffer):
+            self.buffer[end] = value
+            if 0 < self.maxLength == self.length:
+                self.start += 1
+            else:
+                self.length += 1
+        else:
+            self.extend([value])
@@ -6,10 +6,14 @@
 """
 3rd generation of Expression, used for parsing arithmetic, units and custom functions in combo boxes
 this version uses PLY and is modeled off of http://www.dabeaz.com/ply/example.html
+Expressions are compiled into a tree of closures once and the compiled form is cached,
+evaluate only walks the compiled form.
 """
 
 import math
+import operator
 from collections import ChainMap
+from functools import lru_cache
 
 import numpy
 import ply.lex as lex
@@ -24,12 +28,44 @@ class ExpressionError(Exception):
     pass
 
 
+BinaryOperators = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv,
+                   '^': operator.pow, '%': operator.mod}
+
+
+def constantNode(value):
+    node = lambda variables, functions: value
+    node.constant = True
+    return node
+
+
+def isConstant(node):
+    """True for nodes that do not depend on variables or functions and evaluate to a number or quantity"""
+    return getattr(node, 'constant', False) and not isinstance(node(None, None), (list, dict, str))
+
+
+class CompiledExpression(object):
+    """Expression string translated by the parser into a tree of closures.
+    Calling it with the variable and function mappings evaluates the expression,
+    dependencies are the variable names used ('__exprfunc__' if functions are called)."""
+    __slots__ = ('expression', 'function', 'dependencies')
+
+    def __init__(self, expression, function, dependencies):
+        self.expression = expression
+        self.function = function
+        self.dependencies = dependencies
+
+    def __call__(self, variables, functions):
+        return self.function(variables, functions)
+
+
 class Parser:
+    compileCacheSize = 4096
+
     def __init__(self, variabledict=dict(), functiondict=dict()):
         self.dependencies = set()
         self.val = 0
         self.lexer = lex.lex(module=self)
-        self.parser = yacc.yacc(module=self)
+        self.parser = yacc.yacc(module=self, write_tables=False, debug=False)
 
         self.useFloat = False
         self.epsilon = 1e-12
@@ -62,6 +98,7 @@ class Parser:
         self.defaultFuncCM = ChainMap(ExpressionFunctions, self.localFunctions, functiondict)
         self.variableCM = self.defaultVarCM
         self.functionCM = self.defaultFuncCM
+        self.compile = lru_cache(maxsize=self.compileCacheSize)(self._compile)
 
     def nounitgen(self, fun):
         def retfun(x):
@@ -139,8 +176,7 @@ class Parser:
 
     def p_statement_expr(self, p):
         'statement : expression'
-        self.val = p[1]
-        return p[1]
+        p[0] = p[1]
 
     def p_expression_binop(self, p):
         '''expression : expression PLUS expression
@@ -149,51 +185,58 @@ class Parser:
                       | expression DIVIDE expression
                       | expression POW expression
                       | expression MOD expression'''
-        if p[2] == '+'  : p[0] = p[1] + p[3]
-        elif p[2] == '-': p[0] = p[1] - p[3]
-        elif p[2] == '*': p[0] = p[1] * p[3]
-        elif p[2] == '/': p[0] = p[1] / p[3]
-        elif p[2] == '^': p[0] = p[1] ** p[3]
-        elif p[2] == '%': p[0] = p[1] % p[3]
+        left, right, op = p[1], p[3], BinaryOperators[p[2]]
+        if isConstant(left) and isConstant(right):
+            p[0] = constantNode(op(left(None, None), right(None, None)))
+        else:
+            p[0] = lambda variables, functions: op(left(variables, functions), right(variables, functions))
 
     def p_expression_uminus(self, p):
         'expression : MINUS expression %prec UMINUS'
-        p[0] = -p[2]
+        operand = p[2]
+        if isConstant(operand):
+            p[0] = constantNode(-operand(None, None))
+        else:
+            p[0] = lambda variables, functions: -operand(variables, functions)
 
     def p_expression_mag(self, t):
         '''expression : FLOAT NAME
                       | INT NAME'''
-        t[0] = Q(t[1], t[2])
+        t[0] = constantNode(Q(t[1], t[2]))
 
     def p_expression_number(self, t):
         '''expression : FLOAT
                       | INT'''
-        t[0] = t[1]
+        t[0] = constantNode(t[1])
 
     def p_expression_string(self, p):
         'expression : STRING'
-        p[0] = p[1]
+        p[0] = constantNode(p[1])
 
     def p_expression_func(self, t):
         '''expression : NAME LPAREN arglist RPAREN
                       | NAME LPAREN kwarglist RPAREN
                       | NAME LPAREN arglist COMMA kwarglist RPAREN'''
+        name = t[1]
         if len(t) == 7:
-            t[0] = self.functionCM[t[1]](*t[3], **t[5])
-            self.dependencies.add('__exprfunc__')
-        elif len(t) == 5:
-            if type(t[3]) is dict:
-                t[0] = self.functionCM[t[1]](**t[3])
-                self.dependencies.add('__exprfunc__')
-            else:
-                t[0] = self.functionCM[t[1]](*t[3])
-                self.dependencies.add('__exprfunc__')
+            args, kwargs = t[3], t[5]
+        elif type(t[3]) is dict:
+            args, kwargs = [], t[3]
+        else:
+            args, kwargs = t[3], {}
+        if kwargs:
+            t[0] = lambda variables, functions: functions[name](*[arg(variables, functions) for arg in args],
+                                                                **{key: arg(variables, functions) for key, arg in kwargs.items()})
+        else:
+            t[0] = lambda variables, functions: functions[name](*[arg(variables, functions) for arg in args])
+        self.dependencies.add('__exprfunc__')
 
     def p_expression_name(self, t):
         'expression : NAME'
-        t[0] = self.variableCM[t[1]]
-        if t[1] not in self.constLookup:
-            self.dependencies.add(t[1])
+        name = t[1]
+        t[0] = lambda variables, functions: variables[name]
+        if name not in self.constLookup:
+            self.dependencies.add(name)
 
     def p_arglist(self, t):
         '''arglist : expression
@@ -214,11 +257,13 @@ class Parser:
 
     def p_expression_list(self, t):
         'expression : LBRACK listentry RBRACK'
-        t[0] = t[2]
+        entries = t[2]
+        t[0] = lambda variables, functions: [entry(variables, functions) for entry in entries]
 
     def p_expression_dict(self, t):
         'expression : LBRACE dictentry RBRACE'
-        t[0] = t[2]
+        entries = t[2]
+        t[0] = lambda variables, functions: {key(variables, functions): value(variables, functions) for key, value in entries}
 
     def p_listentry(self, t):
         '''listentry : expression
@@ -232,10 +277,9 @@ class Parser:
         '''dictentry : expression COLON expression
                      | dictentry COMMA expression COLON expression'''
         if len(t) == 4:
-            t[0] = {t[1]: t[3]}
+            t[0] = [(t[1], t[3])]
         else:
-            t[0] = t[1]
-            t[0].update({t[3]: t[5]})
+            t[0] = t[1] + [(t[3], t[5])]
 
     def p_expression_group(self, p):
         'expression : LPAREN expression RPAREN'
@@ -244,22 +288,24 @@ class Parser:
     def p_error(self, p):
         raise ExpressionError("Syntax error at '{0}' in '{1}'".format(p.value, p.lexer.lexdata))
 
-    def evaluate(self, s, variabledict=dict(), listDependencies=False, useFloat=False, functiondict=dict()):
+    def _compile(self, s, useFloat=False):
         self.dependencies = set()
         self.useFloat = useFloat
-        self.variableCM = ChainMap(variabledict, self.defaultVarCM)
-        self.functionCM = ChainMap(functiondict, self.defaultFuncCM)
-        self.parser.parse(s, lexer=self.lexer)
+        function = self.parser.parse(s, lexer=self.lexer)
+        return CompiledExpression(s, function, frozenset(self.dependencies))
+
+    def evaluate(self, s, variabledict=dict(), listDependencies=False, useFloat=False, functiondict=dict()):
+        compiled = self.compile(s, useFloat)
+        self.dependencies = set(compiled.dependencies)
+        self.variableCM = ChainMap(variabledict, self.defaultVarCM) if variabledict else self.defaultVarCM
+        self.functionCM = ChainMap(functiondict, self.defaultFuncCM) if functiondict else self.defaultFuncCM
+        self.val = compiled(self.variableCM, self.functionCM)
         if listDependencies:
             return self.val, self.dependencies
         return self.val
 
     def evaluateAsMagnitude(self, s, variabledict=dict(), listDependencies=False, useFloat=False, functiondict=dict()):
-        self.dependencies = set()
-        self.useFloat = useFloat
-        self.variableCM = ChainMap(variabledict, self.defaultVarCM)
-        self.functionCM = ChainMap(functiondict, self.defaultFuncCM)
-        self.parser.parse(s, lexer=self.lexer)
+        self.evaluate(s, variabledict, False, useFloat, functiondict)
         self.val = Q(self.val)
         if listDependencies:
             return self.val, self.dependencies
@@ -268,6 +314,9 @@ class Parser:
 
 class Expression:
     exprParser = Parser()
+    def compile(self, s, useFloat=False):
+        return self.exprParser.compile(s, useFloat)
+
     def evaluate(self, s, variabledict=dict(), listDependencies=False, useFloat=False, functiondict=dict()):
         return self.exprParser.evaluate(s, variabledict, listDependencies, useFloat, functiondict)
 
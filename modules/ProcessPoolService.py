@@ -0,0 +1,89 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Base class for services running batches of jobs in worker processes
+
+The pool of spawned worker processes is started on first use. Subclasses provide runJob,
+a module level function executed in the workers, the optional worker initializer and
+errorResult for jobs that fail in the pool (a JobError by default). If the pool breaks the
+job is run in the calling process and the pool is restarted on the next submit.
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import os
+
+
+class JobError(object):
+    """result of a job that failed in the pool, error is the error message"""
+    def __init__(self, key, error):
+        self.key = key
+        self.error = error
+
+
+class ProcessPoolService(object):
+    name = "process pool service"
+    runJob = None           # staticmethod of a picklable module level function job -> result
+    initializer = None      # staticmethod run once in every worker process
+
+    def __init__(self, processes=None):
+        self.processes = processes if processes is not None else max(1, (os.cpu_count() or 2) - 1)
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            logging.getLogger(__name__).info("Starting {0} with {1} processes".format(self.name, self.processes))
+            self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=self.initializer)
+        return self._executor
+
+    def errorResult(self, job, error):
+        """result of job that failed with the message error"""
+        return JobError(getattr(job, 'key', None), error)
+
+    def submit(self, job, callback=None):
+        """start job and return its future. If given callback is called with the result as soon
+        as it is available. If the worker processes cannot be started the job is run in the
+        calling process and callback is called before submit returns."""
+        try:
+            future = self.executor.submit(self.runJob, job)
+        except Exception as e:
+            logging.getLogger(__name__).warning("{0} not available ({1}), running the job in this process".format(self.name, e))
+            self._executor = None
+            future = Future()
+            try:
+                future.set_result(self.runJob(job))
+            except Exception as jobException:
+                future.set_exception(jobException)
+        if callback is not None:
+            future.add_done_callback(lambda future: callback(self._result(future, job)))
+        return future
+
+    def submitBatch(self, jobs, callback=None):
+        """start all jobs and return the futures, see submit"""
+        return [self.submit(job, callback) for job in jobs]
+
+    def runBatch(self, jobs, timeout=None):
+        """run all jobs in parallel and return the results in the order of jobs"""
+        return [self._result(future, job, timeout) for job, future in zip(jobs, self.submitBatch(jobs))]
+
+    def _result(self, future, job, timeout=None):
+        try:
+            return future.result(timeout)
+        except BrokenProcessPool as e:
+            logging.getLogger(__name__).warning("{0} failed ({1}), running the job in this process".format(self.name, e))
+            self._executor = None
+            return self.runJob(job)
+        except Exception as e:
+            logging.getLogger(__name__).error("{0} failed: {1}".format(self.name, e))
+            return self.errorResult(job, "{0}: {1}".format(e.__class__.__name__, e))
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait)
+            self._executor = None
@@ -4,7 +4,7 @@
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
 # A list that also works as a dict
-from collections import MutableMapping
+from collections.abc import MutableMapping
 from itertools import zip_longest
 from operator import itemgetter
 import copy
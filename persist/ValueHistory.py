@@ -4,14 +4,19 @@
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
 
+from datetime import datetime
 import logging
+import queue
+import threading
+import time
 
+import numpy
 from sqlalchemy import Column, String, Float, DateTime, Integer, ForeignKey, Index
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, select, func, cast, extract
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, backref
 from sqlalchemy.exc import InvalidRequestError, IntegrityError
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 
 from modules.quantity import is_Q
 from persist.DatabaseConnectionSettings import DatabaseConnectionSettings
@@ -49,12 +54,110 @@ class ValueHistoryEntry(Base):
         return "<'{0}.{1}' {2} {3} @ {4}>".format(self.source.space, self.source.name, self.value, self.unit, self.upd_date)
         
     
+class HistoryArrays(object):
+    """Columns of a history query as numpy arrays.
+
+    time is in seconds since the epoch, missing bottom and top values are NaN. For
+    downsampled queries every entry is one time bucket: value is the mean, minimum and
+    maximum the extreme values, bottom and top the extreme limits within the bucket and
+    count the number of database entries in the bucket."""
+    def __init__(self, time=None, value=None, minimum=None, maximum=None, bottom=None, top=None, unit=None, count=None):
+        self.time = numpy.zeros(0) if time is None else time
+        self.value = numpy.zeros(0) if value is None else value
+        self.minimum = self.value if minimum is None else minimum
+        self.maximum = self.value if maximum is None else maximum
+        self.bottom = numpy.full(len(self.value), numpy.nan) if bottom is None else bottom
+        self.top = numpy.full(len(self.value), numpy.nan) if top is None else top
+        self.unit = numpy.zeros(0, dtype=object) if unit is None else unit
+        self.count = numpy.ones(len(self.value), dtype=numpy.int64) if count is None else count
+        
+    def __len__(self):
+        return len(self.time)
+    
+    
+def floatColumn(values):
+    """float64 array of values with None converted to NaN"""
+    return numpy.array(values, dtype=numpy.float64) if len(values) > 0 else numpy.zeros(0)
+        
+        
+class HistoryWriter(threading.Thread):
+    """Background thread writing history entries with bulk inserts.
+
+    Rows are collected until flushSize rows are pending or the oldest pending row is
+    older than flushInterval seconds and are then inserted with a single executemany
+    statement. If the bulk insert is rejected (e.g. duplicate timestamps) the rows are
+    inserted one by one and the failing ones are logged and dropped."""
+    def __init__(self, engine, flushSize=500, flushInterval=2.0):
+        super(HistoryWriter, self).__init__(name="HistoryWriter", daemon=True)
+        self.engine = engine
+        self.flushSize = flushSize
+        self.flushInterval = flushInterval
+        self.queue = queue.Queue()
+        self.pending = list()
+        self.pendingSince = None
+        self.table = ValueHistoryEntry.__table__
+        
+    def put(self, row):
+        self.queue.put(row)
+        
+    def flush(self, timeout=None):
+        """block until all rows put before have been written"""
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+    
+    def stop(self, timeout=None):
+        """write all pending rows and terminate the thread"""
+        self.queue.put(None)
+        self.join(timeout)
+        
+    def run(self):
+        while True:
+            try:
+                timeout = None if self.pendingSince is None else max(0, self.pendingSince + self.flushInterval - time.monotonic())
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self.write()
+                continue
+            if item is None:
+                self.write()
+                return
+            if isinstance(item, threading.Event):
+                self.write()
+                item.set()
+                continue
+            self.pending.append(item)
+            if self.pendingSince is None:
+                self.pendingSince = time.monotonic()
+            if len(self.pending) >= self.flushSize:
+                self.write()
+                
+    def write(self):
+        rows, self.pending, self.pendingSince = self.pending, list(), None
+        if not rows:
+            return
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(self.table.insert(), rows)
+        except SQLAlchemyError as e:
+            logging.getLogger(__name__).warning("Bulk insert of {0} history entries failed, inserting one by one: {1}".format(len(rows), e))
+            for row in rows:
+                try:
+                    with self.engine.begin() as connection:
+                        connection.execute(self.table.insert(), row)
+                except SQLAlchemyError as e:
+                    logging.getLogger(__name__).error(str(e))
+
+
 class ValueHistoryStore:
-    def __init__(self, dbConnection):
+    def __init__(self, dbConnection, flushSize=500, flushInterval=2.0):
         self.database_conn_str = dbConnection.connectionString
         self.engine = create_engine(self.database_conn_str, echo=dbConnection.echo)
         self.sourceDict = dict()
         self.databaseAvailable = False
+        self.flushSize = flushSize
+        self.flushInterval = flushInterval
+        self.writer = None
 
     def rename(self, space, oldsourcename, newsourcename):
         if (space, oldsourcename) not in self.sourceDict:
@@ -84,6 +187,7 @@ class ValueHistoryStore:
         return self.sourceDict    
         
     def getHistory(self, space, source, fromTime, toTime ):
+        self.flush()
         if toTime is not None:
             return self.session.query(ValueHistoryEntry).filter(ValueHistoryEntry.source==self.getSource(space, source)).\
                                                   filter(ValueHistoryEntry.upd_date>fromTime).\
@@ -92,14 +196,83 @@ class ValueHistoryStore:
             return self.session.query(ValueHistoryEntry).filter(ValueHistoryEntry.source==self.getSource(space, source)).\
                                                   filter(ValueHistoryEntry.upd_date>fromTime).order_by(ValueHistoryEntry.upd_date).all()
         
+    def epoch(self, expression):
+        """seconds since the epoch of the datetime expression, evaluated by the database.
+        SQLite stores the naive local times written by DBPersist, they are converted to utc."""
+        if self.engine.dialect.name == 'sqlite':
+            return (func.julianday(expression, 'utc') - 2440587.5) * 86400.0
+        return extract('epoch', expression)
+    
+    def bucket(self, expression, width):
+        """index of the time bucket of width seconds (counted from the epoch) of expression"""
+        if self.engine.dialect.name == 'sqlite':
+            return cast(self.epoch(expression) / width, Integer)   # epoch is positive, cast truncates
+        return func.floor(self.epoch(expression) / width)
+        
+    def getHistoryArrays(self, space, source, fromTime, toTime=None, maxPoints=None):
+        """history of space.source between fromTime and toTime as HistoryArrays.
+
+        The columns are read with a single Core query without creating ORM objects. If
+        maxPoints is given and more entries are in the time range, the range is divided
+        into maxPoints buckets and the database returns the mean, minimum and maximum
+        of each non empty bucket."""
+        self.flush()
+        sourceObj = self.sourceDict.get((space, source))
+        if sourceObj is None or sourceObj.id is None:
+            return HistoryArrays()
+        entry = ValueHistoryEntry.__table__.c
+        conditions = [entry.source_id == sourceObj.id, entry.upd_date > fromTime]
+        if toTime is not None:
+            conditions.append(entry.upd_date < toTime)
+        with self.engine.connect() as connection:
+            if maxPoints:
+                count = connection.execute(select(func.count()).select_from(ValueHistoryEntry.__table__).where(*conditions)).scalar()
+                if count > maxPoints:
+                    return self._downsampledHistory(connection, conditions, fromTime, toTime, maxPoints)
+            rows = connection.execute(select(self.epoch(entry.upd_date), entry.value, entry.bottom, entry.top, entry.unit).
+                                      where(*conditions).order_by(entry.upd_date)).all()
+        if not rows:
+            return HistoryArrays()
+        time, value, bottom, top, unit = zip(*rows)
+        return HistoryArrays(time=floatColumn(time), value=floatColumn(value), bottom=floatColumn(bottom),
+                             top=floatColumn(top), unit=numpy.array(unit, dtype=object))
+        
+    def _downsampledHistory(self, connection, conditions, fromTime, toTime, maxPoints):
+        entry = ValueHistoryEntry.__table__.c
+        if toTime is None:
+            toTime = datetime.now(fromTime.tzinfo)
+        width = max((toTime - fromTime).total_seconds(), 1e-3) / maxPoints
+        bucket = self.bucket(entry.upd_date, width).label('bucket')
+        rows = connection.execute(select(func.avg(self.epoch(entry.upd_date)), func.avg(entry.value), func.min(entry.value),
+                                         func.max(entry.value), func.min(entry.bottom), func.max(entry.top),
+                                         func.max(entry.unit), func.count()).
+                                  where(*conditions).group_by(bucket).order_by(bucket)).all()
+        if not rows:
+            return HistoryArrays()
+        time, value, minimum, maximum, bottom, top, unit, count = zip(*rows)
+        return HistoryArrays(time=floatColumn(time), value=floatColumn(value), minimum=floatColumn(minimum),
+                             maximum=floatColumn(maximum), bottom=floatColumn(bottom), top=floatColumn(top),
+                             unit=numpy.array(unit, dtype=object), count=numpy.array(count, dtype=numpy.int64))
+        
     def commit(self, copyTo=None ):
         self.session.commit()
 #        self.session = self.Session()
 
+    def flush(self):
+        """wait until all values added so far are written to the database"""
+        if self.writer is not None:
+            self.writer.flush()
+            
+    def stopWriter(self):
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+
     def open_session(self):
         self.__enter__()
         
     def close_session(self):
+        self.stopWriter()
         if self.databaseAvailable:
             self.session.commit()        
 
@@ -116,9 +289,12 @@ class ValueHistoryStore:
         return self
         
     def __exit__(self, exittype, value, tb):
+        self.stopWriter()
         self.session.commit()
         
     def add(self, space, source, value, unit, upd_date, bottom=None, top=None):
+        """queue the value for writing by the background writer. Only the creation of
+        new sources is committed immediately."""
         if self.databaseAvailable:
             try:
                 if is_Q(value):
@@ -129,16 +305,13 @@ class ValueHistoryStore:
                         top = top.m_as(unit)
                 if space is not None and source is not None:
                     paramObj = self.getSource(space, source)
-                    if is_Q(value):
-                        value, unit = value.m, "{:~}".format(value.units)
-                    elem = ValueHistoryEntry(paramObj, value, unit, upd_date)
-                    self.session.add(elem)
-                    elem.value = value
-                    if bottom is not None:
-                        elem.bottom = bottom
-                    if top is not None:
-                        elem.top = top
-                    self.commit()
+                    if paramObj.id is None:
+                        self.commit()
+                    if self.writer is None:
+                        self.writer = HistoryWriter(self.engine, self.flushSize, self.flushInterval)
+                        self.writer.start()
+                    self.writer.put({'source_id': paramObj.id, 'value': value, 'unit': unit, 'upd_date': upd_date,
+                                     'bottom': bottom, 'top': top})
             except (InvalidRequestError, IntegrityError) as e:
                 self.session.rollback()
                 self.session = self.Session()
@@ -147,6 +320,7 @@ class ValueHistoryStore:
                 
         
     def get(self, space, source ):
+        self.flush()
         return self.session.query(ValueHistoryEntry).filter(ValueHistoryEntry.source==self.getSource(space, source) )
                     
     def open(self):
@@ -156,14 +330,14 @@ class ValueHistoryStore:
         self.isOpen = True
         
     def close(self):
+        self.stopWriter()
         self.session.commit()
         self.isOpen = False
         
 if __name__ == "__main__":
-    import datetime
     with ValueHistoryStore(DatabaseConnectionSettings(user='python', database='ioncontrol', password='yb171', host='localhost')) as d:
-        d.add('test', 'Peter', 12, 'mm', datetime.datetime.now())
-        d.add('test', 'Peter', 13, 'mm', datetime.datetime.now())
-        d.add('test', 'Peter', 14, 'mm', datetime.datetime.now(), bottom=3, top=15 )
+        d.add('test', 'Peter', 12, 'mm', datetime.now())
+        d.add('test', 'Peter', 13, 'mm', datetime.now())
+        d.add('test', 'Peter', 14, 'mm', datetime.now(), bottom=3, top=15 )
         
 
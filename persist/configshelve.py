@@ -25,7 +25,6 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.exc import NoResultFound
 import yaml
 import datetime
-import copy
 from wrapt import synchronized
 from threading import Thread
 
@@ -95,14 +94,29 @@ class PgShelveEntry(Base):
             logging.getLogger(__name__).error("Pickling of {0} failed {1}".format(self.key, str(e)))
 
 
+def isImmutable(value):
+    """True for values that cannot be changed in place by the code reading them"""
+    return isinstance(value, (str, bytes, int, float, complex, bool, type(None)))
+
+
 class configshelve:
+    """Configuration buffer backed by the database.
+
+    Records are unpickled on first access. Only keys assigned with __setitem__ since the
+    last commit and keys handed out as mutable objects are checked when committing. Mutable
+    values can be changed in place at any time later, they stay watched and are compared to
+    the last committed state on every commit. Values equal to the last committed state are
+    not pickled again and new versions are written with a single bulk insert."""
     version = 1
     def __init__(self, dbConnection, filename=None, loadFromDate=None, filetype='sqlite'):
         self.database_conn_str = dbConnection.connectionString
         self.engine = create_engine(self.database_conn_str, echo=dbConnection.echo)
         self.buffer = dict()
+        self.pickled = dict()   # pickled values of database records that have not been accessed yet
         self.dbContent = dict()
         self.dbDigest = dict()
+        self.dirty = set()
+        self.watched = set()    # keys handed out as mutable objects
         self.filename = filename
         self.loadFromDate = loadFromDate
         self.filetype = filetype
@@ -119,17 +133,40 @@ class configshelve:
             subquery = self.session.query(func.max(PgShelveEntry.id)).filter(PgShelveEntry.upd_date < self.loadFromDate).group_by(PgShelveEntry.key)
         else:
             subquery = self.session.query(func.max(PgShelveEntry.id)).group_by(PgShelveEntry.key)
-        for record in self.session.query(PgShelveEntry).filter(PgShelveEntry.id.in_(subquery)).all():
-            try:
-                self.buffer[record.key] = copy.deepcopy(record.value)
-                self.dbContent[record.key] = record.value
-                self.dbDigest[record.key] = record.digest
-            except Exception as e:
-                logging.getLogger(__name__).exception(e)
-                logging.getLogger(__name__).warning("configuration parameter '{0}' cannot be read from database. ({1})".format(record.key, e))
+        for key, pvalue, digest in self.session.query(PgShelveEntry.key, PgShelveEntry.pvalue, PgShelveEntry.digest).filter(PgShelveEntry.id.in_(subquery)):
+            self.pickled[key] = pvalue
+            self.dbDigest[key] = digest
         if self.version > databaseVersion:
             self.upgradeDatabase(databaseVersion)
 
+    def _unpickle(self, key):
+        """move the value of key from the pickled database records to the buffer. The
+        committed state is unpickled a second time instead of deep copying the value."""
+        pvalue = self.pickled.pop(key)
+        try:
+            self.buffer[key] = pickle.loads(pvalue)
+            self.dbContent[key] = pickle.loads(pvalue)
+        except Exception as e:
+            logging.getLogger(__name__).exception(e)
+            logging.getLogger(__name__).warning("configuration parameter '{0}' cannot be read from database. ({1})".format(key, e))
+            raise KeyError(key)
+
+    def _access(self, key):
+        """value of key for a reader that may change it in place"""
+        if key in self.pickled:
+            self._unpickle(key)
+        value = self.buffer[key]
+        if not isImmutable(value):
+            self.watched.add(key)
+        return value
+
+    def _unpickleAll(self):
+        for key in list(self.pickled):
+            try:
+                self._unpickle(key)
+            except KeyError:
+                pass
+
     def upgradeDatabase(self, databaseVersion):
         self.session.add(DatabaseVersion(self.version))
         if databaseVersion < 1:
@@ -143,13 +180,14 @@ class configshelve:
             session = Session()
             for record in session.query(ShelveEntry).all():
                 try:
-                    self.buffer[record.key] = record.value
+                    self[record.key] = record.value
                 except Exception as e:
                     logging.getLogger(__name__).warning("configuration parameter '{0}' cannot be read from file {1} ({2})".format(record.key, filename, e))
             session.commit()
         elif filetype == 'yaml':
             with open(filename, 'r') as f:
-                self.buffer.update(yaml.load(f))
+                for key, value in yaml.load(f).items():
+                    self[key] = value
 
     def commitToDatabase(self):
         t = Thread(target=self._commitToDatabase)
@@ -157,18 +195,37 @@ class configshelve:
 
     @synchronized
     def _commitToDatabase(self, forcePickle=False):
-        for key, value in self.buffer.items():
-            if self.dbContent.get(key) is None or self.dbContent.get(key) != value or forcePickle:
-                entry = PgShelveEntry(key, value)
-                if self.dbDigest.get(key) != entry.digest:
-                    self.session.add(entry)
-                    self.dbContent[key] = copy.deepcopy(value)
-                    self.dbDigest[key] = entry.digest
+        if forcePickle:
+            self._unpickleAll()
+            self.dirty.update(self.buffer.keys())
+        dirty, self.dirty = self.dirty | self.watched, set()
+        rows = list()
+        for key in dirty:
+            if key not in self.buffer:
+                continue
+            value = self.buffer[key]
+            if not forcePickle and self.dbContent.get(key) is not None and not self.dbContent.get(key) != value:
+                continue
+            try:
+                pvalue = pickle.dumps(value, 4)
+            except Exception as e:
+                logging.getLogger(__name__).error("Pickling of {0} failed {1}".format(key, str(e)))
+                self.dirty.add(key)
+                continue
+            digest = hashlib.sha224(pvalue).digest()
+            if self.dbDigest.get(key) != digest:
+                rows.append({'key': key, 'pvalue': pvalue, 'digest': digest})
+                self.dbDigest[key] = digest
+            self.dbContent[key] = pickle.loads(pvalue) if not isImmutable(value) else value
+        if rows:
+            self.session.execute(PgShelveEntry.__table__.insert(), rows)
         self.session.commit()
         self.session = self.Session()
         
     @synchronized
     def saveConfig(self, copyTo=None, yamlfile=None):
+        if copyTo or yamlfile:
+            self._unpickleAll()
         if copyTo:
             engine = create_engine('sqlite:///' + copyTo, echo=False)
             Base.metadata.create_all(engine)
@@ -197,7 +254,13 @@ class configshelve:
 
     @synchronized
     def __setitem__(self, key, value):
+        self.pickled.pop(key, None)
         self.buffer[key] = value
+        self.dirty.add(key)
+        if isImmutable(value):
+            self.watched.discard(key)
+        else:
+            self.watched.add(key)
 
     @synchronized
     def __delitem__(self, key):
@@ -210,15 +273,18 @@ class configshelve:
 
     @synchronized
     def __getitem__(self, key):
-        return self.buffer[key]
+        return self._access(key)
             
     @synchronized
     def __contains__(self, key):
-        return key in self.buffer
+        return key in self.buffer or key in self.pickled
 
     @synchronized
     def get(self, key, default=None):
-        return self.buffer.get(key, default)
+        try:
+            return self._access(key)
+        except KeyError:
+            return default
 
     @synchronized
     def __next__(self):
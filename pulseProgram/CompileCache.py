@@ -0,0 +1,145 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Content addressed cache of compiled pulse programs
+
+An entry is stored under the sha256 of everything the compilation depends on: the
+source text, the text of all inserted files, the hardware configuration and the version
+of the compiler, which is the hash of the source files of the compiler modules. Editing
+a source, an include or the compiler therefore never hits a stale entry, and entries are
+never invalidated explicitly.
+
+The entries are pickled to one file per key in the cache directory. The pickled bytes are
+kept in memory as well, every get returns a new copy of the cached objects.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import re
+import sys
+import tempfile
+
+from pppCompiler.pppCompiler import pppCompiler
+
+
+def moduleVersion(*modulenames):
+    """hash of the source files of the given modules"""
+    h = hashlib.sha256()
+    for name in modulenames:
+        module = sys.modules.get(name) or __import__(name, fromlist=['__name__'])
+        filename = getattr(module, '__file__', None)
+        if filename and filename.endswith(('.pyc', '.pyo')):
+            filename = filename[:-1]
+        try:
+            with open(filename, 'rb') as f:
+                h.update(f.read())
+        except (OSError, TypeError):
+            h.update(name.encode())
+    return h.hexdigest()
+
+
+class CompileCache(object):
+    def __init__(self, directory, version=''):
+        self.directory = directory
+        self.version = version
+        self._memory = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, *parts):
+        """sha256 of the version and the repr of parts"""
+        h = hashlib.sha256(self.version.encode())
+        for part in parts:
+            h.update(b'\0')
+            h.update(part.encode() if isinstance(part, str) else repr(part).encode())
+        return h.hexdigest()
+
+    def filename(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def get(self, key):
+        """the object stored under key or None. Unreadable entries are ignored."""
+        data = self._memory.get(key)
+        if data is None:
+            try:
+                with open(self.filename(key), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                self.misses += 1
+                return None
+        try:
+            value = pickle.loads(data)
+        except Exception as e:
+            logging.getLogger(__name__).warning("Ignoring corrupt compile cache entry {0}: {1}".format(key, e))
+            self._memory.pop(key, None)
+            self.misses += 1
+            return None
+        self._memory[key] = data
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._memory[key] = data
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmpname = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmpname, self.filename(key))   # readers never see a partially written entry
+        except OSError as e:
+            logging.getLogger(__name__).warning("Cannot write compile cache entry {0}: {1}".format(key, e))
+
+    def clear(self):
+        self._memory.clear()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(('.pickle', '.tmp')):
+                    os.remove(os.path.join(self.directory, name))
+
+
+pppInsertPattern = re.compile(r'^\s*insert\s+"([^"]*)"', re.MULTILINE)
+
+
+def pppSourceParts(source, seen=None):
+    """the source followed by the text of all files inserted (recursively) into it. The files
+    are read relative to the working directory, as by pppCompiler.insert_action"""
+    seen = set() if seen is None else seen
+    parts = [source]
+    for filename in pppInsertPattern.findall(source):
+        if filename in seen:
+            continue
+        seen.add(filename)
+        try:
+            with open(filename, 'r') as f:
+                text = f.read()
+        except OSError:
+            parts.append((filename, None))
+            continue
+        parts.append((filename, text))
+        parts.extend(pppSourceParts(text, seen)[1:])
+    return parts
+
+
+pppCompilerVersion = None
+
+
+def compilePpp(source, cache=None):
+    """compile the ppp source, returns the pp code and the reverse line lookup of pppCompiler"""
+    global pppCompilerVersion
+    if cache is None:
+        compiler = pppCompiler()
+        return compiler.compileString(source), compiler.reverseLineLookup
+    if pppCompilerVersion is None:
+        pppCompilerVersion = moduleVersion('pppCompiler.pppCompiler', 'pppCompiler.Symbol', 'pppCompiler.Builtins')
+    key = cache.key('ppp', pppCompilerVersion, *pppSourceParts(source))
+    result = cache.get(key)
+    if result is None:
+        compiler = pppCompiler()
+        result = compiler.compileString(source), compiler.reverseLineLookup
+        cache.put(key, result)
+    return result
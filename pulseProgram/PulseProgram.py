@@ -15,9 +15,12 @@ import struct
 import copy
 import xml.etree.ElementTree as ElementTree
 
+import numpy
+
 from modules.XmlUtilit import xmlEncodeAttributes, xmlParseAttributes
 from modules.quantity import Q
-from pulser.Encodings import encode, decode, Dimensions, encodingValid, EncodingError
+from pulser.Encodings import encode, encodeArray, decode, Dimensions, encodingValid, EncodingError
+from pulseProgram.CompileCache import moduleVersion
 
 writeBinaryData = False
 
@@ -238,7 +241,14 @@ class PulseProgram:
         toBytecode()    generates self.bytecode
         toBinary()      generates self.binarycode
     the procedure updateVariables( dictionary )  updates variable values in the bytecode
+    If compileCache is set to a CompileCache, compileCode takes the result of parse() and
+    toBytecode() from the cache if the same source lines were compiled before.
     """    
+    compileCache = None
+    cachedAttributes = ('code', 'dataCode', 'variabledict', 'defines', 'labeldict', '_exitcodes',
+                        'bytecode', 'dataBytecode', '_instructionImage')
+    compilerVersion = None
+
     def __init__(self):
         self.variabledict = collections.OrderedDict()        # keeps information on all variables to easily change them later
         self.labeldict = dict()          # keep information on all labels
@@ -247,6 +257,7 @@ class PulseProgram:
         self.bytecode = []               # list of op, argument tuples
         self.dataBytecode = []
         self.binarycode = bytearray()    # binarycode to be uploaded
+        self._instructionImage = None    # binary of bytecode, which does not change with the variables
         self._exitcodes = dict()          # generate a reverse dictionary of variables of type exitcode
 
         
@@ -322,8 +333,19 @@ class PulseProgram:
         
     def variableScanCode(self, variablename, values):
         var = self.variabledict[variablename]
-        # [item for sublist in l for item in sublist] idiom for flattening of list
-        return self.flattenList( [ (var.address, self.convertParameter(x, var.encoding)) for x in values ] )
+        code = numpy.empty(2*len(values), dtype=numpy.uint64)
+        code[0::2] = var.address
+        code[1::2] = self.convertParameterArray(values, var.encoding)
+        return code.tolist()
+
+    def multiVariableScanCode(self, variablenames, columns):
+        """code of multiVariableUpdateCode for every point, columns holds the values of each variable for all points"""
+        varslist = [ self.variabledict[name] for name in variablenames ]
+        code = numpy.empty((len(columns[0]) if columns else 0, 2*len(varslist)), dtype=numpy.uint64)
+        for index, (var, values) in enumerate(zip(varslist, columns)):
+            code[:, 2*index] = var.address | 0x8000 if index < len(varslist)-1 else var.address & 0x7fff
+            code[:, 2*index+1] = self.convertParameterArray(values, var.encoding)
+        return code.ravel().tolist()
                    
     def multiVariableUpdateCode(self, variablenames, values):
         varslist = [ self.variabledict[name] for name in  variablenames]
@@ -349,15 +371,10 @@ class PulseProgram:
         """
         if not self.bytecode or not self.dataBytecode:
             self.compileCode()
-        logger = logging.getLogger(__name__)
-        self.binarycode = bytearray()
-        for wordno, (op, arg) in enumerate(self.bytecode):
-            logger.debug( "{0} {1} {2} {3}".format( hex(wordno), hex(op), hex(arg), hex((op<<(32-8)) + arg)) ) 
-            self.binarycode += struct.pack('I', (op<<(32-8)) + arg)
-        self.dataBinarycode = bytearray()
-        for wordno, arg in enumerate(self.dataBytecode):
-            logger.debug( "{0} {1}".format( hex(wordno), hex(int(arg)) )) 
-            self.dataBinarycode += struct.pack('Q' if arg>0 else 'q', int(arg))
+        if self._instructionImage is None:
+            self._instructionImage = self.instructionImage(self.bytecode)
+        self.binarycode = bytearray(self._instructionImage)
+        self.dataBinarycode = self.dataImage(self.dataBytecode)
         if writeBinaryData:
             self.writeBinaryCodeForSimulation(self.binarycode, 'ppcmdmem.mif')
             self.writeBinaryCodeForSimulation(self.dataBinarycode, 'ppmem6.mif')
@@ -365,6 +382,32 @@ class PulseProgram:
             self.writeBinaryDataForReference(self.dataBinarycode, 'ppmem6.txt')
         return self.binarycode, self.dataBinarycode
         
+    @staticmethod
+    def instructionImage(bytecode):
+        """ 32 bit words (op<<24) + arg of the (op, arg) tuples of bytecode as bytes
+        """
+        try:
+            words = numpy.array(bytecode, dtype=numpy.int64).reshape(-1, 2)
+        except OverflowError:
+            raise struct.error("argument out of range")
+        words = (words[:, 0] << (32-8)) + words[:, 1]
+        if len(words) and (words.min() < 0 or words.max() > 0xffffffff):
+            raise struct.error("argument out of range")
+        return words.astype('=u4').tobytes()
+
+    @staticmethod
+    def dataImage(dataBytecode):
+        """ 64 bit words of dataBytecode, negative values in two's complement
+        """
+        try:
+            words = numpy.array(dataBytecode, dtype=numpy.int64).view(numpy.uint64)
+        except (OverflowError, TypeError):
+            values = [int(arg) for arg in dataBytecode]
+            if any(not -0x8000000000000000 <= value <= 0xffffffffffffffff for value in values):
+                raise struct.error("argument out of range")
+            words = numpy.array([value & 0xffffffffffffffff for value in values], dtype=numpy.uint64)
+        return bytearray(words.astype('=u8').tobytes())
+
     def currentVariablesText(self):
         lines = list()
         for name, var in iter(sorted(self.variabledict.items())):
@@ -454,6 +497,8 @@ class PulseProgram:
         self.code = []
         self.variabledict = collections.OrderedDict() 
         self.defines = dict()
+        self.labeldict = dict()
+        self._exitcodes = dict()
         addr_offset = 0
     
         for text, lineno, sourcename in self.sourcelines:    
@@ -570,11 +615,14 @@ class PulseProgram:
         """ generate bytecode from code
         """
         logger = logging.getLogger(__name__)
+        debug = logger.isEnabledFor(logging.DEBUG)
         logger.debug( "\nCode ---> ByteCode:" )
         self.bytecode = []
         self.dataBytecode = []
+        self._instructionImage = None
         for line in self.code:
-            logger.debug( "{0}: {1}".format(hex(line[0]),  line[1:] )) 
+            if debug:
+                logger.debug( "{0}: {1}".format(hex(line[0]),  line[1:] )) 
             bytedata = 0
             if line[1] not in OPS:
                 raise ppexception("Unknown command {0}".format(line[1]), line[4], line[5], line[1]) 
@@ -600,10 +648,12 @@ class PulseProgram:
                 logger.error( "Error assembling bytecode from file '{0}': Unknown variable: '{1}'. \n".format(line[4], data) )
                 raise ppexception("{0}: Unknown variable {1}".format(line[4], data), line[4], line[5], data)
             self.bytecode.append((byteop, bytedata))
-            logger.debug( "---> {0} {1}".format(hex(byteop), hex(bytedata)) )
+            if debug:
+                logger.debug( "---> {0} {1}".format(hex(byteop), hex(bytedata)) )
     
         for line in self.dataCode:
-            logger.debug( "{0}: {1}".format(hex(line[0]),  line[1:] )) 
+            if debug:
+                logger.debug( "{0}: {1}".format(hex(line[0]),  line[1:] )) 
             bytedata = 0
             if line[1] not in OPS:
                 raise ppexception("Unknown command {0}".format(line[1]), line[4], line[5], line[1]) 
@@ -629,7 +679,8 @@ class PulseProgram:
                 logger.error( "Error assembling bytecode from file '{0}': Unknown variable: '{1}'. \n".format(line[4], data) )
                 raise ppexception("{0}: Unknown variable {1}".format(line[4], data), line[4], line[5], data)
             self.dataBytecode.append( bytedata )
-            logger.debug( "---> {0} {1}".format(hex(byteop), hex(bytedata)) )
+            if debug:
+                logger.debug( "---> {0} {1}".format(hex(byteop), hex(bytedata)) )
 
         return self.bytecode, self.dataBytecode
 
@@ -644,10 +695,35 @@ class PulseProgram:
             logging.getLogger(__name__).error("Error encoding {0} with '{1}': {2}".format(mag, encoding, str(e)))
             return 0
 
+    def convertParameterArray(self, values, encoding=None):
+        """convert a sequence of parameters to an uint64 array of the binary values, identical
+        to convertParameter of every value"""
+        try:
+            return encodeArray(values, encoding)
+        except EncodingError:
+            return numpy.array([self.convertParameter(mag, encoding) for mag in values], dtype=numpy.uint64)
+
+    def cacheKey(self):
+        """ key of the compiled code in compileCache, the hash of everything parse() depends on
+        """
+        if PulseProgram.compilerVersion is None:
+            PulseProgram.compilerVersion = moduleVersion('pulseProgram.PulseProgram', 'pulser.Encodings')
+        boards = [(type(board).__name__, board.channelLimit) for board in self.adBoards]
+        return self.compileCache.key('pp', self.compilerVersion, self.sourcelines, self.adIndexList, boards, str(self.timestep))
+
     def compileCode(self):
         try:
+            key = self.cacheKey() if self.compileCache is not None else None
+            state = self.compileCache.get(key) if key is not None else None
+            if state is not None:
+                for name in self.cachedAttributes:
+                    setattr(self, name, state[name])
+                return
             self.parse()
             self.toBytecode()
+            if key is not None:
+                self._instructionImage = self.instructionImage(self.bytecode)
+                self.compileCache.put(key, dict((name, getattr(self, name)) for name in self.cachedAttributes))
         except Exception as e:
             logging.getLogger(__name__).exception(e)
             raise
@@ -17,13 +17,13 @@ from modules.quantity import Q
 from .BinaryTableModel import CounterTableModel, TriggerTableModel, ShutterTableModel
 from ProjectConfig.Project import getProject
 from pulseProgram import PulseProgram
+from pulseProgram.CompileCache import CompileCache, compilePpp
 from pulseProgram.PulseProgramSourceEdit import PulseProgramSourceEdit
 from pulseProgram.VariableDictionary import VariableDictionary
 from pulseProgram.VariableTableModel import VariableTableModel
 from pulser.Encodings import EncodingDict
 from uiModules.RotatedHeaderView import RotatedHeaderView
 from modules.enum import enum
-from pppCompiler.pppCompiler import pppCompiler
 from pppCompiler.CompileException import CompileException
 from pppCompiler.Symbol import SymbolTable
 from modules.PyqtUtility import BlockSignals, updateComboBoxItems
@@ -145,6 +145,9 @@ class PulseProgramUi(PulseProgramWidget, PulseProgramBase):
         self.pppCompileException = None
         self.globaldict = parameterdict
         self.project = getProject()
+        if PulseProgram.PulseProgram.compileCache is None:   # shared by the pulse programs of all experiments
+            PulseProgram.PulseProgram.compileCache = CompileCache(os.path.join(self.project.projectDir, '.compile-cache'))
+        self.compileCache = PulseProgram.PulseProgram.compileCache
         self.defaultPPPDir = self.project.configDir+'/PulseProgramsPlus'
         if not os.path.exists(self.defaultPPPDir):
             os.makedirs(self.defaultPPPDir)
@@ -554,9 +557,7 @@ class PulseProgramUi(PulseProgramWidget, PulseProgramBase):
         self.pppSource = self.pppSource.expandtabs(4)
         success = False
         try:
-            compiler = pppCompiler()
-            ppCode = compiler.compileString( self.pppSource )
-            self.pppReverseLineLookup = compiler.reverseLineLookup
+            ppCode, self.pppReverseLineLookup = compilePpp( self.pppSource, self.compileCache )
             self.pppCompileException = None
             with open(savefilename, "w") as f:
                 f.write(ppCode)
@@ -689,15 +690,16 @@ class PulseProgramUi(PulseProgramWidget, PulseProgramBase):
     
     def variableScanCode(self, variablename, values, extendedReturn=False):
         tempparameters = copy.deepcopy( self.currentContext.parameters )
-        updatecode = list()
-        numVariablesPerUpdate = 0
-        for currentval in values:
+        upd_names, columns = list(), list()
+        for index, currentval in enumerate(values):   # the dependent variables are the same for all values
             upd_names, upd_values = tempparameters.setValue(variablename, currentval)
-            numVariablesPerUpdate = len(upd_names)
-            upd_names.append( variablename )
-            upd_values.append( currentval )
-            updatecode.extend( self.pulseProgram.multiVariableUpdateCode( upd_names, upd_values ) )
-            logging.getLogger(__name__).info("{0}: {1}".format(upd_names, upd_values))
+            if index == 0:
+                columns = [ list() for _ in upd_values ]
+            for column, updatedValue in zip(columns, upd_values):
+                column.append(updatedValue)
+        numVariablesPerUpdate = len(upd_names)
+        logging.getLogger(__name__).info("{0} scan values of {1} updating {2}".format(len(values), variablename, upd_names))
+        updatecode = self.pulseProgram.multiVariableScanCode( upd_names + [variablename], columns + [values] ) if len(values) else list()
         if extendedReturn:
             return updatecode, numVariablesPerUpdate
         return updatecode
@@ -5,8 +5,9 @@
 # *****************************************************************
 
 import logging
+from contextlib import contextmanager
 
-from networkx import DiGraph, simple_cycles, dfs_postorder_nodes, dfs_preorder_nodes
+from networkx import DiGraph, descendants, has_path, shortest_path, topological_sort
 
 from modules.Expression import Expression
 from modules.SequenceDict import SequenceDict
@@ -45,12 +46,17 @@ class VariableDictionaryView(object):
  
 class VariableDictionary(SequenceDict):
     """Ordered Dictionary to hold variable values. It maintains a dependency graph
-    to check for cycles and to recalculate the necessary values when one of the fields is updated"""   
+    to check for cycles and to recalculate the necessary values when one of the fields is updated.
+    The dependencies are taken from the compiled expressions, changes are propagated to the
+    downstream variables in topological order. Within batchUpdate the propagation of all
+    changes is done once at the end of the block."""
     expression = Expression()
     def __init__(self, *args, **kwargs):
         self.valueView = VariableDictionaryView(self)
         self.dependencyGraph = DiGraph()
         self.globaldict = dict()
+        self._topologicalIndex = (None, None)   # (graph, dict node -> position in topological order)
+        self._batchChanges = None
         super(VariableDictionary, self).__init__(*args, **kwargs)
 
     def __getstate__(self):
@@ -65,38 +71,53 @@ class VariableDictionary(SequenceDict):
         self.globaldict = globaldict 
                 
     def calculateDependencies(self):
-        self.dependencyGraph = DiGraph()   # clear the old dependency graph in case parameters got removed
+        """rebuild the dependency graph from the expressions and recalculate all variables"""
+        graph = DiGraph()   # new dependency graph in case parameters got removed
+        cyclic = dict()     # name -> error, the variables closing a cycle keep their error after the recalculation
         for name, var in self.items():
             if hasattr(var, 'strvalue'):
+                graph.add_node(name)
                 try:
-                    var.value, dependencies = self.expression.evaluate(var.strvalue, self.valueView, listDependencies=True)
-                    self.addDependencies(self.dependencyGraph, dependencies, name)
+                    self.addDependencies(graph, self.expression.compile(var.strvalue).dependencies, name)
                     var.strerror = None
-                except (KeyError, ValueError, ZeroDivisionError) as e:
-                    logging.getLogger(__name__).warning( str(e) )
-                    var.strerror = str(e)
+                except CyclicDependencyException as e:
+                    errstr = "Cyclic dependency {0} in the expression '{1}' for variable '{2}'.".format(e, var.strvalue, var.name)
+                    logging.getLogger(__name__).warning( errstr )
+                    cyclic[name] = errstr
                 except Exception as e:
                     errstr = "Unable to evaluate the expression '{0}' for variable '{1}'.".format(var.strvalue,var.name)
                     logging.getLogger(__name__).warning( errstr )
                     var.strerror = errstr
             else:
                 var.strerror = None
+        self.dependencyGraph = graph
         self.recalculateAll()
-        
+        for name, errstr in cyclic.items():
+            self[name].strerror = errstr
+
     def merge(self, variabledict, globaldict=None, overwrite=False, linkNewToParent=False ):
+        """merge the parameters of variabledict. Removed and added variables, the variables
+        depending on globals and their dependents are recalculated, all variables if a
+        different globaldict is given"""
+        recalculateAll = globaldict is not None and globaldict is not self.globaldict
         if globaldict is not None:
             self.globaldict = globaldict
-        for name in list(self.keys()):
-            if name not in variabledict:
-                self.pop(name)
-        for name, var in variabledict.items():
-            if var.type in ['parameter', 'address'] and (name not in self or overwrite):
-                self[name] = copy.deepcopy(var)
-                if linkNewToParent:
-                    self[name].useParentValue = True
-        self.sortToMatch( list(variabledict.keys()) )        
-        self.calculateDependencies()
-                
+        with self.batchUpdate():
+            for name in list(self.keys()):
+                if name not in variabledict:
+                    self.pop(name)
+                    self.removeDependencies(name)
+            for name, var in variabledict.items():
+                if var.type in ['parameter', 'address'] and (name not in self or overwrite):
+                    self[name] = copy.deepcopy(var)
+                    if linkNewToParent:
+                        self[name].useParentValue = True
+            # globals might have changed since the last merge
+            self.recalculateDependents([node for node in self.dependencyGraph if node not in self])
+        self.sortToMatch( list(variabledict.keys()) )
+        if recalculateAll:
+            self.calculateDependencies()
+
     def __setitem__(self, key, value):
         super(VariableDictionary, self).__setitem__(key, value)
         if hasattr(value, 'strvalue'):
@@ -106,7 +127,7 @@ class VariableDictionary(SequenceDict):
         new = type(self)()
         new.globaldict = self.globaldict
         new.update( (name, copy.deepcopy(value)) for name, value in list(self.items()))
-        new.dependencyGraph = self.dependencyGraph
+        new.dependencyGraph = self.dependencyGraph.copy()
         #calculateDependencies()
         return new
                 
@@ -117,11 +138,68 @@ class VariableDictionary(SequenceDict):
                 
     def addEdgeNoCycle(self, graph, first, second ):
         """add the dependency to the graph, raise CyclicDependencyException in case of cyclic dependencies"""
+        if first == second:
+            raise CyclicDependencyException([first])
+        if graph.has_node(first) and graph.has_node(second) and has_path(graph, second, first):
+            raise CyclicDependencyException(shortest_path(graph, second, first))
         graph.add_edge(first, second)
-        cycles = simple_cycles( graph )
-        for cycle in cycles:
-            raise CyclicDependencyException(cycle)
-                
+
+    def replaceDependencies(self, name, dependencies):
+        """set the dependencies of name, in case of cyclic dependencies the graph is left unchanged"""
+        graph = self.dependencyGraph
+        oldDependencies = list(graph.predecessors(name)) if graph.has_node(name) else list()
+        if graph.has_node(name) and set(oldDependencies) == set(dependencies):
+            return
+        self._topologicalIndex = (None, None)
+        graph.add_node(name)
+        graph.remove_edges_from([(dependency, name) for dependency in oldDependencies])  # dependencies from other variables might be gone
+        try:
+            self.addDependencies(graph, dependencies, name)
+        except CyclicDependencyException:
+            graph.remove_edges_from([(dependency, name) for dependency in dependencies if graph.has_edge(dependency, name)])
+            graph.add_edges_from((dependency, name) for dependency in oldDependencies)
+            raise
+
+    def updateDependencies(self, name):
+        """set the dependencies of name to the ones of the expression it is currently calculated from"""
+        strvalue = getattr(self[name], 'strvalue', None)
+        try:
+            dependencies = self.expression.compile(strvalue).dependencies if strvalue else list()
+        except Exception:
+            dependencies = list()     # the expression does not compile, its error is shown already
+        self.replaceDependencies(name, dependencies)
+
+    def removeDependencies(self, name):
+        """remove the in edges of a variable that was removed"""
+        if self.dependencyGraph.has_node(name) and self.dependencyGraph.in_degree(name) > 0:
+            self.dependencyGraph.remove_edges_from(list(self.dependencyGraph.in_edges([name])))
+            self._topologicalIndex = (None, None)
+        if self._batchChanges is not None:
+            self._batchChanges.add(name)
+
+    def topologicalIndex(self):
+        """position of every node of the dependency graph in topological order, cached until the graph changes"""
+        graph, index = self._topologicalIndex
+        if graph is not self.dependencyGraph:
+            index = dict((node, position) for position, node in enumerate(topological_sort(self.dependencyGraph)))
+            self._topologicalIndex = (self.dependencyGraph, index)
+        return index
+
+    @contextmanager
+    def batchUpdate(self):
+        """Defer the recalculation of dependent variables to the end of the block.
+        The names of the recalculated variables are appended to the yielded list."""
+        if self._batchChanges is not None:   # nested batch, the outermost one recalculates
+            yield list()
+            return
+        self._batchChanges = set()
+        recalculated = list()
+        try:
+            yield recalculated
+        finally:
+            changes, self._batchChanges = self._batchChanges, None
+            recalculated.extend(self.recalculateDependents(changes))
+
     def setStrValueIndex(self, index, strvalue):
         return self.setStrValue( self.keyAt(index), strvalue)
         
@@ -129,14 +207,9 @@ class VariableDictionary(SequenceDict):
         """update the variable value with strvalue and recalculate as necessary"""  
         var = self[name]
         try:
-            result, dependencies = self.expression.evaluate(strvalue, self.valueView, listDependencies=True )
-            graph = self.dependencyGraph.copy()            # make a copy of the graph. In case of cyclic dependencies we do not want o leave any changes
-            for edge in list(graph.in_edges([name])):      # remove all the inedges, dependencies from other variables might be gone
-                graph.remove_edge(*edge)
-            self.addDependencies(graph, dependencies, name) # add all new dependencies
-            var.value = result
+            self.replaceDependencies(name, self.expression.compile(strvalue).dependencies)
             var.strvalue = strvalue
-            self.dependencyGraph = graph
+            var.value = self.expression.evaluate(strvalue, self.valueView)
             var.strerror = None
         except KeyError as e:
             var.strerror = str(e)
@@ -149,14 +222,9 @@ class VariableDictionary(SequenceDict):
     def setParentStrValue(self, name, strvalue):
         var = self[name]
         try:
-            result, dependencies = self.expression.evaluate(strvalue, self.valueView, listDependencies=True )
-            graph = self.dependencyGraph.copy()            # make a copy of the graph. In case of cyclic dependencies we do not want o leave any changes
-            for edge in list(graph.in_edges([name])):      # remove all the inedges, dependencies from other variables might be gone
-                graph.remove_edge(*edge)
-            self.addDependencies(graph, dependencies, name) # add all new dependencies
-            var.parentValue = result
+            self.replaceDependencies(name, self.expression.compile(strvalue).dependencies)
             var.parentStrvalue = strvalue
-            self.dependencyGraph = graph
+            var.parentValue = self.expression.evaluate(strvalue, self.valueView)
             var.strerror = None
         except KeyError as e:
             var.strerror = str(e)
@@ -168,24 +236,26 @@ class VariableDictionary(SequenceDict):
 
     def setValue(self, name, value):
         """update the variable value with value and recalculate as necessary.
-        This is done using existing dependencies."""
+        The variable no longer depends on other variables."""
         var = self[name]
         try:
             var.value = value
             var.strvalue = ""
             var.strerror = None
+            self.updateDependencies(name)
         except KeyError as e:
             var.strerror = str(e)
         return self.recalculateDependent(name, returnResult=True)
         
     def setParentValue(self, name, value):
-        """update the variable value with value and recalculate as necessary.
-        This is done using existing dependencies."""
+        """update the parent value with value and recalculate as necessary.
+        The variable keeps the dependencies of its own expression unless it uses the parent value."""
         var = self[name]
         try:
             var.parentValue = value
             var.parentStrvalue = ""
             var.strerror = None
+            self.updateDependencies(name)
         except KeyError as e:
             var.strerror = str(e)
         return self.recalculateDependent(name, returnResult=True)
@@ -197,13 +267,23 @@ class VariableDictionary(SequenceDict):
         self.at(index).enabled = enabled
        
     def recalculateDependent(self, node, returnResult=False):
-        if self.dependencyGraph.has_node(node):
-            generator = dfs_preorder_nodes(self.dependencyGraph, node)
-            next(generator )   # skip the first, that is us
-            nodelist = list(generator)  # make a list, we need it twice 
-            result = [ self.recalculateNode(node) for node in nodelist ]                
-            return (nodelist, result) if returnResult else nodelist     # return which ones were re-calculated, so gui can be updated 
-        return (list(), list()) if returnResult else list()
+        return self.recalculateDependents([node], returnResult)
+
+    def recalculateDependents(self, nodes, returnResult=False):
+        """recalculate the variables depending on any of nodes (variables or globals) once in topological order.
+        Within batchUpdate the nodes are only recorded."""
+        if self._batchChanges is not None:
+            self._batchChanges.update(nodes)
+            return (list(), list()) if returnResult else list()
+        graph = self.dependencyGraph
+        downstream = set()
+        for node in nodes:
+            if graph.has_node(node):
+                downstream.update(descendants(graph, node))
+        index = self.topologicalIndex()
+        nodelist = sorted(downstream, key=index.__getitem__)
+        result = [ self.recalculateNode(node) for node in nodelist ]
+        return (nodelist, result) if returnResult else nodelist     # return which ones were re-calculated, so gui can be updated 
 
     def recalculateNode(self, node):
         if node in self:
@@ -224,11 +304,9 @@ class VariableDictionary(SequenceDict):
         return None
             
     def recalculateAll(self):
-        g = self.dependencyGraph.reverse()
-        for node, indegree in g.in_degree_iter():
-            if indegree==0:
-                for calcnode in dfs_postorder_nodes(g, node):
-                    self.recalculateNode(calcnode)
+        index = self.topologicalIndex()
+        for node in sorted(index, key=index.__getitem__):
+            self.recalculateNode(node)
                     
     def bareDictionaryCopy(self):
         return SequenceDict( self )
@@ -0,0 +1,267 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Vectorized decoder for the pulser result FIFO.
+
+The buffer read from the FIFO is viewed as an array of 64 bit tokens. Only the
+control tokens (header 0xff) and the scan values following a scan parameter marker
+are handled one by one, all tokens in between are classified by their header byte
+and appended to the current Data object in bulk.
+"""
+import logging
+from time import time as time_time
+
+import numpy
+
+from modules import enum
+from pulser.PulserData import Data, DedicatedData, ChannelColumns, RaggedColumns
+
+Mask16 = numpy.uint64(0xffff)
+Mask28 = numpy.uint64(0xfffffff)
+Mask40 = numpy.uint64(0xffffffffff)
+Mask48 = numpy.uint64(0xffffffffffff)
+Mask8 = numpy.uint64(0xff)
+Mask12 = numpy.uint64(0xfff)
+Shift28 = numpy.uint64(28)
+Shift40 = numpy.uint64(40)
+Shift48 = numpy.uint64(48)
+Shift56 = numpy.uint64(56)
+
+KnownHeaders = numpy.array([0x01, 0x02, 0x03, 0x04, 0x05, 0x06, 0x50, 0x51, 0xee, 0xff], dtype=numpy.uint64)
+
+
+def tokenArray(data):
+    """view a bytes like object as array of 64 bit tokens, incomplete trailing tokens are ignored"""
+    return numpy.frombuffer(data, dtype=numpy.uint64, count=len(data) // 8)
+
+
+def channelGroups(channels):
+    """return a list of (channel, index) where index selects the entries of channel in their original order"""
+    if len(channels) == 0:
+        return []
+    if channels[0] == channels[-1] and (channels == channels[0]).all():
+        return [(int(channels[0]), slice(None))]
+    order = numpy.argsort(channels, kind='stable')
+    sortedChannels = channels[order]
+    bounds = (numpy.flatnonzero(sortedChannels[1:] != sortedChannels[:-1]) + 1).tolist()
+    return [(int(sortedChannels[start]), order[start:stop])
+            for start, stop in zip([0] + bounds, bounds + [len(channels)])]
+
+
+def extendChannels(target, channels, values):
+    """append values to the ChannelColumns target for every channel, preserving the order within each channel"""
+    for channel, index in channelGroups(channels):
+        target.extend(channel, values[index])
+
+
+class DataFifoDecoder(object):
+    """Decoder state for the pulser result FIFO
+
+    Used as base class by PulserHardwareServer. Decoded Data and DedicatedData objects
+    are put into self.dataQueue. If self.sharedDataRing is set, the columns of Data objects
+    are transported through the shared memory ring whenever they fit.
+    """
+    analyzingState = enum.enum('normal', 'scanparameter', 'dependentscanparameter')
+    dataClass = Data
+    dedicatedDataClass = DedicatedData
+
+    def __init__(self):
+        self.state = self.analyzingState.normal
+        self.data = self.dataClass()
+        self.dedicatedData = self.dedicatedDataClass(time_time())
+        self.timestampOffset = 0
+        self.timeTickOffset = 0.0
+        self.sharedDataRing = None
+
+    def putData(self, data):
+        descriptor = self.sharedDataRing.write(data) if self.sharedDataRing is not None else None
+        self.dataQueue.put(descriptor if descriptor is not None else data)
+
+    def decodeDataTokens(self, data):
+        """ decode the tokens in the bytes like object data
+            0xffffffffffffffff end of experiment marker
+            0xfffexxxxxxxxxxxx exitcode marker
+            0xfffd000000000000 timestamping overflow marker
+            0xfffcxxxxxxxxxxxx scan parameter, followed by scanparameter value
+            0xfffb00000000xxxx timing was not met, xxxx address of update command whose timing could not be met
+            0x01ddnnxxxxxxxxxx count result from channel n id dd
+            0x02ddnnxxxxxxxxxx timestamp result channel n id dd
+            0x03ddnnxxxxxxxxxx timestamp gate start channel n id dd
+            0x04nnxxxxxxxxxxxx other return
+            0x05nnxxxxxxxxxxxx ADC return MSB 16 bits count, LSB 32 bits sum
+            0x06ddxxxxxxxxxxxx
+            0xeennxxxxxxxxxxxx dedicated result
+            0x50nn00000000xxxx result n return Hi 16 bits, only being sent if xxxx is not identical to zero
+            0x51nnxxxxxxxxxxxx result n return Low 48 bits, guaranteed to come first
+        """
+        tokens = tokenArray(data)
+        headers = tokens >> Shift56
+        position = 0
+        if self.state != self.analyzingState.normal and len(tokens) > 0:
+            self._scanValue(int(tokens[0]))
+            position = 1
+        for index in numpy.flatnonzero(headers == 0xff).tolist():
+            if index < position:   # this token was a scan value
+                continue
+            self._decodeBlock(tokens[position:index], headers[position:index])
+            self._controlToken(int(tokens[index]))
+            position = index + 1
+            if self.state != self.analyzingState.normal and position < len(tokens):
+                self._scanValue(int(tokens[position]))
+                position += 1
+        self._decodeBlock(tokens[position:], headers[position:])
+
+    def _scanValue(self, token):
+        logger = logging.getLogger(__name__)
+        if self.state == self.analyzingState.dependentscanparameter:
+            self.data.dependentValues.append(token)
+            logger.debug("Dependent value {0} received".format(token))
+        else:
+            logger.debug("Scan value {0} received".format(token))
+            if self.data.scanvalue is None:
+                self.data.scanvalue = token
+            else:
+                self.data.timeTickOffset = self.timeTickOffset
+                self.putData(self.data)
+                self.data = self.dataClass()
+                self.data.scanvalue = token
+        self.state = self.analyzingState.normal
+
+    def _controlToken(self, token):
+        logger = logging.getLogger(__name__)
+        if token == 0xffffffffffffffff:    # end of run
+            self.data.final = True
+            self.data.exitcode = 0x0000
+            self.data.timeTickOffset = self.timeTickOffset
+            self.putData(self.data)
+            logger.info("End of Run marker received")
+            self.data = self.dataClass()
+        elif token & 0xffff000000000000 == 0xfffe000000000000:  # exitparameter
+            self.data.final = True
+            self.data.exitcode = token & 0x0000ffffffffffff
+            logger.info("Exitcode {0:x} received".format(self.data.exitcode))
+            self.data.timeTickOffset = self.timeTickOffset
+            self.putData(self.data)
+            self.data = self.dataClass()
+        elif token == 0xfffd000000000000:
+            self.timestampOffset += (1 << 40)
+        elif token & 0xffff000000000000 == 0xfffc000000000000:  # new scan parameter
+            self.state = (self.analyzingState.dependentscanparameter if (token & 0x8000 == 0x8000)
+                          else self.analyzingState.scanparameter)
+        elif token & 0xffff000000000000 == 0xfffb000000000000:
+            if self.data.timingViolations is None:
+                self.data.timingViolations = list()
+            self.data.timingViolations.append(token & 0xffff)
+
+    def _decodeBlock(self, tokens, headers):
+        """decode a block of tokens that does not contain control tokens"""
+        if len(tokens) == 0:
+            return
+        present = numpy.bincount(headers.astype(numpy.uint8), minlength=256)
+        if present[0xee]:
+            self._decodeDedicated(tokens[headers == 0xee].tolist())
+        if present[1] or present[5]:
+            self._decodeCounts(tokens, headers)
+        if present[2] or present[3]:
+            self._decodeTimestamps(tokens, headers)
+        if present[0x50] or present[0x51]:
+            self._decodeResults(tokens, headers)
+        if present[6]:
+            timeTicks = headers == 6
+            extendChannels(self.data.timeTick, (tokens[timeTicks] >> Shift40) & Mask8,
+                           (tokens[timeTicks] & Mask40).astype(numpy.int64) + self.timestampOffset)
+        if present[4] or present.sum() > present[KnownHeaders].sum():
+            other = (headers == 4) | ~numpy.isin(headers, KnownHeaders)
+            self.data.other.extend(numpy.where(headers[other] == 4, tokens[other] & Mask40, tokens[other]).tolist())
+
+    def _decodeDedicated(self, tokenList):
+        for token in tokenList:
+            try:
+                channel = (token >> 48) & 0xff
+                if self.dedicatedData.data[channel] is not None:
+                    self.dataQueue.put(self.dedicatedData)
+                    self.dedicatedData = self.dedicatedDataClass(self.timeTickOffset)
+                if channel == 33:
+                    self.dedicatedData.data[channel] = (token & 0xffffffffff) + self.timestampOffset
+                else:
+                    self.dedicatedData.data[channel] = token & 0xffffffffffff
+            except IndexError:
+                pass
+
+    def _decodeCounts(self, tokens, headers):
+        """counter results (header 1) and ADC results (header 5) are stored in data.count"""
+        selected = (headers == 1) | (headers == 5)
+        selectedTokens = tokens[selected]
+        isAdc = headers[selected] == 5
+        if not isAdc.any():
+            extendChannels(self.data.count, (selectedTokens >> Shift40) & Mask16,
+                           (selectedTokens & Mask40).astype(numpy.int64))
+            return
+        adcCount = (selectedTokens >> Shift28) & Mask12
+        keep = ~isAdc | (adcCount > 0)   # ADC results without samples are ignored
+        selectedTokens, isAdc, adcCount = selectedTokens[keep], isAdc[keep], adcCount[keep]
+        channels = (selectedTokens >> Shift40) & Mask16
+        channels[isAdc] += numpy.uint64(32)
+        values = numpy.where(isAdc, (selectedTokens & Mask28) / numpy.maximum(adcCount, 1),
+                             selectedTokens & Mask40)
+        for channel, index in channelGroups(channels):
+            channelIsAdc = isAdc[index]
+            self.data.count.extend(channel, values[index] if channelIsAdc.any() else
+                                   (selectedTokens[index] & Mask40).astype(numpy.int64))
+
+    def _decodeTimestamps(self, tokens, headers):
+        """timestamps (header 2) are stored relative to the last gate start (header 3) of the same channel"""
+        selected = (headers == 2) | (headers == 3)
+        selectedTokens = tokens[selected]
+        isGateStart = headers[selected] == 3
+        channels = (selectedTokens >> Shift40) & Mask16
+        values = (selectedTokens & Mask40).astype(numpy.int64) + self.timestampOffset
+        if self.data.timestamp is None:
+            self.data.timestamp = RaggedColumns(numpy.int64)
+        if self.data.timestampZero is None and isGateStart.any():
+            self.data.timestampZero = ChannelColumns(numpy.int64)
+        for channel, index in channelGroups(channels):
+            channelValues = values[index]
+            gateStarts = numpy.flatnonzero(isGateStart[index])
+            first = int(gateStarts[0]) if len(gateStarts) else len(channelValues)
+            if first > 0:
+                if self.data.timestamp.gateCount(channel) and self.data.timestampZero is not None and channel in self.data.timestampZero:
+                    self.data.timestamp.extend(channel, channelValues[:first] - self.data.timestampZero[channel][-1])
+                else:
+                    logging.getLogger(__name__).debug("Timestamps without gate start in channel {0} ignored".format(channel))
+            if len(gateStarts):
+                gateLengths = numpy.diff(numpy.append(gateStarts, len(channelValues)))
+                zeros = channelValues[gateStarts]
+                relative = channelValues[first:] - numpy.repeat(zeros, gateLengths)
+                isTimestamp = ~isGateStart[index][first:]
+                self.data.timestampZero.extend(channel, zeros)
+                self.data.timestamp.extendGates(channel, relative[isTimestamp],
+                                                gateStarts - first - numpy.arange(len(gateStarts)))
+
+    def _decodeResults(self, tokens, headers):
+        """result low words (header 0x51) and optional high words (header 0x50) belonging to the last low word"""
+        selected = (headers == 0x51) | (headers == 0x50)
+        if self.data.result is None:
+            self.data.result = ChannelColumns(numpy.uint64)
+        selectedTokens = tokens[selected]
+        isLow = headers[selected] == 0x51
+        channels = (selectedTokens >> Shift48) & Mask8
+        if isLow.all():
+            extendChannels(self.data.result, channels, selectedTokens & Mask48)
+            return
+        for channel, index in channelGroups(channels):
+            channelTokens = selectedTokens[index]
+            channelIsLow = isLow[index]
+            lowWords = channelTokens[channelIsLow] & Mask48
+            target = numpy.cumsum(channelIsLow)[~channelIsLow] - 1
+            highWords = (channelTokens[~channelIsLow] & Mask16) << Shift48
+            leading = target < 0
+            if leading.any() and channel in self.data.result:
+                results = self.data.result[channel]
+                if len(results):
+                    results[-1] |= numpy.bitwise_or.reduce(highWords[leading])
+            numpy.bitwise_or.at(lowWords, target[~leading], highWords[~leading])
+            self.data.result.extend(channel, lowWords)
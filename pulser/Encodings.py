@@ -5,6 +5,8 @@
 # *****************************************************************
 import math
 
+import numpy
+
 from modules import quantity
 from modules.quantity import Q, ureg, value, is_Q
 from enum import Enum
@@ -27,6 +29,32 @@ class EncodingError(Exception):
     pass
 
 
+ExactFloat = float(1 << 53)   # larger integers are not exactly represented as float
+
+
+def quantityColumn(values):
+    """(magnitudes, units) of a sequence of values with the same units, units is None for plain numbers.
+    values can also be a quantity holding an array. None if the values mix units or are no numbers."""
+    if is_Q(values):
+        magnitudes, units = numpy.asarray(values.m), values.units
+    else:
+        if len(values) == 0:
+            return numpy.zeros(0), None
+        first = values[0]
+        if is_Q(first):
+            units, container = first.units, first._units
+            if not all(is_Q(v) and v._units == container for v in values):
+                return None
+            magnitudes = numpy.array([v.m for v in values])
+        else:
+            if any(is_Q(v) for v in values):
+                return None
+            magnitudes, units = numpy.array(values), None
+    if magnitudes.ndim != 1 or magnitudes.dtype.kind not in 'if':
+        return None
+    return magnitudes, units
+
+
 class Encoding:
     def __init__(self, maxvalue=None, bits=16, unit='', signed=True, representation=Representation.TwosComplement,
                  step=None):
@@ -43,6 +71,7 @@ class Encoding:
             self.step = (self.maxvalue - self.minvalue) / (1 << self.bits) if step is None else step
         self.mask = (1 << self.bits) - 1
         self.offsetValue = self.minvalue if representation == Representation.Offset and signed else 0
+        self._factors = dict()
 
     def encode(self, v):
         if is_Q(v) and v.dimensionless:
@@ -55,6 +84,47 @@ class Encoding:
         else:
             raise EncodingError("Value {0} out of range {1}, {2}".format(v, Q(self.minvalue, self.unit), Q(self.maxvalue, self.unit)))
 
+    def factor(self, units):
+        """factor converting magnitudes in units to self.unit, None if the conversion is not a
+        multiplication. Cached per units."""
+        if units not in self._factors:
+            factor = Q(1.0, units).m_as(self.unit)
+            self._factors[units] = factor if Q(0.0, units).m_as(self.unit) == 0 else None
+        return self._factors[units]
+
+    def encodeEach(self, values):
+        return numpy.array([self.encode(v) for v in values], dtype=numpy.uint64)
+
+    def encodeArray(self, values):
+        """encode a sequence of values with the same units (or a quantity holding an array)
+        at once, the result is the uint64 array of encode of every value"""
+        return self.encodeColumn(values, quantityColumn(values))
+
+    def encodeColumn(self, values, column):
+        if column is None:
+            return self.encodeEach(values)
+        magnitudes, units = column
+        if units is None:
+            if self.unit and magnitudes.any():
+                return self.encodeEach(values)   # raises like encode
+        elif not units.dimensionless:
+            factor = self.factor(units)
+            if factor is None:
+                return self.encodeEach(values)
+            magnitudes = magnitudes * factor
+        v = magnitudes.astype(numpy.float64)
+        if len(v) and not numpy.abs(v).max() < ExactFloat:
+            return self.encodeEach(values)
+        outOfRange = ~((self.minvalue <= v) & (v < self.maxvalue))
+        if outOfRange.any():
+            raise EncodingError("Value {0} out of range {1}, {2}".format(float(v[outOfRange.argmax()]), Q(self.minvalue, self.unit), Q(self.maxvalue, self.unit)))
+        return self.maskArray(numpy.rint((v + self.offsetValue) / self.step).astype(numpy.int64))
+
+    def maskArray(self, words):
+        if self.bits < 64:
+            words = words & numpy.int64(self.mask)
+        return words.view(numpy.uint64)
+
     def decode(self, v):
         return v * self.step + self.offsetValue
 
@@ -83,6 +153,28 @@ class BinaryEncoding(Encoding):
         else:
             raise EncodingError("Value {0} out of range {1}, {2}".format(v, Q(self.minvalue, self.unit), Q(self.maxvalue, self.unit)))
 
+    def encodeColumn(self, values, column):
+        if column is None:
+            return self.encodeEach(values)
+        magnitudes, units = column
+        if units is not None and units.dimensionless and units != ureg.dimensionless:
+            factor = self.factor(units)
+            if factor is None:
+                return self.encodeEach(values)
+            magnitudes = magnitudes * factor
+        if magnitudes.dtype.kind == 'f':
+            if len(magnitudes) and not numpy.abs(magnitudes).max() < ExactFloat:
+                return self.encodeEach(values)
+            v = numpy.rint(magnitudes + self.offsetValue).astype(numpy.int64)
+        elif self.offsetValue == 0:
+            v = magnitudes.astype(numpy.int64)
+        else:
+            return self.encodeEach(values)
+        outOfRange = ~((numpy.int64(max(self.minvalue, -(1 << 63))) <= v) & (v <= numpy.int64(min(self.maxvalue, (1 << 63) - 1))))
+        if outOfRange.any():
+            raise EncodingError("Value {0} out of range {1}, {2}".format(int(v[outOfRange.argmax()]), Q(self.minvalue, self.unit), Q(self.maxvalue, self.unit)))
+        return self.maskArray(v)
+
 
 unsigned64 = BinaryEncoding((1 << 64) - 1, 64, step=1, signed=False)
 signagnostic64 = BinaryEncoding((1 << 64) - 1, 64, step=1, signed=True)
@@ -123,6 +215,21 @@ def encode(val, encoding=None):
         return signagnostic64.encode(val)
 
 
+def encodeArray(values, encoding=None):
+    """encode a sequence of values, identical to encode of every value but converting
+    values with the same units at once. Returns an uint64 array."""
+    column = quantityColumn(values)
+    if encoding in EncodingDict:
+        return EncodingDict[encoding].encodeColumn(values, column)
+    if encoding:
+        raise EncodingError("Undefined encoding '{0}'".format(encoding))
+    if column is None:
+        return numpy.array([encode(v) for v in values], dtype=numpy.uint64)
+    units = column[1]
+    encoder = signagnostic64 if units is None else EncodingDict.get(units.dimensionality, signagnostic64)
+    return encoder.encodeColumn(values, column)
+
+
 def decode(val, encoding):
     try:
         return EncodingDict[encoding].decode(val)
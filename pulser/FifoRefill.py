@@ -0,0 +1,75 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Server side refill of the pulser input FIFO
+
+The scan code is sent to the PulserHardwareServer once per scan. The code of point n
+are the words [n*wordsPerPoint, (n+1)*wordsPerPoint). The pulse program reads the code
+of a point from the input FIFO when it starts the point, so every Data object of a
+finished point frees the code of (at least) one point in the FIFO. The server counts
+the finished points and writes the next chunk of code as soon as chunkWords are free
+or the FIFO runs low, instead of the client writing the code of every point through the
+command pipe.
+
+The client acknowledges the points it has evaluated through a shared counter. The code
+is never written more than window points ahead of the acknowledged points, which bounds
+the number of points queued for a slow client.
+"""
+import numpy
+
+
+def codeArray(code):
+    """scan code as uint64 array with the byte layout written to the data pipe"""
+    try:
+        return numpy.array(code, dtype=numpy.int64).view(numpy.uint64)
+    except OverflowError:
+        return numpy.array([word & 0xffffffffffffffff for word in code], dtype=numpy.uint64)
+
+
+class FifoRefill(object):
+    def __init__(self, code, wordsPerPoint, startPoint=0, fifoDepth=2040, chunkWords=None, window=None):
+        self.code = code if isinstance(code, numpy.ndarray) and code.dtype == numpy.uint64 else codeArray(code)
+        self.wordsPerPoint = max(1, int(wordsPerPoint))
+        self.fifoDepth = max(self.wordsPerPoint, fifoDepth - fifoDepth % self.wordsPerPoint)
+        if chunkWords is None:
+            chunkWords = self.fifoDepth // 4
+        self.chunkWords = max(2 * self.wordsPerPoint, chunkWords - chunkWords % self.wordsPerPoint)
+        self.window = max(3, window) if window is not None else None
+        self.written = min(startPoint * self.wordsPerPoint, len(self.code))   # words written to the FIFO
+        self.finished = startPoint       # points finished by the pulse program
+        self.acknowledged = startPoint   # points evaluated by the client
+        self.chunks = 0
+
+    @property
+    def fillLevel(self):
+        """upper bound of the words in the FIFO"""
+        return max(0, self.written - self.finished * self.wordsPerPoint)
+
+    @property
+    def done(self):
+        return self.written >= len(self.code)
+
+    def pointFinished(self, points=1):
+        self.finished += points
+
+    def acknowledge(self, points):
+        """the client has evaluated the first points points"""
+        self.acknowledged = max(self.acknowledged, points)
+
+    def nextChunk(self, force=False):
+        """code to be written to the FIFO now. An empty array is returned while less than chunkWords
+        are free and the FIFO still holds more than chunkWords. force returns the code fitting into
+        the FIFO regardless of the chunk size."""
+        limit = min(len(self.code), self.finished * self.wordsPerPoint + self.fifoDepth)
+        if self.window is not None:
+            limit = min(limit, (self.acknowledged + self.window) * self.wordsPerPoint)
+        free = limit - self.written
+        if free <= 0 or (free < self.chunkWords and self.fillLevel > self.chunkWords and limit < len(self.code) and not force):
+            return self.code[0:0]
+        chunk = self.code[self.written:limit]
+        self.written = limit
+        self.chunks += 1
+        return chunk
@@ -0,0 +1,94 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Vectorized decoder for the logic analyzer pipe.
+
+The pipe delivers 64 bit header words, headers of type 3 to 6 are followed by one
+64 bit pattern word. Runs of such header/pattern pairs are decoded in bulk, only the
+overrun (2) and end (1) markers are handled one by one.
+"""
+import logging
+
+import numpy
+
+from pulser.PulserData import LogicAnalyzerData
+from pulser.DataFifoDecoder import tokenArray
+
+Mask24 = numpy.uint64(0xffffff)
+Shift56 = numpy.uint64(56)
+
+
+class LogicAnalyzerDecoder(object):
+    """Decoder state for the logic analyzer pipe
+
+    Used as base class by PulserHardwareServer. Complete LogicAnalyzerData objects are
+    put into self.dataQueue.
+    """
+    patternFields = {3: 'data', 4: 'trigger', 5: 'auxData', 6: 'gateData'}
+
+    def __init__(self):
+        self.logicAnalyzerData = LogicAnalyzerData()
+        self.logicAnalyzerBuffer = bytearray()
+        self.logicAnalyzerReadStatus = 0      # header type of the header waiting for its pattern word, 0 if none
+        self.logicAnalyzerTime = 0
+
+    def decodeLogicAnalyzerData(self, data):
+        """ decode the words in the bytes like object data, incomplete words are kept for the next call
+            0xhhxxxxxxxxtttttt header hh with 24 bit time tttttt
+            hh=01 end marker
+            hh=02 overrun of the 24 bit time counter
+            hh=03, 04, 05, 06 data, trigger, aux data and gate data, followed by the 64 bit pattern word
+        """
+        self.logicAnalyzerBuffer.extend(data)
+        words = tokenArray(self.logicAnalyzerBuffer)
+        position = 0
+        while position < len(words):
+            if self.logicAnalyzerReadStatus:
+                getattr(self.logicAnalyzerData, self.patternFields[self.logicAnalyzerReadStatus]).append(
+                    self.logicAnalyzerTime, int(words[position]))
+                self.logicAnalyzerReadStatus = 0
+                position += 1
+                continue
+            rest = words[position:]
+            pairs = len(rest) // 2
+            headers = rest[0:2 * pairs:2] >> Shift56
+            valid = (headers >= 3) & (headers <= 6)
+            end = pairs if valid.all() else int(valid.argmin())
+            if end > 0:
+                self._decodePairs(rest[0:2 * end:2], rest[1:2 * end:2], headers[:end])
+                position += 2 * end
+            if position < len(words):
+                self._decodeHeader(int(words[position]))
+                position += 1
+        self.logicAnalyzerBuffer = self.logicAnalyzerBuffer[len(self.logicAnalyzerBuffer) // 8 * 8:]
+
+    def _decodePairs(self, headerWords, patterns, headers):
+        data = self.logicAnalyzerData
+        data.wordcount += len(headerWords)
+        times = (headerWords & Mask24).astype(numpy.int64) + data.countOffset
+        for header, field in self.patternFields.items():
+            mask = headers == header
+            if mask.all():
+                getattr(data, field).extend(times, patterns)
+            elif mask.any():
+                getattr(data, field).extend(times[mask], patterns[mask])
+        self.logicAnalyzerTime = int(times[-1])
+
+    def _decodeHeader(self, code):
+        data = self.logicAnalyzerData
+        data.wordcount += 1
+        self.logicAnalyzerTime = (code & 0xffffff) + data.countOffset
+        header = code >> 56
+        if header == 2:  # overrun marker
+            data.countOffset += 0x1000000   # overrun of 24 bit counter
+        elif header == 1:  # end marker
+            data.stopMarker = self.logicAnalyzerTime
+            logging.getLogger(__name__).debug("Logic analyzer end marker at {0:x}, {1} words".format(
+                self.logicAnalyzerTime, data.wordcount))
+            self.dataQueue.put(data)
+            self.logicAnalyzerData = LogicAnalyzerData()
+        elif header in self.patternFields:
+            self.logicAnalyzerReadStatus = header
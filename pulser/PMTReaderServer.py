@@ -10,8 +10,9 @@ import struct
 import logging
 
 class DedicatedData:
-    def __init__(self):
+    def __init__(self, timeTickOffset=None):
         self.data = [None]*33
+        self.overrun = False
         
     def count(self):
         return self.data[0:32]
@@ -25,15 +26,17 @@ class DedicatedData:
 
 class PMTReaderServer( PulserHardwareServer ):
     dedicatedDataClass = DedicatedData
-    def __init__(self, dataQueue=None, commandPipe=None, loggingQueue=None, sharedMemoryArray=None):
-        super( PMTReaderServer, self ).__init__(dataQueue, commandPipe, loggingQueue, sharedMemoryArray )
+    def __init__(self, dataQueue=None, commandPipe=None, loggingQueue=None, sharedMemoryArray=None, sharedDataRing=None,
+                 acknowledgedPoints=None):
+        super( PMTReaderServer, self ).__init__(dataQueue, commandPipe, loggingQueue, sharedMemoryArray, sharedDataRing,
+                                                acknowledgedPoints )
         
     def readDataFifo(self):
         """ run is responsible for reading the data back from the FPGA
             0x6nxxxxxx count result from channel n (0-15)
             0x7nxxxxxx count result from channel n+16 (16-31)
         """
-        data, self.dedicatedData.overrun = self.ppReadData(4)
+        data, self.dedicatedData.overrun, _ = self.ppReadData(4)
         if data:
             for s in sliceview(data, 4):
                 (token,) = struct.unpack('I', s)
@@ -41,9 +44,9 @@ class PMTReaderServer( PulserHardwareServer ):
                     channel = (token >>24) & 0x3f
                     if self.dedicatedData.data[channel] is not None:
                         self.dataQueue.put( self.dedicatedData )
-                        self.dedicatedData = self.DedicatedData()
+                        self.dedicatedData = self.dedicatedDataClass()
                     self.dedicatedData.data[channel] = token & 0xffffff
-            if self.data.overrun:
+            if self.dedicatedData.overrun:
                 logging.getLogger(__name__).info( "Overrun detected, triggered data queue" )
                 self.dataQueue.put( self.dedicatedData )
                 
@@ -0,0 +1,316 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Data containers filled from the pulser result FIFOs and sent to the client
+"""
+import json
+from time import time as time_time
+
+import numpy
+
+from modules.ColumnBuffer import ColumnBuffer
+
+
+def jsonDefault(obj):
+    """serialize the column containers and numpy arrays and scalars"""
+    if isinstance(obj, (ChannelColumns, RaggedColumns)):
+        return obj.toDict()
+    if isinstance(obj, (numpy.ndarray, numpy.generic)):
+        return obj.tolist()
+    raise TypeError("Object of type {0} is not JSON serializable".format(type(obj).__name__))
+
+
+class ChannelColumns(object):
+    """Dictionary like container with one ColumnBuffer per channel.
+    container[channel] returns a numpy view of the channel values, an empty array for unknown channels."""
+    __slots__ = ('dtype', 'columns')
+
+    def __init__(self, dtype=numpy.int64):
+        self.dtype = numpy.dtype(dtype)
+        self.columns = dict()
+
+    def column(self, channel):
+        column = self.columns.get(channel)
+        if column is None:
+            column = self.columns[channel] = ColumnBuffer(self.dtype)
+        return column
+
+    def __getitem__(self, channel):
+        column = self.columns.get(channel)
+        return column.array if column is not None else numpy.zeros(0, dtype=self.dtype)
+
+    def __setitem__(self, channel, values):
+        self.columns[channel] = ColumnBuffer(self.dtype, values)
+
+    def extend(self, channel, values):
+        self.column(channel).extend(values)
+
+    def append(self, channel, value):
+        self.column(channel).append(value)
+
+    def get(self, channel, default=None):
+        return self[channel] if channel in self.columns else default
+
+    def __contains__(self, channel):
+        return channel in self.columns
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def keys(self):
+        return self.columns.keys()
+
+    def values(self):
+        return [column.array for column in self.columns.values()]
+
+    def items(self):
+        return [(channel, column.array) for channel, column in self.columns.items()]
+
+    def toDict(self):
+        return {channel: column.array.tolist() for channel, column in self.columns.items()}
+
+    def emptyCopy(self):
+        return ChannelColumns(self.dtype)
+
+    @property
+    def nbytes(self):
+        return sum(column.buffer.nbytes for column in self.columns.values())
+
+
+class RaggedColumns(object):
+    """Per channel sequence of variable length gates (e.g. timestamps), stored as one ColumnBuffer
+    of values and one of gate start offsets per channel.
+    container[channel] returns a list of numpy views, one per gate, flat(channel) all values."""
+    __slots__ = ('dtype', 'valueColumns', 'offsetColumns')
+
+    def __init__(self, dtype=numpy.int64):
+        self.dtype = numpy.dtype(dtype)
+        self.valueColumns = dict()
+        self.offsetColumns = dict()
+
+    def _columns(self, channel):
+        if channel not in self.valueColumns:
+            self.valueColumns[channel] = ColumnBuffer(self.dtype)
+            self.offsetColumns[channel] = ColumnBuffer(numpy.int64)
+        return self.valueColumns[channel], self.offsetColumns[channel]
+
+    def __getitem__(self, channel):
+        if channel not in self.valueColumns:
+            return list()
+        offsets = self.offsetColumns[channel].array
+        return numpy.split(self.valueColumns[channel].array, offsets[1:]) if len(offsets) else list()
+
+    def flat(self, channel):
+        column = self.valueColumns.get(channel)
+        return column.array if column is not None else numpy.zeros(0, dtype=self.dtype)
+
+    def gateOffsets(self, channel):
+        column = self.offsetColumns.get(channel)
+        return column.array if column is not None else numpy.zeros(0, dtype=numpy.int64)
+
+    def gateCount(self, channel):
+        column = self.offsetColumns.get(channel)
+        return len(column) if column is not None else 0
+
+    def startGate(self, channel):
+        values, offsets = self._columns(channel)
+        offsets.append(len(values))
+
+    def extend(self, channel, values):
+        """append values to the last gate of channel"""
+        self._columns(channel)[0].extend(values)
+
+    def extendGates(self, channel, values, gateStarts):
+        """append new gates starting at the indices gateStarts of values"""
+        valueColumn, offsetColumn = self._columns(channel)
+        offsetColumn.extend(numpy.asarray(gateStarts, dtype=numpy.int64) + len(valueColumn))
+        valueColumn.extend(values)
+
+    def setChannel(self, channel, values, offsets):
+        self.valueColumns[channel] = ColumnBuffer(self.dtype, values)
+        self.offsetColumns[channel] = ColumnBuffer(numpy.int64, offsets)
+
+    def __contains__(self, channel):
+        return channel in self.valueColumns
+
+    def __iter__(self):
+        return iter(self.valueColumns)
+
+    def __len__(self):
+        return len(self.valueColumns)
+
+    def keys(self):
+        return self.valueColumns.keys()
+
+    def items(self):
+        return [(channel, self[channel]) for channel in self.valueColumns]
+
+    def toDict(self):
+        return {channel: [gate.tolist() for gate in self[channel]] for channel in self.valueColumns}
+
+    def emptyCopy(self):
+        return RaggedColumns(self.dtype)
+
+    @property
+    def nbytes(self):
+        return sum(column.buffer.nbytes for column in list(self.valueColumns.values()) + list(self.offsetColumns.values()))
+
+
+class Data(object):
+    """Results of one scan point. count, timeTick, timestampZero and result are ChannelColumns,
+    timestamp is a RaggedColumns with one gate per timestamp gate start"""
+    __slots__ = ('count', 'timestamp', 'timestampZero', 'scanvalue', 'final', 'other', 'overrun', 'exitcode',
+                 'dependentValues', 'evaluated', 'result', 'externalStatus', '_creationTime', 'timeTick',
+                 'timeTickOffset', 'timingViolations', 'channelCache')
+
+    def __init__(self):
+        self.count = ChannelColumns(numpy.int64)       # counts in the counter channel
+        self.timestamp = None                          # RaggedColumns of timestamps relative to the gate start
+        self.timestampZero = None                      # ChannelColumns of gate start times
+        self.scanvalue = None                           # scanvalue
+        self.final = False
+        self.other = list()
+        self.overrun = False
+        self.exitcode = 0
+        self.dependentValues = list()                   # additional scan values
+        self.evaluated = dict()
+        self.result = None                              # data received in the result channels ChannelColumns with channel number as key
+        self.externalStatus = None
+        self._creationTime = time_time()
+        self.timeTick = ChannelColumns(numpy.int64)
+        self.timeTickOffset = 0.0
+        self.timingViolations = None
+        self.channelCache = dict()                      # arrays derived from the channels, shared by the evaluations
+        
+    @property
+    def creationTime(self):
+        return (list(self.timeTick.values())[0]*5e-9)+self.timeTickOffset if self.timeTick else self._creationTime
+    
+    @property
+    def timeinterval(self):
+        return ( ((list(self.timeTick.values())[0][0]*5e-9)+self.timeTickOffset, (list(self.timeTick.values())[0][-1]*5e-9)+self.timeTickOffset) if self.timeTick 
+                 else (self._creationTime, self._creationTime) )
+        
+    def __str__(self):
+        return str(len(self.count))+" "+" ".join( [str(self.count[i]) for i in range(16) ])
+    
+    def defaultTimestampZero(self):
+        return 0
+    
+    def dataString(self):
+        return repr(self)
+    
+    def __repr__(self):
+        return json.dumps([self.count, self.timestamp, self.timestampZero, self.scanvalue, self.final, self.other,
+                           self.overrun, self.exitcode, self.dependentValues, self.result, self.externalStatus,
+                           self._creationTime, self.timeTickOffset, self.timeTick], default=jsonDefault)
+        
+    @staticmethod
+    def fromJson(string):
+        data = Data()
+        (count, timestamp, timestampZero, data.scanvalue, data.final, data.other, data.overrun,
+         data.exitcode, data.dependentValues, result, data.externalStatus, data._creationTime, data.timeTickOffset,
+         timeTick) = json.loads(string)
+        for channel, values in count.items():
+            data.count[int(channel)] = values
+        for channel, values in timeTick.items():
+            data.timeTick[int(channel)] = values
+        if timestampZero is not None:
+            data.timestampZero = ChannelColumns(numpy.int64)
+            for channel, values in timestampZero.items():
+                data.timestampZero[int(channel)] = values
+        if timestamp is not None:
+            data.timestamp = RaggedColumns(numpy.int64)
+            for channel, gates in timestamp.items():
+                lengths = [len(gate) for gate in gates]
+                data.timestamp.setChannel(int(channel), [value for gate in gates for value in gate],
+                                          numpy.cumsum([0] + lengths[:-1]) if gates else [])
+        if result is not None:
+            data.result = ChannelColumns(numpy.uint64)
+            for channel, values in result.items():
+                data.result[int(channel)] = values
+        return data
+
+class DedicatedData(object):
+    def __init__(self, timeTickOffset=0):
+        self.data = [None]*34
+        self.externalStatus = None
+        self.timeTickOffset = timeTickOffset
+        self._timestamp = time_time()
+        self.maxBytesRead = 0
+        
+    def count(self):
+        return self.data[0:15]
+        
+    def analog(self):
+        return self.data[16:31]
+        
+    def integration(self):
+        return self.data[32]
+    
+    @property
+    def timestamp(self):
+        return self.data[33]*5e-9+self.timeTickOffset if self.data[33] else self._timestamp
+    
+    @timestamp.setter
+    def timestamp(self, ts):
+        self._timestamp = ts
+
+class PatternColumns(object):
+    """Sequence of (time, pattern) samples of the logic analyzer stored as two ColumnBuffers.
+    Iterating yields (time, pattern) tuples."""
+    __slots__ = ('timeColumn', 'patternColumn')
+
+    def __init__(self):
+        self.timeColumn = ColumnBuffer(numpy.int64)
+        self.patternColumn = ColumnBuffer(numpy.uint64)
+
+    @property
+    def time(self):
+        return self.timeColumn.array
+
+    @property
+    def pattern(self):
+        return self.patternColumn.array
+
+    def append(self, time, pattern):
+        self.timeColumn.append(time)
+        self.patternColumn.append(pattern)
+
+    def extend(self, times, patterns):
+        self.timeColumn.extend(times)
+        self.patternColumn.extend(patterns)
+
+    def __len__(self):
+        return len(self.timeColumn)
+
+    def __iter__(self):
+        return zip(self.time.tolist(), self.pattern.tolist())
+
+
+class LogicAnalyzerData:
+    def __init__(self):
+        self.data = PatternColumns()
+        self.auxData = PatternColumns()
+        self.trigger = PatternColumns()
+        self.gateData = PatternColumns()
+        self.stopMarker = None
+        self.countOffset = 0
+        self.overrun = False
+        self.wordcount = 0
+        
+    def dataToStr(self, l):
+        strlist = list()
+        for time, pattern in l:
+            strlist.append("({0}, {1:x})".format(time, pattern))
+        return "["+", ".join(strlist)+"]"
+                  
+    def __str__(self):
+        return "data: {0} auxdata: {1} trigger: {2} gate: {3} stopMarker: {4} countOffset: {5}".format(self.dataToStr(self.data), self.dataToStr(self.auxData), self.dataToStr(self.trigger), 
+                                                                                                       self.dataToStr(self.gateData), self.stopMarker, self.countOffset)
@@ -9,7 +9,7 @@ Encapsulation of the Pulse Programmer Hardware
 from queue import Queue
 import logging
 import multiprocessing
-from multiprocessing.sharedctypes import Array
+from multiprocessing.sharedctypes import Array, Value
 from ctypes import c_longlong
 import numpy
 
@@ -20,6 +20,7 @@ from .PulserHardwareServer import FinishException
 from pulser.OKBase import ErrorMessages, FPGAException
 from .PulserHardwareServer import PulserHardwareServer
 from pulser.PulserHardwareServer import PulserHardwareException
+from pulser.SharedDataRing import SharedDataRing
 
 
 def check(number, command):
@@ -28,14 +29,16 @@ def check(number, command):
 
 
 class QueueReader(QtCore.QThread):      
-    def __init__(self, pulserHardware, dataQueue, parent = None):
+    def __init__(self, pulserHardware, dataQueue, parent = None, sharedDataRing=None):
         QtCore.QThread.__init__(self, parent)
         self.exiting = False
         self.pulserHardware = pulserHardware
         self.running = False
         self.dataMutex = QtCore.QMutex()           # protects the thread data
         self.dataQueue = dataQueue
+        self.sharedDataRing = sharedDataRing
         self.dataHandler = { 'Data': lambda data, size : self.pulserHardware.dataAvailable.emit(data, size),
+                             'SharedDataDescriptor': lambda descriptor, size: self.pulserHardware.dataAvailable.emit(self.sharedDataRing.read(descriptor), size),
                              'DedicatedData': lambda data, size: self.pulserHardware.dedicatedDataAvailable.emit(data),
                              'FinishException': lambda data, size: self.raise_(FinishException()),
                              'LogicAnalyzerData': lambda data, size: self.onLogicAnalyzerData(data) }
@@ -98,7 +101,9 @@ class PulserHardware(QtCore.QObject):
     timestep = Q(5, 'ns')
 
     sharedMemorySize = 256*1024
-    def __init__(self):
+    sharedDataRingSize = 0      # words in the shared memory ring used to transport Data, 0 uses the data queue only
+    refillWindow = 10000        # points the FIFO refill may run ahead of the points acknowledged by the client
+    def __init__(self, sharedDataRingSize=None):
         super(PulserHardware, self).__init__()
         self._shutter = 0
         self._trigger = 0
@@ -111,11 +116,16 @@ class PulserHardware(QtCore.QObject):
         self.clientPipe, self.serverPipe = multiprocessing.Pipe()
         self.loggingQueue = multiprocessing.Queue()
         self.sharedMemoryArray = Array( c_longlong, self.sharedMemorySize, lock=True )
+        self.acknowledgedPoints = Value( c_longlong, 0, lock=False )
+        if sharedDataRingSize is not None:
+            self.sharedDataRingSize = sharedDataRingSize
+        self.sharedDataRing = SharedDataRing(self.sharedDataRingSize) if self.sharedDataRingSize > 0 else None
                 
-        self.serverProcess = self.serverClass(self.dataQueue, self.serverPipe, self.loggingQueue, self.sharedMemoryArray )
+        self.serverProcess = self.serverClass(self.dataQueue, self.serverPipe, self.loggingQueue, self.sharedMemoryArray, self.sharedDataRing,
+                                              self.acknowledgedPoints )
         self.serverProcess.start()
 
-        self.queueReader = QueueReader(self, self.dataQueue)
+        self.queueReader = QueueReader(self, self.dataQueue, sharedDataRing=self.sharedDataRing)
         self.queueReader.start()
         
         self.loggingReader = LoggingReader(self.loggingQueue)
@@ -209,6 +219,16 @@ class PulserHardware(QtCore.QObject):
         self.ppActiveChanged.emit(False)
         return value
             
+    def ppStartRefill(self, startPoint=0):
+        """start the server side FIFO refill with the scan code set by ppSetScanCode at point startPoint"""
+        self.acknowledgedPoints.value = startPoint
+        self.clientPipe.send( ('ppStartRefill', (startPoint, self.refillWindow) ) )
+        return processReturn( self.clientPipe.recv() )
+
+    def acknowledgePoints(self, points):
+        """the first points points of the scan are evaluated, this does not use the command pipe"""
+        self.acknowledgedPoints.value = points
+
     def setShutterBit(self, bit, value):
         self.clientPipe.send( ('setShutterBit', (bit, value) ) )  
         _shutter = processReturn( self.clientPipe.recv() )
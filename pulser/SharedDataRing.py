@@ -0,0 +1,136 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Shared memory ring buffer transport for Data objects
+
+The pulser server process writes the per channel columns of a Data object (counts,
+timestamps, results, time ticks) into a preallocated shared memory ring and only sends
+a small SharedDataDescriptor through the data queue. The descriptor carries the
+remaining (scalar) fields of the Data object and the layout of the columns in the ring.
+The client copies the columns out of the ring as numpy arrays and releases the space.
+
+If a Data object does not fit into the free space of the ring, or contains values that
+cannot be represented as 64 bit columns, write returns None and the caller sends the
+Data object through the queue as before.
+"""
+import copy
+from ctypes import c_int64, c_longlong
+from multiprocessing.sharedctypes import RawArray, RawValue
+
+import numpy
+
+ColumnTypes = {'q': numpy.int64, 'Q': numpy.uint64, 'd': numpy.float64}
+TypeCodes = {numpy.dtype(numpy.int64): 'q', numpy.dtype(numpy.uint64): 'Q', numpy.dtype(numpy.float64): 'd'}
+
+
+def toColumn(values):
+    """return values as int64, uint64 or float64 array or None if that is not possible"""
+    column = numpy.asarray(values)
+    return column if column.dtype in TypeCodes else None
+
+
+class SharedDataDescriptor(object):
+    """Data object stripped of its columns together with the layout of the columns in the ring"""
+    def __init__(self, data, layout, start, end):
+        self.data = data
+        self.layout = layout      # list of (field, channel, typecode, offset relative to start, length)
+        self.start = start
+        self.end = end
+
+
+class SharedDataRing(object):
+    """Ring buffer of 64 bit words in shared memory with a single writer and a single reader.
+
+    writeCount and readCount are the total number of words written and released. The
+    writer only ever reads readCount, the reader sets it after it copied the columns.
+    """
+    columnFields = ('count', 'timeTick', 'result', 'timestampZero', 'timestamp')
+
+    def __init__(self, size):
+        self.size = size
+        self.buffer = RawArray(c_int64, size)
+        self.readCount = RawValue(c_longlong, 0)
+        self.writeCount = 0
+        self._array = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_array'] = None
+        return state
+
+    @property
+    def array(self):
+        if self._array is None:
+            self._array = numpy.frombuffer(self.buffer, dtype=numpy.int64)
+        return self._array
+
+    def freeSpace(self):
+        return self.size - (self.writeCount - self.readCount.value)
+
+    def write(self, data):
+        """write the columns of data to the ring and return the descriptor to be sent instead of data.
+        Returns None if data cannot be transported through the ring."""
+        columns = self._columns(data)
+        if columns is None:
+            return None
+        length = sum(len(column) for _, _, column in columns)
+        position = self.writeCount % self.size
+        padding = self.size - position if position + length > self.size else 0
+        if length + padding > self.freeSpace():
+            return None
+        start = self.writeCount + padding
+        offset = start % self.size
+        array = self.array
+        layout = list()
+        for field, channel, column in columns:
+            array[offset:offset + len(column)] = column.view(numpy.int64)
+            layout.append((field, channel, TypeCodes[column.dtype], offset - start % self.size, len(column)))
+            offset += len(column)
+        self.writeCount = start + length
+        return SharedDataDescriptor(self._strip(data), layout, start, self.writeCount)
+
+    def read(self, descriptor):
+        """reconstruct the Data object described by descriptor and release its space in the ring"""
+        data = descriptor.data
+        offset = descriptor.start % self.size
+        record = self.array[offset:offset + descriptor.end - descriptor.start].copy()
+        self.readCount.value = descriptor.end
+        gateOffsets = dict()
+        for field, channel, typecode, offset, length in descriptor.layout:
+            column = record[offset:offset + length].view(ColumnTypes[typecode])
+            if field == 'timestampGates':
+                gateOffsets[channel] = column
+            elif field == 'timestamp':
+                data.timestamp.setChannel(channel, column, gateOffsets.pop(channel))
+            else:
+                getattr(data, field)[channel] = column
+        return data
+
+    def _columns(self, data):
+        columns = list()
+        for field in self.columnFields:
+            values = getattr(data, field)
+            if not values:
+                continue
+            for channel in values.keys():
+                if field == 'timestamp':
+                    columns.append(('timestampGates', channel, values.gateOffsets(channel)))
+                    column = toColumn(values.flat(channel))
+                else:
+                    column = toColumn(values[channel])
+                if column is None:
+                    return None
+                columns.append((field, channel, column))
+        return columns
+
+    def _strip(self, data):
+        """Shallow copy of data with empty column containers"""
+        stripped = copy.copy(data)
+        for field in self.columnFields:
+            values = getattr(data, field)
+            if values is not None:
+                setattr(stripped, field, values.emptyCopy())
+        return stripped
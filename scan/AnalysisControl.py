@@ -16,6 +16,7 @@ from uiModules.ComboBoxDelegate import ComboBoxDelegate
 from scan.PushVariable import PushVariable                         #@UnresolvedImport
 from modules.Utility import unique
 import copy
+import itertools
 from PyQt5 import QtCore, QtGui, QtWidgets
 from scan.PushVariableTableModel import PushVariableTableModel     #@UnresolvedImport
 from scan.DatabasePushDestination import DatabasePushDestination   #@UnresolvedImport
@@ -23,6 +24,7 @@ from fit.FitUiTableModel import FitUiTableModel
 from fit.FitResultsTableModel import FitResultsTableModel
 from fit.FitFunctionBase import fitFunctionMap
 from fit.StoredFitFunction import StoredFitFunction                #@UnresolvedImport
+from fit.FitService import FitJob, fitService, traceSigma
 from modules.PyqtUtility import BlockSignals, Override, updateComboBoxItems
 
 import os
@@ -76,6 +78,7 @@ class AnalysisControl(ControlForm, ControlBase ):
     analysisConfigurationChanged = QtCore.pyqtSignal( object )
     currentAnalysisChanged = QtCore.pyqtSignal( object )
     analysisResultSignal = QtCore.pyqtSignal( object )
+    fitResultReady = QtCore.pyqtSignal( object )
     def __init__(self, config, globalDict, parentname, evaluationNames, parent=None):
         ControlForm.__init__(self)
         ControlBase.__init__(self, parent)
@@ -101,6 +104,9 @@ class AnalysisControl(ControlForm, ControlBase ):
         self.currentEvaluationIndex = None
         self.fitfunction = None
         self.plottedTraceDict = None
+        self.pendingFits = dict()      # fit service key -> evaluation, fitfunction, plot, batch
+        self.fitKeys = itertools.count()
+        self.fitResultReady.connect( self.onFitResult )
         self.parameters = self.config.get( self.configname+'.parameters', AnalysisControlParameters() )
         
     def setupUi(self, parent):
@@ -354,44 +360,36 @@ class AnalysisControl(ControlForm, ControlBase ):
         self.fit( self.currentEvaluation )
 
     def fit(self, evaluation):
+        fitfunction, plot = self.prepareFit(evaluation)
+        if plot is not None:
+            fitfunction.leastsq(plot.x, plot.y, sigma=traceSigma(plot))
+            self.fitFinished(evaluation, fitfunction, plot)
+        return self.fitParameters(evaluation)
+
+    def prepareFit(self, evaluation):
+        """return the evaluated fitfunction to be used for evaluation and the plotted trace to be fitted"""
         if self.currentEvaluation is not None and evaluation == self.currentEvaluation:
-            plot = self.plottedTraceDict.get( evaluation.evaluation )
-            self.fitfunction.evaluate( self.globalDict )
-            if plot is not None:
-                sigma = None
-                if plot.hasHeightColumn:
-                    sigma = plot.height
-                elif plot.hasTopColumn and plot.hasBottomColumn:
-                    sigma = abs(plot.top + plot.bottom)
-                self.fitfunction.leastsq(plot.x, plot.y, sigma=sigma)
-                plot.fitFunction = copy.deepcopy(self.fitfunction)
-                plot.plot(-2)
-                evaluation.fitfunction = StoredFitFunction.fromFitfunction(self.fitfunction)
-                self.fitfunctionTableModel.fitDataChanged()
-                self.fitResultsTableModel.fitDataChanged()
-                replacements = self.fitfunction.replacementDict()
-                replacements.update( self.globalDict )
-                evaluation.updatePushVariables( replacements )
-                self.pushTableModel.fitDataChanged()
+            fitfunction = self.fitfunction
         else:
             fitfunction = evaluation.fitfunction.fitfunction()
-            fitfunction.evaluate( self.globalDict )
-            plot = self.plottedTraceDict.get( evaluation.evaluation )
-            if plot is not None:
-                sigma = None
-                if plot.hasHeightColumn:
-                    sigma = plot.height
-                elif plot.hasTopColumn and plot.hasBottomColumn:
-                    sigma = abs(plot.top + plot.bottom)
-                fitfunction.leastsq(plot.x, plot.y, sigma=sigma)
-                plot.fitFunction = fitfunction
-                plot.plot(-2)
-                evaluation.fitfunction = StoredFitFunction.fromFitfunction(fitfunction)
-                self.fitfunctionTableModel.fitDataChanged()
-                self.fitResultsTableModel.fitDataChanged()
-                replacements = fitfunction.replacementDict()
-                replacements.update( self.globalDict )
-                evaluation.updatePushVariables( replacements )
+        fitfunction.evaluate( self.globalDict )
+        return fitfunction, self.plottedTraceDict.get( evaluation.evaluation )
+
+    def fitFinished(self, evaluation, fitfunction, plot):
+        """show the fitted fitfunction and update the push variables of evaluation"""
+        isCurrent = fitfunction is self.fitfunction
+        plot.fitFunction = copy.deepcopy(fitfunction) if isCurrent else fitfunction
+        plot.plot(-2)
+        evaluation.fitfunction = StoredFitFunction.fromFitfunction(fitfunction)
+        self.fitfunctionTableModel.fitDataChanged()
+        self.fitResultsTableModel.fitDataChanged()
+        replacements = fitfunction.replacementDict()
+        replacements.update( self.globalDict )
+        evaluation.updatePushVariables( replacements )
+        if isCurrent:
+            self.pushTableModel.fitDataChanged()
+
+    def fitParameters(self, evaluation):
         names = evaluation.fitfunction.fitfunction().parameterNames
         vals = evaluation.fitfunction.fitfunction().parameters
         return dict(list(zip(names, vals))) #Return a dictionary of fit parameters and fitted values
@@ -415,19 +413,59 @@ class AnalysisControl(ControlForm, ControlBase ):
                     
     def onFitAll(self):
         self.fitAll()
-        
-    def fitAll(self):
+
+    def onFitResult(self, result):
+        evaluation, fitfunction, plot, batch = self.pendingFits.pop(result.key)
+        allResults, failedList, onFinished = batch
+        try:
+            self.fitFinished(evaluation, result.applyTo(fitfunction), plot)
+            allResults[evaluation.name] = self.fitParameters(evaluation)
+        except Exception as e:
+            logging.getLogger(__name__).error("Analysis '{0}' failed with error '{1}'".format(evaluation.name, e))
+            failedList.append(evaluation.name)
+        if not any(pending[3] is batch for pending in self.pendingFits.values()):
+            self.fitBatchFinished(batch)
+
+    def fitBatchFinished(self, batch):
+        allResults, failedList, onFinished = batch
+        self.analysisResultSignal.emit(allResults)
+        if onFinished is not None:
+            onFinished(failedList)
+
+    def prepareFits(self):
+        """returns the results of the evaluations without trace, the failed evaluations and a list of
+        (evaluation, fitfunction, plot) to be fitted"""
         allResults = dict()
         failedList = list()
+        pending = list()
         for evaluation in self.analysisDefinition:
             try:
-                allResults[evaluation.name] = self.fit(evaluation)
+                fitfunction, plot = self.prepareFit(evaluation)
+                if plot is not None:
+                    pending.append((evaluation, fitfunction, plot))
+                else:
+                    allResults[evaluation.name] = self.fitParameters(evaluation)
             except Exception as e:
                 logging.getLogger(__name__).error("Analysis '{0}' failed with error '{1}'".format(evaluation.name, e))
                 failedList.append(evaluation.name)
-        self.analysisResultSignal.emit(allResults)
-        return failedList
-    
+        return allResults, failedList, pending
+
+    def fitAll(self, onFinished=None):
+        """fit all evaluations in the fit service without blocking the user interface. The results
+        are applied in onFitResult as the fits finish, then analysisResultSignal is emitted and
+        onFinished is called with the names of the failed evaluations."""
+        allResults, failedList, pending = self.prepareFits()
+        batch = (allResults, failedList, onFinished)
+        if not pending:
+            self.fitBatchFinished(batch)
+            return
+        jobs = list()
+        for evaluation, fitfunction, plot in pending:
+            key = next(self.fitKeys)
+            self.pendingFits[key] = (evaluation, fitfunction, plot, batch)
+            jobs.append(FitJob(fitfunction, plot.x, plot.y, traceSigma(plot), key=key))
+        fitService().submitBatch(jobs, callback=self.fitResultReady.emit)
+
     def onLoadFitFunction(self, name=None):
         name = str(name) if name is not None else self.currentAnalysisName
         if name in self.analysisDefinitions:
@@ -452,11 +490,16 @@ class AnalysisControl(ControlForm, ControlBase ):
         self.plottedTraceDict = plottedTraceDict
         self.setButtonEnabledState()
 
-    def analyze(self, plottedTraceDict ):
+    def analyze(self, plottedTraceDict, onFinished=None):
+        """fit all evaluations and push the results once all fits are done. onFinished is
+        called with the failed pushes."""
         self.setPlottedTraceDict(plottedTraceDict)
-        self.fitAll()
+        self.fitAll(lambda failedList: self.analysisFinished(onFinished))
+
+    def analysisFinished(self, onFinished):
         failedToPush = self.pushAll()
-        return failedToPush
+        if onFinished is not None:
+            onFinished(failedToPush)
 
     def evaluate(self, name=None):
         if self.fitfunction is not None:
@@ -69,8 +69,23 @@ class EvaluationBase(Observable, metaclass=EvaluationMeta):
     def __deepcopy__(self, memo=None):
         return type(self)( self.globalDict, settings=copy.deepcopy(self.settings, memo) )
   
+    def countArray(self, data, evaluation):
+        """numpy array of the counts in the channel of evaluation, shared by all evaluations of the point"""
+        key = (evaluation.type, evaluation.channelKey)
+        countarray = data.channelCache.get(key)
+        if countarray is None:
+            countarray = data.channelCache[key] = numpy.asarray(evaluation.getChannelData(data))
+        return countarray
+
+    def evaluateMany(self, points, evaluation, expected=None, ppDict=None, globalDict=None):
+        """evaluate the Data of several points, expected is None or the list of expected values of the points.
+        Returns the list of (mean, error, raw) of the points"""
+        expected = expected if expected is not None else [None] * len(points)
+        return [self.evaluate(data, evaluation, expected=e, ppDict=ppDict, globalDict=globalDict)
+                for data, e in zip(points, expected)]
+
     def histogram(self, data, evaluation, histogramBins=50 ):
-        countarray = evaluation.getChannelData(data)
+        countarray = self.countArray(data, evaluation)
         y, x = numpy.histogram( countarray, range=(0, histogramBins), bins=histogramBins)
         return y, x, None   # third parameter is optional function 
     
\ No newline at end of file
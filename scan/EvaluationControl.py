@@ -8,6 +8,7 @@ import copy
 import functools
 import logging
 
+import numpy
 from PyQt5 import QtCore, QtGui, QtWidgets
 import PyQt5.uic
 
@@ -81,7 +82,7 @@ class EvaluationDefinition(object):
             return data.count[self.channelKey]  
         elif data.result is not None:
             return data.result[self.channelKey]
-        return []
+        return numpy.zeros(0, dtype=numpy.int64)
 
 
 class Evaluation:
@@ -16,13 +16,106 @@ import math
 import numpy
 
 from gui.ExpressionValue import ExpressionValue
-from modules.quantity import Q
+from modules.quantity import Q, value
 from scan.EvaluationBase import EvaluationBase, EvaluationException
 from uiModules.ParameterTable import Parameter
 from modules.Expression import Expression
 from modules.enum import enum
 from modules.SequenceDict import SequenceDict
 
+
+def wilsonInterval(x, N):
+    """probability p=x/N with the bottom and top of the Wilson score interval with continuity correction,
+    see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
+    x and N are numbers or numpy arrays"""
+    p = x/N
+    rootp = 3-1/N -4*p+4*N*(1-p)*p
+    top = numpy.where(rootp>=0, numpy.minimum(1, (2 + 2*N*p + numpy.sqrt(numpy.maximum(rootp, 0)))/(2*(N+1))), 1)
+    rootb = -1-1/N +4*p+4*N*(1-p)*p
+    bottom = numpy.where(rootb>=0, numpy.maximum(0, (2*N*p - numpy.sqrt(numpy.maximum(rootb, 0)))/(2*(N+1))), 0)
+    return p, bottom[()], top[()]
+
+
+def discriminatedArray(bright, invert):
+    """int8 array of the discriminated shots (1 for bright) from the boolean array bright"""
+    if invert:
+        numpy.logical_not(bright, out=bright)
+    return bright.view(numpy.int8)
+
+
+def counterSum(data, counterId, counters):
+    """sum of the counts of counters with counterId, shared by all evaluations of the point"""
+    channels = tuple(((counterId&0xff)<<8) | (int(counter) & 0xff) for counter in counters)
+    countarray = data.channelCache.get(channels)
+    if countarray is None:
+        arrays = [data.count[channel] for channel in channels if channel in data.count]
+        length = min(len(array) for array in arrays) if arrays else 0
+        countarray = numpy.zeros(length, dtype=numpy.result_type(numpy.int64, *arrays))
+        for array in arrays:
+            countarray += array[:length]
+        data.channelCache[channels] = countarray
+    return countarray
+
+
+class DiscriminationMixin(object):
+    """
+    State detection by discriminating every shot. discriminate(*sourceArrays(data, evaluation))
+    returns the discriminated shots of a point as numpy array, which are stored in data.evaluated.
+    The result is the mean of the discriminated shots with the Wilson score interval as error.
+    evaluateMany discriminates the shots of all points at once.
+    """
+    def sourceArrays(self, data, evaluation):
+        return (self.countArray(data, evaluation),)
+
+    def expectedValue(self, expected):
+        """value compared to the result of points with an expected state, None to ignore the expected state"""
+        return None
+
+    def result(self, p, bottom, top, x, expected):
+        expected = self.expectedValue(expected) if expected is not None else None
+        if expected is not None:
+            p = abs(expected-p)
+            bottom = abs(expected-bottom)
+            top = abs(expected-top)
+        return p, (p-bottom, top-p), x
+
+    def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
+        sources = self.sourceArrays(data, evaluation)
+        if len(sources[0]) == 0:
+            return 0, None, 0
+        discriminated = self.discriminate(*sources)
+        if evaluation.name:
+            data.evaluated[evaluation.name] = discriminated
+        x = discriminated.sum()
+        p, bottom, top = wilsonInterval(x, float(len(discriminated)))
+        return self.result(p, bottom, top, x, expected)
+
+    def evaluateMany(self, points, evaluation, expected=None, ppDict=None, globalDict=None):
+        if not points:
+            return list()
+        sources = [self.sourceArrays(data, evaluation) for data in points]
+        lengths = numpy.array([len(arrays[0]) for arrays in sources], dtype=numpy.int64)
+        discriminated = self.discriminate(*[numpy.concatenate(arrays) for arrays in zip(*sources)])
+        end = numpy.cumsum(lengths)
+        start = end - lengths
+        nonempty = lengths > 0
+        x = numpy.zeros(len(points), dtype=numpy.result_type(discriminated.dtype, numpy.int64))
+        if nonempty.any():
+            x[nonempty] = numpy.add.reduceat(discriminated, start[nonempty], dtype=x.dtype)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            p, bottom, top = wilsonInterval(x, lengths.astype(numpy.float64))
+        results = list()
+        for index, data in enumerate(points):
+            if not nonempty[index]:
+                results.append((0, None, 0))
+                continue
+            if evaluation.name:
+                data.evaluated[evaluation.name] = discriminated[start[index]:end[index]]
+            results.append(self.result(p[index], bottom[index], top[index], x[index],
+                                       expected[index] if expected is not None else None))
+        return results
+
+
 class MeanEvaluation(EvaluationBase):
     name = 'Mean'
     tooltip = "Mean of observed counts" 
@@ -57,8 +150,8 @@ class MeanEvaluation(EvaluationBase):
         return mean, (mean-numpy.min(countarray), numpy.max(countarray)-mean), numpy.sum(countarray)
     
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None):
-        countarray = evaluation.getChannelData(data)
-        if not countarray:
+        countarray = self.countArray(data, evaluation)
+        if len(countarray) == 0:
             return 0, (0,0), 0
         mean, (minus, plus), raw =  self.errorBarTypeLookup[self.settings['errorBarType']](countarray)
         if self.settings['transformation']!="":
@@ -91,8 +184,8 @@ class NumberEvaluation(EvaluationBase):
         EvaluationBase.__init__(self, globalDict, settings)
         
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None):
-        countarray = evaluation.getChannelData(data)
-        if not countarray:
+        countarray = self.countArray(data, evaluation)
+        if len(countarray) == 0:
             return 0, None, 0
         return len(countarray), None, len(countarray)
 
@@ -121,9 +214,9 @@ class FeedbackEvaluation(EvaluationBase):
         return mean, (mean-numpy.min(countarray), numpy.max(countarray)-mean), numpy.sum(countarray)
 
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None):
-        countarray = evaluation.getChannelData(data)
+        countarray = self.countArray(data, evaluation)
         globalName = self.settings['GlobalVariable']
-        if not countarray:
+        if len(countarray) == 0:
             return 2, (0,0), 0
         if not globalDict or globalName not in globalDict:
             return 1, (0,0), 0
@@ -155,7 +248,7 @@ class FeedbackEvaluation(EvaluationBase):
         return parameterDict
 
 
-class ThresholdEvaluation(EvaluationBase):
+class ThresholdEvaluation(DiscriminationMixin, EvaluationBase):
     """
     simple threshold state detection: if more than threshold counts are observed 
     the ion is considered bright. For threshold photons or less it is considered
@@ -170,26 +263,8 @@ class ThresholdEvaluation(EvaluationBase):
         self.settings.setdefault('threshold',1)
         self.settings.setdefault('invert',False)
         
-    def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
-        countarray = evaluation.getChannelData(data)
-        if not countarray:
-            return 0, None, 0
-        N = float(len(countarray))
-        if self.settings['invert']:
-            discriminated = [ 0 if count > self.settings['threshold'] else 1 for count in countarray ]
-        else:
-            discriminated = [ 1 if count > self.settings['threshold'] else 0 for count in countarray ]
-        if evaluation.name:
-            data.evaluated[evaluation.name] = discriminated
-        x = numpy.sum( discriminated )
-        p = x/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0            
-        return p, (p-bottom, top-p), x
+    def discriminate(self, countarray):
+        return discriminatedArray(countarray > value(self.settings['threshold'], ''), self.settings['invert'])
 
     def parameters(self):
         parameterDict = super(ThresholdEvaluation, self).parameters()
@@ -200,7 +275,7 @@ class ThresholdEvaluation(EvaluationBase):
         parameterDict['invert'] = Parameter(name='invert', dataType='bool', value=self.settings['invert'])
         return parameterDict
 
-class RangeEvaluation(EvaluationBase):
+class RangeEvaluation(DiscriminationMixin, EvaluationBase):
     """Evaluate the number of counts that occur in a specified range"""
     name = "Count Range"
     tooltip = ""
@@ -212,27 +287,10 @@ class RangeEvaluation(EvaluationBase):
         self.settings.setdefault('max',1)
         self.settings.setdefault('invert',False)
         
-    def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
-        countarray = evaluation.getChannelData(data)
-        if not countarray:
-            return 0, None, 0
-        N = float(len(countarray))
-        if self.settings['invert']:
-            discriminated = [ 0 if self.settings['min'] <= count <= self.settings['max'] else 1 for count in countarray ]
-        else:
-            discriminated = [ 1 if self.settings['min'] <= count <= self.settings['max'] else 0 for count in countarray ]
-        if evaluation.name:
-            data.evaluated[evaluation.name] = discriminated
-        x = numpy.sum( discriminated )
-        p = float(x)/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        # caution: not applicable to this situation, needs to be fixed
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0            
-        return p, (p-bottom, top-p), x
+    def discriminate(self, countarray):
+        # caution: the Wilson score interval is not applicable to this situation, needs to be fixed
+        inRange = (countarray >= value(self.settings['min'], '')) & (countarray <= value(self.settings['max'], ''))
+        return discriminatedArray(inRange, self.settings['invert'])
 
     def parameters(self):
         parameterDict = super(RangeEvaluation, self).parameters()
@@ -244,7 +302,7 @@ class RangeEvaluation(EvaluationBase):
         parameterDict['invert'] = Parameter(name='invert', dataType='bool', value=self.settings['invert'])
         return parameterDict
 
-class DoubleRangeEvaluation(EvaluationBase):
+class DoubleRangeEvaluation(DiscriminationMixin, EvaluationBase):
     """Evaluate the number of counts that occur in two specified ranges"""
     name = "Double Count Range"
     tooltip = ""
@@ -258,29 +316,11 @@ class DoubleRangeEvaluation(EvaluationBase):
         self.settings.setdefault('max_2',1)
         self.settings.setdefault('invert',False)
         
-    def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
-        countarray = evaluation.getChannelData(data)
-        if not countarray:
-            return 0, None, 0
-        N = float(len(countarray))
-        if self.settings['invert']:
-            discriminated = [ 0 if ( self.settings['min_1'] <= count <= self.settings['max_1'] ) or
-                             ( self.settings['min_2'] <= count <= self.settings['max_2'] )  else 1 for count in countarray ]
-        else:
-            discriminated = [ 1 if ( self.settings['min_1'] <= count <= self.settings['max_1'] ) or
-                             ( self.settings['min_2'] <= count <= self.settings['max_2'] )  else 0 for count in countarray ]
-        if evaluation.name:
-            data.evaluated[evaluation.name] = discriminated
-        x = numpy.sum( discriminated )
-        p = float(x)/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        # caution: not applicable to this situation, needs to be fixed
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0            
-        return p, (p-bottom, top-p), x
+    def discriminate(self, countarray):
+        # caution: the Wilson score interval is not applicable to this situation, needs to be fixed
+        inRange = ( ((countarray >= value(self.settings['min_1'], '')) & (countarray <= value(self.settings['max_1'], ''))) |
+                    ((countarray >= value(self.settings['min_2'], '')) & (countarray <= value(self.settings['max_2'], ''))) )
+        return discriminatedArray(inRange, self.settings['invert'])
 
     def parameters(self):
         parameterDict = super(DoubleRangeEvaluation, self).parameters()
@@ -294,7 +334,7 @@ class DoubleRangeEvaluation(EvaluationBase):
         parameterDict['invert'] = Parameter(name='invert', dataType='bool', value=self.settings['invert'])
         return parameterDict
 
-class FidelityEvaluation(EvaluationBase):
+class FidelityEvaluation(DiscriminationMixin, EvaluationBase):
     """
     simple threshold state detection: if more than threshold counts are observed 
     the ion is considered bright. For threshold photons or less it is considered
@@ -311,31 +351,11 @@ class FidelityEvaluation(EvaluationBase):
         self.settings.setdefault('threshold',1)
         self.settings.setdefault('invert',False)
         
-    def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
-        countarray = evaluation.getChannelData(data)
-        if not countarray:
-            return 0, None, 0
-        N = float(len(countarray))
-        if self.settings['invert']:
-            discriminated = [ 0 if count > self.settings['threshold'] else 1 for count in countarray ]
-        else:
-            discriminated = [ 1 if count > self.settings['threshold'] else 0 for count in countarray ]
-        if evaluation.name:
-            data.evaluated[evaluation.name] = discriminated
-        x = numpy.sum( discriminated )
-        p = x/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0  
-        if expected is not None:
-            expected = self.ExpectedLookup[expected]
-            p = abs(expected-p)
-            bottom = abs(expected-bottom)
-            top = abs(expected-top)
-        return p, (p-bottom, top-p), x
+    def discriminate(self, countarray):
+        return discriminatedArray(countarray > value(self.settings['threshold'], ''), self.settings['invert'])
+
+    def expectedValue(self, expected):
+        return self.ExpectedLookup[expected]
 
     def parameters(self):
         parameterDict = super(FidelityEvaluation, self).parameters()
@@ -346,7 +366,7 @@ class FidelityEvaluation(EvaluationBase):
         parameterDict['invert'] = Parameter(name='invert', dataType='bool', value=self.settings['invert'])
         return parameterDict
 
-class ParityEvaluation(EvaluationBase):
+class ParityEvaluation(DiscriminationMixin, EvaluationBase):
     """Evaluates the parity, given individual ion signals ion_1 and ion_2"""
     name = "Parity"
     tooltip = "Two ion parity evaluation"
@@ -358,32 +378,22 @@ class ParityEvaluation(EvaluationBase):
         self.settings.setdefault('Ion_1','')
         self.settings.setdefault('Ion_2','')
 
-    def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
+    def sourceArrays(self, data, evaluation):
         name1, name2 = self.settings['Ion_1'], self.settings['Ion_2']
-        eval1, eval2 = data.evaluated.get(name1), data.evaluated.get(name2) 
+        eval1, eval2 = data.evaluated.get(name1), data.evaluated.get(name2)
         if eval1 is None:
             raise EvaluationException("Cannot find data '{0}'".format(name1))
         if eval2 is None:
             raise EvaluationException("Cannot find data '{0}'".format(name2))
         if len(eval1)!=len(eval2):
             raise EvaluationException("Evaluated arrays have different length {0}, {1}".format(len(eval1),len(eval2)))
-        N = float(len(eval1))
-        discriminated = [ 1 if e1==e2 else -1 for e1, e2 in zip(eval1, eval2) ]
-        if evaluation.name:
-            data.evaluated[evaluation.name] = discriminated
-        x = numpy.sum( discriminated )
-        p = x/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0  
-        if expected is not None:
-            p = abs(expected-p)
-            bottom = abs(expected-bottom)
-            top = abs(expected-top)
-        return p, (p-bottom, top-p), x
+        return numpy.asarray(eval1), numpy.asarray(eval2)
+
+    def expectedValue(self, expected):
+        return expected
+
+    def discriminate(self, eval1, eval2):
+        return numpy.where(eval1 == eval2, numpy.int8(1), numpy.int8(-1))
 
     def parameters(self):
         parameterDict = super(ParityEvaluation, self).parameters()
@@ -391,7 +401,7 @@ class ParityEvaluation(EvaluationBase):
         parameterDict['Ion_2'] = Parameter(name='Ion_2', dataType='str', value=self.settings['Ion_2'], tooltip='The evaluation for ion 2')
         return parameterDict
 
-class TwoIonEvaluation(EvaluationBase):
+class TwoIonEvaluation(DiscriminationMixin, EvaluationBase):
     """Combines two individual ion evaluations using coefficients on the four possible state (dd, db, bd, and bb)"""
     name = "TwoIon"
     tooltip = "Two ion parity evaluation"
@@ -407,33 +417,25 @@ class TwoIonEvaluation(EvaluationBase):
         self.settings.setdefault('bd',-1)
         self.settings.setdefault('bb',1)
         
-    def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
+    def sourceArrays(self, data, evaluation):
         name1, name2 = self.settings['Ion_1'], self.settings['Ion_2']
-        eval1, eval2 = data.evaluated.get(name1), data.evaluated.get(name2) 
+        eval1, eval2 = data.evaluated.get(name1), data.evaluated.get(name2)
         if eval1 is None:
             raise EvaluationException("Cannot find data '{0}'".format(name1))
         if eval2 is None:
             raise EvaluationException("Cannot find data '{0}'".format(name2))
         if len(eval1)!=len(eval2):
             raise EvaluationException("Evaluated arrays have different length {0}, {1}".format(len(eval1),len(eval2)))
-        N = float(len(eval1))
-        lookup = {(0,0): self.settings['dd'], (0,1): self.settings['db'], (1,0): self.settings['bd'], (1,1):self.settings['bb'] }
-        discriminated = [ lookup[pair] for pair in zip(eval1, eval2) ]
-        if evaluation.name:
-            data.evaluated[evaluation.name] = discriminated
-        x = float(numpy.sum( discriminated )) # Float converts type "magnitude" to float so as to not break plotting (numpy.isnan fails)
-        p = x/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0  
-        if expected is not None:
-            p = abs(expected-p)
-            bottom = abs(expected-bottom)
-            top = abs(expected-top)
-        return p, (p-bottom, top-p), x
+        return numpy.asarray(eval1), numpy.asarray(eval2)
+
+    def expectedValue(self, expected):
+        return expected
+
+    def discriminate(self, eval1, eval2):
+        # magnitudes are converted to float so as to not break plotting (numpy.isnan fails)
+        lookup = numpy.array([[value(self.settings['dd'], ''), value(self.settings['db'], '')],
+                              [value(self.settings['bd'], ''), value(self.settings['bb'], '')]], dtype=numpy.float64)
+        return lookup[eval1.astype(numpy.intp), eval2.astype(numpy.intp)]
 
     def parameters(self):
         parameterDict = super(TwoIonEvaluation, self).parameters()
@@ -484,15 +486,12 @@ class CounterSumMeanEvaluation(EvaluationBase):
         mean = numpy.mean(countarray)
         return mean, (mean - numpy.min(countarray), numpy.max(countarray) - mean), numpy.sum(countarray)
 
-    def getCountArray(self, data):
-        counters = [((self.settings['id']&0xff)<<8) | (int(counter) & 0xff) for counter in self.settings['counters']]
-        listOfCountArrays = [data.count[counter] for counter in counters if counter in data.count.keys()]
-        countarray = [sum(sublist) for sublist in zip(*listOfCountArrays)]
-        return countarray
+    def countArray(self, data, evaluation):
+        return counterSum(data, self.settings['id'], self.settings['counters'])
 
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None):
-        countarray = self.getCountArray(data)
-        if not countarray:
+        countarray = self.countArray(data, evaluation)
+        if len(countarray) == 0:
             return 0, (0, 0), 0
         mean, (minus, plus), raw = self.errorBarTypeLookup[self.settings['errorBarType']](countarray)
         if self.settings['transformation'] != "":
@@ -507,11 +506,6 @@ class CounterSumMeanEvaluation(EvaluationBase):
             return mean, (mean - minus, plus - mean), raw
         return mean, (minus, plus), raw
 
-    def histogram(self, data, evaluation, histogramBins=50 ):
-        countarray = self.getCountArray(data)
-        y, x = numpy.histogram( countarray, range=(0, histogramBins), bins=histogramBins)
-        return y, x, None   # third parameter is optional function
-
     def parameters(self):
         parameterDict = super(CounterSumMeanEvaluation, self).parameters()
         parameterDict['id'] = Parameter(name='id', dataType='magnitude', value=self.settings['id'],
@@ -526,7 +520,7 @@ class CounterSumMeanEvaluation(EvaluationBase):
                                                     tooltip="use y for the result in a mathematical expression")
         return parameterDict
 
-class CounterSumThresholdEvaluation(EvaluationBase):
+class CounterSumThresholdEvaluation(DiscriminationMixin, EvaluationBase):
     """
     simple threshold state detection: if more than threshold counts are observed
     the ion is considered bright. For threshold photons or less it is considered
@@ -543,32 +537,11 @@ class CounterSumThresholdEvaluation(EvaluationBase):
         self.settings.setdefault('counters', [])
         self.settings.setdefault('id', 0)
 
-    def getCountArray(self, data):
-        counters = [((self.settings['id']&0xff)<<8) | (int(counter) & 0xff) for counter in self.settings['counters']]
-        listOfCountArrays = [data.count[counter] for counter in counters if counter in data.count.keys()]
-        countarray = [sum(sublist) for sublist in zip(*listOfCountArrays)]
-        return countarray
+    def countArray(self, data, evaluation):
+        return counterSum(data, self.settings['id'], self.settings['counters'])
 
-    def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
-        countarray = self.getCountArray(data)
-        if not countarray:
-            return 0, None, 0
-        N = float(len(countarray))
-        if self.settings['invert']:
-            discriminated = [ 0 if count > self.settings['threshold'] else 1 for count in countarray ]
-        else:
-            discriminated = [ 1 if count > self.settings['threshold'] else 0 for count in countarray ]
-        if evaluation.name:
-            data.evaluated[evaluation.name] = discriminated
-        x = numpy.sum( discriminated )
-        p = x/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0
-        return p, (p-bottom, top-p), x
+    def discriminate(self, countarray):
+        return discriminatedArray(countarray > value(self.settings['threshold'], ''), self.settings['invert'])
 
     def parameters(self):
         parameterDict = super(CounterSumThresholdEvaluation, self).parameters()
@@ -0,0 +1,161 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Headless replay of recorded raw data
+
+The Data records written by trace.RawData.DataRecorder during a scan are evaluated
+again with a new list of evaluations (for example with a different threshold),
+without the user interface and without taking the data again. The points are read
+in batches and every batch is evaluated with evaluateMany of the algorithms in the
+order of the evaluations, with data.evaluated of a point shared between them as in
+ScanExperiment.dataMiddlePart. The histograms of the evaluations with showHistogram
+set are integrated over all points.
+
+A ReplayJob describes one file, the ReplayService replays batches of jobs in worker
+processes and returns a ReplayResult per file holding the evaluated values as arrays.
+replayData evaluates any iterable of Data in the calling process.
+"""
+import itertools
+
+import numpy
+
+from modules.ProcessPoolService import ProcessPoolService
+from scan.EvaluationBase import EvaluationAlgorithms
+from trace.RawData import DataReader
+
+
+def initializeWorker():
+    """register all evaluation algorithms in the worker process"""
+    from scan import EvaluationMethods  #@UnusedImport
+
+
+class ReplayJob(object):
+    """Replay of the raw data file filename with evalList (list of EvaluationDefinition).
+    The x value of point n is xValues[n] or n if xValues is not given, expected[n] is
+    passed to the algorithms as expected value. globalDict and ppDict replace the global
+    variables and the pulse program parameters of the scan."""
+    def __init__(self, filename, evalList, histogramBins=50, xValues=None, expected=None, globalDict=None,
+                 ppDict=None, key=None):
+        self.filename = filename
+        self.evalList = list(evalList)
+        self.histogramBins = histogramBins
+        self.xValues = xValues
+        self.expected = expected
+        self.globalDict = dict(globalDict) if globalDict else dict()
+        self.ppDict = dict(ppDict) if ppDict else dict()
+        self.key = key if key is not None else filename
+
+
+class ReplayResult(object):
+    """Evaluated values of a replayed file, value, errorBottom, errorTop and raw are
+    dictionaries evaluation name: numpy array with one entry per point. errorBottom and
+    errorTop are the lengths of the error bars below and above the value as returned by
+    the evaluations (nan for evaluations without error bars). histograms holds (y, x) of
+    the integrated histograms. error is the error message if the replay failed."""
+    def __init__(self, key, names=(), error=None):
+        self.key = key
+        self.names = list(names)
+        self.x = numpy.zeros(0)
+        self.value = dict((name, numpy.zeros(0)) for name in self.names)
+        self.errorBottom = dict((name, numpy.zeros(0)) for name in self.names)
+        self.errorTop = dict((name, numpy.zeros(0)) for name in self.names)
+        self.raw = dict((name, numpy.zeros(0)) for name in self.names)
+        self.histograms = dict()
+        self.error = error
+
+    @property
+    def points(self):
+        return len(self.x)
+
+    def resize(self, points):
+        self.x = numpy.resize(self.x, points)
+        for columns in (self.value, self.errorBottom, self.errorTop, self.raw):
+            for name in self.names:
+                columns[name] = numpy.resize(columns[name], points)
+
+
+class ReplayServiceException(Exception):
+    pass
+
+
+def evaluationAlgorithms(evalList, globalDict):
+    """algorithm instances configured with the settings of the evaluations in evalList"""
+    algorithms = list()
+    for evaluation in evalList:
+        if evaluation.evaluation not in EvaluationAlgorithms:
+            raise ReplayServiceException("Unknown evaluation algorithm '{0}'".format(evaluation.evaluation))
+        algo = EvaluationAlgorithms[evaluation.evaluation](globalDict=globalDict)
+        algo.setSettings(dict(evaluation.settings), evaluation.name)
+        algorithms.append(algo)
+    return algorithms
+
+
+def replayData(dataIterable, job, batchSize=256):
+    """evaluate the Data in dataIterable with the evaluations of job and return the ReplayResult"""
+    names = [evaluation.name for evaluation in job.evalList]
+    result = ReplayResult(job.key, names)
+    algorithms = evaluationAlgorithms(job.evalList, job.globalDict)
+    histogramList = [(evaluation, algo) for evaluation, algo in zip(job.evalList, algorithms) if evaluation.showHistogram]
+    dataIterator = iter(dataIterable)
+    index = 0
+    while True:
+        batch = list(itertools.islice(dataIterator, batchSize))
+        if not batch:
+            break
+        result.resize(index + len(batch))
+        end = index + len(batch)
+        for data in batch:
+            data.evaluated = dict()
+        expected = job.expected[index:end] if job.expected is not None else None
+        result.x[index:end] = job.xValues[index:end] if job.xValues is not None else numpy.arange(index, end)
+        for name, evaluation, algo in zip(names, job.evalList, algorithms):
+            for point, (mean, error, raw) in enumerate(algo.evaluateMany(batch, evaluation, expected=expected,
+                                                                        ppDict=job.ppDict, globalDict=job.globalDict),
+                                                       start=index):
+                result.value[name][point] = mean
+                result.errorBottom[name][point], result.errorTop[name][point] = error if error is not None else (numpy.nan, numpy.nan)
+                result.raw[name][point] = raw
+        for data in batch:
+            for evaluation, algo in histogramList:
+                y, x, _ = algo.histogram(data, evaluation, job.histogramBins)
+                if evaluation.name in result.histograms:
+                    result.histograms[evaluation.name][0][:] += y
+                else:
+                    result.histograms[evaluation.name] = (y.copy(), x)
+        index = end
+    return result
+
+
+def runReplayJob(job):
+    """replay a single job, executed in the worker processes"""
+    try:
+        return replayData(DataReader(job.filename), job)
+    except Exception as e:
+        return ReplayResult(job.key, error="{0}: {1}".format(e.__class__.__name__, e))
+
+
+class ReplayService(ProcessPoolService):
+    name = "replay service"
+    runJob = staticmethod(runReplayJob)
+    initializer = staticmethod(initializeWorker)
+
+    def errorResult(self, job, error):
+        return ReplayResult(job.key, error=error)
+
+    def replayBatch(self, jobs, timeout=None):
+        """replay all jobs in parallel and return the ReplayResults in the order of jobs"""
+        return self.runBatch(jobs, timeout)
+
+
+_replayService = None
+
+
+def replayService():
+    """replay service shared by all users"""
+    global _replayService
+    if _replayService is None:
+        _replayService = ReplayService()
+    return _replayService
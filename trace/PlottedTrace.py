@@ -8,12 +8,12 @@ from trace import pens
 
 from PyQt5 import QtCore
 import numpy
-from pyqtgraph.graphicsItems.ErrorBarItem import ErrorBarItem
 from pyqtgraph.graphicsItems.PlotCurveItem import PlotCurveItem
 
 from modules import enum
 from trace.TraceCollection import TracePlotting
-import time 
+from trace.TraceRendering import SortedColumns, ErrorBarChunks, minMaxDecimate, errorBarDecimate
+import time
 from modules import WeakMethod
 from functools import partial
 
@@ -26,6 +26,9 @@ class PlottedTrace(object):
     Styles = enum.enum('lines', 'points', 'linespoints', 'lines_with_errorbars', 'points_with_errorbars', 'linepoints_with_errorbars')
     PointsStyles = [ 1, 4 ]
     Types = enum.enum('default', 'steps')
+    decimationThreshold = 4000   # curves with more points are reduced to the min and max of every pixel column
+    defaultPixels = 2000         # pixel columns used while the width of the view is not known
+    replotCostFactor = 10        # replots are delayed to spend at most 1/replotCostFactor of the time replotting
     def __init__(self,Trace,graphicsView,penList=None,pen=0,style=None,plotType=None,
                  xColumn='x',yColumn='y',topColumn='top',bottomColumn='bottom',heightColumn='height',
                  rawColumn='raw', tracePlotting=None, name="", xAxisLabel = None, xAxisUnit = None,
@@ -43,7 +46,13 @@ class PlottedTrace(object):
         self.trace = Trace
         self.curve = None
         self.fitcurve = None
-        self.errorBarItem = None
+        self.errorBars = None
+        self.sortedColumns = SortedColumns()
+        self.sortedErrorBars = SortedColumns()
+        self.viewBox = None
+        self.viewRangeSlot = WeakMethod.ref(self.onViewRangeChanged)
+        self.decimation = None
+        self.replotCost = 0
         self.style = self.Styles.lines if style is None else style
         self.type = self.Types.default if plotType is None else plotType
         self.curvePen = 0
@@ -126,6 +135,19 @@ class PlottedTrace(object):
         
     def timeintervalAppend(self, timeinterval, maxPoints=0):
         self.trace.timeintervalAppend(timeinterval, maxPoints)
+
+    def appendX(self, x, timeinterval, maxPoints=0):
+        """append a point to the x column and the time interval, keeping the last maxPoints if maxPoints > 0"""
+        self.trace.appendColumn(self._xColumn, x, maxPoints)
+        self.trace.timeintervalAppend(timeinterval, maxPoints)
+
+    def appendY(self, y, error, raw, maxPoints=0):
+        """append an evaluated point (y, error, raw) to the y, raw, bottom and top columns"""
+        self.trace.appendColumn(self._yColumn, y, maxPoints)
+        self.trace.appendColumn(self._rawColumn, raw, maxPoints)
+        if error is not None:
+            self.trace.appendColumn(self._bottomColumn, error[0], maxPoints)
+            self.trace.appendColumn(self._topColumn, error[1], maxPoints)
         
     @property
     def timeinterval(self):
@@ -198,9 +220,10 @@ class PlottedTrace(object):
                 self._graphicsView.removeItem(self.curve)
                 self.curve = None
                 self.penUsageDict[self.curvePen] -= 1
-            if self.errorBarItem is not None:
-                self._graphicsView.removeItem(self.errorBarItem)  
-                self.errorBarItem = None
+            if self.errorBars is not None:
+                self.errorBars.remove()
+                self.errorBars = None
+            self.disconnectView()
             if self.fitcurve is not None:
                 self._graphicsView.removeItem(self.fitcurve)
                 self.fitcurve = None
@@ -245,20 +268,89 @@ class PlottedTrace(object):
 
     def plotErrorBars(self, penindex):
         if self._graphicsView is not None:
-            if self.hasHeightColumn:
-                self.errorBarItem = ErrorBarItem(x=(self.x), y=(self.y), height=(self.height),
-                                                           pen=self.penList[penindex][0])
-            elif self.hasTopColumn and self.hasBottomColumn:
-                self.errorBarItem = ErrorBarItem(x=(self.x), y=(self.y), top=(self.top), bottom=(self.bottom),
-                                                           pen=self.penList[penindex][0])
-                self._graphicsView.addItem(self.errorBarItem)
-            
+            columns = self.errorBarColumns()
+            if columns is not None:
+                self.errorBars = ErrorBarChunks(self._graphicsView, self.penList[penindex][0])
+                self.errorBars.setData(**self.errorBarData())
+
+    def errorBarColumns(self):
+        if self.hasHeightColumn:
+            return dict(x=numpy.asarray(self.x), y=numpy.asarray(self.y), height=numpy.asarray(self.height))
+        if self.hasTopColumn and self.hasBottomColumn:
+            return dict(x=numpy.asarray(self.x), y=numpy.asarray(self.y), top=numpy.asarray(self.top),
+                        bottom=numpy.asarray(self.bottom))
+        return None
+
+    def errorBarData(self):
+        """error bars, for more than decimationThreshold points reduced to one bar per pixel column of the view"""
+        columns = self.errorBarColumns()
+        if columns is None or len(columns['x']) <= self.decimationThreshold:
+            return columns
+        if 'height' in columns:
+            self.sortedErrorBars.update(columns['x'], columns['y'], columns['height'])
+            x, y, height = self.sortedErrorBars.sorted
+            lower, upper = y - height / 2, y + height / 2
+        else:
+            self.sortedErrorBars.update(columns['x'], columns['y'], columns['top'], columns['bottom'])
+            x, y, top, bottom = self.sortedErrorBars.sorted
+            lower, upper = y - bottom, y + top
+        x, y, height = errorBarDecimate(x, lower, upper, *self.viewRange())
+        return dict(x=x, y=y, height=height)
+
+    def curveData(self):
+        """x and y of the curve. Sorted by x unless only points are plotted and reduced to the min
+        and max of y in every pixel column of the view for more than decimationThreshold points"""
+        x, y = numpy.asarray(self.x), numpy.asarray(self.y)
+        if self.style in self.PointsStyles and len(x) <= self.decimationThreshold:
+            self.decimation = None
+            return x, y
+        self.sortedColumns.update(x, y)
+        x, y = self.sortedColumns.sorted
+        if len(x) <= self.decimationThreshold:
+            self.decimation = None
+            return x, y
+        self.decimation = self.viewRange()
+        return minMaxDecimate(x, y, *self.decimation)
+
+    def viewRange(self):
+        """x range (None while the x axis is auto ranging) and width in pixels of the view of the curve"""
+        if self.viewBox is None:
+            return None, self.defaultPixels
+        xRange = None if self.viewBox.autoRangeEnabled()[0] else tuple(self.viewBox.viewRange()[0])
+        width = int(self.viewBox.width())
+        return xRange, width if width > 0 else self.defaultPixels
+
+    def connectView(self):
+        """decimated curves are updated when the x range or the size of the view changes"""
+        self.disconnectView()
+        self.viewBox = self.curve.getViewBox() if self.curve is not None else None
+        if self.viewBox is not None:
+            self.viewBox.sigXRangeChanged.connect(self.viewRangeSlot)
+            self.viewBox.sigResized.connect(self.viewRangeSlot)
+            self.onViewRangeChanged()
+
+    def disconnectView(self):
+        if self.viewBox is not None:
+            for signal in (self.viewBox.sigXRangeChanged, self.viewBox.sigResized):
+                try:
+                    signal.disconnect(self.viewRangeSlot)
+                except TypeError:
+                    pass
+            self.viewBox = None
+
+    def onViewRangeChanged(self, *args):
+        if self.decimation is not None and self.viewRange() != self.decimation:
+            if self.curve is not None:
+                self.curve.setData(*self.curveData())
+            if self.errorBars is not None:
+                self.errorBars.setData(**self.errorBarData())
+
     def plotLines(self,penindex, errorbars=True ):
         if self._graphicsView is not None:
             if errorbars:
                 self.plotErrorBars(penindex)
-            x, y = sort_lists_by((self.x, self.y), key_list=0) if len(self.x) > 0 else (self.x, self.y)
-            self.curve = self._graphicsView.plot( numpy.array(x), numpy.array(y), pen=self.penList[penindex][0])            
+            self.curve = self._graphicsView.plot( *self.curveData(), pen=self.penList[penindex][0])
+            self.connectView()
             if self.xAxisLabel:
                 if self.xAxisUnit:
                     self._graphicsView.setLabel('bottom', text = "{0} ({1})".format(self.xAxisLabel, self.xAxisUnit))
@@ -269,8 +361,9 @@ class PlottedTrace(object):
         if self._graphicsView is not None:
             if errorbars:
                 self.plotErrorBars(penindex)
-            self.curve = self._graphicsView.plot((self.x), (self.y), pen=None, symbol=self.penList[penindex][1],
+            self.curve = self._graphicsView.plot(*self.curveData(), pen=None, symbol=self.penList[penindex][1],
                                                 symbolPen=self.penList[penindex][2], symbolBrush=self.penList[penindex][3])
+            self.connectView()
             if self.xAxisLabel:
                 if self.xAxisUnit:
                     self._graphicsView.setLabel('bottom', text = "{0} ({1})".format(self.xAxisLabel, self.xAxisUnit))
@@ -281,9 +374,9 @@ class PlottedTrace(object):
         if self._graphicsView is not None:
             if errorbars:
                 self.plotErrorBars(penindex)
-            x, y = sort_lists_by( (self.x, self.y), key_list=0)
-            self.curve = self._graphicsView.plot( numpy.array(x), numpy.array(y), pen=self.penList[penindex][0], symbol=self.penList[penindex][1],
+            self.curve = self._graphicsView.plot( *self.curveData(), pen=self.penList[penindex][0], symbol=self.penList[penindex][1],
                                                 symbolPen=self.penList[penindex][2], symbolBrush=self.penList[penindex][3])
+            self.connectView()
             if self.xAxisLabel:
                 if self.xAxisUnit:
                     self._graphicsView.setLabel('bottom', text = "{0} ({1})".format(self.xAxisLabel, self.xAxisUnit))
@@ -320,26 +413,27 @@ class PlottedTrace(object):
             self.curvePen = penindex
         
     def replot(self):
+        """replot now or, if the last replot is recent compared to the time it took, delayed"""
         if self._graphicsView is not None:
-            if len(self.x)>500 and time.time()-self.lastPlotTime<len(self.x)/500.:
+            wait = self.replotCostFactor * self.replotCost - (time.time() - self.lastPlotTime)
+            if wait > 0:
                 if not self.needsReplot:
                     self.needsReplot = True
-                    QtCore.QTimer.singleShot(len(self.x)*2, self._replot) 
+                    QtCore.QTimer.singleShot(int(1000 * wait) + 1, self._replot)
             else:
                 self._replot()
-            
+
     def _replot(self):
-        if hasattr(self, 'curve') and self.curve is not None:
-            if self.style not in self.PointsStyles and self.type==self.Types.default:
-                x, y = sort_lists_by((self.x, self.y), key_list=0) if len(self.x) > 0 else (self.x, self.y)
-                self.curve.setData( numpy.array(x), numpy.array(y) )
+        start = time.time()
+        if self.curve is not None:
+            if self.type==self.Types.default:
+                self.curve.setData( *self.curveData() )
             else:
                 self.curve.setData( (self.x), (self.y) )
-        if hasattr(self, 'errorBarItem') and self.errorBarItem is not None:
-            if self.hasHeightColumn:
-                self.errorBarItem.setData(x=(self.x), y=(self.y), height=(self.trace.height))
-            else:
-                self.errorBarItem.setOpts(x=(self.x), y=(self.y), top=(self.top), bottom=(self.bottom))
+        if self.errorBars is not None:
+            columns = self.errorBarData()
+            if columns is not None:
+                self.errorBars.setData(**columns)
         if self.fitFunction is not None:
             if self.type==self.Types.default:
                 self.replotFitFunction()
@@ -349,6 +443,7 @@ class PlottedTrace(object):
             self._graphicsView.removeItem(self.fitcurve)
             self.fitcurve = None
         self.lastPlotTime = time.time()
+        self.replotCost = self.lastPlotTime - start
         self.needsReplot = False
 
     def setView(self, graphicsView ):
@@ -3,13 +3,41 @@
 # This Software is released under the GPL license detailed
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
+"""
+Raw data files.
 
+RawData writes a flat binary file of timestamps (or floats) referenced from a trace.
 
-from array import array
+DataRecorder writes the pulser Data objects of a scan to a length prefixed columnar
+file from a background thread, DataReader reads them back lazily. The file starts with
+RawDataMagic followed by one record per Data object:
+
+    uint64 record length, uint32 meta length, meta, column bytes
+
+meta is the json encoded list of the scalar fields of Data and the column directory
+[[field, channel, dtype, length], ...]. The columns follow in directory order as raw
+bytes of the given numpy dtype, integer columns are stored in the smallest type holding
+their values. The gates of the timestamp RaggedColumns are stored as the flat
+values ('timestamp') and the gate start offsets ('timestampOffsets').
+"""
 import hashlib
+import json
+import mmap
+import queue
 import shutil
+import struct
+import threading
+import time
+
+import numpy
 
 from modules import DataDirectory
+from pulser.PulserData import Data, ChannelColumns, RaggedColumns, jsonDefault
+
+RawDataMagic = b'IONRAW\x00\x01'
+RecordHeader = struct.Struct('<QI')
+channelFields = ('count', 'timeTick', 'timestampZero', 'result')
+compactTypes = (numpy.uint8, numpy.int8, numpy.uint16, numpy.int16, numpy.uint32, numpy.int32)
 
 
 class RawData(object):
@@ -24,7 +52,7 @@ class RawData(object):
         if not self.datafile:
             self.datafilename, _ = DataDirectory.DataDirectory().sequencefile( "RawData.bin" )
             self.datafile = open( self.datafilename, 'wb' )
-        data_array = array(datatype, data)
+        data_array = numpy.ascontiguousarray(data, dtype=numpy.dtype(datatype))  # same item size as array(datatype)
         self.hash.update(data_array)
         data_array.tofile(self.datafile)
     
@@ -55,7 +83,154 @@ class RawData(object):
             self.datafile.close()
         return self.hash.hexdigest()
     
-    
+
+def compactColumn(values):
+    """values converted to the smallest integer type holding all of them"""
+    if values.dtype.kind not in 'iu' or len(values) == 0:
+        return values
+    low, high = values.min(), values.max()
+    for dtype in compactTypes:
+        info = numpy.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+def encodeData(data):
+    """scalar fields and column arrays [(field, channel, values), ...] of the Data object data"""
+    columns = list()
+    for field in channelFields:
+        container = getattr(data, field)
+        if container is not None:
+            columns.extend((field, channel, values) for channel, values in container.items())
+    if data.timestamp is not None:
+        for channel in data.timestamp.keys():
+            columns.append(('timestamp', channel, data.timestamp.flat(channel)))
+            columns.append(('timestampOffsets', channel, data.timestamp.gateOffsets(channel)))
+    fields = [data.scanvalue, data.final, data.other, data.overrun, data.exitcode, data.dependentValues,
+              data.externalStatus, data._creationTime, data.timeTickOffset, data.timestamp is not None,
+              data.timestampZero is not None, data.result is not None]
+    return fields, columns
+
+
+def encodeRecord(fields, columns):
+    """list of the byte strings of the record of fields and columns as returned by encodeData"""
+    columns = [(field, channel, numpy.ascontiguousarray(compactColumn(values))) for field, channel, values in columns]
+    directory = [[field, channel, values.dtype.str, len(values)] for field, channel, values in columns]
+    meta = json.dumps(fields + [directory], default=jsonDefault).encode()
+    length = RecordHeader.size - 8 + len(meta) + sum(values.nbytes for _, _, values in columns)
+    return [RecordHeader.pack(length, len(meta)), meta] + [values.data for _, _, values in columns]
+
+
+def decodeData(buffer):
+    """Data object of the record payload in buffer (without the record header)"""
+    (metaLength, ) = struct.unpack_from('<I', buffer, RecordHeader.size - 4)
+    start = RecordHeader.size
+    data = Data()
+    (data.scanvalue, data.final, data.other, data.overrun, data.exitcode, data.dependentValues, data.externalStatus,
+     data._creationTime, data.timeTickOffset, hasTimestamp, hasTimestampZero, hasResult,
+     directory) = json.loads(bytes(buffer[start:start + metaLength]).decode())
+    data.timestamp = RaggedColumns(numpy.int64) if hasTimestamp else None
+    data.timestampZero = ChannelColumns(numpy.int64) if hasTimestampZero else None
+    data.result = ChannelColumns(numpy.uint64) if hasResult else None
+    position = start + metaLength
+    timestampValues = dict()
+    for field, channel, dtype, length in directory:
+        dtype = numpy.dtype(dtype)
+        values = numpy.frombuffer(buffer, dtype=dtype, count=length, offset=position)
+        position += length * dtype.itemsize
+        if field == 'timestamp':
+            timestampValues[channel] = values
+        elif field == 'timestampOffsets':
+            data.timestamp.setChannel(channel, timestampValues.pop(channel), values)
+        else:
+            getattr(data, field)[channel] = values
+    return data
+
+
+class DataRecorder(threading.Thread):
+    """Background writer of the Data objects of a scan.
+
+    record() only collects the fields and columns, they are encoded and written by the thread.
+    Records are written in batches of batchSize or when the oldest pending record is
+    flushInterval seconds old. The columns of Data are append only, passing views of them
+    to the thread is safe."""
+    def __init__(self, filename, batchSize=64, flushInterval=1.0):
+        super(DataRecorder, self).__init__(name="DataRecorder", daemon=True)
+        self.filename = filename
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+        self.queue = queue.Queue()
+        self.file = open(filename, 'wb')
+        self.file.write(RawDataMagic)
+        self.start()
+
+    def record(self, data):
+        self.queue.put(encodeData(data))
+
+    def close(self):
+        """write all pending records and close the file"""
+        self.queue.put(None)
+        self.join()
+
+    def run(self):
+        pending = list()
+        deadline = None
+        while True:
+            try:
+                item = self.queue.get(timeout=None if deadline is None else max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = False
+            if item:
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flushInterval
+            if item is None or item is False or len(pending) >= self.batchSize:
+                self.write(pending)
+                pending, deadline = list(), None
+            if item is None:
+                self.file.close()
+                return
+
+    def write(self, records):
+        for fields, columns in records:
+            for part in encodeRecord(fields, columns):
+                self.file.write(part)
+        self.file.flush()
+
+
+class DataReader(object):
+    """Lazy reader of a file written by DataRecorder.
+
+    Opening the file only reads the record headers, reader[index] decodes a single Data
+    object. Incomplete records at the end of the file (e.g. of a crashed program) are ignored."""
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if f.seek(0, 2) > 0 else b''
+        if self.buffer[:len(RawDataMagic)] != RawDataMagic:
+            raise ValueError("'{0}' is not a raw data file".format(filename))
+        self.offsets = list()
+        position = len(RawDataMagic)
+        while position + RecordHeader.size <= len(self.buffer):
+            length, _ = RecordHeader.unpack_from(self.buffer, position)
+            if position + 8 + length > len(self.buffer):
+                break
+            self.offsets.append(position)
+            position += 8 + length
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        start = self.offsets[index]
+        length, _ = RecordHeader.unpack_from(self.buffer, start)
+        return decodeData(memoryview(self.buffer)[start:start + 8 + length])
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+
 if __name__=="__main__":
     DataDirectory.DefaultProject = "testproject"
     rd = RawData()
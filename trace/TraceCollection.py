@@ -16,6 +16,7 @@ import copy
 
 import numpy
 
+from modules.ColumnBuffer import ColumnBuffer
 from modules.XmlUtilit import prettify
 from modules.enum import enum
 import xml.etree.ElementTree as ElementTree
@@ -184,6 +185,7 @@ class TraceCollection(keydefaultdict):
         self.rawdata = None
         self.description["tracePlottingList"] = TracePlottingList()
         self.record_timestamps = record_timestamps
+        self._columnBuffers = dict()
 
     def __bool__(self):
         return True  # to remain backwards compatible with previous behavior
@@ -215,13 +217,41 @@ class TraceCollection(keydefaultdict):
         self['timeTickFirst']
         self['timeTickLast']
     
+    def appendColumn(self, name, value, maxPoints=0):
+        """Append value to the column in amortized constant time.
+
+        The column is a view into a growable buffer, if maxPoints > 0 only the last maxPoints
+        values are kept. If the column was replaced since the last append, the buffer is
+        rebuilt from the new column."""
+        self._updateColumn(name, maxPoints, lambda buffer: buffer.append(value),
+                           lambda column: numpy.append(column, value))
+
+    def extendColumn(self, name, values, maxPoints=0):
+        """Append all values to the column, see appendColumn"""
+        self._updateColumn(name, maxPoints, lambda buffer: buffer.extend(values),
+                           lambda column: numpy.append(column, values))
+
+    def _updateColumn(self, name, maxPoints, update, fallback):
+        buffers = self.__dict__.setdefault('_columnBuffers', dict())
+        column = self[name]
+        buffer, view = buffers.get(name, (None, None))
+        try:
+            if column is not view or view.base is not buffer.buffer:
+                buffer = ColumnBuffer(numpy.float64, column)
+            buffer.setMaxLength(maxPoints)
+            update(buffer)
+        except (TypeError, ValueError):   # values that are not numbers are kept in an object array
+            buffers.pop(name, None)
+            column = fallback(column)
+            self[name] = column[len(column) - maxPoints:] if 0 < maxPoints < len(column) else column
+            return
+        view = buffer.array
+        self[name] = view
+        buffers[name] = (buffer, view)
+
     def timeintervalAppend(self, timeinterval, maxPoints=0):
-        if 0 < maxPoints < len(self["timeTickFirst"]):
-            self['timeTickFirst'] = numpy.append(self['timeTickFirst'][-maxPoints+1:0], timeinterval[0])
-            self['timeTickLast'] = numpy.append(self['timeTickLast'][-maxPoints+1:0], timeinterval[1])
-        else:
-            self['timeTickFirst'] = numpy.append(self['timeTickFirst'], timeinterval[0])
-            self['timeTickLast'] = numpy.append(self['timeTickLast'], timeinterval[1])
+        self.appendColumn('timeTickFirst', timeinterval[0], maxPoints)
+        self.appendColumn('timeTickLast', timeinterval[1], maxPoints)
         self.description["lastDataAquired"] = datetime.now(pytz.utc)
     
     @property
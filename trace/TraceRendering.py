@@ -0,0 +1,199 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Incremental rendering of traces that grow by appending points
+
+TraceCollection.appendColumn never overwrites values visible in an array it returned
+earlier. If a column is replaced, reallocated or the rolling window drops points, the
+buffer or the address of the first value of the column changes. Columns can also be
+changed in place (trace.y += y), AppendTracker therefore keeps a copy of the values seen
+at the last replot and compares it with the columns to find the first point that changed.
+
+SortedColumns keeps the columns sorted by x, merging only the new points. minMaxDecimate
+reduces a sorted curve to the min and max of every pixel column of the view and
+errorBarDecimate the error bars to one bar per pixel column, the cost of painting a trace
+is then bounded by the width of the view. ErrorBarChunks splits the error bars into items
+of chunkSize points and only updates the items covering changed points.
+"""
+import numpy
+from pyqtgraph.graphicsItems.ErrorBarItem import ErrorBarItem
+
+from modules.ColumnBuffer import ColumnBuffer
+
+
+def columnOrigin(column):
+    """buffer of column and address of its first value"""
+    base = column.base if column.base is not None else column
+    return base, column.__array_interface__['data'][0]
+
+
+def sameValues(column, values):
+    """True if column holds values, nan is equal to nan"""
+    return numpy.array_equal(column, values, equal_nan=column.dtype.kind in 'fc' and values.dtype.kind in 'fc')
+
+
+class AppendTracker(object):
+    """Finds the first point that changed in columns that grow by appending"""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.origins = None
+        self.values = None
+        self.length = 0
+
+    def update(self, *columns):
+        """index of the first point of columns that changed since the last update, the
+        number of points if only points were appended or nothing changed"""
+        origins = [columnOrigin(column) for column in columns]
+        length = min(len(column) for column in columns) if columns else 0
+        unchanged = (self.origins is not None and length >= self.length and len(origins) == len(self.origins) and
+                     all(base is oldBase and address == oldAddress
+                         for (base, address), (oldBase, oldAddress) in zip(origins, self.origins)) and
+                     all(sameValues(column[:self.length], values.array) for column, values in zip(columns, self.values)))
+        if unchanged:
+            first = self.length
+            for column, values in zip(columns, self.values):
+                values.extend(column[first:length])
+        else:
+            first = 0
+            self.values = [ColumnBuffer(column.dtype, column[:length]) for column in columns]
+        self.origins, self.length = origins, length
+        return first
+
+
+class SortedColumns(object):
+    """x and the other columns of a trace sorted by x (stable, identical to sorting all points).
+    New points are merged into the sorted columns, points appended in ascending x order are
+    added in amortized constant time."""
+    def __init__(self):
+        self.tracker = AppendTracker()
+        self.columns = None
+        self.arrays = list()
+
+    def reset(self):
+        self.tracker.reset()
+        self.columns = None
+        self.arrays = list()
+
+    def update(self, x, *columns):
+        """update with the current columns (numpy arrays, x first), returns the index of the
+        first changed value in the sorted columns"""
+        first = self.tracker.update(x, *columns)
+        length = self.tracker.length
+        allColumns = (x,) + columns
+        if self.columns is None or first == 0:
+            order = numpy.argsort(x[:length], kind='stable')
+            self.setColumns([column[:length][order] for column in allColumns])
+            return 0
+        if first == length:
+            return length
+        order = numpy.argsort(x[first:length], kind='stable')
+        new = [column[first:length][order] for column in allColumns]
+        sortedX = self.columns[0].array
+        if not len(sortedX) or new[0][0] >= sortedX[-1]:
+            for buffer, values in zip(self.columns, new):
+                buffer.extend(values)
+            return len(sortedX)
+        positions = numpy.searchsorted(sortedX, new[0], side='right')   # new points after equal old ones
+        self.setColumns([numpy.insert(buffer.array, positions, values) for buffer, values in zip(self.columns, new)])
+        return int(positions[0])
+
+    def setColumns(self, columns):
+        if all(column.dtype.kind in 'iuf' for column in columns):
+            self.columns = [ColumnBuffer(column.dtype, column) for column in columns]
+            self.arrays = None
+        else:   # columns that are not numbers are sorted on every update
+            self.columns = None
+            self.arrays = columns
+
+    @property
+    def sorted(self):
+        """the sorted columns"""
+        return self.arrays if self.columns is None else [buffer.array for buffer in self.columns]
+
+
+def pixelColumns(x, xRange=None, pixels=1000):
+    """start and stop of the points of x (sorted ascending) in xRange including their outer
+    neighbours, and the start of every non empty one of pixels columns relative to start.
+    The starts are None if there are at most 2*pixels points to show."""
+    start, stop = 0, len(x)
+    if stop and x.dtype.kind == 'f':
+        stop = int(numpy.searchsorted(x, numpy.nan))   # nan is sorted to the end
+    if xRange is not None and stop:
+        start = max(0, int(numpy.searchsorted(x[:stop], xRange[0], side='left')) - 1)
+        stop = min(stop, int(numpy.searchsorted(x[:stop], xRange[1], side='right')) + 1)
+    if stop - start <= 2 * pixels or x.dtype.kind not in 'iuf' or not numpy.isfinite(x[start]) or not numpy.isfinite(x[stop - 1]):
+        return start, stop, None
+    x = x[start:stop]
+    return start, stop, numpy.unique(numpy.searchsorted(x, numpy.linspace(x[0], x[-1], pixels + 1)[:-1], side='left'))
+
+
+def minMaxDecimate(x, y, xRange=None, pixels=1000):
+    """curve x, y (x sorted ascending) reduced to the min and max of y in every of pixels
+    columns. Only the points in xRange and their outer neighbours are kept if xRange is given.
+    Returns x and y unchanged if they have at most 2*pixels points in the range."""
+    start, stop, starts = pixelColumns(x, xRange, pixels)
+    x, y = x[start:stop], y[start:stop]
+    if starts is None or y.dtype.kind not in 'biuf':
+        return x, y
+    decimatedX = numpy.empty(2 * len(starts) + 1, dtype=x.dtype)
+    decimatedY = numpy.empty(2 * len(starts) + 1, dtype=numpy.float64)
+    decimatedX[0:-1:2] = decimatedX[1:-1:2] = x[starts]
+    decimatedY[0:-1:2] = numpy.fmin.reduceat(y, starts)
+    decimatedY[1:-1:2] = numpy.fmax.reduceat(y, starts)
+    decimatedX[-1], decimatedY[-1] = x[-1], y[-1]
+    return decimatedX, decimatedY
+
+
+def errorBarDecimate(x, lower, upper, xRange=None, pixels=1000):
+    """error bars from lower to upper at x (sorted ascending) reduced to one bar from the
+    lowest lower to the highest upper in every of pixels columns, returned as x, y, height.
+    Only the error bars in xRange and their outer neighbours are kept if xRange is given."""
+    start, stop, starts = pixelColumns(x, xRange, pixels)
+    x, lower, upper = x[start:stop], lower[start:stop], upper[start:stop]
+    if starts is not None:
+        x, lower, upper = x[starts], numpy.fmin.reduceat(lower, starts), numpy.fmax.reduceat(upper, starts)
+    return x, (lower + upper) / 2, upper - lower
+
+
+class ErrorBarChunks(object):
+    """Error bars of a trace as ErrorBarItems of chunkSize points each"""
+    chunkSize = 64      # Qt strokes wide pens in superlinear time of the bars of an item
+
+    def __init__(self, view, pen):
+        self.view = view
+        self.pen = pen
+        self.items = list()
+        self.tracker = AppendTracker()
+        self.pointsUpdated = 0
+
+    def setData(self, x, y, height=None, top=None, bottom=None):
+        """show the error bars of the points, only the items covering changed points are updated"""
+        columns = dict((name, column) for name, column in (('x', x), ('y', y), ('height', height), ('top', top), ('bottom', bottom))
+                       if column is not None)
+        first = self.tracker.update(*columns.values())
+        length = self.tracker.length
+        for start in range(first - first % self.chunkSize, length if first < length else 0, self.chunkSize):
+            stop = min(start + self.chunkSize, length)
+            opts = dict((name, column[start:stop]) for name, column in columns.items())
+            index = start // self.chunkSize
+            if index < len(self.items):
+                self.items[index].setData(**opts)
+            else:
+                item = ErrorBarItem(pen=self.pen, **opts)
+                self.view.addItem(item)
+                self.items.append(item)
+            self.pointsUpdated += stop - start
+        while len(self.items) > -(-length // self.chunkSize):
+            self.view.removeItem(self.items.pop())
+        return first
+
+    def remove(self):
+        for item in self.items:
+            self.view.removeItem(item)
+        self.items = list()
+        self.tracker.reset()
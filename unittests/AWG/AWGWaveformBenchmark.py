@@ -0,0 +1,78 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of the AWG waveform sampling.
+
+Evaluates a waveform with a time dependent segment and a repeated segment set
+of constant segments with the per sample evaluation (numpy.vectorize of the
+clipped lambdified function, numpy.append of every segment and repetition)
+originally implemented in AWGWaveform and with the current AWGWaveform, and
+reports the times.
+
+usage: python -m unittests.AWG.AWGWaveformBenchmark [--samples N]
+"""
+import argparse
+import time
+
+import numpy
+import sympy
+
+from AWG.AWGSegmentModel import nodeTypes
+from AWG.AWGWaveform import AWGWaveform
+from modules.MagnitudeParser import isIdentifier
+from unittests.AWG.AWGWaveform_test import syntheticWaveform
+
+
+class ReferenceWaveform(AWGWaveform):
+    """per sample evaluation of the original implementation"""
+    def evaluate(self):
+        _, sampleList = self.evaluateSegments(self.segmentDataRoot.children)
+        return self.compliantSampleList(sampleList)
+
+    def evaluateSegments(self, nodeList, startStep=0):
+        sampleList = numpy.array([])
+        for node in nodeList:
+            if node.enabled:
+                if node.nodeType == nodeTypes.segment:
+                    duration = self.settings.varDict[node.duration]['value'] if isIdentifier(node.duration) else self.expression.evaluateAsMagnitude(node.duration)
+                    startStep, newSamples = self.evaluateEquation(node, duration, startStep)
+                    sampleList = numpy.append(sampleList, newSamples)
+                elif node.nodeType == nodeTypes.segmentSet:
+                    repMag = self.settings.varDict[node.repetitions]['value'] if isIdentifier(node.repetitions) else self.expression.evaluateAsMagnitude(node.repetitions)
+                    for n in range(int(repMag.to_base_units().m)):
+                        startStep, newSamples = self.evaluateSegments(node.children, startStep)
+                        sampleList = numpy.append(sampleList, newSamples)
+        return startStep, sampleList
+
+    def computeFunction(self, sympyExpr, tVar, startStep, stopStep):
+        numSamples = stopStep - startStep + 1
+        if numSamples <= 0:
+            return numpy.array([])
+        func = sympy.lambdify(tVar, sympyExpr, "numpy")
+        clippedFunc = lambda t: max(self.minAmplitude, min(self.maxAmplitude, func(t)))
+        vectorFunc = numpy.vectorize(clippedFunc, otypes=[numpy.float64])
+        return vectorFunc((numpy.arange(numSamples) + startStep) * self.stepsize.m_as('s'))
+
+
+def referenceWaveform(waveform):
+    return ReferenceWaveform(waveform.channel, waveform.settings, waveform.waveformCache)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the AWG waveform sampling")
+    parser.add_argument('--samples', type=int, default=1000000)
+    args = parser.parse_args()
+    waveform = syntheticWaveform(args.samples)
+    reference, referenceTime = timed(referenceWaveform(waveform).evaluate)
+    samples, vectorizedTime = timed(waveform.evaluate)
+    print("{0} samples: reference {1:.3f} s vectorized {2:.3f} s, max deviation {3}".format(
+        len(samples), referenceTime, vectorizedTime, numpy.abs(samples - reference).max()))
@@ -0,0 +1,94 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import unittest
+from collections import OrderedDict
+
+import numpy
+
+from AWG.AWGSegmentModel import AWGSegment, AWGSegmentSet
+from AWG.AWGWaveform import AWGWaveform
+from modules.quantity import Q
+
+
+class Settings(object):
+    def __init__(self, maxSamples=4000000, cacheDepth=0):
+        self.deviceProperties = dict(sampleRate=Q(1, 'GHz'), minSamples=1, maxSamples=maxSamples, sampleChunkSize=64,
+                                     padValue=2047, minAmplitude=0, maxAmplitude=4095)
+        self.deviceSettings = dict()
+        self.root = AWGSegmentSet(None)
+        self.channelSettingsList = [{'segmentDataRoot': self.root}]
+        self.cacheDepth = cacheDepth
+        self.varDict = {'w': {'value': Q(2.5, 'MHz'), 'text': None},
+                        'A': {'value': Q(2500, ''), 'text': None},
+                        'R': {'value': Q(40, ''), 'text': None}}
+
+
+def syntheticWaveform(samples, maxSamples=4000000, cacheDepth=0):
+    """waveform with a clipped sine over half the samples followed by a repeated pulse pattern"""
+    settings = Settings(maxSamples, cacheDepth)
+    root = settings.root
+    root.children.append(AWGSegment(root, equation='A*sin(w*t) + 2047', duration='{0} ns'.format(samples // 2)))
+    pulses = AWGSegmentSet(root, repetitions='R')
+    pulses.children.append(AWGSegment(pulses, equation='A', duration='{0} ns'.format(samples // 160)))
+    pulses.children.append(AWGSegment(pulses, equation='100', duration='{0} ns'.format(samples // 160)))
+    root.children.append(pulses)
+    waveform = AWGWaveform(0, settings, OrderedDict())
+    return waveform
+
+
+def expectedSamples(samples, maxSamples=4000000):
+    """samples of syntheticWaveform: 2500*sin(2.5e6 t) + 2047 at 1 GHz clipped to 0..4095 followed by 40 pulses
+    of 2500 and 100"""
+    sine = numpy.clip(2500 * numpy.sin(2.5e6 * numpy.arange(samples // 2) * 1e-9) + 2047, 0, 4095)
+    pulses = numpy.tile(numpy.repeat([2500.0, 100.0], samples // 160), 40)
+    return numpy.concatenate((sine, pulses))[:maxSamples]
+
+
+def padded(samples):
+    """samples padded with 2047 to a multiple of the 64 samples chunk size"""
+    return numpy.append(samples, [2047] * (-len(samples) % 64))
+
+
+class AWGWaveformTest(unittest.TestCase):
+    def assertSamples(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        numpy.testing.assert_allclose(actual, expected, rtol=0, atol=1e-9)
+
+    def test_waveform(self):
+        samples = syntheticWaveform(20000).evaluate()
+        self.assertEqual(len(samples), 20032)
+        self.assertSamples(samples, padded(expectedSamples(20000)))
+        self.assertEqual(samples[[0, 10000, 10125, 10250]].tolist(), [2047, 2500, 100, 2500])
+
+    def test_truncated_repetitions(self):
+        samples = syntheticWaveform(20000, maxSamples=10311).evaluate()
+        self.assertEqual(len(samples), 10368)
+        self.assertSamples(samples, padded(expectedSamples(20000, maxSamples=10311)))
+
+    def test_cached(self):
+        waveform = syntheticWaveform(20000, cacheDepth=-1)
+        first = waveform.evaluate()
+        numpy.testing.assert_array_equal(waveform.evaluate(), first)
+        self.assertSamples(first, padded(expectedSamples(20000)))
+
+    def test_nested_sets(self):
+        waveform = syntheticWaveform(2000)
+        root = waveform.segmentDataRoot
+        outer = AWGSegmentSet(root, repetitions='3')
+        inner = AWGSegmentSet(outer, repetitions='R')
+        inner.children.append(AWGSegment(inner, equation='1000*sqrt(t*w - 5.001)', duration='7 ns'))
+        outer.children.append(inner)
+        outer.children.append(AWGSegment(outer, equation='5000', duration='3 ns'))
+        root.children.append(outer)
+        steps = numpy.arange(1960, 1960 + 3 * 283).reshape(3, 283)[:, :280]
+        nested = numpy.full((3, 283), 4095.0)      # nan before 2 us and the constant 5000 are set to the maximum amplitude
+        with numpy.errstate(invalid='ignore'):
+            nested[:, :280] = numpy.clip(numpy.nan_to_num(1000 * numpy.sqrt(steps * 2.5e-3 - 5.001), nan=4095), 0, 4095)
+        self.assertSamples(waveform.evaluate(), padded(numpy.concatenate((expectedSamples(2000), nested.ravel()))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of the digital lock stream decoder.
+
+Decodes synthetic stream records with the per record struct decoder as originally
+implemented in DigitalLockControllerServer.unpackStreamRecord and with the vectorized
+decodeStreamBuffer and reports the throughput in records/s.
+
+usage: python -m unittests.digitalLock.StreamDecoderBenchmark [--records N]
+"""
+import argparse
+import struct
+import time
+
+from digitalLock.controller.StreamDecoder import StreamDataItem, decodeStreamBuffer, RecordSize
+from unittests.digitalLock.StreamDecoder_test import syntheticStream
+
+
+def twos_comp(val, bits):
+    """compute the 2's compliment of int value val"""
+    if( (val&(1<<(bits-1))) != 0 ):
+        val -= 1 << bits
+    return val
+
+
+def referenceDecode(buffer):
+    """decode the complete records in buffer one by one, returns (items, consumed bytes)"""
+    items = list()
+    for offset in range(0, len(buffer) - RecordSize + 1, RecordSize):
+        item = StreamDataItem()
+        (errorsig, item.errorSigMax, item.errorSigMin, item.samples, freq0, freq1, freq2, item.errorSigSumSq,
+         item.externalMax, item.externalMin, item.externalCount, externalSum) = struct.unpack_from('QhhIQQQQHHIQ', buffer, offset)
+        item.lockStatus = (externalSum >> 46) & 0x3
+        if errorsig & 0xffff000000000000 != 0xfefe000000000000 or freq2 & 0xffff000000000000 != 0xefef000000000000:
+            return items, offset + 2
+        if item.samples>0:
+            item.errorSigSum = twos_comp( (errorsig&0xffffffffffff), 48)
+            item.freqMin = twos_comp( freq1 & 0xffffffffffff, 48 )
+            item.freqMax = twos_comp( freq2 & 0xffffffffffff, 48 )
+            item.freqSum = twos_comp( (freq0 <<8) | (freq1 >> 56), 72 )
+            item.externalSum = externalSum & 0xfffffffffff
+            items.append(item)
+    return items, (len(buffer) // RecordSize) * RecordSize
+
+
+def timed(decoder, buffer, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decoder(buffer)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the digital lock stream decoder")
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args()
+    buffer = bytearray(syntheticStream(args.records))
+    reference = args.records / timed(referenceDecode, buffer)
+    vectorized = args.records / timed(decodeStreamBuffer, buffer)
+    print("{0} records: reference {1:.3g} records/s, vectorized {2:.3g} records/s, speedup {3:.1f}".format(
+        args.records, reference, vectorized, vectorized / reference))
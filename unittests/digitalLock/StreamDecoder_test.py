@@ -0,0 +1,101 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import random
+import struct
+import unittest
+
+from digitalLock.controller.StreamDecoder import StreamData, decodeStreamBuffer, scopeSegments
+
+
+def packRecord(samples, errorSigSum=0, errorSigMin=0, errorSigMax=0, errorSigSumSq=0, freqSum=0, freqMin=0, freqMax=0,
+               externalMin=0, externalMax=0, externalCount=0, externalSum=0, lockStatus=0):
+    """stream record with the given field values as sent by the digital lock"""
+    freqSum &= (1 << 72) - 1
+    return struct.pack('QhhIQQQQHHIQ', 0xfefe000000000000 | (errorSigSum & 0xffffffffffff), errorSigMax, errorSigMin,
+                       samples, freqSum >> 8, ((freqSum & 0xff) << 56) | (freqMin & 0xffffffffffff),
+                       0xefef000000000000 | (freqMax & 0xffffffffffff), errorSigSumSq, externalMax, externalMin,
+                       externalCount, (lockStatus << 46) | externalSum)
+
+
+def syntheticRecord(rng, samples=None):
+    samples = rng.randint(0, 3) if samples is None else samples
+    freqSum = rng.getrandbits(72)
+    return struct.pack('QhhIQQQQHHIQ', 0xfefe000000000000 | rng.getrandbits(48), rng.randint(-32768, 32767),
+                       rng.randint(-32768, 32767), samples, freqSum >> 8,
+                       ((freqSum & 0xff) << 56) | rng.getrandbits(48), 0xefef000000000000 | rng.getrandbits(48),
+                       rng.getrandbits(64), rng.getrandbits(16), rng.getrandbits(16), rng.getrandbits(32),
+                       rng.getrandbits(64))
+
+
+def syntheticStream(records=10000, seed=0):
+    rng = random.Random(seed)
+    return b''.join(syntheticRecord(rng, rng.randint(1, 1000)) for _ in range(records))
+
+
+class StreamDecoderTest(unittest.TestCase):
+    fields = [dict(samples=3, errorSigSum=-5, errorSigMin=-32768, errorSigMax=32767, errorSigSumSq=0xfedcba9876543210,
+                   freqSum=-(1 << 70) + 3, freqMin=-7, freqMax=(1 << 47) - 1, externalMin=1, externalMax=0xffff,
+                   externalCount=0xffffffff, externalSum=0xfffffffffff, lockStatus=3),
+              dict(samples=1000, errorSigSum=(1 << 47) - 1, errorSigMin=-1, errorSigMax=0, errorSigSumSq=17,
+                   freqSum=(1 << 52) + 255, freqMin=1 << 40, freqMax=-(1 << 47), externalSum=12345, lockStatus=2)]
+
+    def assertFields(self, data, fields):
+        self.assertEqual(len(data), len(fields))
+        for item, expected in zip(data, fields):
+            for field in StreamData.fields:
+                self.assertEqual(getattr(item, field), float(expected.get(field, 0)) if field == 'freqSum'
+                                 else expected.get(field, 0), field)
+
+    def test_fields(self):
+        buffer = bytearray(packRecord(**self.fields[0]) + packRecord(0, errorSigSum=1) + packRecord(**self.fields[1]))
+        data, consumed = decodeStreamBuffer(buffer)
+        self.assertEqual(consumed, 192)
+        self.assertFields(data, self.fields)
+
+    def test_records(self):
+        data, consumed = decodeStreamBuffer(bytearray(syntheticStream(2000)))
+        self.assertEqual((len(data), consumed), (2000, 128000))
+        self.assertEqual(int(data.samples.sum()), 1007978)
+        self.assertEqual(int(data.errorSigSum.sum()), 6450197641268549)
+        self.assertEqual(int(data.freqMin.sum()), -6846578404088)
+        self.assertEqual(int(data.externalSum.sum()), 17681294444408208)
+        self.assertEqual(int(data.lockStatus.sum()), 2943)
+        self.assertEqual(data.freqSum[:2].tolist(), [float(-520973787316155879490), float(1330734719778176575606)])
+
+    def test_empty_records_and_remainder(self):
+        rng = random.Random(1)
+        buffer = b''.join(syntheticRecord(rng) for _ in range(200)) + b'\x00' * 17
+        data, consumed = decodeStreamBuffer(bytearray(buffer))
+        self.assertEqual((len(data), consumed), (155, 12800))
+
+    def test_misaligned(self):
+        buffer = b''.join(packRecord(**self.fields[index % 2]) for index in range(10))
+        data, consumed = decodeStreamBuffer(bytearray(buffer[:5 * 64] + b'\x12\x34' + buffer[5 * 64:]))
+        self.assertEqual(consumed, 5 * 64 + 2)
+        self.assertFields(data, [self.fields[index % 2] for index in range(5)])
+        data, consumed = decodeStreamBuffer(bytearray(b'\x00\x00' + buffer))
+        self.assertEqual((len(data), consumed), (0, 2))
+
+    def test_columns(self):
+        data, _ = decodeStreamBuffer(bytearray(syntheticStream(10)))
+        self.assertEqual(len(data), 10)
+        self.assertEqual(data[-1].samples, int(data.samples[-1]))
+        merged = StreamData()
+        merged.extend(data)
+        merged.extend(data)
+        self.assertEqual(len(merged), 20)
+
+    def test_scope(self):
+        words = [(0xffff << 48) | ((1 << 47) - 3), (0x7fff << 48) | (1 << 47) | 5, 0xffffffffffffffff,
+                 (0x8000 << 48) | (1 << 46), 0]
+        segments = scopeSegments(bytearray(struct.pack('5Q', *words)))
+        self.assertEqual(len(segments), 2)
+        self.assertEqual([segment[0].tolist() for segment in segments], [[-1, 32767], [-32768, 0]])
+        self.assertEqual([segment[1].tolist() for segment in segments], [[-3, 5], [-(1 << 46), 0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
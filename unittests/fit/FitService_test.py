@@ -0,0 +1,83 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import threading
+import unittest
+
+import numpy
+
+from fit.FitFunctionBase import fitFunctionMap
+from fit import FitFunctions  #@UnusedImport
+from fit.FitService import FitService, FitJob, FitServiceException
+
+
+def makeJobs():
+    x = numpy.linspace(-5, 5, 201)
+    rng = numpy.random.RandomState(1)
+    jobs = list()
+    for key, (name, parameters, startParameters) in enumerate((
+            ("Gaussian", [10, 0.5, 1.2, 1], [8, 0, 1, 0]),
+            ("Lorentzian", [5, 0.2, -0.3, 2], [4, 0.3, 0, 1.5]),
+            ("Cos", [2, 0.2, 0.5, 1], [1.8, 0.21, 0.4, 1]),
+            ("Line", [1.5, -0.3], [1, 0]))):
+        fitfunction = fitFunctionMap[name]()
+        y = fitfunction.value(x, parameters) + rng.normal(0, 0.05, len(x))
+        fitfunction.startParameters = startParameters
+        jobs.append(FitJob(fitfunction, x, y, numpy.full(len(x), 0.05), key=key))
+    return jobs
+
+
+class FitServiceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = FitService(processes=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.shutdown()
+
+    def localFit(self, job):
+        fitfunction = job.fitfunction.fitfunction()
+        fitfunction.leastsq(job.x, job.y, sigma=job.sigma.copy())
+        return fitfunction
+
+    def test_fitBatch(self):
+        jobs = makeJobs()
+        results = self.service.fitBatch(jobs)
+        self.assertEqual([result.key for result in results], [job.key for job in jobs])
+        for job, result in zip(jobs, results):
+            self.assertIsNone(result.error)
+            local = self.localFit(job)
+            numpy.testing.assert_allclose(result.parameters, local.parameters, rtol=1e-7)
+            numpy.testing.assert_allclose(result.parametersConfidence, local.parametersConfidence, rtol=1e-6)
+            self.assertAlmostEqual(result.chisq, local.chisq)
+            fitfunction = job.fitfunction.fitfunction()
+            result.applyTo(fitfunction)
+            self.assertEqual(fitfunction.parameters, result.parameters)
+            self.assertAlmostEqual(fitfunction.results['RMSres'].value.m, local.results['RMSres'].value.m)
+
+    def test_callback(self):
+        jobs = makeJobs()
+        results = dict()
+        done = threading.Event()
+        def callback(result):
+            results[result.key] = result
+            if len(results) == len(jobs):
+                done.set()
+        self.service.submitBatch(jobs, callback=callback)
+        self.assertTrue(done.wait(60))
+        self.assertEqual(sorted(results.keys()), [job.key for job in jobs])
+
+    def test_error(self):
+        job = makeJobs()[0]
+        job.y = job.y[:10]
+        result = self.service.fitBatch([job])[0]
+        self.assertIsNotNone(result.error)
+        with self.assertRaises(FitServiceException):
+            result.applyTo(job.fitfunction.fitfunction())
+
+
+if __name__ == "__main__":
+    unittest.main()
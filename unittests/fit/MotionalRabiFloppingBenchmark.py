@@ -0,0 +1,135 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of the motional Rabi flopping fit functions.
+
+Fits synthetic time scans with the per point reference implementation and the
+vectorized fit functions and reports the time per evaluation, the time per fit and the
+largest deviation between the two.
+
+usage: python -m unittests.fit.MotionalRabiFloppingBenchmark [--points N] [--repeat N]
+"""
+import argparse
+import time
+
+import numpy
+from numpy import pi, cos, sqrt, sin, dot, outer
+from scipy import constants
+from scipy.optimize import leastsq
+
+from fit.MotionalRabiFlopping import MotionalRabiFlopping, TwoModeMotionalRabiFlopping, transitionAmplitude, MaxPhononNumber
+
+
+def eta(mass, angle, trapFrequency, wavelength):
+    """Lamb Dicke parameter as calculated in updateTables"""
+    secfreq = trapFrequency.m_as('Hz')
+    m = mass * constants.m_p
+    return (2*pi/(wavelength*10**-9))*cos(angle*pi/180) * sqrt(constants.hbar/(2*m*2*pi*secfreq))
+
+
+def referenceLaguerreTable(eta, delta_n):
+    """Laguerre table built per n with genlaguerre objects as originally implemented"""
+    return numpy.array([transitionAmplitude(eta, n, n+delta_n) for n in range(MaxPhononNumber)])
+
+
+def referenceProbabilityTable(nBar):
+    current = 1/(nBar+1.)
+    factor = nBar/(nBar+1.)
+    a = [current]
+    for _ in range(1, MaxPhononNumber):
+        current *= factor
+        a.append(current)
+    return numpy.array(a)
+
+
+class ReferenceMotionalRabiFlopping(MotionalRabiFlopping):
+    """per point evaluation as originally implemented"""
+    name = "ReferenceMotionalRabiFlopping"
+
+    def updateTables(self, nBar):
+        A, n, omega, mass, angle, trapFrequency, wavelength, delta_n = self.parameters  #@UnusedVariable
+        self.laguerreTable = referenceLaguerreTable(eta(mass, angle, trapFrequency, wavelength), delta_n)
+        self.pnTable = referenceProbabilityTable(nBar)
+
+    def value(self, x, p=None):
+        A, n, omega, mass, angle, trapFrequency, wavelength, delta_n = self.parameters if p is None else p  #@UnusedVariable
+        self.updateTables(n)
+        return numpy.array([A*dot(self.pnTable, sin((omega * xn)*self.laguerreTable)**2) for xn in x])
+
+
+class ReferenceTwoModeMotionalRabiFlopping(TwoModeMotionalRabiFlopping):
+    """per point evaluation as originally implemented"""
+    name = "ReferenceTwoModeMotionalRabiFlopping"
+
+    def updateTables(self, p):
+        A, n, omega, mass, angle, trapFrequency, wavelength, delta_n, n_2, trapFrequency_2 = p  #@UnusedVariable
+        self.laguerreTable = referenceLaguerreTable(eta(mass, angle, trapFrequency, wavelength), delta_n)
+        self.laguerreTable2 = referenceLaguerreTable(eta(mass, angle, trapFrequency_2, wavelength), 0)
+        self.pnTable = referenceProbabilityTable(n)
+        self.pnTable2 = referenceProbabilityTable(n_2)
+
+    def value(self, x, p=None):
+        myp = self.parameters if p is None else p
+        A, n, omega = myp[0:3]
+        self.updateTables(myp)
+        frequencies = outer(self.laguerreTable, self.laguerreTable2).flatten()
+        probabilities = outer(self.pnTable, self.pnTable2).flatten()
+        return numpy.array([A*dot(probabilities, sin((omega * xn)*frequencies)**2) for xn in x])
+
+
+def makeFit(fitClass):
+    fit = fitClass()
+    fit.parameters = list(fit.startParameters)
+    fit.parameters[6] = float(fit.parameters[6].m_as('nm'))   # updateTables expects the wavelength in nm
+    return fit
+
+
+def leastsqFit(fit, x, y):
+    """fit A, n and rabiFreq, the remaining parameters are fixed"""
+    fixed = list(fit.parameters[3:])
+    fitted, _ = leastsq(lambda p: y - fit.value(x, list(p) + fixed), [1.0, 3.0, 0.3])
+    return fitted
+
+
+def timed(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark(name, referenceClass, fitClass, points, repeat, seed=0):
+    x = numpy.linspace(0, 100, points)
+    truth = makeFit(fitClass)
+    truth.parameters[0:3] = [0.95, 3.2, 0.31]
+    rng = numpy.random.RandomState(seed)
+    y = truth.value(x) + rng.normal(0, 0.02, points)
+    results = dict()
+    for fitClass in (referenceClass, fitClass):
+        fit = makeFit(fitClass)
+        fit.parameters[2] = 0.3
+        evaluation, value = timed(lambda: fit.value(x, fit.parameters), repeat)
+        fitting, fitted = timed(lambda: leastsqFit(fit, x, y), repeat)
+        results[fitClass] = (evaluation, fitting, value, list(fitted))
+    (refEvaluation, refFitting, refValue, refParameters), (evaluation, fitting, value, parameters) = \
+        results[referenceClass], results[fitClass]
+    print("{0}: {1} points, value reference {2:.3g} s vectorized {3:.3g} s, leastsq reference {4:.3g} s vectorized {5:.3g} s, "
+          "speedup {6:.1f}, max deviation {7:.2g}".format(name, points, refEvaluation, evaluation, refFitting, fitting,
+                                                          refFitting / fitting, numpy.max(numpy.abs(refValue - value))))
+    print("    fitted A, n, rabiFreq reference {0} vectorized {1}".format(numpy.round(refParameters, 4), numpy.round(parameters, 4)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the motional Rabi flopping fit functions")
+    parser.add_argument('--points', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    benchmark("MotionalRabiFlopping", ReferenceMotionalRabiFlopping, MotionalRabiFlopping, args.points, args.repeat)
+    benchmark("TwoModeMotionalRabiFlopping", ReferenceTwoModeMotionalRabiFlopping, TwoModeMotionalRabiFlopping,
+              args.points, args.repeat)
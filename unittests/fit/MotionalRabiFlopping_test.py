@@ -0,0 +1,39 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import unittest
+
+import numpy
+from numpy import sin, dot
+
+from fit.MotionalRabiFlopping import laguerreTable, probabilityTable, floppingTables, flopping, transitionAmplitude
+
+
+class MotionalRabiFloppingTest(unittest.TestCase):
+    def test_closed_form_values(self):
+        eta = 0.1
+        debyeWaller = numpy.exp(-eta**2 / 2)
+        numpy.testing.assert_allclose(laguerreTable(eta, 0)[:3], debyeWaller * numpy.array([1, 1 - eta**2, 1 - 2 * eta**2 + eta**4 / 2]), rtol=1e-12)
+        numpy.testing.assert_allclose(laguerreTable(eta, 1)[:2], debyeWaller * eta * numpy.array([1, (2 - eta**2) / numpy.sqrt(2)]), rtol=1e-12)
+        numpy.testing.assert_allclose(probabilityTable(5.0)[:3], [1 / 6., 5 / 36., 25 / 216.], rtol=1e-12)
+        numpy.testing.assert_allclose(flopping(numpy.array([0., 1., 10.]), 0.3, *floppingTables(0.1, 0, 5.0)),
+                                      [0, 0.07868786, 0.10487209], atol=1e-8)
+
+    def test_laguerreTable(self):
+        for eta, delta_n in ((0.05, 0), (0.1, 1), (0.3, -2)):
+            reference = numpy.array([transitionAmplitude(eta, n, n+delta_n) for n in range(200)])
+            numpy.testing.assert_allclose(laguerreTable(eta, delta_n), reference, rtol=1e-9, atol=1e-15)
+
+    def test_flopping(self):
+        x = numpy.linspace(0, 50, 101)
+        frequencies, probabilities = laguerreTable(0.1, 0), probabilityTable(5.0)
+        reference = [dot(probabilities, sin((0.3 * xn) * frequencies)**2) for xn in x]
+        numpy.testing.assert_allclose(flopping(x, 0.3, *floppingTables(0.1, 0, 5.0)), reference, atol=1e-14)
+        self.assertAlmostEqual(flopping(x[7], 0.3, *floppingTables(0.1, 0, 5.0)), reference[7], places=14)
+        self.assertEqual(len(flopping(x[:0], 0.3, *floppingTables(0.1, 0, 5.0))), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Helpers shared by the tests and benchmarks of several packages. Helpers used by a single
+test module are defined in that module.
+"""
+import random
+import struct
+import sys
+from unittest import mock
+
+import numpy
+
+from pulseProgram.PulseProgram import PulseProgram, Variable
+from pulser.PulserData import Data
+from scan.EvaluationControl import EvaluationDefinition
+
+
+def mockOpalKelly():
+    """patch of sys.modules replacing the Opal Kelly driver by a mock without connected boards.
+    The driver is only used to talk to the hardware, modules importing it can be imported
+    and used with simulated hardware while the patch is active."""
+    ok = mock.MagicMock()
+    ok.FrontPanel.return_value.GetDeviceCount.return_value = 0
+    return mock.patch.dict(sys.modules, {'ok': ok})
+
+
+class ListQueue(list):
+    def put(self, item):
+        self.append(item)
+
+
+def chunks(data, chunksize):
+    """split the stream into reads of chunksize bytes as delivered by the pipe"""
+    return [data[start:start + chunksize] for start in range(0, len(data), chunksize)]
+
+
+def syntheticFifoData(points=100, shots=100, counters=8, timestamps=4, seed=0):
+    """generate a FIFO stream of a scan with counts, timestamps, ADC values, results and time ticks"""
+    rng = random.Random(seed)
+    tokens = list()
+    time = 0
+    for point in range(points):
+        tokens.extend([0xfffc000000000000, point])
+        tokens.extend([0xfffc000000008000, rng.getrandbits(48)])
+        for shot in range(shots):
+            time += 1000
+            tokens.append(0x0600000000000000 | time)
+            tokens.append(0x0300000000000000 | time)
+            for _ in range(timestamps):
+                time += rng.randint(1, 50)
+                tokens.append(0x0200000000000000 | time)
+            for channel in range(counters):
+                tokens.append(0x0100000000000000 | (channel << 40) | rng.randint(0, 30))
+            tokens.append(0x0500000000000000 | (1 << 40) | (16 << 28) | rng.getrandbits(20))
+            tokens.append(0x5102000000000000 | rng.getrandbits(48))
+            if shot % 10 == 0:
+                tokens.append(0x5002000000000000 | rng.getrandbits(16))
+            if time > 0xffffffffff:
+                time -= 1 << 40
+                tokens.append(0xfffd000000000000)
+        tokens.append(0xee21000000000000 | time)
+        tokens.append(0xee00000000000000 | rng.randint(0, 1000))
+    tokens.append(0xffffffffffffffff)
+    return struct.pack('{0}Q'.format(len(tokens)), *tokens)
+
+
+def decodeFifoData(decoderClass, buffers):
+    """decoder of decoderClass after decoding the FIFO reads buffers"""
+    decoder = decoderClass()
+    decoder.dataQueue = ListQueue()
+    for buffer in buffers:
+        decoder.decodeDataTokens(buffer)
+    return decoder
+
+
+def pulseProgram(**variables):
+    """PulseProgram with the variables given as name=dict of Variable attributes"""
+    program = PulseProgram()
+    for name, attributes in variables.items():
+        var = Variable()
+        var.name = name
+        for attribute, value in attributes.items():
+            setattr(var, attribute, value)
+        program.variabledict[name] = var
+    return program
+
+
+def syntheticScanData(points=100, shots=100, seed=0):
+    """Data of a scan with two ions in counter 0 and 1 and background in counter 2"""
+    rng = numpy.random.RandomState(seed)
+    dataList = list()
+    for point in range(points):
+        bright = 0.5 + 0.5 * numpy.sin(point * 2 * numpy.pi / points)
+        data = Data()
+        data.scanvalue = point
+        for channel in (0, 1):
+            state = rng.random_sample(shots) < bright
+            data.count[channel] = numpy.where(state, rng.poisson(12, shots), rng.poisson(0.5, shots))
+        data.count[2] = rng.poisson(3, shots)
+        dataList.append(data)
+    return dataList
+
+
+def evaluationDefinition(name, algorithm, counter=0, showHistogram=False, **settings):
+    evaluation = EvaluationDefinition()
+    evaluation.name = name
+    evaluation.evaluation = algorithm
+    evaluation.counter = counter
+    evaluation.showHistogram = showHistogram
+    evaluation.settings.update(settings)
+    return evaluation
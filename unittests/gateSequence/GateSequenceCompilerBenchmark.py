@@ -0,0 +1,87 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of the gate sequence compilation.
+
+Compiles a GST style list of random gate sequences (with repetitions) over the gates of
+config/GateSequences/GateDefinition.xml, once with the original per sequence compiler and
+once with GateSequenceCompiler, then again with GateSequenceCompiler after a variable
+change that affects part of the gates, and reports the times.
+
+usage: python -m unittests.gateSequence.GateSequenceCompilerBenchmark [--sequences N] [--length N]
+"""
+import argparse
+import time
+
+from gateSequence.GateSequenceCompiler import GateSequenceCompiler
+from modules.quantity import Q
+from unittests.fixtures import pulseProgram
+from unittests.gateSequence.GateSequenceCompiler_test import gateSequenceContainer, sequenceData
+
+
+class ReferenceGateSequenceCompiler(object):
+    """GateSequenceCompiler as it was originally"""
+    expression = GateSequenceCompiler.expression
+    def __init__(self, pulseProgram ):
+        self.pulseProgram = pulseProgram
+        self.compiledGates = dict()
+
+    def gateSequencesCompile(self, gatesets ):
+        self.gateCompile( gatesets.gateDefinition )
+        addresses = list()
+        data = list()
+        index = 0
+        for gateset in list(gatesets.GateSequenceDict.values()):
+            gatesetdata = self.gateSequenceCompile( gateset )
+            addresses.append(index)
+            data.extend(gatesetdata)
+            index += len(gatesetdata)*8
+        return addresses, data
+
+    def gateSequenceCompile(self, gateset ):
+        data = list()
+        length = 0
+        for gate in gateset:
+            thisCompiledGate = self.compiledGates[gate]
+            data.extend( thisCompiledGate )
+            length += len(thisCompiledGate)//self.pulseListLength
+        return [length] + data
+
+    def gateCompile(self, gateDefinition ):
+        variables = self.pulseProgram.variables()
+        pulseList = list(gateDefinition.PulseDefinition.values())
+        self.pulseListLength = len(pulseList)
+        for gatename, gate in gateDefinition.Gates.items():
+            data = list()
+            for name, strvalue in gate.pulsedict:
+                result = self.expression.evaluate(strvalue, variables )
+                encoding = gateDefinition.PulseDefinition[name].encoding
+                data.append( self.pulseProgram.convertParameter( result, encoding ) )
+            self.compiledGates[gatename] = data
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the gate sequence compilation")
+    parser.add_argument('--sequences', type=int, default=10000)
+    parser.add_argument('--length', type=int, default=40)
+    args = parser.parse_args()
+    container = gateSequenceContainer(args.sequences, args.length)
+    program = pulseProgram(gateTime=dict(value=Q(10, 'us')), piTime=dict(value=Q(4, 'us')))
+    (refAddresses, refData), referenceTime = timed(ReferenceGateSequenceCompiler(program).gateSequencesCompile, container)
+    compiler = GateSequenceCompiler(program)
+    (addresses, data), compileTime = timed(compiler.gateSequencesCompile, container)
+    program.variabledict['piTime'].value = Q(5, 'us')
+    _, recompileTime = timed(compiler.gateSequencesCompile, container)
+    same = all(sequenceData(addresses, data, i) == sequenceData(refAddresses, refData, i) for i in range(args.sequences))
+    print("{0} sequences: original {1:.3f} s, compiled {2:.3f} s, after variable change {3:.3f} s, "
+          "{4} of {5} words{6}".format(args.sequences, referenceTime, compileTime, recompileTime, len(data), len(refData),
+                                       "" if same else ", DIFFERENT DATA"))
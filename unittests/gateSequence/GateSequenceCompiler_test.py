@@ -0,0 +1,91 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import os
+import unittest
+
+import numpy
+
+from gateSequence.GateDefinition import GateDefinition
+from gateSequence.GateSequenceCompiler import GateSequenceCompiler
+from gateSequence.GateSequenceContainer import GateSequenceContainer, GateSequenceOrderedDict
+from modules.quantity import Q
+from unittests.fixtures import pulseProgram
+
+GateDefinitionFile = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'GateSequences', 'GateDefinition.xml'))
+
+# phase, waittime and pulsetime words of the gates in GateDefinition.xml for gateTime 10 us and piTime 4 us
+GateWords = {'I': [0, 2000, 0],
+             'x': [0, 1600, 400], 'y': [0x1000, 1600, 400], '-x': [0x2000, 1600, 400], '-y': [0x3000, 1600, 400],
+             'x2': [0, 1200, 800], 'y2': [0x1000, 1200, 800]}
+
+
+def gateSequenceContainer(sequences=10000, length=40, seed=0):
+    """container with sequences random gate sequences of up to length gates, a quarter of them repeated"""
+    container = GateSequenceContainer(GateDefinition.from_file(GateDefinitionFile))
+    gates = sorted(container.gateDefinition.Gates)
+    rng = numpy.random.RandomState(seed)
+    distinct = [[gates[i] for i in rng.randint(0, len(gates), rng.randint(0, length + 1))]
+                for _ in range(sequences - sequences // 4)]
+    container.GateSequenceDict = GateSequenceOrderedDict()
+    for index in range(sequences):
+        gateset = distinct[index] if index < len(distinct) else distinct[rng.randint(0, len(distinct))]
+        container.GateSequenceDict['S{0}'.format(index)] = list(gateset)
+    container.validate()
+    return container
+
+
+def sequenceData(addresses, data, index, pulseListLength=3):
+    """length header and words of gate sequence index"""
+    start = addresses[index] // 8
+    return data[start:start + 1 + data[start] * pulseListLength]
+
+
+def expectedSequence(gateset, gateWords=GateWords):
+    return [len(gateset)] + [word for gate in gateset for word in gateWords[gate]]
+
+
+class GateSequenceCompilerTest(unittest.TestCase):
+    def setUp(self):
+        self.container = gateSequenceContainer(sequences=400, length=12)
+        self.program = pulseProgram(gateTime=dict(value=Q(10, 'us')), piTime=dict(value=Q(4, 'us')))
+
+    def assertSequences(self, actual, gateWords=GateWords):
+        addresses, data = actual
+        gatesets = list(self.container.GateSequenceDict.values())
+        self.assertEqual(len(addresses), len(gatesets))
+        for index, gateset in enumerate(gatesets):
+            self.assertEqual(sequenceData(addresses, data, index), expectedSequence(gateset, gateWords))
+
+    def test_compile(self):
+        addresses, data = GateSequenceCompiler(self.program).gateSequencesCompile(self.container)
+        self.assertSequences((addresses, data))
+        distinct = set(map(tuple, self.container.GateSequenceDict.values()))
+        self.assertEqual(len(set(addresses)), len(distinct))    # identical sequences share the data
+        self.assertEqual(len(data), sum(1 + 3 * len(gateset) for gateset in distinct))
+        self.assertIsInstance(data, list)
+
+    def test_single_sequence(self):
+        compiler = GateSequenceCompiler(self.program)
+        compiler.gateCompile(self.container.gateDefinition)
+        self.assertEqual(compiler.gateSequenceCompile(['x', 'I', 'y']), [3, 0, 1600, 400, 0, 2000, 0, 0x1000, 1600, 400])
+        self.assertEqual(compiler.gateSequenceCompile([]), [0])
+
+    def test_variable_change(self):
+        compiler = GateSequenceCompiler(self.program)
+        compiler.gateSequencesCompile(self.container)
+        identity = compiler.gateWords['I']
+        rotation = compiler.gateWords['x']
+        self.program.variabledict['piTime'].value = Q(5, 'us')
+        actual = compiler.gateSequencesCompile(self.container)
+        self.assertIs(compiler.gateWords['I'], identity)    # I does not depend on piTime
+        self.assertIsNot(compiler.gateWords['x'], rotation)
+        self.assertSequences(actual, {'I': [0, 2000, 0],
+                                      'x': [0, 1500, 500], 'y': [0x1000, 1500, 500], '-x': [0x2000, 1500, 500],
+                                      '-y': [0x3000, 1500, 500], 'x2': [0, 1000, 1000], 'y2': [0x1000, 1000, 1000]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of the logic analyzer decoding and evaluation.
+
+Decodes a synthetic capture with the per word decoder and the per transition
+evaluation originally implemented in PulserHardwareServer.readDataFifo and
+LogicAnalyzer.evaluateData and with the vectorized LogicAnalyzerDecoder and
+TransitionTable, and reports the times.
+
+usage: python -m unittests.logicAnalyzer.LogicAnalyzerBenchmark [--transitions N]
+"""
+import argparse
+import struct
+import time
+
+from unittests.logicAnalyzer.LogicAnalyzer_test import NumChannels, NumAuxChannels, NumTriggerChannels, NumGateChannels, \
+    evaluate, decode, syntheticCapture
+from unittests.fixtures import ListQueue, chunks
+
+
+class ReferenceLogicAnalyzerData(object):
+    def __init__(self):
+        self.data = list()
+        self.auxData = list()
+        self.trigger = list()
+        self.gateData = list()
+        self.stopMarker = None
+        self.countOffset = 0
+        self.wordcount = 0
+
+
+def referenceDecode(buffers):
+    """per word decoder of the logic analyzer pipe, returns the list of decoded captures"""
+    queue = ListQueue()
+    data = ReferenceLogicAnalyzerData()
+    readStatus = 0
+    currentTime = 0
+    buffer = bytearray()
+    fields = {3: 'data', 4: 'trigger', 5: 'auxData', 6: 'gateData'}
+    for chunk in buffers:
+        buffer.extend(chunk)
+        for offset in range(0, len(buffer) - 7, 8):
+            (code, ) = struct.unpack_from('Q', buffer, offset)
+            if readStatus == 0:
+                data.wordcount += 1
+                currentTime = (code & 0xffffff) + data.countOffset
+                header = code >> 56
+                if header == 2:
+                    data.countOffset += 0x1000000
+                elif header == 1:
+                    data.stopMarker = currentTime
+                    queue.put(data)
+                    data = ReferenceLogicAnalyzerData()
+                elif header in fields:
+                    readStatus = header
+            else:
+                getattr(data, fields[readStatus]).append((currentTime, code))
+                readStatus = 0
+        buffer = buffer[len(buffer) // 8 * 8:]
+    return queue
+
+
+def bitEvaluate(numChannels, thisval, lastval=None, channelOffset=0, trigger=False):
+    offValue = 0 if trigger else -1
+    if lastval is None:
+        return [(bit+channelOffset, 1 if thisval&(1<<bit) else offValue) for bit in range(numChannels)]
+    return [(bit+channelOffset, 0 if thisval&(1<<bit)==lastval&(1<<bit) else 1 if thisval&(1<<bit) else offValue) for bit in range(numChannels)]
+
+
+def referenceEvaluate(logicData, scaling=1):
+    """dictionary time -> {channel: transition} as built by LogicAnalyzer.evaluateData"""
+    pulseData = dict()
+    groups = [(logicData.data, NumChannels, 0, False),
+              (logicData.auxData, NumAuxChannels, NumChannels, False),
+              (logicData.trigger, NumTriggerChannels, NumChannels + NumAuxChannels, True),
+              (logicData.gateData, NumGateChannels, NumChannels + NumAuxChannels + NumTriggerChannels, False)]
+    for samples, numChannels, channelOffset, trigger in groups:
+        lastval = None
+        for clockcycle, value in samples:
+            pulseData.setdefault(clockcycle * scaling, dict()).update(bitEvaluate(numChannels, value, lastval, channelOffset, trigger))
+            lastval = value
+    if logicData.data:
+        pulseData[logicData.stopMarker * scaling] = dict()
+    return pulseData
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the logic analyzer decoding and evaluation")
+    parser.add_argument('--transitions', type=int, default=200000)
+    parser.add_argument('--chunksize', type=int, default=16384, help='bytes per simulated pipe read')
+    args = parser.parse_args()
+    buffers = chunks(syntheticCapture(args.transitions), args.chunksize)
+    (referenceData, ), referenceDecodeTime = timed(referenceDecode, buffers)
+    (logicData, ), decodeTime = timed(decode, buffers)
+    _, referenceEvaluateTime = timed(referenceEvaluate, referenceData)
+    _, evaluateTime = timed(evaluate, logicData)
+    print("{0} transitions: decode reference {1:.3f} s vectorized {2:.3f} s, evaluate reference {3:.3f} s vectorized {4:.3f} s".format(
+        args.transitions, referenceDecodeTime, decodeTime, referenceEvaluateTime, evaluateTime))
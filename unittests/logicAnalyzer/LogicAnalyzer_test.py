@@ -0,0 +1,137 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import random
+import struct
+import unittest
+
+import numpy
+
+from logicAnalyzer.LogicAnalyzerTransitions import TransitionTable, bitPlanes, stepTraces
+from pulser.LogicAnalyzerDecoder import LogicAnalyzerDecoder
+from unittests.fixtures import ListQueue, chunks
+
+NumChannels, NumAuxChannels, NumTriggerChannels, NumGateChannels = 64, 10, 7, 32
+
+
+def evaluate(logicData, scaling=1):
+    table = TransitionTable(NumChannels + NumAuxChannels + NumTriggerChannels + NumGateChannels, scaling)
+    table.addGroup(logicData.data.time, logicData.data.pattern, NumChannels, 0)
+    table.addGroup(logicData.auxData.time, logicData.auxData.pattern, NumAuxChannels, NumChannels)
+    table.addGroup(logicData.trigger.time, logicData.trigger.pattern, NumTriggerChannels, NumChannels + NumAuxChannels, trigger=True)
+    table.addGroup(logicData.gateData.time, logicData.gateData.pattern, NumGateChannels,
+                   NumChannels + NumAuxChannels + NumTriggerChannels)
+    return table.build(logicData.stopMarker if logicData.data else None)
+
+
+def decode(buffers):
+    decoder = LogicAnalyzerDecoder()
+    decoder.dataQueue = ListQueue()
+    for buffer in buffers:
+        decoder.decodeLogicAnalyzerData(buffer)
+    return decoder.dataQueue
+
+
+def syntheticCapture(transitions=1000, seed=0):
+    """pipe content of one capture with transitions header/pattern pairs and counter overruns"""
+    rng = random.Random(seed)
+    words = list()
+    clock = 0
+    for _ in range(transitions):
+        clock += rng.randint(1, 200000)
+        while clock > 0xffffff:
+            clock -= 0x1000000
+            words.append(0x0200000000000000)
+        header = rng.choice((3, 3, 3, 4, 5, 6))
+        words.append((header << 56) | (rng.getrandbits(32) << 24) | clock)
+        words.append(rng.getrandbits(64) & rng.getrandbits(64))
+    words.append(0x0100000000000000 | (clock + 10))
+    return struct.pack('{0}Q'.format(len(words)), *words)
+
+
+# data at 100 and after a counter overrun at 50, aux data at 150, trigger at 60, gate data at 70, end at 80
+Capture = struct.pack('12Q', 0x0300000000000000 | 100, 0b101, 0x0500000000000000 | 150, 0b1, 0x0200000000000000,
+                      0x0300000000000000 | 50, 0b110, 0x0400000000000000 | 60, 0b1, 0x0600000000000000 | 70, 1 << 31,
+                      0x0100000000000000 | 80)
+Overrun = 0x1000000
+
+
+class LogicAnalyzerDecoderTest(unittest.TestCase):
+    def assertCapture(self, data):
+        self.assertEqual(list(data.data), [(100, 0b101), (Overrun + 50, 0b110)])
+        self.assertEqual(list(data.auxData), [(150, 0b1)])
+        self.assertEqual(list(data.trigger), [(Overrun + 60, 0b1)])
+        self.assertEqual(list(data.gateData), [(Overrun + 70, 1 << 31)])
+        self.assertEqual((data.stopMarker, data.wordcount), (Overrun + 80, 7))
+
+    def test_capture(self):
+        (data, ) = decode([Capture])
+        self.assertCapture(data)
+        (data, ) = decode([syntheticCapture(2000)])
+        self.assertEqual([len(getattr(data, field)) for field in ('data', 'auxData', 'trigger', 'gateData')],
+                         [997, 327, 343, 333])
+        self.assertEqual((data.stopMarker, data.wordcount), (201119976, 2012))
+        self.assertEqual(int(data.data.time.sum()), 100587681984)
+
+    def test_chunked(self):
+        for chunksize in (4, 8, 12, 100, 4096):
+            (data, ) = decode(chunks(Capture, chunksize))
+            self.assertCapture(data)
+        captures = syntheticCapture(500, seed=1) + syntheticCapture(300, seed=2)
+        expected = decode([captures])
+        self.assertEqual(len(expected), 2)
+        for chunksize in (4, 8, 12, 100, 4096):
+            actual = decode(chunks(captures, chunksize))
+            self.assertEqual(len(expected), len(actual))
+            for reference, data in zip(expected, actual):
+                for field in ('data', 'auxData', 'trigger', 'gateData'):
+                    self.assertEqual(list(getattr(reference, field)), list(getattr(data, field)))
+                self.assertEqual((reference.stopMarker, reference.wordcount), (data.stopMarker, data.wordcount))
+
+
+class TransitionTableTest(unittest.TestCase):
+    def test_transitions(self):
+        (data, ) = decode([Capture])
+        table = evaluate(data)
+        self.assertEqual(table.times.tolist(), [100, 150, Overrun + 50, Overrun + 60, Overrun + 70, Overrun + 80])
+        aux, trigger, gate = NumChannels, NumChannels + NumAuxChannels, NumChannels + NumAuxChannels + NumTriggerChannels
+        expected = numpy.zeros((6, gate + NumGateChannels), dtype=int)
+        expected[0, 0:NumChannels] = -1     # first data pattern, channels not set are low
+        expected[0, [0, 2]] = 1
+        expected[1, aux:trigger] = -1
+        expected[1, aux] = 1
+        expected[2, [0, 1]] = [-1, 1]       # data 0b101 -> 0b110
+        expected[3, trigger] = 1            # trigger channels are not reported as low
+        expected[4, gate:] = -1
+        expected[4, gate + 31] = 1
+        self.assertEqual(table.codes.tolist(), expected.tolist())
+        self.assertEqual(table.significantRows([1, aux]).tolist(), [0, 1, 2])
+
+    def test_scaled_transitions(self):
+        (data, ) = decode([syntheticCapture(1000, seed=3)])
+        table = evaluate(data, 0.00002)
+        self.assertEqual(table.codes.shape, (1001, 113))
+        self.assertEqual((int((table.codes == 1).sum()), int((table.codes == -1).sum())), (7703, 7549))
+        self.assertAlmostEqual(table.times[-1], data.stopMarker * 0.00002)
+        significant = table.significantRows([0, 5, 64, 80, 100])
+        self.assertEqual(len(significant), 467)
+        self.assertEqual(significant[:10].tolist(), [0, 1, 2, 3, 4, 11, 13, 14, 18, 19])
+
+    def test_step_traces(self):
+        patterns = numpy.array([0, 1, 0x8000000000000003, 2], dtype=numpy.uint64)
+        planes = bitPlanes(patterns, 64)
+        self.assertEqual(planes[:, 63].tolist(), [0, 0, 1, 0])
+        enabled = [True, False] + [True] * 62
+        traces, offset = stepTraces(planes, enabled, 0, 0.75)
+        self.assertEqual(offset, 63)
+        self.assertIsNone(traces[1])
+        for bit in (0, 63):
+            channelOffset = bit if bit == 0 else bit - 1
+            self.assertEqual(traces[bit].tolist(),
+                             [channelOffset + 0.75 if int(value) & (1 << bit) else channelOffset for value in patterns])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Micro-benchmark of modules.Expression.
+
+Evaluates the test expressions of modules.Expression and the recalculation of a chain of
+dependent variables after a change of a global, once parsing every expression (as done
+before the compile cache) and once with the cached compiled expressions.
+
+usage: python -m unittests.modules.ExpressionBenchmark [--repeat N] [--variables N]
+"""
+import argparse
+import time
+from collections import ChainMap
+
+from modules.Expression import Expression
+from modules.quantity import Q
+
+Expressions = ["2*2", "{ 'A':1, 'B':2, 'C': {'a': 1.2, 'b': 3.4} }", "16.8 MHz", "3.14159", "42", "1E6", "-.43",
+               "6.02E23", "1.0e-7", "1+2", "9+3+6", "3^2+4*-3+5+6+7+9/5/4/3*3*(4*4+4*5)", "PI", "round(3.21)",
+               "round(PI)", "(sqrt(1 s / 2 s))", "0x0000000000000001", "sin(pi/2)", "[1,2,3,4]", "'a quoted string'",
+               "2*(alpha+beta)", "piTime * 2 + 3 us", "x0+sqrt(s^2*(A/(12-O)-1))", "sqrt(sin(round(pi)^2/17)^2+1)*1 MHz"]
+Variables = {'alpha': 5, 'beta': 2, 'piTime': Q(10, 'ms'), 'x0': Q(0), 's': 1, 'A': Q(20), 'O': Q(0)}
+
+
+def parsed(expression, s, variables):
+    """evaluate without the compile cache"""
+    parser = expression.exprParser
+    return parser._compile(s)(ChainMap(variables, parser.defaultVarCM), parser.defaultFuncCM)
+
+
+def cached(expression, s, variables):
+    return expression.evaluate(s, variables)
+
+
+def variableChain(length, units=True):
+    """strings of a chain of variables each depending on the previous one and a global"""
+    strings = {'v0': 'G1 * 2 MHz' if units else 'G1 * 2'}
+    template = 'v{0} + G1 * {1} kHz + sqrt(G2) * 1 Hz' if units else 'v{0} + G1 * {1} + sqrt(G2) * 2^10'
+    for index in range(1, length):
+        strings['v{0}'.format(index)] = template.format(index - 1, index)
+    return strings
+
+
+def recalculate(evaluateFunction, expression, strings, globaldict):
+    values = ChainMap(dict(), globaldict)
+    for name, s in strings.items():
+        values[name] = evaluateFunction(expression, s, values)
+    return values
+
+
+def timed(function, *args, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark expression evaluation")
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--variables', type=int, default=500)
+    args = parser.parse_args()
+    expression = Expression()
+
+    def evaluateAll(evaluateFunction):
+        for s in Expressions:
+            evaluateFunction(expression, s, Variables)
+
+    for evaluateFunction in (parsed, cached):
+        print("test expressions {0}: {1:.1f} us/expression".format(
+            evaluateFunction.__name__, timed(evaluateAll, evaluateFunction, repeat=args.repeat) / len(Expressions) * 1e6))
+    for units in (False, True):
+        strings = variableChain(args.variables, units)
+        for evaluateFunction in (parsed, cached):
+            globaldict = {'G1': 1, 'G2': 4}
+            recalculate(evaluateFunction, expression, strings, globaldict)
+            globaldict['G1'] = 2
+            print("recalculate {0} variables {1} units after global change {2}: {3:.2f} ms".format(
+                args.variables, "with" if units else "without", evaluateFunction.__name__,
+                timed(recalculate, evaluateFunction, expression, strings, globaldict, repeat=10) * 1e3))
@@ -0,0 +1,67 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import pickle
+import random
+import unittest
+
+import numpy
+
+from modules.ColumnBuffer import ColumnBuffer
+
+
+class TestColumnBuffer(unittest.TestCase):
+    def fill(self, maxLength, steps=200, seed=0):
+        rng = random.Random(seed)
+        buffer = ColumnBuffer(numpy.float64, maxLength=maxLength)
+        reference = list()
+        views = list()
+        for _ in range(steps):
+            if rng.random() < 0.7:
+                value = rng.random()
+                buffer.append(value)
+                reference.append(value)
+            else:
+                values = [rng.random() for _ in range(rng.randint(0, 40))]
+                buffer.extend(values)
+                reference.extend(values)
+            if maxLength:
+                reference = reference[-maxLength:]
+            self.assertEqual(buffer.array.tolist(), reference)
+            views.append((buffer.array, list(reference)))
+        return views
+
+    def test_grow(self):
+        self.fill(0)
+
+    def test_rolling_window(self):
+        for maxLength in (1, 2, 7, 100):
+            self.fill(maxLength, seed=maxLength)
+
+    def test_views_stay_valid(self):
+        for view, expected in self.fill(10):
+            self.assertEqual(view.tolist(), expected)
+
+    def test_float_upgrade(self):
+        buffer = ColumnBuffer(numpy.int64, [1, 2])
+        buffer.append(0.5)
+        self.assertEqual(buffer.dtype, numpy.float64)
+        self.assertEqual(buffer.array.tolist(), [1, 2, 0.5])
+
+    def test_set_max_length(self):
+        buffer = ColumnBuffer(numpy.int64, range(10))
+        buffer.setMaxLength(3)
+        self.assertEqual(buffer.array.tolist(), [7, 8, 9])
+        buffer.append(10)
+        self.assertEqual(buffer.array.tolist(), [8, 9, 10])
+
+    def test_pickle(self):
+        buffer = ColumnBuffer(numpy.uint64, [0xffffffffffffffff, 1], maxLength=5)
+        restored = pickle.loads(pickle.dumps(buffer))
+        self.assertEqual(restored.array.tolist(), [0xffffffffffffffff, 1])
+        self.assertEqual(restored.maxLength, 5)
+
+if __name__ == "__main__":
+    unittest.main()
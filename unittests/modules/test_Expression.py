@@ -58,3 +58,17 @@ class TestExpression(unittest.TestCase):
                            {'x0': Q(0), 's': 1, 'A': Q(20), 'O': Q(0)}),
                          math.sqrt(20 / 12 - 1))
         self.assertEqual(e("sqrt(sin(round(pi)^2/17)^2+1)*1 MHz"),math.sqrt(math.sin(round(math.pi)**2/17)**2+1)*Q(1,'MHz'))
+
+    def test_compiled(self):
+        compiled = ExprEval.compile("2*(alpha+beta) + sqrt(pi)")
+        self.assertIs(compiled, ExprEval.compile("2*(alpha+beta) + sqrt(pi)"))
+        self.assertEqual(compiled.dependencies, {'alpha', 'beta', '__exprfunc__'})
+        self.assertEqual(ExprEval.evaluate("2*(alpha+beta)", {'alpha': 5, 'beta': 2}, listDependencies=True),
+                         (14, {'alpha', 'beta'}))
+        self.assertEqual(e("2*(alpha+beta)", {'alpha': 1, 'beta': 2}), 6)
+        first = e("[1, 2, alpha]", {'alpha': 3})
+        first.append(4)
+        self.assertEqual(e("[1, 2, alpha]", {'alpha': 3}), [1, 2, 3])
+        self.assertEqual(e("1", useFloat=True), 1.0)
+        self.assertIsInstance(e("1", useFloat=True), float)
+        self.assertIsInstance(e("1"), int)
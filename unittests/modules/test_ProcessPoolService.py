@@ -0,0 +1,44 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import unittest
+
+from modules.ProcessPoolService import ProcessPoolService, JobError
+
+
+class Job(object):
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+
+def reciprocal(job):
+    return 1 / job.value
+
+
+class ReciprocalService(ProcessPoolService):
+    name = "reciprocal service"
+    runJob = staticmethod(reciprocal)
+
+
+class ProcessPoolServiceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = ReciprocalService(processes=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.shutdown()
+
+    def test_error_result(self):
+        results = self.service.runBatch([Job(0, 4), Job(1, 0), Job(2, 0.5)])
+        self.assertEqual(results[0], 0.25)
+        self.assertIsInstance(results[1], JobError)
+        self.assertEqual((results[1].key, results[1].error), (1, "ZeroDivisionError: division by zero"))
+        self.assertEqual(results[2], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
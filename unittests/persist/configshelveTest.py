@@ -3,7 +3,10 @@
 # This Software is released under the GPL license detailed
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
-from persist.configshelve import configshelve
+from persist.configshelve import configshelve, PgShelveEntry
+import os
+import shutil
+import tempfile
 import unittest
 
 from persist.DatabaseConnectionSettings import DatabaseConnectionSettings
@@ -15,5 +18,62 @@ class ConfigshelveTest(unittest.TestCase):
         with configshelve(dbConnection, filename='ExperimentUi.config.db') as d:
             pass
 
+    def testIncrementalCommit(self):
+        directory = tempfile.mkdtemp()
+        try:
+            dbConnection = SQLiteConnection(os.path.join(directory, 'config.db'))
+            d = configshelve(dbConnection).__enter__()
+            for index in range(100):
+                d['key{0}'.format(index)] = list(range(index))
+            d._commitToDatabase()
+            d = configshelve(dbConnection).__enter__()
+            self.assertEqual(len(d.pickled), 100)
+            self.assertTrue('key5' in d)
+            d.get('key1').append(7)
+            d['key2'] = 'changed'
+            d.get('key3')
+            d._commitToDatabase()
+            self.assertEqual(d.session.query(PgShelveEntry).count(), 102)
+            d = configshelve(dbConnection).__enter__()
+            self.assertEqual(d['key1'], [0, 7])
+            self.assertEqual(d['key2'], 'changed')
+            self.assertEqual(d.get('missing', 5), 5)
+            d.session.close()
+        finally:
+            shutil.rmtree(directory)
+
+
+    def testInPlaceChangeAfterCommit(self):
+        directory = tempfile.mkdtemp()
+        try:
+            dbConnection = SQLiteConnection(os.path.join(directory, 'config.db'))
+            d = configshelve(dbConnection).__enter__()
+            d['settings'] = {'gain': 1}
+            d['name'] = 'first'
+            d._commitToDatabase()
+            d = configshelve(dbConnection).__enter__()
+            settings = d['settings']
+            d._commitToDatabase()
+            self.assertEqual(d.session.query(PgShelveEntry).count(), 2)
+            settings['gain'] = 2
+            d._commitToDatabase()
+            self.assertEqual(d.session.query(PgShelveEntry).count(), 3)
+            settings['gain'] = 3
+            d._commitToDatabase()
+            d._commitToDatabase()
+            self.assertEqual(d.session.query(PgShelveEntry).count(), 4)
+            d = configshelve(dbConnection).__enter__()
+            self.assertEqual(d['settings'], {'gain': 3})
+            self.assertEqual(d['name'], 'first')
+            d.session.close()
+        finally:
+            shutil.rmtree(directory)
+
+
+class SQLiteConnection(object):
+    def __init__(self, filename):
+        self.connectionString = "sqlite:///" + filename
+        self.echo = False
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,80 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+from datetime import datetime, timedelta
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy
+from sqlalchemy import select, func
+
+from persist.ValueHistory import ValueHistoryStore, ValueHistoryEntry
+
+
+class SQLiteConnection(object):
+    def __init__(self, filename):
+        self.connectionString = "sqlite:///" + filename
+        self.echo = False
+
+
+class TestValueHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = ValueHistoryStore(SQLiteConnection(os.path.join(self.directory, 'history.db')), flushSize=64, flushInterval=0.05)
+        self.store.open_session()
+        self.start = datetime(2016, 3, 1, 12, 0, 0)
+
+    def tearDown(self):
+        self.store.close_session()
+        self.store.engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def addValues(self, count, step=timedelta(seconds=1)):
+        for index in range(count):
+            self.store.add('space', 'source', float(index), 'Hz', self.start + index * step,
+                           bottom=index - 0.5 if index % 2 else None, top=index + 0.5)
+
+    def test_bulk_write(self):
+        self.addValues(1000)
+        self.store.add('space', 'source', 5.0, 'Hz', self.start)   # duplicate key is dropped
+        result = self.store.getHistory('space', 'source', self.start - timedelta(1), None)
+        self.assertEqual([e.value for e in result], list(range(1000)))
+        arrays = self.store.getHistoryArrays('space', 'source', self.start - timedelta(1))
+        self.assertEqual(arrays.value.tolist(), list(range(1000)))
+        self.assertTrue(numpy.isnan(arrays.bottom[0]))
+        self.assertEqual(arrays.bottom[1], 0.5)
+        self.assertEqual(list(arrays.unit[:2]), ['Hz', 'Hz'])
+        self.assertTrue(numpy.allclose(numpy.diff(arrays.time), 1, atol=1e-3))
+        self.assertAlmostEqual(arrays.time[0], self.start.timestamp(), delta=1e-3)
+
+    def test_interval_flush(self):
+        self.addValues(3)
+        time.sleep(0.5)
+        with self.store.engine.connect() as connection:
+            count = connection.execute(select(func.count()).select_from(ValueHistoryEntry.__table__)).scalar()
+        self.assertEqual(count, 3)
+
+    def test_downsampled(self):
+        self.addValues(600)
+        fromTime = self.start - timedelta(seconds=0.5)
+        arrays = self.store.getHistoryArrays('space', 'source', fromTime, fromTime + timedelta(seconds=600), maxPoints=60)
+        self.assertLessEqual(len(arrays), 61)
+        self.assertEqual(int(arrays.count.sum()), 600)
+        raw = numpy.arange(600, dtype=numpy.float64)
+        bounds = numpy.concatenate(([0], numpy.cumsum(arrays.count)))
+        for index, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])):
+            self.assertAlmostEqual(arrays.value[index], raw[start:stop].mean())
+            self.assertEqual(arrays.minimum[index], raw[start])
+            self.assertEqual(arrays.maximum[index], raw[stop - 1])
+            self.assertEqual(arrays.top[index], raw[stop - 1] + 0.5)
+        self.assertEqual(len(self.store.getHistoryArrays('space', 'source', fromTime, None, maxPoints=1000)), 600)
+        self.assertEqual(len(self.store.getHistoryArrays('space', 'unknown', fromTime)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
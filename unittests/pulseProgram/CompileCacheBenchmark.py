@@ -0,0 +1,73 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of loading pulse programs.
+
+Generates a set of pp programs, each inserting a shared file with more variables, and
+loads every program as PulseProgramUi does when switching experiments (loadSource,
+compileCode and toBinary on a new PulseProgram). Reports the time per program without
+cache and with the original per word toBinary, without cache, with a cache populated
+in the same session and with a cache read from disk by a new CompileCache.
+
+usage: python -m unittests.pulseProgram.CompileCacheBenchmark [--programs N] [--blocks N]
+"""
+import argparse
+import logging
+import os
+import struct
+import tempfile
+import time
+
+from pulseProgram.CompileCache import CompileCache
+from pulseProgram.PulseProgram import PulseProgram
+from unittests.pulseProgram.CompileCache_test import writePrograms
+
+
+def referenceToBinary(pp):
+    """binary as built originally by PulseProgram.toBinary"""
+    logger = logging.getLogger(__name__)
+    binarycode = bytearray()
+    for wordno, (op, arg) in enumerate(pp.bytecode):
+        logger.debug( "{0} {1} {2} {3}".format( hex(wordno), hex(op), hex(arg), hex((op<<(32-8)) + arg)) )
+        binarycode += struct.pack('I', (op<<(32-8)) + arg)
+    dataBinarycode = bytearray()
+    for wordno, arg in enumerate(pp.dataBytecode):
+        logger.debug( "{0} {1}".format( hex(wordno), hex(int(arg)) ))
+        dataBinarycode += struct.pack('Q' if arg>0 else 'q', int(arg))
+    return binarycode, dataBinarycode
+
+
+def loadProgram(path, reference=False):
+    pp = PulseProgram()
+    pp.loadSource(path)
+    return pp, referenceToBinary(pp) if reference else pp.toBinary()
+
+
+def loadAll(paths, reference=False):
+    start = time.perf_counter()
+    binaries = [loadProgram(path, reference)[1] for path in paths]
+    return binaries, (time.perf_counter() - start) / len(paths)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark loading pulse programs")
+    parser.add_argument('--programs', type=int, default=24)
+    parser.add_argument('--blocks', type=int, default=200)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        paths = writePrograms(directory, args.programs, args.blocks)
+        cacheDir = os.path.join(directory, '.compile-cache')
+        reference, referenceTime = loadAll(paths, reference=True)
+        binaries, uncachedTime = loadAll(paths)
+        PulseProgram.compileCache = CompileCache(cacheDir)
+        loadAll(paths)
+        sessionBinaries, sessionTime = loadAll(paths)
+        PulseProgram.compileCache = CompileCache(cacheDir)
+        diskBinaries, diskTime = loadAll(paths)
+        PulseProgram.compileCache = None
+        print("{0} programs: original {1:.2f} ms, uncached {2:.2f} ms, cached {3:.3f} ms, from disk {4:.3f} ms per program{5}".format(
+            args.programs, 1e3 * referenceTime, 1e3 * uncachedTime, 1e3 * sessionTime, 1e3 * diskTime,
+            "" if reference == binaries == sessionBinaries == diskBinaries else ", DIFFERENT BINARY"))
@@ -0,0 +1,142 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import os
+import struct
+import tempfile
+import unittest
+
+from pulseProgram.CompileCache import CompileCache, pppSourceParts
+from pulseProgram.PulseProgram import PulseProgram
+
+
+def ppSource(name, variables=50, blocks=50, insert=None):
+    """pp source with variables parameters in different encodings and blocks loops of instructions"""
+    lines = ["# generated program {0}".format(name)]
+    if insert:
+        lines.append("insert {0}".format(insert))
+    for i in range(variables):
+        lines.append("var freq{0} {1}, parameter, MHz, AD9912_FRQ".format(i, 100 + i))
+        lines.append("var time{0} {1}, parameter, us".format(i, 1 + i))
+        lines.append("var mask{0} {1}, mask".format(i, 1 << (i % 32)))
+    lines.append("var maxRepeat 1000, parameter")
+    lines.append("var endLabel 0xfffe100000000000, exitcode")
+    lines.append("const LOOPS 10")
+    lines.append("\tCLRW")
+    for i in range(blocks):
+        j = i % variables
+        lines.extend(["block{0}: NOP".format(i),
+                      "\tSHUTTERMASK mask{0}".format(j),
+                      "\tASYNCSHUTTER mask{0}".format(j),
+                      "\tDDSFRQ 0, freq{0}".format(j),
+                      "\tUPDATE time{0}".format(j),
+                      "\tLDWR maxRepeat",
+                      "\tCMP LOOPS",
+                      "\tJMPZ block{0}".format(i),
+                      "\tWAIT"])
+    lines.append("\tEND endLabel")
+    return "\n".join(lines) + "\n"
+
+
+def writePrograms(directory, programs, blocks):
+    """write programs pp files inserting shared.pp to directory and return their paths"""
+    with open(os.path.join(directory, 'shared.pp'), 'w') as f:
+        f.write(ppSource('shared', variables=20, blocks=0).replace('\tCLRW\n\tEND endLabel\n', '').replace(
+            'var ', 'var shared_').replace('const LOOPS', 'const SHARED_LOOPS'))
+    paths = list()
+    for i in range(programs):
+        path = os.path.join(directory, 'program{0}.pp'.format(i))
+        with open(path, 'w') as f:
+            f.write(ppSource(i, variables=40 + i, blocks=blocks, insert='shared.pp'))
+        paths.append(path)
+    return paths
+
+
+def loadProgram(path):
+    """load path as PulseProgramUi does and return the PulseProgram and its binary"""
+    pp = PulseProgram()
+    pp.loadSource(path)
+    return pp, pp.toBinary()
+
+
+class CompileCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.directory = self.tempdir.name
+        self.cacheDir = os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        PulseProgram.compileCache = None
+        self.tempdir.cleanup()
+
+    def test_cache(self):
+        cache = CompileCache(self.cacheDir, version='1')
+        key = cache.key('a', [1, 2])
+        self.assertNotEqual(key, cache.key('a', [1, 3]))
+        self.assertNotEqual(key, CompileCache(self.cacheDir, version='2').key('a', [1, 2]))
+        self.assertIsNone(cache.get(key))
+        cache.put(key, {'code': [1, 2]})
+        value = cache.get(key)
+        value['code'].append(3)
+        self.assertEqual(cache.get(key), {'code': [1, 2]})
+        self.assertEqual(CompileCache(self.cacheDir, version='1').get(key), {'code': [1, 2]})
+        with open(cache.filename(key), 'wb') as f:
+            f.write(b'corrupt')
+        self.assertIsNone(CompileCache(self.cacheDir, version='1').get(key))
+        cache.clear()
+        self.assertIsNone(cache.get(key))
+
+    def test_ppp_includes(self):
+        include = os.path.join(self.directory, 'include.ppp')
+        with open(include, 'w') as f:
+            f.write('var a = 1\n')
+        source = 'insert "{0}"\nvar b = 2\n'.format(include)
+        parts = pppSourceParts(source)
+        self.assertEqual(parts, [source, (include, 'var a = 1\n')])
+        with open(include, 'w') as f:
+            f.write('var a = 2\n')
+        self.assertNotEqual(pppSourceParts(source), parts)
+
+    def test_pulse_program(self):
+        paths = writePrograms(self.directory, 2, 20)
+        expected, expectedBinary = loadProgram(paths[0])
+        PulseProgram.compileCache = CompileCache(self.cacheDir)
+        compiled, binary = loadProgram(paths[0])
+        PulseProgram.compileCache = CompileCache(self.cacheDir)
+        cached, cachedBinary = loadProgram(paths[0])
+        self.assertEqual(PulseProgram.compileCache.hits, 1)
+        for pp in (compiled, cached):
+            self.assertEqual(pp.code, expected.code)
+            self.assertEqual(pp.bytecode, expected.bytecode)
+            self.assertEqual(pp.variabledict, expected.variabledict)
+            self.assertEqual(pp.labeldict, expected.labeldict)
+        self.assertEqual(binary, expectedBinary)
+        self.assertEqual(cachedBinary, expectedBinary)
+        self.assertEqual(cached.exitcode(0x100000000000), 'endLabel')
+        self.assertIs(cached._exitcodes[0x100000000000], cached.variabledict['endLabel'])
+        with open(os.path.join(self.directory, 'shared.pp'), 'a') as f:
+            f.write('var shared_extra 1, parameter\n')
+        changed, _ = loadProgram(paths[0])
+        self.assertEqual(PulseProgram.compileCache.misses, 1)
+        self.assertIn('shared_extra', changed.variabledict)
+
+    def test_binary(self):
+        path = os.path.join(self.directory, 'binary.pp')
+        with open(path, 'w') as f:
+            f.write('var a 5, parameter\nvar endLabel 0xfffe100000000000, exitcode\n\tLDWR a\n\tWAIT\n\tEND endLabel\n')
+        pp, (binary, dataBinary) = loadProgram(path)
+        self.assertEqual(pp.bytecode, [(0x08, 0), (0x35, 0), (0xff, 1)])
+        self.assertEqual(binary, struct.pack('3I', 0x08000000, 0x35000000, 0xff000001))
+        self.assertEqual(dataBinary, struct.pack('2Q', 5, 0xfffe100000000000))
+
+    def test_data_image(self):
+        data = [0, 1, -1, 0x7fffffffffffffff, 0xffffffffffffffff, -0x8000000000000000]
+        self.assertEqual(PulseProgram.dataImage(data), b''.join(struct.pack('Q' if arg>0 else 'q', arg) for arg in data))
+        self.assertRaises(struct.error, PulseProgram.dataImage, [1 << 64])
+        self.assertRaises(struct.error, PulseProgram.instructionImage, [(0xff, 1 << 24)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import unittest
+
+from networkx import is_directed_acyclic_graph
+
+from modules.SequenceDict import SequenceDict
+from pulseProgram.VariableDictionary import VariableDictionary, CyclicDependencyException
+
+
+class Variable:
+    def __init__(self, name, strvalue):
+        self.name = name
+        self.strvalue = strvalue
+        self.value = 0
+        self.type = 'parameter'
+        self.enabled = True
+
+
+def variables(**strvalues):
+    return SequenceDict((name, Variable(name, strvalue)) for name, strvalue in strvalues.items())
+
+
+class VariableDictionaryTest(unittest.TestCase):
+    def setUp(self):
+        self.globaldict = {'G1': 1, 'G2': 8}
+        self.vd = VariableDictionary()
+        self.vd.setGlobaldict(self.globaldict)
+        self.vd.merge(variables(L1='G1*23+G2', L2='2*L1', L3='3*L2+L1', L4='L2+L3', L5='G2'))
+
+    def values(self):
+        return dict((name, var.value) for name, var in self.vd.items())
+
+    def test_initial(self):
+        self.assertEqual(self.values(), {'L1': 31, 'L2': 62, 'L3': 217, 'L4': 279, 'L5': 8})
+
+    def test_set_str_value(self):
+        recalculated = self.vd.setStrValue('L1', '1')
+        self.assertEqual(recalculated, ['L2', 'L3', 'L4'])
+        self.assertEqual(self.values(), {'L1': 1, 'L2': 2, 'L3': 7, 'L4': 9, 'L5': 8})
+
+    def test_global_change(self):
+        self.globaldict['G1'] = 2
+        self.assertEqual(self.vd.recalculateDependent('G1'), ['L1', 'L2', 'L3', 'L4'])
+        self.assertEqual(self.values(), {'L1': 54, 'L2': 108, 'L3': 378, 'L4': 486, 'L5': 8})
+
+    def test_batch(self):
+        with self.vd.batchUpdate() as recalculated:
+            self.vd.setStrValue('L1', '1')
+            self.vd.setValue('L2', 5)
+            self.globaldict['G2'] = 3
+            self.vd.recalculateDependent('G2')
+        self.assertEqual(sorted(recalculated), ['L3', 'L4', 'L5'])
+        self.assertEqual(self.values(), {'L1': 1, 'L2': 5, 'L3': 16, 'L4': 21, 'L5': 3})
+
+    def test_set_value_removes_dependencies(self):
+        self.vd.setValue('L2', 5)
+        self.globaldict['G1'] = 2
+        self.vd.recalculateDependent('G1')
+        self.assertEqual(self.values()['L2'], 5)
+        self.assertIsNone(self.vd['L2'].strerror)
+
+    def test_cyclic(self):
+        self.vd.setStrValue('L1', 'L4')
+        self.assertEqual(self.vd['L1'].strvalue, 'G1*23+G2')
+        self.assertIsNotNone(self.vd['L1'].strerror)
+        self.assertEqual(self.values()['L1'], 31)
+
+    def test_cyclic_dependencies_are_rejected(self):
+        edges = set(self.vd.dependencyGraph.edges())
+        self.assertRaises(CyclicDependencyException, self.vd.replaceDependencies, 'L1', ['L4'])
+        self.assertRaises(CyclicDependencyException, self.vd.replaceDependencies, 'L2', ['L2'])
+        self.assertEqual(set(self.vd.dependencyGraph.edges()), edges)
+        cyclic = VariableDictionary()
+        cyclic.merge(variables(A='B', B='C+1', C='A'))   # the variable closing the cycle gets an error
+        self.assertEqual([name for name, var in cyclic.items() if var.strerror is not None], ['C'])
+        self.assertTrue(is_directed_acyclic_graph(cyclic.dependencyGraph))
+        cyclic.merge(variables(A='B', B='C+1', C='A'), globaldict={'G1': 1})   # rebuilds the dependency graph
+        self.assertEqual([name for name, var in cyclic.items() if var.strerror is not None], ['C'])
+        self.assertTrue(is_directed_acyclic_graph(cyclic.dependencyGraph))
+
+    def test_set_parent_value_keeps_dependencies(self):
+        self.vd.setParentValue('L2', 5)
+        self.assertEqual(self.vd.setStrValue('L1', '1'), ['L2', 'L3', 'L4'])
+        self.assertEqual(self.values(), {'L1': 1, 'L2': 2, 'L3': 7, 'L4': 9, 'L5': 8})
+
+    def test_merge(self):
+        self.vd.merge(variables(L2='2*L6', L6='7', L1='G1*23+G2', L3='3*L2+L1', L4='L2+L3'))
+        self.assertEqual(list(self.vd.keys()), ['L2', 'L6', 'L1', 'L3', 'L4'])
+        self.assertEqual(self.values(), {'L1': 31, 'L2': 62, 'L3': 217, 'L4': 279, 'L6': 7})
+        self.vd.merge(variables(L2='2*L6', L6='7', L1='G1*23+G2', L3='3*L2+L1', L4='L2+L3'), overwrite=True)
+        self.assertEqual(self.values(), {'L1': 31, 'L2': 14, 'L3': 73, 'L4': 87, 'L6': 7})
+
+    def test_merge_after_global_change(self):
+        self.globaldict['G1'] = 2
+        self.globaldict['G2'] = 7
+        self.vd.merge(variables(L1='G1*23+G2', L2='2*L1', L3='3*L2+L1', L4='L2+L3', L5='G2'))
+        self.assertEqual(self.values(), {'L1': 53, 'L2': 106, 'L3': 371, 'L4': 477, 'L5': 7})
+
+    def test_missing_variable_is_resolved(self):
+        self.vd.setStrValue('L5', 'L7 + 1')
+        self.assertIsNotNone(self.vd['L5'].strerror)
+        self.vd.merge(variables(L1='G1*23+G2', L2='2*L1', L3='3*L2+L1', L4='L2+L3', L5='L7 + 1', L7='2'))
+        self.assertEqual(self.values()['L5'], 3)
+        self.assertIsNone(self.vd['L5'].strerror)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of the pulser data FIFO decoder.
+
+Replays recorded FIFO dumps (raw binary files as read from the data pipe) or synthetic
+data through the per token reference decoder and the vectorized DataFifoDecoder and
+reports the throughput in tokens/s.
+
+usage: python -m unittests.pulser.DataFifoDecoderBenchmark [dumpfile ...]
+"""
+import argparse
+import json
+import struct
+import time
+from collections import defaultdict
+
+from pulser.DataFifoDecoder import DataFifoDecoder
+from unittests.fixtures import syntheticFifoData, chunks, decodeFifoData
+
+
+class ListData(object):
+    """Data record with defaultdict of lists as originally used by PulserHardwareServer"""
+    def __init__(self):
+        self.count = defaultdict(list)
+        self.timestamp = None
+        self.timestampZero = None
+        self.scanvalue = None
+        self.final = False
+        self.other = list()
+        self.overrun = False
+        self.exitcode = 0
+        self.dependentValues = list()
+        self.evaluated = dict()
+        self.result = None
+        self.externalStatus = None
+        self._creationTime = 0
+        self.timeTick = defaultdict(list)
+        self.timeTickOffset = 0.0
+        self.timingViolations = None
+
+    def dataString(self):
+        return json.dumps([self.count, self.timestamp, self.timestampZero, self.scanvalue, self.final, self.other,
+                           self.overrun, self.exitcode, self.dependentValues, self.result, self.externalStatus,
+                           self._creationTime, self.timeTickOffset, self.timeTick])
+
+
+class ReferenceDecoder(DataFifoDecoder):
+    """per token decoder and list based data record as originally implemented in PulserHardwareServer.readDataFifo"""
+    dataClass = ListData
+
+    def decodeDataTokens(self, data):
+        for offset in range(0, len(data) - 7, 8):
+            (token,) = struct.unpack_from('Q', data, offset)
+            if self.state == self.analyzingState.dependentscanparameter:
+                self.data.dependentValues.append(token)
+                self.state = self.analyzingState.normal
+            elif self.state == self.analyzingState.scanparameter:
+                if self.data.scanvalue is None:
+                    self.data.scanvalue = token
+                else:
+                    self.data.timeTickOffset = self.timeTickOffset
+                    self.dataQueue.put(self.data)
+                    self.data = self.dataClass()
+                    self.data.scanvalue = token
+                self.state = self.analyzingState.normal
+            elif token & 0xff00000000000000 == 0xee00000000000000:  # dedicated results
+                try:
+                    channel = (token >> 48) & 0xff
+                    if self.dedicatedData.data[channel] is not None:
+                        self.dataQueue.put(self.dedicatedData)
+                        self.dedicatedData = self.dedicatedDataClass(self.timeTickOffset)
+                    if channel == 33:
+                        self.dedicatedData.data[channel] = (token & 0xffffffffff) + self.timestampOffset
+                    else:
+                        self.dedicatedData.data[channel] = token & 0xffffffffffff
+                except IndexError:
+                    pass
+            elif token & 0xff00000000000000 == 0xff00000000000000:
+                self._controlToken(token)
+            else:
+                key = token >> 56
+                if key == 1:   # count
+                    channel = (token >> 40) & 0xffff
+                    value = token & 0x000000ffffffffff
+                    (self.data.count[channel]).append(value)
+                elif key == 2:  # timestamp
+                    channel = (token >> 40) & 0xffff
+                    value = token & 0x000000ffffffffff
+                    if self.data.timestamp is None:
+                        self.data.timestamp = defaultdict(list)
+                    self.data.timestamp[channel][-1].append(self.timestampOffset + value - self.data.timestampZero[channel][-1])
+                elif key == 3:  # timestamp gate start
+                    channel = (token >> 40) & 0xffff
+                    value = token & 0x000000ffffffffff
+                    if self.data.timestampZero is None:
+                        self.data.timestampZero = defaultdict(list)
+                    self.data.timestampZero[channel].append(self.timestampOffset + value)
+                    if self.data.timestamp is None:
+                        self.data.timestamp = defaultdict(list)
+                    self.data.timestamp[channel].append(list())
+                elif key == 4:  # other return value
+                    value = token & 0x000000ffffffffff
+                    self.data.other.append(value)
+                elif key == 5:  # ADC return
+                    channel = (token >> 40) & 0xffff
+                    sumvalue = token & 0xfffffff
+                    count = (token >> 28) & 0xfff
+                    if count > 0:
+                        self.data.count[channel + 32].append(sumvalue / float(count))
+                elif key == 6:  # clock timestamp
+                    self.data.timeTick[(token >> 40) & 0xff].append(self.timestampOffset + (token & 0xffffffffff))
+                elif key == 0x51:
+                    channel = (token >> 48) & 0xff
+                    value = token & 0x0000ffffffffffff
+                    if self.data.result is None:
+                        self.data.result = defaultdict(list)
+                    self.data.result[channel].append(value)
+                elif key == 0x50:
+                    channel = (token >> 48) & 0xff
+                    value = token & 0x000000000000ffff
+                    self.data.result[channel][-1] |= (value << 48)
+                else:
+                    self.data.other.append(token)
+
+
+def benchmark(name, buffers, repeat=3):
+    tokens = sum(len(b) for b in buffers) // 8
+    results = dict()
+    for decoderClass in (ReferenceDecoder, DataFifoDecoder):
+        best = min(timed(decoderClass, buffers) for _ in range(repeat))
+        results[decoderClass.__name__] = tokens / best
+    print("{0}: {1} tokens, reference {2:.3g} tokens/s, vectorized {3:.3g} tokens/s, speedup {4:.1f}".format(
+        name, tokens, results['ReferenceDecoder'], results['DataFifoDecoder'],
+        results['DataFifoDecoder'] / results['ReferenceDecoder']))
+
+
+def timed(decoderClass, buffers):
+    start = time.perf_counter()
+    decodeFifoData(decoderClass, buffers)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pulser data FIFO decoder")
+    parser.add_argument('dumpfiles', nargs='*', help='raw data FIFO dumps')
+    parser.add_argument('--chunksize', type=int, default=16376, help='bytes per simulated pipe read')
+    args = parser.parse_args()
+    if args.dumpfiles:
+        for filename in args.dumpfiles:
+            with open(filename, 'rb') as f:
+                benchmark(filename, chunks(f.read(), args.chunksize))
+    else:
+        benchmark("synthetic", chunks(syntheticFifoData(), args.chunksize))
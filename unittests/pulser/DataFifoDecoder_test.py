@@ -0,0 +1,87 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import json
+import struct
+import unittest
+
+import numpy
+
+from pulser.DataFifoDecoder import DataFifoDecoder
+from unittests.fixtures import syntheticFifoData, chunks, decodeFifoData
+
+
+def tokenBytes(*tokens):
+    return struct.pack('{0}Q'.format(len(tokens)), *tokens)
+
+
+def dataState(data):
+    """json representation of the data record without the creation time"""
+    state = json.loads(data.dataString())
+    del state[11]
+    return state, data.timingViolations
+
+
+def counts(data):
+    return dict((channel, list(values)) for channel, values in data.count.items())
+
+
+class DataFifoDecoderTest(unittest.TestCase):
+    def test_synthetic(self):
+        decoder = decodeFifoData(DataFifoDecoder, [syntheticFifoData(points=20, shots=30)])
+        points = [data for data in decoder.dataQueue if type(data).__name__ == 'Data']
+        self.assertEqual(len(decoder.dataQueue), 39)    # the dedicated data of the last point is still open
+        self.assertEqual([data.scanvalue for data in points], list(range(20)))
+        self.assertEqual([data.final for data in points], [False] * 19 + [True])
+        self.assertEqual(points[0].dependentValues, [108438666086349])
+        for data in points:
+            self.assertEqual(sorted(data.count.keys()), list(range(8)) + [33])
+            self.assertTrue(all(len(values) == 30 for values in data.count.values()))
+            self.assertEqual(len(data.timestamp[0]), 30)
+            self.assertTrue(all(len(gate) == 4 for gate in data.timestamp[0]))
+            self.assertEqual(len(data.timeTick[0]), 30)
+            self.assertEqual(len(data.result[2]), 30)
+        self.assertEqual(dict((channel, int(numpy.sum(values))) for channel, values in points[3].count.items()),
+                         {0: 330, 1: 404, 2: 468, 3: 456, 4: 452, 5: 420, 6: 491, 7: 395, 33: 1123266})
+        self.assertEqual(sum(int(numpy.sum(data.count[channel])) for data in points for channel in range(8)), 72095)
+
+    def test_chunked(self):
+        data = syntheticFifoData(points=20, shots=30, seed=1)
+        expected = decodeFifoData(DataFifoDecoder, [data])
+        for chunksize in (8, 24, 1000, 4096):
+            decoder = decodeFifoData(DataFifoDecoder, chunks(data, chunksize))
+            self.assertEqual(len(decoder.dataQueue), len(expected.dataQueue))
+            for expectedData, actual in zip(expected.dataQueue, decoder.dataQueue):
+                if hasattr(expectedData, 'dataString'):
+                    self.assertEqual(dataState(actual), dataState(expectedData))
+                else:
+                    self.assertEqual(actual.data, expectedData.data)
+            self.assertEqual(decoder.state, expected.state)
+
+    def test_scanvalue_looks_like_control_token(self):
+        decoder = decodeFifoData(DataFifoDecoder, [tokenBytes(
+            0xfffc000000000000, 1, 0x0100000000000005,
+            0xfffc000000000000, 0xffffffffffffffff, 0x0100000000000007,
+            0xfffc000000008000, 0xfffc000000000000, 0x0100010000000003,
+            0xfffe000000000012)])
+        first, second = decoder.dataQueue
+        self.assertEqual((first.scanvalue, counts(first), first.final), (1, {0: [5]}, False))
+        self.assertEqual((second.scanvalue, counts(second), second.final), (0xffffffffffffffff, {0: [7], 1: [3]}, True))
+        self.assertEqual((second.dependentValues, second.exitcode), ([0xfffc000000000000], 0x12))
+        self.assertEqual(decoder.state, decoder.analyzingState.normal)
+
+    def test_mixed_adc_and_counts(self):
+        decoder = decodeFifoData(DataFifoDecoder, [tokenBytes(
+            0x0100002000000005, 0x0500000000000000 | (4 << 28) | 100, 0x0100002000000007,
+            0x0500000000000000, 0x04000000000000aa, 0x7700000000000001, 0xfffb000000000123)])
+        data = decoder.data
+        self.assertEqual(len(decoder.dataQueue), 0)
+        self.assertEqual(counts(data), {0: [0x2000000005, 0x2000000007], 32: [25.0]})
+        self.assertEqual(data.other, [0xaa, 0x7700000000000001])
+        self.assertEqual(data.timingViolations, [0x123])
+
+
+if __name__ == "__main__":
+    unittest.main()
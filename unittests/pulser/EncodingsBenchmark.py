@@ -0,0 +1,48 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of the scan code generation.
+
+Builds the scan code of a variable for every encoding in EncodingDict with scan values
+in a different unit than the encoding, once with the original per value
+convertParameter and once with PulseProgram.variableScanCode, and reports the time per
+scan value.
+
+usage: python -m unittests.pulser.EncodingsBenchmark [--points N]
+"""
+import argparse
+import time
+
+from pulser.Encodings import EncodingDict
+from unittests.fixtures import pulseProgram
+from unittests.pulser.Encodings_test import scanValues
+
+
+def referenceScanCode(program, variablename, values):
+    """scan code as built originally by PulseProgram.variableScanCode"""
+    var = program.variabledict[variablename]
+    return program.flattenList( [ (var.address, program.convertParameter(x, var.encoding)) for x in values ] )
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scan code generation")
+    parser.add_argument('--points', type=int, default=100000)
+    args = parser.parse_args()
+    names = [name for name in EncodingDict if isinstance(name, str)]
+    program = pulseProgram(**dict((name, dict(encoding=name, address=address)) for address, name in enumerate(names)))
+    for name in names:
+        values = scanValues(EncodingDict[name], args.points)
+        reference, referenceTime = timed(referenceScanCode, program, name, values)
+        code, codeTime = timed(program.variableScanCode, name, values)
+        print("{0:24s} per value {1:8.3f} us, vectorized {2:6.3f} us{3}".format(
+            name, 1e6 * referenceTime / args.points, 1e6 * codeTime / args.points,
+            "" if code == reference else ", DIFFERENT CODE"))
@@ -3,12 +3,16 @@
 # This Software is released under the GPL license detailed
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
-from pulser.Encodings import encode, decode, decodeQ, EncodingError, Dimensions
+from pulser.Encodings import encode, encodeArray, decode, decodeQ, EncodingError, Dimensions, EncodingDict, BinaryEncoding
 from modules.quantity import Q
+from unittests.fixtures import pulseProgram
 import unittest
 import math
 
+import numpy
+
 timestep = Q(5, 'ns')
+ScanUnits = {'Hz': 'MHz', 'V': 'mV', 'ns': 'us'}
 
 legacy_encodings = {'AD9912_FRQ': (1e9 / 2 ** 48, 'Hz', Dimensions.frequency, 0xffffffffffff),
              'AD9910_FRQ': (1e9 / 2 ** 32, 'Hz', Dimensions.frequency, 0xffffffff),
@@ -49,6 +53,20 @@ def legacy_decode(val, encoding):
     return Q(val * step, unit)
 
 
+def scanValues(encoding, points=1000, seed=0):
+    """scan values within the range of encoding (an entry of EncodingDict)"""
+    rng = numpy.random.RandomState(seed)
+    if isinstance(encoding, BinaryEncoding):
+        low, high = max(encoding.minvalue, -(1 << 62)), min(encoding.maxvalue, 1 << 62)
+        return rng.randint(low, high, points, dtype=numpy.int64).tolist()
+    magnitudes = rng.uniform(encoding.minvalue, encoding.maxvalue, points) * 0.999
+    if not encoding.unit:
+        return [Q(m) for m in magnitudes.tolist()]
+    unit = ScanUnits[encoding.unit]
+    scale = Q(1, unit).m_as(encoding.unit)
+    return [Q(m / scale, unit) for m in magnitudes.tolist()]
+
+
 class EncodingsTest(unittest.TestCase):
     def testDDS(self):
         self.assertEqual(encode(Q(500, 'MHz'), 'AD9912_FRQ'), 0x800000000000)
@@ -109,5 +127,42 @@ class EncodingsTest(unittest.TestCase):
     def testNoneEncoding(self):
         self.assertEqual(encode(Q(-5, 'MHz')), 18446744073709551611)
 
+    def testEncodeArray(self):
+        for name, encoding in EncodingDict.items():
+            values = scanValues(encoding, 500)
+            self.assertEqual(encodeArray(values, name).tolist(), [encode(v, name) for v in values], name)
+        mixed = [Q(1, 'MHz'), Q(1200, 'kHz'), Q(3, 'GHz') / 4]
+        self.assertEqual(encodeArray(mixed, 'AD9912_FRQ').tolist(), [encode(v, 'AD9912_FRQ') for v in mixed])
+        for values in ([Q(100, 'ns'), Q(2, 'us')], [256, -1, 72057594037927937], [Q(6.076, 'kHz'), Q(-5, 'MHz')],
+                       [0xffffffffffffffff, 3], []):
+            self.assertEqual(encodeArray(values).tolist(), [encode(v) for v in values])
+        self.assertEqual(encodeArray(Q(numpy.array([1.5, 2.5, 3.5]), 'us'), 'TIME').tolist(), [300, 500, 700])
+        self.assertEqual(encodeArray([Q(-5, 'V'), Q(0, 'V'), Q(4.9999, 'V')], 'ADC7606_VOLTAGE_OFFSET').tolist(),
+                         [0, 0x8000, 0xffff])
+        with self.assertRaises(EncodingError):
+            encodeArray([Q(1, 'V'), Q(5.01, 'V')], 'ADC7606_VOLTAGE')
+        with self.assertRaises(EncodingError):
+            encodeArray([1, -1], 'unsigned64')
+        with self.assertRaises(EncodingError):
+            encodeArray([1], 'UNDEFINED')
+
+    def testScanCode(self):
+        program = pulseProgram(frequency=dict(encoding='AD9912_FRQ', address=3), time=dict(encoding=None, address=0x8005),
+                               phase=dict(encoding='AD9910_PHASE', address=12))
+        frequencies = [Q(1, 'MHz'), Q(250, 'MHz'), Q(123.456789, 'MHz'), Q(2, 'GHz')]   # out of range is encoded as 0
+        self.assertEqual(program.variableScanCode('frequency', frequencies),
+                         [3, 0x4189374bc7, 3, 0x400000000000, 3, 0x1f9add373963, 3, 0])
+        columns = [frequencies, [Q(100, 'ns'), Q(2.5, 'us'), Q(1, 'ms'), Q(5, 'ns')], [Q(0), Q(90), Q(359.9), Q(180)]]
+        names = ['frequency', 'time', 'phase']
+        self.assertEqual(program.multiVariableScanCode(names, columns),
+                         [0x8003, 0x4189374bc7, 0x8005, 20, 12, 0,
+                          0x8003, 0x400000000000, 0x8005, 500, 12, 0x4000,
+                          0x8003, 0x1f9add373963, 0x8005, 200000, 12, 0xffee,
+                          0x8003, 0, 0x8005, 1, 12, 0x8000])
+        self.assertEqual(program.multiVariableScanCode(names[1:2], columns[1:2]), [5, 20, 5, 500, 5, 200000, 5, 1])
+        self.assertEqual(program.multiVariableScanCode(names, [[], [], []]), [])
+        values = scanValues(EncodingDict['AD9912_FRQ'], 200)
+        self.assertEqual(program.variableScanCode('frequency', values)[1::2], [encode(v, 'AD9912_FRQ') for v in values])
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,44 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of the scan code transport to the pulser input FIFO.
+
+Runs a scan on a simulated pulser server process, once with the client writing the
+code of every point through the command pipe after the evaluation of the previous
+point (as InternalScanMethod.prepareNextPoint without refill) and once with the FIFO
+refill of the server. Reports the points/s, the number of writes to the input FIFO and
+how often the simulated pulse program had to wait for code.
+
+usage: python -m unittests.pulser.FifoRefillBenchmark [--points N] [--duration us] [--shots N] [--evaluation us]
+"""
+import argparse
+
+from PyQt5 import QtCore
+
+from unittests.fixtures import mockOpalKelly
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scan code transport to the pulser input FIFO")
+    parser.add_argument('--points', type=int, default=20000)
+    parser.add_argument('--duration', type=float, default=20, help='duration of a point in us')
+    parser.add_argument('--shots', type=int, default=10)
+    parser.add_argument('--evaluation', type=float, default=0, help='client evaluation time per point in us')
+    args = parser.parse_args()
+    app = QtCore.QCoreApplication([])
+    mockOpalKelly().start()
+    from unittests.pulser.SimulatedPulser import SimulatedPulserHardware, runScan
+    pulser = SimulatedPulserHardware()
+    try:
+        for refill in (False, True):
+            scanvalues, elapsed, statistics = runScan(pulser, args.points, refill, args.duration * 1e-6, args.shots,
+                                                      args.evaluation * 1e-6)
+            print("{0}: {1} of {2} points, {3:.0f} points/s, {4} writes, max fill {5} words, {6} waits{7}".format(
+                "refill" if refill else "per point", len(scanvalues), args.points, len(scanvalues) / elapsed,
+                statistics['writes'], statistics['maxFill'], statistics['waits'],
+                ", FIFO overflow" if statistics['overflow'] else ""))
+    finally:
+        pulser.shutdown()
@@ -0,0 +1,105 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import unittest
+
+import numpy
+from PyQt5 import QtWidgets
+
+from pulser.FifoRefill import FifoRefill, codeArray
+from unittests.fixtures import mockOpalKelly, ListQueue
+
+SimulatedPulser = None
+
+
+def setUpModule():
+    global SimulatedPulser
+    patch = mockOpalKelly()
+    patch.start()
+    unittest.addModuleCleanup(patch.stop)
+    from unittests.pulser import SimulatedPulser
+
+
+class FifoRefillTest(unittest.TestCase):
+    def test_chunks(self):
+        refill = FifoRefill(SimulatedPulser.scanCode(1000), 2, fifoDepth=100)
+        self.assertEqual(len(refill.nextChunk(force=True)), 100)
+        self.assertEqual(len(refill.nextChunk()), 0)
+        refill.pointFinished(10)
+        self.assertEqual(len(refill.nextChunk()), 0)    # less than a chunk free
+        refill.pointFinished(3)
+        chunk = refill.nextChunk()
+        self.assertEqual(len(chunk), 26)
+        self.assertEqual(chunk[1], 50)
+        self.assertEqual(refill.fillLevel, 100)
+        refill.pointFinished(1000)
+        written = 126
+        while not refill.done:
+            written += len(refill.nextChunk())
+        self.assertEqual(written, 2000)
+
+    def test_window(self):
+        refill = FifoRefill(SimulatedPulser.scanCode(1000), 2, startPoint=100, fifoDepth=100, window=20)
+        self.assertEqual(refill.nextChunk(force=True)[1], 100)
+        self.assertEqual(refill.written, 240)
+        refill.pointFinished(50)
+        self.assertEqual(len(refill.nextChunk()), 0)    # the client did not acknowledge the points
+        refill.acknowledge(150)
+        self.assertEqual(refill.written + len(refill.nextChunk()), 340)
+
+    def test_code_array(self):
+        code = [17, -1, 0xffffffffffffffff]
+        numpy.testing.assert_array_equal(codeArray(code), [17, 0xffffffffffffffff, 0xffffffffffffffff])
+
+
+class OverrunTest(unittest.TestCase):
+    def test_overrun_flush(self):
+        counts = [0x0100000000000003] * 3
+        server = SimulatedPulser.RecordedPulserServer([([0xfffc000000000000, 0] + counts + [0xfffc000000000000, 1] + counts, False),
+                                       (counts, True),
+                                       (counts + [0xfffc000000000000, 2] + counts, False),
+                                       ([0xfffc000000000000, 3] + counts, False),
+                                       ([0xffffffffffffffff], False)], ListQueue())
+        server.ppSetScanCode(SimulatedPulser.scanCode(10), 2)
+        server.ppStartRefill()
+        finished = list()
+        for _ in range(5):
+            server.readDataFifo()
+            finished.append(server.fifoRefill.finished)
+        self.assertEqual(finished, [1, 1, 1, 3, 3])    # point 1 is flushed on overrun and finished at scan value 3
+        self.assertEqual([data.scanvalue for data in server.dataQueue], [0, 1, 2, 3])
+        self.assertEqual([data.final for data in server.dataQueue], [False, False, False, True])
+
+
+class SimulatedPulserTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+        cls.pulser = SimulatedPulser.SimulatedPulserHardware()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pulser.shutdown()
+
+    def test_refill(self):
+        scanvalues, _, statistics = SimulatedPulser.runScan(self.pulser, 5000, True, pointDuration=2e-5)
+        self.assertEqual(scanvalues, list(range(5000)))
+        self.assertFalse(statistics['overflow'])
+        self.assertLessEqual(statistics['maxFill'], self.pulser.serverClass.inputFifoDepth)
+        self.assertLess(statistics['writes'], 100)
+
+    def test_slow_client(self):
+        self.pulser.refillWindow = 100
+        try:
+            scanvalues, _, statistics = SimulatedPulser.runScan(self.pulser, 1000, True, pointDuration=1e-5, evaluation=2e-4)
+        finally:
+            del self.pulser.refillWindow
+        self.assertEqual(scanvalues, list(range(1000)))
+        self.assertFalse(statistics['overflow'])
+        self.assertLessEqual(statistics['maxFill'], 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import unittest
+
+from PyQt5 import QtWidgets
+
+from unittests.fixtures import mockOpalKelly
+
+
+class PulserHardwareClientTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+        patch = mockOpalKelly()
+        patch.start()
+        cls.addClassCleanup(patch.stop)
+        from pulser.PMTReaderServer import PMTReaderServer
+        from pulser.PulserHardwareClient import PulserHardware
+
+        class PMTReaderHardware(PulserHardware):
+            serverClass = PMTReaderServer
+        cls.serverClass, cls.hardwareClass = PMTReaderServer, PMTReaderHardware
+
+    def test_pmt_reader_server(self):
+        pulser = self.hardwareClass()
+        try:
+            self.assertIsInstance(pulser.serverProcess, self.serverClass)
+            self.assertIs(pulser.serverProcess.acknowledgedPoints, pulser.acknowledgedPoints)
+            for _ in range(3):     # the server loop reads the data FIFO between the commands
+                self.assertEqual(pulser.getShutter(), 0)
+        finally:
+            pulser.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Throughput benchmark of the transport of Data objects from the pulser server process.
+
+A producer process sends scan points with the given number of shots either through the
+multiprocessing.Queue only or through the SharedDataRing, the consumer in this process
+reconstructs the Data objects and reports points/s.
+
+usage: python -m unittests.pulser.SharedDataRingBenchmark [--points N] [--shots N] [--counters N]
+"""
+import argparse
+import multiprocessing
+import time
+
+import numpy
+
+from pulser.PulserData import Data
+from pulser.SharedDataRing import SharedDataRing
+
+
+def makePoint(scanvalue, shots, counters):
+    data = Data()
+    data.scanvalue = scanvalue
+    for channel in range(counters):
+        data.count[channel] = numpy.arange(shots)
+    data.timeTick[0] = numpy.arange(shots)
+    return data
+
+
+def producer(queue, ring, points, shots, counters):
+    template = makePoint(0, shots, counters)
+    for scanvalue in range(points):
+        data = Data()
+        data.scanvalue = scanvalue
+        data.count = template.count
+        data.timeTick = template.timeTick
+        descriptor = ring.write(data) if ring is not None else None
+        while ring is not None and descriptor is None and ring.freeSpace() < ring.size // 2:
+            time.sleep(0)      # wait for the consumer instead of measuring the queue fallback
+            descriptor = ring.write(data)
+        queue.put(descriptor if descriptor is not None else data)
+    queue.put(None)
+
+
+def consume(queue, ring):
+    received = 0
+    while True:
+        item = queue.get()
+        if item is None:
+            return received
+        if ring is not None and item.__class__.__name__ == 'SharedDataDescriptor':
+            ring.read(item)
+        received += 1
+
+
+def run(points, shots, counters, ringSize):
+    queue = multiprocessing.Queue()
+    ring = SharedDataRing(ringSize) if ringSize else None
+    process = multiprocessing.Process(target=producer, args=(queue, ring, points, shots, counters))
+    start = time.perf_counter()
+    process.start()
+    received = consume(queue, ring)
+    elapsed = time.perf_counter() - start
+    process.join()
+    return received / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Data transport between pulser server and client")
+    parser.add_argument('--points', type=int, default=2000)
+    parser.add_argument('--shots', type=int, default=1000)
+    parser.add_argument('--counters', type=int, default=8)
+    parser.add_argument('--ringsize', type=int, default=16 * 1024 * 1024, help='words in the shared memory ring')
+    args = parser.parse_args()
+    queueRate = run(args.points, args.shots, args.counters, 0)
+    ringRate = run(args.points, args.shots, args.counters, args.ringsize)
+    print("{0} points with {1} shots on {2} counters: queue {3:.0f} points/s, shared memory ring {4:.0f} points/s".format(
+        args.points, args.shots, args.counters, queueRate, ringRate))
@@ -0,0 +1,95 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import json
+import unittest
+
+import numpy
+
+from pulser.DataFifoDecoder import DataFifoDecoder
+from pulser.PulserData import Data, ChannelColumns, RaggedColumns
+from pulser.SharedDataRing import SharedDataRing, SharedDataDescriptor
+from unittests.fixtures import ListQueue, syntheticFifoData, chunks
+
+
+def makeData(shots=10, scanvalue=1):
+    data = Data()
+    data.scanvalue = scanvalue
+    data.count[0] = list(range(shots))
+    data.count[33] = [0.5 * i for i in range(shots)]
+    data.timeTick[0] = list(range(100, 100 + shots))
+    data.result = ChannelColumns(numpy.uint64)
+    data.result[2] = [0xffff000000000001] * shots
+    data.timestampZero = ChannelColumns(numpy.int64)
+    data.timestampZero[1] = list(range(shots))
+    data.timestamp = RaggedColumns(numpy.int64)
+    data.timestamp.setChannel(1, [value for i in range(shots) for value in range(i)],
+                              [i * (i - 1) // 2 for i in range(shots)])
+    data.dependentValues = [17]
+    return data
+
+
+class SharedDataRingTest(unittest.TestCase):
+    def assertDataEqual(self, expected, actual):
+        for field in ('count', 'timeTick', 'result', 'timestampZero'):
+            self.assertEqual({k: list(v) for k, v in getattr(expected, field).items()},
+                             {k: list(v) for k, v in getattr(actual, field).items()})
+        self.assertEqual([list(gate) for gate in expected.timestamp[1]], [list(gate) for gate in actual.timestamp[1]])
+        self.assertEqual(expected.scanvalue, actual.scanvalue)
+        self.assertEqual(expected.dependentValues, actual.dependentValues)
+
+    def test_roundtrip(self):
+        ring = SharedDataRing(1000)
+        data = makeData()
+        descriptor = ring.write(data)
+        self.assertIsInstance(descriptor, SharedDataDescriptor)
+        self.assertFalse(descriptor.data.count)
+        received = ring.read(descriptor)
+        self.assertDataEqual(makeData(), received)
+        self.assertEqual(received.count[0].dtype, numpy.int64)
+        self.assertEqual(received.count[33].dtype, numpy.float64)
+        self.assertEqual(received.result[2].dtype, numpy.uint64)
+        self.assertEqual(ring.freeSpace(), 1000)
+
+    def test_wraparound(self):
+        ring = SharedDataRing(200)
+        for scanvalue in range(20):
+            descriptor = ring.write(makeData(scanvalue=scanvalue))
+            self.assertIsNotNone(descriptor)
+            self.assertDataEqual(makeData(scanvalue=scanvalue), ring.read(descriptor))
+
+    def test_fallback_when_full(self):
+        ring = SharedDataRing(200)
+        first = ring.write(makeData())
+        self.assertIsNotNone(first)
+        self.assertIsNone(ring.write(makeData()))
+        ring.read(first)
+        self.assertIsNotNone(ring.write(makeData()))
+        self.assertIsNone(ring.write(makeData(shots=1000)))
+
+    def test_decoder(self):
+        fifo = chunks(syntheticFifoData(points=10, shots=20), 4096)
+        reference = DataFifoDecoder()
+        reference.dataQueue = ListQueue()
+        shared = DataFifoDecoder()
+        shared.dataQueue = ListQueue()
+        shared.sharedDataRing = SharedDataRing(1 << 20)
+        for buffer in fifo:
+            reference.decodeDataTokens(buffer)
+            shared.decodeDataTokens(buffer)
+        self.assertEqual(len(reference.dataQueue), len(shared.dataQueue))
+        for expected, item in zip(reference.dataQueue, shared.dataQueue):
+            if isinstance(item, SharedDataDescriptor):
+                received = shared.sharedDataRing.read(item)
+                self.assertEqual(expected.count.toDict(), received.count.toDict())
+                self.assertEqual(expected.timestamp.toDict(), received.timestamp.toDict())
+                self.assertEqual(expected.result.toDict(), received.result.toDict())
+                self.assertEqual(expected.scanvalue, received.scanvalue)
+                expectedFields, receivedFields = json.loads(expected.dataString()), json.loads(received.dataString())
+                del expectedFields[11], receivedFields[11]   # creation time
+                self.assertEqual(expectedFields, receivedFields)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Pulser server processes with simulated hardware, shared by the pulser tests and benchmarks
+
+The pulser server imports the Opal Kelly driver, import this module while
+unittests.fixtures.mockOpalKelly is active.
+"""
+from collections import deque
+import threading
+import time
+
+import numpy
+from PyQt5 import QtCore
+
+from pulser.FifoRefill import codeArray
+from pulser.PulserHardwareClient import PulserHardware
+from pulser.PulserHardwareServer import PulserHardwareServer
+
+
+EndOfRun = 0xffffffffffffffff
+ScanParameter = 0xfffc000000000000
+
+
+class SimulatedPulserServer(PulserHardwareServer):
+    """pulser server process with a simulated pulse program instead of the FPGA.
+    The pulse program reads the code of one point from the input FIFO at the start of
+    every point and returns the scan value (the last word of the code of the point)
+    and shots counts. It waits if the code of the next point is not in the FIFO yet."""
+    def __init__(self, *args, **kwargs):
+        super(SimulatedPulserServer, self).__init__(*args, **kwargs)
+        self.inputFifo = deque()
+        self.simulateScan(0, 2)
+        self.ppRunning = False
+
+    def simulateScan(self, points, wordsPerPoint, pointDuration=1e-5, shots=10):
+        self.points = points
+        self.simulatedWordsPerPoint = wordsPerPoint
+        self.pointDuration = pointDuration
+        self.shots = shots
+        self.executed = 0
+        self.statistics = {'writes': 0, 'words': 0, 'maxFill': 0, 'overflow': False, 'waits': 0}
+        return True
+
+    def simulationStatistics(self):
+        return dict(self.statistics)
+
+    def ppUpload(self, binary, codestartaddress=0, datastartaddress=0):
+        return True
+
+    def ppWriteData(self, data):
+        words = numpy.frombuffer(bytes(data), dtype=numpy.uint64) if isinstance(data, bytearray) else codeArray(data)
+        self.inputFifo.extend(words.tolist())
+        self.statistics['writes'] += 1
+        self.statistics['words'] += len(words)
+        self.statistics['maxFill'] = max(self.statistics['maxFill'], len(self.inputFifo))
+        if len(self.inputFifo) > self.inputFifoDepth:
+            self.statistics['overflow'] = True
+        return len(words)
+
+    def ppClearWriteFifo(self):
+        PulserHardwareServer.ppClearWriteFifo(self)
+        self.inputFifo.clear()
+
+    def ppFlushData(self):
+        self.data = self.dataClass()
+
+    def ppStart(self):
+        self.data = self.dataClass()
+        self.executed = 0
+        self.startTime = time.perf_counter()
+        self.ppRunning = True
+        return True
+
+    def ppStop(self):
+        self.ppRunning = False
+        return True
+
+    def clearOverrun(self):
+        pass
+
+    def ppReadData(self, minbytes=8):
+        if not self.ppRunning:
+            return None, False, 0
+        due = min(self.points, int((time.perf_counter() - self.startTime) / self.pointDuration))
+        tokens = list()
+        while self.executed < due:
+            if len(self.inputFifo) < self.simulatedWordsPerPoint:
+                self.statistics['waits'] += 1
+                self.startTime = time.perf_counter() - self.executed * self.pointDuration
+                break
+            for _ in range(self.simulatedWordsPerPoint):
+                value = self.inputFifo.popleft()
+            tokens.append(ScanParameter)
+            tokens.append(value)
+            tokens.extend([(0x01 << 56) | count for count in range(self.shots)])
+            self.executed += 1
+        if self.executed >= self.points:
+            tokens.append(EndOfRun)
+            self.ppRunning = False
+        if not tokens:
+            return None, False, 0
+        return bytearray(numpy.array(tokens, dtype=numpy.uint64).tobytes()), False, 0
+
+
+class SimulatedPulserHardware(PulserHardware):
+    serverClass = SimulatedPulserServer
+
+
+class RecordedPulserServer(PulserHardwareServer):
+    """pulser server reading the recorded (tokens, overrun) from the data pipe"""
+    def __init__(self, reads, dataQueue):
+        super(RecordedPulserServer, self).__init__(dataQueue=dataQueue)
+        self.reads = [(bytearray(numpy.array(tokens, dtype=numpy.uint64).tobytes()), overrun, 0) for tokens, overrun in reads]
+
+    def ppReadData(self, minbytes=8):
+        return self.reads.pop(0)
+
+    def ppWriteData(self, data):
+        return len(data) // 8
+
+
+def scanCode(points, address=17):
+    """code of a scan writing the scan index to address"""
+    code = numpy.empty(2 * points, dtype=numpy.int64)
+    code[0::2] = address
+    code[1::2] = numpy.arange(points)
+    return code.tolist()
+
+
+class ScanClient(object):
+    """receives the Data of a scan, evaluation is the time spent per point. With refill
+    the points are acknowledged, otherwise the code of the next point is written."""
+    def __init__(self, pulser, code, refill, evaluation=0):
+        self.pulser = pulser
+        self.code = code
+        self.refill = refill
+        self.evaluation = evaluation
+        self.nextIndexToWrite = 0
+        self.scanvalues = list()
+        self.finished = threading.Event()
+        pulser.dataAvailable.connect(self.onData, QtCore.Qt.DirectConnection)
+
+    def start(self, points, pointDuration, shots):
+        self.pulser.simulateScan(points, 2, pointDuration, shots)
+        self.pulser.ppClearWriteFifo()
+        if self.refill:
+            self.pulser.ppSetScanCode(self.code, 2)
+            self.pulser.ppStartRefill(0)
+        else:
+            self.nextIndexToWrite = min(len(self.code), PulserHardwareServer.inputFifoDepth)
+            self.pulser.ppWriteData(self.code[:self.nextIndexToWrite])
+        self.pulser.ppStart()
+
+    def onData(self, data, queuesize):
+        if data.scanvalue is not None:
+            self.scanvalues.append(data.scanvalue)
+        if self.evaluation:
+            time.sleep(self.evaluation)
+        if data.final:
+            self.finished.set()
+        elif self.refill:
+            self.pulser.acknowledgePoints(len(self.scanvalues))
+        elif self.nextIndexToWrite < len(self.code):
+            self.pulser.ppWriteData(self.code[self.nextIndexToWrite:self.nextIndexToWrite + 2])
+            self.nextIndexToWrite += 2
+
+    def disconnect(self):
+        self.pulser.dataAvailable.disconnect(self.onData)
+
+
+def runScan(pulser, points, refill, pointDuration=1e-5, shots=10, evaluation=0, timeout=60):
+    """run a simulated scan and return the received scan values, the elapsed time and the server statistics"""
+    client = ScanClient(pulser, scanCode(points), refill, evaluation)
+    start = time.perf_counter()
+    client.start(points, pointDuration, shots)
+    client.finished.wait(timeout)
+    elapsed = time.perf_counter() - start
+    client.disconnect()
+    return client.scanvalues, elapsed, pulser.simulationStatistics()
@@ -0,0 +1,87 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import unittest
+from unittest import mock
+
+import numpy
+from PyQt5 import QtCore, QtWidgets
+from pyqtgraph import PlotWidget
+
+from fit import FitFunctions  #@UnusedImport
+from fit.FitFunctionBase import fitFunctionMap
+from fit.FitService import fitService
+from fit.StoredFitFunction import StoredFitFunction
+from scan.AnalysisControl import AnalysisControl, AnalysisDefinitionElement
+from trace.PlottedTrace import PlottedTrace
+from trace.TraceCollection import TraceCollection
+
+
+class AnalysisControlTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    @classmethod
+    def tearDownClass(cls):
+        fitService().shutdown()
+
+    def setUp(self):
+        if not isinstance(self.app, QtWidgets.QApplication):
+            self.skipTest("the analysis control needs a QApplication, not the QCoreApplication of an earlier test")
+        self.control = AnalysisControl(dict(), dict(), 'test', ['line'])
+        self.control.setupUi(self.control)
+        self.widget = PlotWidget()
+        trace = TraceCollection()
+        trace.x = numpy.arange(10.)
+        trace.y = 2 * trace.x + 1
+        self.plottedTrace = PlottedTrace(trace, self.widget)
+        self.plottedTrace.plot()
+        evaluation = AnalysisDefinitionElement()
+        evaluation.name = 'fit'
+        evaluation.evaluation = 'line'
+        fitfunction = fitFunctionMap['Line']()
+        fitfunction.startParameters = [0, 0]
+        evaluation.fitfunction = StoredFitFunction.fromFitfunction(fitfunction)
+        self.control.analysisDefinition = [evaluation]
+        self.results = list()
+        self.control.analysisResultSignal.connect(self.results.append)
+
+    def tearDown(self):
+        self.plottedTrace.removePlots()
+        self.widget.close()
+
+    def waitFor(self, done, timeout=60000):
+        timer = QtCore.QElapsedTimer()
+        timer.start()
+        while not done and timer.elapsed() < timeout:
+            self.app.processEvents()
+            QtCore.QThread.msleep(10)
+
+    def assertFitted(self):
+        self.assertEqual(list(self.results[0].keys()), ['fit'])
+        numpy.testing.assert_allclose([self.results[0]['fit']['m'], self.results[0]['fit']['b']], [2, 1])
+        numpy.testing.assert_allclose(self.plottedTrace.fitFunction.parameters, [2, 1])
+
+    def test_analyze(self):
+        failedToPush = list()
+        self.control.analyze({'line': self.plottedTrace}, failedToPush.append)
+        self.assertEqual((failedToPush, self.results), ([], []))     # the fit runs in the fit service
+        self.waitFor(failedToPush)
+        self.assertEqual(failedToPush, [[]])
+        self.assertFitted()
+        self.assertEqual(self.control.pendingFits, dict())
+
+    def test_pool_not_available(self):
+        failedToPush = list()
+        with mock.patch('modules.ProcessPoolService.ProcessPoolExecutor', side_effect=OSError("no processes")):
+            fitService().shutdown()
+            self.control.analyze({'line': self.plottedTrace}, failedToPush.append)
+        self.assertEqual(failedToPush, [[]])       # fitted in this process before analyze returns
+        self.assertFitted()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of the state detection evaluations.
+
+Evaluates synthetic points with two thresholded ions, their parity, a two ion
+evaluation, a fidelity, a double count range and a counter sum threshold evaluation,
+with the per shot list comprehensions originally implemented in EvaluationMethods,
+with the current evaluate per point and with evaluateMany, and reports the times
+per point.
+
+usage: python -m unittests.scan.EvaluationMethodsBenchmark [--points N] [--shots N]
+"""
+import argparse
+import math
+import time
+
+import numpy
+
+from scan.EvaluationBase import EvaluationAlgorithms, EvaluationException
+from scan import EvaluationMethods  #@UnusedImport
+from unittests.fixtures import syntheticScanData
+from unittests.scan.EvaluationMethods_test import stateEvaluations, evaluatePoints, evaluateMany
+
+
+def wilson(x, N):
+    p = x/N
+    rootp = 3-1/N -4*p+4*N*(1-p)*p
+    top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
+    rootb = -1-1/N +4*p+4*N*(1-p)*p
+    bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0
+    return p, bottom, top
+
+
+class ReferenceEvaluation(object):
+    """per shot evaluation of the original implementation, ReferenceEvaluation(name, settings)
+    evaluates like EvaluationAlgorithms[name] with settings"""
+    ExpectedLookup = { 'd': 0, 'u' : 1, '1':0.5, '-1':0.5, 'i':0.5, '-i':0.5 }
+
+    def __init__(self, name, settings):
+        self.name = name
+        self.settings = EvaluationAlgorithms[name]().settings
+        self.settings.update(settings)
+
+    def countArray(self, data, evaluation):
+        if self.name.startswith('Counter Sum'):
+            counters = [((self.settings['id']&0xff)<<8) | (int(counter) & 0xff) for counter in self.settings['counters']]
+            listOfCountArrays = [data.count[counter] for counter in counters if counter in data.count.keys()]
+            return [sum(sublist) for sublist in zip(*listOfCountArrays)]
+        return list(evaluation.getChannelData(data))
+
+    def discriminate(self, data, evaluation):
+        s = self.settings
+        if self.name in ('Parity', 'TwoIon'):
+            eval1, eval2 = data.evaluated.get(s['Ion_1']), data.evaluated.get(s['Ion_2'])
+            if eval1 is None or eval2 is None or len(eval1) != len(eval2):
+                raise EvaluationException("Invalid evaluated data")
+            if self.name == 'Parity':
+                return [ 1 if e1==e2 else -1 for e1, e2 in zip(eval1, eval2) ]
+            lookup = {(0,0): s['dd'], (0,1): s['db'], (1,0): s['bd'], (1,1): s['bb'] }
+            return [ lookup[pair] for pair in zip(eval1, eval2) ]
+        countarray = self.countArray(data, evaluation)
+        if self.name == 'Count Range':
+            discriminated = [ 1 if s['min'] <= count <= s['max'] else 0 for count in countarray ]
+        elif self.name == 'Double Count Range':
+            discriminated = [ 1 if ( s['min_1'] <= count <= s['max_1'] ) or
+                             ( s['min_2'] <= count <= s['max_2'] )  else 0 for count in countarray ]
+        else:
+            discriminated = [ 1 if count > s['threshold'] else 0 for count in countarray ]
+        return [1 - d for d in discriminated] if s.get('invert') else discriminated
+
+    def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None):
+        discriminated = self.discriminate(data, evaluation)
+        if len(discriminated) == 0:
+            return 0, None, 0
+        if evaluation.name:
+            data.evaluated[evaluation.name] = discriminated
+        N = float(len(discriminated))
+        x = float(numpy.sum(discriminated)) if self.name == 'TwoIon' else numpy.sum(discriminated)
+        p, bottom, top = wilson(x, N)
+        if expected is not None and self.name in ('Fidelity', 'Parity', 'TwoIon'):
+            expected = self.ExpectedLookup[expected] if self.name == 'Fidelity' else expected
+            p = abs(expected-p)
+            bottom = abs(expected-bottom)
+            top = abs(expected-top)
+        return p, (p-bottom, top-p), x
+
+
+def evaluateReference(points, evalList, expected=None):
+    algorithms = [ReferenceEvaluation(evaluation.evaluation, evaluation.settings) for evaluation in evalList]
+    results = list()
+    for index, data in enumerate(points):
+        data.evaluated = dict()
+        results.append([algo.evaluate(data, evaluation, expected[index] if expected else None)
+                        for evaluation, algo in zip(evalList, algorithms)])
+    return results
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the state detection evaluations")
+    parser.add_argument('--points', type=int, default=50)
+    parser.add_argument('--shots', type=int, default=10000)
+    args = parser.parse_args()
+    points = syntheticScanData(args.points, args.shots)
+    evalList = stateEvaluations()
+    _, referenceTime = timed(evaluateReference, points, evalList)
+    _, pointTime = timed(evaluatePoints, points, evalList)
+    _, manyTime = timed(evaluateMany, points, evalList)
+    print("{0} evaluations, {1} shots: reference {2:.3f} ms/point, vectorized {3:.3f} ms/point, evaluateMany {4:.3f} ms/point".format(
+        len(evalList), args.shots, 1e3 * referenceTime / args.points, 1e3 * pointTime / args.points,
+        1e3 * manyTime / args.points))
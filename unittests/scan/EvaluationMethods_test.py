@@ -0,0 +1,147 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import unittest
+
+import numpy
+
+from modules.quantity import Q
+from pulser.PulserData import Data
+from scan.EvaluationBase import EvaluationAlgorithms
+from unittests.fixtures import syntheticScanData, evaluationDefinition
+from scan import EvaluationMethods  #@UnusedImport
+
+
+def stateEvaluations():
+    """state detection evaluations of two ions in counter 0 and 1"""
+    return [evaluationDefinition('ion1', 'Threshold', 0, threshold=2),
+            evaluationDefinition('ion2', 'Threshold', 1, threshold=2, invert=True),
+            evaluationDefinition('parity', 'Parity', Ion_1='ion1', Ion_2='ion2'),
+            evaluationDefinition('twoIon', 'TwoIon', Ion_1='ion1', Ion_2='ion2', db=0, bd=0.5),
+            evaluationDefinition('fidelity', 'Fidelity', 0, threshold=3),
+            evaluationDefinition('range', 'Double Count Range', 1, min_1=1, max_1=3, min_2=8, max_2=12),
+            evaluationDefinition('sum', 'Counter Sum Threshold', counters=['0', '1'], threshold=5)]
+
+
+def algorithms(evalList):
+    """algorithm instances configured with the settings of the evaluations in evalList"""
+    result = list()
+    for evaluation in evalList:
+        algo = EvaluationAlgorithms[evaluation.evaluation]()
+        algo.setSettings(dict(evaluation.settings), evaluation.name)
+        result.append(algo)
+    return result
+
+
+def evaluatePoints(points, evalList, expected=None):
+    """evaluate point by point with evaluate, returns [[(mean, error, raw) per evaluation] per point]"""
+    algos = algorithms(evalList)
+    results = list()
+    for index, data in enumerate(points):
+        data.evaluated = dict()
+        results.append([algo.evaluate(data, evaluation, expected[index] if expected else None)
+                        for evaluation, algo in zip(evalList, algos)])
+    return results
+
+
+def evaluateMany(points, evalList, expected=None):
+    """evaluate all points with evaluateMany, returns the results like evaluatePoints"""
+    for data in points:
+        data.evaluated = dict()
+    columns = [algo.evaluateMany(points, evaluation, expected) for evaluation, algo in zip(evalList, algorithms(evalList))]
+    return [list(point) for point in zip(*columns)]
+
+
+# Wilson error bars (mean - bottom, top - mean) of x bright out of 6 shots
+Error3 = (0.258147466, 0.258147466)
+Error2 = (0.2151338962, 0.2819569898)
+Error4 = (0.2819569898, 0.2151338962)
+
+
+def point():
+    """ion 1 counts (threshold 2: 0, 1, 1, 0, 0, 1), ion 2 counts (threshold 2: 1, 0, 1, 0, 1, 0)"""
+    data = Data()
+    data.count[0] = numpy.array([0, 3, 5, 1, 2, 9])
+    data.count[1] = numpy.array([4, 0, 10, 2, 8, 1])
+    return data
+
+
+class EvaluationMethodsTest(unittest.TestCase):
+    def assertResults(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        for (mean, error, raw), (actualMean, actualError, actualRaw) in zip(expected, actual):
+            self.assertAlmostEqual(mean, actualMean, places=12)
+            self.assertAlmostEqual(raw, actualRaw, places=9)
+            if error is None:
+                self.assertIsNone(actualError)
+            else:
+                numpy.testing.assert_allclose(actualError, error, rtol=0, atol=1e-9)
+
+    def assertSameResults(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        for expectedPoint, actualPoint in zip(expected, actual):
+            self.assertResults(expectedPoint, actualPoint)
+
+    def test_evaluate(self):
+        expected = [(0.5, Error3, 3),               # ion1
+                    (0.5, Error3, 3),               # ion2, inverted
+                    (1 / 3, Error2, 2),             # parity
+                    (0.75, (0.2869008199, 0.1844047142), 4.5),    # twoIon with db=0 and bd=0.5
+                    (1 / 3, Error2, 2),             # fidelity, threshold 3
+                    (2 / 3, Error4, 4),             # double count range 1..3 or 8..12
+                    (0.5, Error3, 3)]               # counter sum threshold 5 of ion 1 and 2
+        for evaluate in (evaluatePoints, evaluateMany):
+            (results, ) = evaluate([point()], stateEvaluations())
+            self.assertResults(expected, results)
+
+    def test_two_ion_expected(self):
+        expected = [(1 / 6, (-0.2151338962, -0.0513763436), 2), (0.25, (0.2130991801, 0.1844047142), 4.5)]
+        for evaluate in (evaluatePoints, evaluateMany):
+            (results, ) = evaluate([point()], stateEvaluations()[:4], [0.5])
+            self.assertResults(expected, results[2:])
+        points = syntheticScanData(points=30, shots=200)
+        self.assertSameResults(evaluatePoints(points, stateEvaluations()[:4], [0.5] * 30),
+                               evaluateMany(points, stateEvaluations()[:4], [0.5] * 30))
+        self.assertEqual(points[0].evaluated['parity'].dtype, numpy.int8)
+
+    def test_fidelity_expected(self):
+        evalList = [evaluationDefinition('fidelity', 'Fidelity', 0, threshold=Q(3)),
+                    evaluationDefinition('range', 'Count Range', 1, min=2, max=10, invert=True)]
+        fidelities = {'d': (1 / 3, Error2, 2), 'u': (2 / 3, (-0.2151338962, -0.2819569898), 2),
+                      'i': (1 / 6, (-0.2151338962, -0.0513763436), 2), '-1': (1 / 6, (-0.2151338962, -0.0513763436), 2)}
+        for expected, fidelity in fidelities.items():
+            for evaluate in (evaluatePoints, evaluateMany):
+                (results, ) = evaluate([point()], evalList, [expected])
+                self.assertResults([fidelity, (1 / 3, Error2, 2)], results)
+        points = syntheticScanData(points=20, shots=100)
+        expected = ['d', 'u', 'i', '-1'] * 5
+        self.assertSameResults(evaluatePoints(points, evalList, expected), evaluateMany(points, evalList, expected))
+
+    def test_empty_counts(self):
+        points = syntheticScanData(points=30, shots=200)
+        points[3].count[0] = []   # point without counts in channel 0
+        points.append(Data())
+        points[-1].count[1] = []
+        evalList = stateEvaluations()[:2] + stateEvaluations()[4:]
+        results = evaluatePoints(points, evalList)
+        self.assertSameResults(results, evaluateMany(points, evalList))
+        self.assertEqual([results[3][index] for index in (0, 2)], [(0, None, 0), (0, None, 0)])
+        self.assertEqual(results[-1][1], (0, None, 0))
+
+    def test_counter_sum_cache(self):
+        points = syntheticScanData(points=2, shots=50)
+        evalList = [evaluationDefinition('sum', 'Counter Sum Threshold', counters=['0', '1', '2'], threshold=20),
+                    evaluationDefinition('mean', 'Counter Sum Mean', counters=['0', '1', '2'])]
+        results = evaluatePoints(points, evalList)
+        self.assertEqual(len(points[0].channelCache), 1)
+        summed = points[0].count[0] + points[0].count[1] + points[0].count[2]
+        numpy.testing.assert_array_equal(list(points[0].channelCache.values())[0], summed)
+        self.assertAlmostEqual(results[0][0][0], numpy.mean(summed > 20))
+        self.assertEqual(results[0][0][2], numpy.count_nonzero(summed > 20))
+        self.assertAlmostEqual(results[0][1][0], numpy.mean(summed))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of the evaluation pipeline by replaying raw data files.
+
+Records synthetic scans (Poisson distributed counts of a bright and a dark ion) with
+the DataRecorder and replays them with threshold, parity and mean evaluations, once
+in this process and once with the ReplayService, and reports the throughput in
+points/s.
+
+usage: python -m unittests.scan.ReplayBenchmark [--files N] [--points N] [--shots N] [--processes N]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from scan.Replay import ReplayJob, ReplayService, replayData
+from trace.RawData import DataReader
+from unittests.fixtures import syntheticScanData
+from unittests.scan.Replay_test import recordScan, evaluations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the evaluation pipeline by replaying raw data")
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--points', type=int, default=500)
+    parser.add_argument('--shots', type=int, default=100)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp()
+    try:
+        filenames = [os.path.join(directory, 'scan{0}.bin'.format(index)) for index in range(args.files)]
+        for seed, filename in enumerate(filenames):
+            recordScan(filename, syntheticScanData(args.points, args.shots, seed))
+        jobs = [ReplayJob(filename, evaluations()) for filename in filenames]
+        points = args.files * args.points
+        start = time.perf_counter()
+        for job in jobs:
+            replayData(DataReader(job.filename), job)
+        localTime = time.perf_counter() - start
+        service = ReplayService(args.processes)
+        service.replayBatch(jobs[:service.processes])   # start the workers
+        start = time.perf_counter()
+        results = service.replayBatch(jobs)
+        serviceTime = time.perf_counter() - start
+        service.shutdown()
+        errors = [result.error for result in results if result.error]
+        print("{0} files of {1} points with {2} shots: in process {3:.0f} points/s, {4} processes {5:.0f} points/s{6}".format(
+            args.files, args.points, args.shots, points / localTime, service.processes, points / serviceTime,
+            ", errors: {0}".format(errors) if errors else ""))
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,115 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from scan.EvaluationBase import EvaluationAlgorithms
+from scan.Replay import ReplayJob, ReplayService, replayData
+from trace.RawData import DataRecorder, DataReader
+from unittests.fixtures import syntheticScanData, evaluationDefinition
+from scan import EvaluationMethods  #@UnusedImport
+
+
+def recordScan(filename, dataList):
+    recorder = DataRecorder(filename)
+    for data in dataList:
+        recorder.record(data)
+    recorder.close()
+
+
+def evaluations(threshold=2):
+    return [evaluationDefinition('ion1', 'Threshold', 0, True, threshold=threshold),
+            evaluationDefinition('ion2', 'Threshold', 1, True, threshold=threshold),
+            evaluationDefinition('parity', 'Parity', Ion_1='ion1', Ion_2='ion2'),
+            evaluationDefinition('background', 'Mean', 2, errorBarType='statistical')]
+
+
+def evaluateScan(dataList, evalList, histogramBins=50):
+    """per point evaluation as done by ScanExperiment.dataMiddlePart and showHistogram"""
+    algorithms = list()
+    for evaluation in evalList:
+        algo = EvaluationAlgorithms[evaluation.evaluation]()
+        algo.setSettings(dict(evaluation.settings), evaluation.name)
+        algorithms.append(algo)
+    evaluated, histograms = list(), dict()
+    for data in dataList:
+        data.evaluated = dict()
+        evaluated.append([algo.evaluate(data, evaluation) for evaluation, algo in zip(evalList, algorithms)])
+        for evaluation, algo in zip(evalList, algorithms):
+            if evaluation.showHistogram:
+                y, x, _ = algo.histogram(data, evaluation, histogramBins)
+                histograms[evaluation.name] = histograms[evaluation.name] + y if evaluation.name in histograms else y
+    return evaluated, histograms
+
+
+class ReplayTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.filenames = [os.path.join(cls.directory, 'scan{0}.bin'.format(seed)) for seed in range(3)]
+        for seed, filename in enumerate(cls.filenames):
+            recordScan(filename, syntheticScanData(points=20, shots=50, seed=seed))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def assertReplayed(self, result, filename, evalList):
+        self.assertIsNone(result.error)
+        expected, histograms = evaluateScan(list(DataReader(filename)), evalList)
+        self.assertEqual(result.points, len(expected))
+        for index, evaluation in enumerate(evalList):
+            name = evaluation.name
+            numpy.testing.assert_allclose(result.value[name], [point[index][0] for point in expected])
+            numpy.testing.assert_allclose(result.errorBottom[name], [point[index][1][0] for point in expected])
+            numpy.testing.assert_allclose(result.errorTop[name], [point[index][1][1] for point in expected])
+            numpy.testing.assert_allclose(result.raw[name], [point[index][2] for point in expected])
+        self.assertEqual(set(result.histograms.keys()), set(histograms.keys()))
+        for name, y in histograms.items():
+            numpy.testing.assert_array_equal(result.histograms[name][0], y)
+
+    def test_replayData(self):
+        evalList = evaluations(threshold=3)
+        job = ReplayJob(self.filenames[0], evalList, xValues=numpy.linspace(0, 1, 20))
+        result = replayData(DataReader(self.filenames[0]), job, batchSize=7)
+        self.assertReplayed(result, self.filenames[0], evalList)
+        numpy.testing.assert_allclose(result.x, numpy.linspace(0, 1, 20))
+
+    def test_values(self):
+        job = ReplayJob(self.filenames[0], evaluations(threshold=3))
+        result = replayData(DataReader(self.filenames[0]), job)
+        self.assertEqual(result.raw['ion1'][:4].tolist(), [20, 35, 37, 44])
+        self.assertEqual(result.raw['ion2'][:4].tolist(), [21, 31, 39, 45])
+        self.assertEqual(result.raw['parity'][:4].tolist(), [0, 2, 18, 36])
+        numpy.testing.assert_allclose(result.value['ion1'][:4], [0.4, 0.7, 0.74, 0.88])
+        numpy.testing.assert_allclose(result.value['parity'][:4], [0, 0.04, 0.36, 0.72])
+        numpy.testing.assert_allclose(result.value['background'][:4], [3.0, 2.82, 2.7, 2.9])
+        numpy.testing.assert_allclose(result.errorBottom['background'], result.errorTop['background'])
+        numpy.testing.assert_allclose(result.errorBottom['ion1'][:2], [0.0761758376, 0.0785945654])
+        numpy.testing.assert_allclose(result.errorTop['ion1'][:2], [0.0806577494, 0.0695550309])
+        self.assertEqual(result.histograms['ion1'][0][:4].tolist(), [318, 146, 38, 3])
+        self.assertEqual(result.histograms['ion1'][0].sum(), 20 * 50)
+
+    def test_replayBatch(self):
+        service = ReplayService(processes=2)
+        try:
+            jobs = [ReplayJob(filename, evaluations(threshold)) for filename in self.filenames for threshold in (1, 5)]
+            jobs.append(ReplayJob(os.path.join(self.directory, 'missing.bin'), evaluations()))
+            results = service.replayBatch(jobs)
+        finally:
+            service.shutdown()
+        self.assertEqual([result.key for result in results], [job.key for job in jobs])
+        for job, result in zip(jobs[:-1], results):
+            self.assertReplayed(result, job.filename, job.evalList)
+        self.assertIsNotNone(results[-1].error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of replotting a growing trace.
+
+Appends blocks of scan points (x in scan order with some points out of order, y, top and
+bottom) to a trace plotted with lines and error bars in an offscreen PlotWidget, replots
+and paints the widget after every block. Runs once with the replot as done before (full
+sort with sort_lists_by, all points and error bars handed to pyqtgraph) and once with
+PlottedTrace, and reports the replot and paint time per appended point for the first and
+the last block.
+
+usage: QT_QPA_PLATFORM=offscreen python -m unittests.trace.PlottedTraceBenchmark [--points N] [--block N]
+"""
+import argparse
+import time
+
+import numpy
+from PyQt5 import QtWidgets
+from pyqtgraph import PlotWidget
+from pyqtgraph.graphicsItems.ErrorBarItem import ErrorBarItem
+
+from trace.PlottedTrace import PlottedTrace, sort_lists_by
+from trace.TraceCollection import TraceCollection
+
+
+class ReferencePlottedTrace(PlottedTrace):
+    """PlottedTrace with the curve and error bars plotted as originally"""
+    def removePlots(self):
+        if self._graphicsView is not None and getattr(self, 'errorBarItem', None) is not None:
+            self._graphicsView.removeItem(self.errorBarItem)
+            self.errorBarItem = None
+        super(ReferencePlottedTrace, self).removePlots()
+
+    def plotErrorBars(self, penindex):
+        if self._graphicsView is not None and self.hasTopColumn and self.hasBottomColumn:
+            self.errorBarItem = ErrorBarItem(x=(self.x), y=(self.y), top=(self.top), bottom=(self.bottom),
+                                             pen=self.penList[penindex][0])
+            self._graphicsView.addItem(self.errorBarItem)
+
+    def plotLines(self, penindex, errorbars=True):
+        if self._graphicsView is not None:
+            if errorbars:
+                self.plotErrorBars(penindex)
+            x, y = sort_lists_by((self.x, self.y), key_list=0) if len(self.x) > 0 else (self.x, self.y)
+            self.curve = self._graphicsView.plot(numpy.array(x), numpy.array(y), pen=self.penList[penindex][0])
+
+    def _replot(self):
+        if self.curve is not None:
+            x, y = sort_lists_by((self.x, self.y), key_list=0) if len(self.x) > 0 else (self.x, self.y)
+            self.curve.setData(numpy.array(x), numpy.array(y))
+        if getattr(self, 'errorBarItem', None) is not None:
+            self.errorBarItem.setOpts(x=(self.x), y=(self.y), top=(self.top), bottom=(self.bottom))
+        self.lastPlotTime = time.time()
+        self.needsReplot = False
+
+
+def scanPoints(start, stop, seed=0):
+    """x, y, top and bottom of points start to stop of a scan, one in ten points out of order"""
+    rng = numpy.random.RandomState(seed + start)
+    x = numpy.arange(start, stop, dtype=numpy.float64)
+    shuffled = rng.rand(len(x)) < 0.1
+    x[shuffled] = rng.uniform(0, stop, numpy.count_nonzero(shuffled))
+    y = numpy.sin(x / 500.) + 0.1 * rng.randn(len(x))
+    error = 0.1 * rng.rand(len(x))
+    return x, y, error, error
+
+
+def run(traceClass, points, block, width=1000, height=600):
+    widget = PlotWidget()
+    widget.resize(width, height)
+    widget.show()
+    trace = TraceCollection()
+    for name, column in zip(('x', 'y', 'top', 'bottom'), scanPoints(0, block)):
+        trace.extendColumn(name, column)
+    plottedTrace = traceClass(trace, widget, style=PlottedTrace.Styles.lines_with_errorbars)
+    plottedTrace.plot()
+    QtWidgets.QApplication.processEvents()
+    blockTimes = list()
+    for start in range(block, points, block):
+        for name, column in zip(('x', 'y', 'top', 'bottom'), scanPoints(start, min(start + block, points))):
+            trace.extendColumn(name, column)
+        begin = time.perf_counter()
+        plottedTrace._replot()
+        widget.grab()
+        blockTimes.append((time.perf_counter() - begin) / block)
+    plottedTrace.removePlots()
+    widget.close()
+    return blockTimes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark replotting a growing trace")
+    parser.add_argument('--points', type=int, default=100000)
+    parser.add_argument('--block', type=int, default=1000)
+    args = parser.parse_args()
+    app = QtWidgets.QApplication([])
+    for traceClass in (ReferencePlottedTrace, PlottedTrace):
+        start = time.perf_counter()
+        blockTimes = run(traceClass, args.points, args.block)
+        total = time.perf_counter() - start
+        print("{0}: {1} points in blocks of {2} in {3:.2f} s, first block {4:.1f} us/point, last block {5:.1f} us/point".format(
+            traceClass.__name__, args.points, args.block, total, blockTimes[0] * 1e6, blockTimes[-1] * 1e6))
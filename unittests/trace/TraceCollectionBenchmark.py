@@ -0,0 +1,67 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of appending scan points to a TraceCollection.
+
+Appends points with x, time interval and y, raw, top and bottom for several evaluations,
+once with numpy.append as done before and once with TraceCollection.appendColumn, and
+reports the time per point for the first and the last block of points.
+
+usage: python -m unittests.trace.TraceCollectionBenchmark [--points N] [--traces N] [--maxpoints N]
+"""
+import argparse
+import time
+
+import numpy
+
+from trace.TraceCollection import TraceCollection
+
+
+def appendNumpy(trace, names, x, point, maxPoints):
+    def append(column, value):
+        trace[column] = numpy.append(trace[column][len(trace[column]) - maxPoints + 1:] if maxPoints > 0 else trace[column], value)
+    append('x', x)
+    append('timeTickFirst', point)
+    append('timeTickLast', point + 1)
+    for name in names:
+        for column in (name, name + '_raw', name + '_top', name + '_bottom'):
+            append(column, point)
+
+
+def appendBuffered(trace, names, x, point, maxPoints):
+    trace.appendColumn('x', x, maxPoints)
+    trace.timeintervalAppend((point, point + 1), maxPoints)
+    for name in names:
+        for column in (name, name + '_raw', name + '_top', name + '_bottom'):
+            trace.appendColumn(column, point, maxPoints)
+
+
+def run(appendFunction, points, traces, maxPoints, block=1000):
+    trace = TraceCollection()
+    names = ['Eval{0}'.format(i) for i in range(traces)]
+    blockTimes = list()
+    start = time.perf_counter()
+    for point in range(points):
+        appendFunction(trace, names, 0.1 * point, point, maxPoints)
+        if (point + 1) % block == 0:
+            now = time.perf_counter()
+            blockTimes.append((now - start) / block)
+            start = now
+    return blockTimes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark appending points to a TraceCollection")
+    parser.add_argument('--points', type=int, default=100000)
+    parser.add_argument('--traces', type=int, default=4)
+    parser.add_argument('--maxpoints', type=int, default=0, help='rolling window length, 0 keeps all points')
+    args = parser.parse_args()
+    for appendFunction in (appendNumpy, appendBuffered):
+        start = time.perf_counter()
+        blockTimes = run(appendFunction, args.points, args.traces, args.maxpoints)
+        total = time.perf_counter() - start
+        print("{0}: {1} points on {2} traces in {3:.2f} s, first block {4:.1f} us/point, last block {5:.1f} us/point".format(
+            appendFunction.__name__, args.points, args.traces, total, blockTimes[0] * 1e6, blockTimes[-1] * 1e6))
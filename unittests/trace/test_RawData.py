@@ -0,0 +1,67 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+from array import array
+import os
+import shutil
+import tempfile
+import unittest
+
+from pulser.DataFifoDecoder import DataFifoDecoder
+from pulser.PulserData import Data
+from trace.RawData import DataRecorder, DataReader, RawData
+from unittests.fixtures import syntheticFifoData, decodeFifoData
+
+
+class TestRawData(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'raw.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        dataList = [data for data in decodeFifoData(DataFifoDecoder, [syntheticFifoData(points=10, shots=20)]).dataQueue
+                    if isinstance(data, Data)]
+        empty = Data()
+        empty.scanvalue = 1.5
+        empty.other = [1, 2]
+        dataList.append(empty)
+        recorder = DataRecorder(self.filename, batchSize=3)
+        for data in dataList:
+            recorder.record(data)
+        recorder.close()
+        reader = DataReader(self.filename)
+        self.assertEqual(len(reader), len(dataList))
+        for expected, actual in zip(dataList, reader):
+            self.assertEqual(expected.dataString(), actual.dataString())
+        self.assertIsNone(reader[-1].timestamp)
+
+    def test_truncated(self):
+        recorder = DataRecorder(self.filename)
+        for scanvalue in range(3):
+            data = Data()
+            data.scanvalue = scanvalue
+            data.count[0] = list(range(100))
+            recorder.record(data)
+        recorder.close()
+        with open(self.filename, 'r+b') as f:
+            f.truncate(os.path.getsize(self.filename) - 10)
+        reader = DataReader(self.filename)
+        self.assertEqual([data.scanvalue for data in reader], [0, 1])
+
+    def test_raw_timestamps(self):
+        raw = RawData()
+        raw.datafile = open(self.filename, 'wb')
+        raw.addInt(range(1000))
+        raw.addFloat([0.5, 1.5])
+        raw.close()
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), array('L', range(1000)).tobytes() + array('d', [0.5, 1.5]).tobytes())
+
+
+if __name__ == "__main__":
+    unittest.main()
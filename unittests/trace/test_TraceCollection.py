@@ -0,0 +1,42 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import unittest
+
+import numpy
+
+from trace.TraceCollection import TraceCollection
+
+
+class TestTraceCollection(unittest.TestCase):
+    def test_rolling_columns(self):
+        trace = TraceCollection()
+        reference = list()
+        for start in range(0, 100, 7):
+            values = numpy.arange(start, start + 7, dtype=numpy.float64)
+            trace.extendColumn('y', values, 20)
+            trace.appendColumn('y', -start, 20)
+            reference = (reference + values.tolist() + [-start])[-20:]
+            self.assertEqual(trace['y'].tolist(), reference)
+
+    def test_replaced_column(self):
+        trace = TraceCollection()
+        trace.extendColumn('x', [1, 2, 3])
+        trace.x = numpy.array([5.0])
+        trace.extendColumn('x', [6, 7], 2)
+        self.assertEqual(trace.x.tolist(), [6, 7])
+
+    def test_views_are_not_modified(self):
+        trace = TraceCollection()
+        trace.extendColumn('x', range(10), 10)
+        view = trace.x
+        for value in range(10, 40):
+            trace.appendColumn('x', value, 10)
+        self.assertEqual(view.tolist(), list(range(10)))
+        self.assertEqual(trace.x.tolist(), list(range(30, 40)))
+
+
+if __name__ == "__main__":
+    unittest.main()
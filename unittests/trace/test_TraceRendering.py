@@ -0,0 +1,130 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import unittest
+
+import numpy
+from PyQt5 import QtWidgets
+from pyqtgraph import PlotWidget
+
+from trace.PlottedTrace import PlottedTrace
+from trace.TraceCollection import TraceCollection
+from trace.TraceRendering import SortedColumns, ErrorBarChunks, minMaxDecimate, errorBarDecimate
+
+
+class RecordingView(object):
+    def __init__(self):
+        self.items = list()
+
+    def addItem(self, item):
+        self.items.append(item)
+
+    def removeItem(self, item):
+        self.items.remove(item)
+
+
+class TestTraceRendering(unittest.TestCase):
+    def test_sorted_columns(self):
+        rng = numpy.random.RandomState(0)
+        trace = TraceCollection()
+        sortedColumns = SortedColumns()
+        for block in range(60):
+            maxPoints = 150 if block >= 40 else 0
+            for value in rng.randint(0, 50, rng.randint(0, 8)) if block % 3 else range(block, block + 5):
+                trace.appendColumn('x', value, maxPoints)
+                trace.appendColumn('y', rng.rand(), maxPoints)
+            if block == 20:
+                trace.x = trace.x[::-1].copy()
+            sortedColumns.update(trace.x, trace.y)
+            order = numpy.argsort(trace.x, kind='stable')
+            x, y = sortedColumns.sorted
+            self.assertEqual(x.tolist(), trace.x[order].tolist())
+            self.assertEqual(y.tolist(), trace.y[order].tolist())
+
+    def test_decimate(self):
+        x = numpy.linspace(0, 1000, 100001)
+        y = numpy.sin(x)
+        y[500] = 5
+        dx, dy = minMaxDecimate(x, y, pixels=200)
+        self.assertLessEqual(len(dx), 401)
+        self.assertEqual((dy.max(), dy.min(), dx[0], dx[-1]), (5, y.min(), 0, 1000))
+        dx, dy = minMaxDecimate(x, y, xRange=(100, 200), pixels=200)
+        self.assertEqual((dx[0], dx[-1]), (x[9999], x[20001]))
+        self.assertEqual(minMaxDecimate(x[:100], y[:100])[0].tolist(), x[:100].tolist())
+        ex, ey, eheight = errorBarDecimate(x, y - 0.5, y + 1, pixels=200)
+        self.assertLessEqual(len(ex), 200)
+        self.assertAlmostEqual((ey + eheight / 2).max(), 6)
+        self.assertAlmostEqual((ey - eheight / 2).min(), -1.5)
+
+    def test_decimate_columns(self):
+        x = numpy.arange(12.)
+        y = numpy.array([3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5, 8.])
+        dx, dy = minMaxDecimate(x, y, pixels=3)     # columns start at the points 0, 4 and 8
+        self.assertEqual(dx.tolist(), [0, 0, 4, 4, 8, 8, 11])
+        self.assertEqual(dy.tolist(), [1, 4, 2, 9, 3, 8, 8])
+        ex, ey, eheight = errorBarDecimate(x, y - 1, y + 2, pixels=3)
+        self.assertEqual((ex.tolist(), ey.tolist(), eheight.tolist()), ([0, 4, 8], [3, 6, 6], [6, 10, 8]))
+        dx, dy = minMaxDecimate(x, y, pixels=6)
+        self.assertEqual((dx.tolist(), dy.tolist()), (x.tolist(), y.tolist()))
+
+    def test_error_bar_chunks(self):
+        view = RecordingView()
+        errorBars = ErrorBarChunks(view, None)
+        trace = TraceCollection()
+        for start, stop in ((0, 100), (100, 150), (150, 200)):    # appended without reallocation
+            trace.extendColumn('x', range(start, stop))
+            trace.extendColumn('y', range(start, stop))
+            trace.extendColumn('height', numpy.ones(stop - start))
+            self.assertEqual(errorBars.setData(trace.x, trace.y, height=trace['height']), start)
+        self.assertEqual(len(view.items), -(-200 // ErrorBarChunks.chunkSize))
+        self.assertLess(errorBars.pointsUpdated, 200 + 2 * ErrorBarChunks.chunkSize)
+        self.assertEqual(errorBars.setData(trace.x[:10].copy(), trace.y[:10], height=trace['height'][:10]), 0)
+        self.assertEqual(len(view.items), 1)
+        errorBars.remove()
+        self.assertEqual(view.items, [])
+
+
+class TestPlottedTrace(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    def setUp(self):
+        if not isinstance(self.app, QtWidgets.QApplication):
+            self.skipTest("plots need a QApplication, not the QCoreApplication of an earlier test")
+        self.widget = PlotWidget()
+        self.trace = TraceCollection()
+        self.trace.x = numpy.arange(5.)
+        self.trace.y = numpy.zeros(5)
+        self.trace['top'] = numpy.full(5, 0.5)
+        self.trace['bottom'] = numpy.full(5, 0.5)
+        self.plotted = PlottedTrace(self.trace, self.widget, style=PlottedTrace.Styles.lines_with_errorbars)
+        self.plotted.plot()
+
+    def tearDown(self):
+        self.plotted.removePlots()
+        self.widget.close()
+
+    def test_in_place_change(self):
+        self.trace.y += 1       # as ScanExperiment.showTimestamps integrates the histogram
+        self.plotted._replot()
+        self.assertEqual(self.plotted.curve.yData.tolist(), [1, 1, 1, 1, 1])
+        self.assertEqual(self.plotted.errorBars.items[0].opts['y'].tolist(), [1, 1, 1, 1, 1])
+        self.trace.y[2] = 7
+        self.trace['top'][4] = 2
+        self.plotted._replot()
+        self.assertEqual(self.plotted.curve.yData.tolist(), [1, 1, 7, 1, 1])
+        self.assertEqual(self.plotted.errorBars.items[0].opts['top'].tolist(), [0.5, 0.5, 0.5, 0.5, 2])
+
+    def test_append(self):
+        for name, value in (('x', 5), ('y', 3), ('top', 0.5), ('bottom', 0.5)):
+            self.trace.appendColumn(name, value)
+        self.plotted._replot()
+        self.assertEqual(self.plotted.curve.yData.tolist(), [0, 0, 0, 0, 0, 3])
+        self.assertEqual(self.plotted.sortedColumns.tracker.length, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
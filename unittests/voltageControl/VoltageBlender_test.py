@@ -0,0 +1,124 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import unittest
+from unittest import mock
+
+import numpy
+
+from unittests.fixtures import mockOpalKelly
+from voltageControl.AdjustValue import AdjustValue
+from voltageControl.VoltageLocalAdjust import LocalAdjustRecord
+
+VoltageBlender = None
+
+
+class Project(object):
+    """project without voltage hardware"""
+    exptConfig = {'software': {'Voltages': {'Voltages': {'hardware': 'NI DAC Chassis: None'}}}, 'hardware': dict()}
+
+    def fromFullName(self, fullName):
+        return fullName.split(': ')
+
+    def isEnabled(self, guiName, objName):
+        return dict()
+
+
+def setUpModule():
+    """the DAC controller imports the Opal Kelly driver and the blender reads the project at import"""
+    global VoltageBlender
+    patch = mockOpalKelly()
+    patch.start()
+    unittest.addModuleCleanup(patch.stop)
+    with mock.patch('ProjectConfig.Project.currentProject', Project()):
+        from voltageControl.VoltageBlender import VoltageBlender
+
+
+class DACController(object):
+    def __init__(self):
+        self.written = list()
+
+    def writeVoltages(self, address, lines):
+        self.written.append(numpy.array(lines))
+        return lines
+
+    def verifyVoltages(self, address, data):
+        pass
+
+
+class Edge(object):
+    """shuttling edge interpolating the given line numbers"""
+    def __init__(self, linenos):
+        self.linenos = linenos
+
+    def iLines(self):
+        return iter(self.linenos)
+
+
+def perLineBlend(blender, lineno, lineGain, globalGain):
+    """voltages of a single line as calculated line by line originally"""
+    left, right = int(numpy.floor(lineno)), int(numpy.ceil(lineno))
+    convexc = lineno - left
+    line = (blender.lines[left]*(1-convexc) + blender.lines[right]*convexc)*lineGain
+    localadjustline = numpy.zeros(blender.lines.shape[1])
+    for record in blender.localAdjustVoltages:
+        if callable(record.gain.value):
+            localadjustline = numpy.add(localadjustline, (record.solution[left]*(1-convexc)*record.gain.value(left) +
+                                                          record.solution[right]*convexc*record.gain.value(right)))
+        else:
+            localadjustline = numpy.add(localadjustline, (record.solution[left]*(1-convexc) +
+                                                          record.solution[right]*convexc)*record.gainValue)
+    line = blender.adjustLine(line)
+    line = numpy.add(line, localadjustline)
+    line *= globalGain
+    return line
+
+
+class VoltageBlenderTest(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        self.blender = VoltageBlender(dict(), DACController())
+        self.blender.lines = rng.uniform(-5, 5, (40, 8))
+        self.blender.adjustLines = rng.uniform(-1, 1, (3, 8))
+        for index, value in ((0, 0.5), (2, -1.25)):
+            adjust = AdjustValue('adjust{0}'.format(index), index)
+            adjust.value = value
+            self.blender.adjustDict[adjust.name] = adjust
+        constant = LocalAdjustRecord('constant', gain=0.3)
+        constant.solution = rng.uniform(-1, 1, (40, 8))
+        function = LocalAdjustRecord('function', gain=0)
+        function.gain.value = lambda line: 0.01 * line + 0.2
+        function.solution = rng.uniform(-1, 1, (40, 8))
+        self.blender.localAdjustVoltages = [constant, function]
+        self.edges = [Edge(numpy.linspace(0, 20, 81)), Edge(numpy.linspace(30.5, 10.25, 28))]
+
+    def assertPerLine(self, lines, linenos, lineGain, globalGain):
+        expected = numpy.array([perLineBlend(self.blender, lineno, lineGain, globalGain) for lineno in linenos])
+        self.assertTrue(numpy.array_equal(lines, expected))
+
+    def test_calculate_lines(self):
+        linenos = [0, 0.25, 3.5, 17.75, 38.999, 39]
+        self.assertPerLine(self.blender.calculateLines(linenos, 1.5, 0.8), linenos, 1.5, 0.8)
+        self.assertTrue(numpy.array_equal(self.blender.calculateLine(3.5, 1.5, 0.8), perLineBlend(self.blender, 3.5, 1.5, 0.8)))
+
+    def test_edge_cache(self):
+        linenos = numpy.concatenate([list(edge.iLines()) for edge in self.edges])
+        self.blender.writeData(self.edges)
+        self.assertPerLine(self.blender.dacController.written[-1], linenos, 1.0, 1.0)
+        cached = list(self.blender.edgeCache.values())
+        self.blender.writeData(self.edges)
+        self.assertTrue(all(a is b for a, b in zip(self.blender.edgeCache.values(), cached)))
+        self.blender.localAdjustVoltages[1].gain.value = lambda line: 0.5
+        self.blender.writeData(self.edges)
+        self.assertFalse(any(a is b for a, b in zip(self.blender.edgeCache.values(), cached)))
+        self.assertPerLine(self.blender.dacController.written[-1], linenos, 1.0, 1.0)
+        self.blender.lineGain = 2.0
+        self.blender.writeData(self.edges)
+        self.assertPerLine(self.blender.dacController.written[-1], linenos, 2.0, 1.0)
+        self.assertEqual(self.blender.uploadedDataHash, self.blender.shuttlingDataHash())
+
+
+if __name__ == "__main__":
+    unittest.main()
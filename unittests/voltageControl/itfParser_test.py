@@ -0,0 +1,81 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from Chassis.itfParser import itfParser
+
+
+class itfParserTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.mapPath = os.path.join(self.directory, 'map.txt')
+        self.solutionPath = os.path.join(self.directory, 'solution.txt')
+        with open(self.mapPath, 'w') as f:
+            for index in range(8):
+                f.write('E{0:02d}\t{1}\t{2}\n'.format(index, (index * 3) % 8, index))
+        self.writeSolution(['\t'.join(repr(float(v)) for v in numpy.arange(6) + 10 * line) for line in range(20)])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def writeSolution(self, lines):
+        with open(self.solutionPath, 'w') as f:
+            f.write('# test solution\noffset=1\n')
+            f.write('\t'.join('E{0:02d}'.format(index) for index in range(6)) + '\t\n')
+            for line in lines:
+                f.write(line + '\t\n')
+
+    def open(self):
+        itf = itfParser()
+        itf.eMapFilePath = self.mapPath
+        itf.open(self.solutionPath)
+        return itf
+
+    def referenceMatrix(self):
+        itf = self.open()
+        matrix = numpy.array([itf.eMapReadLine() for _ in range(itf.getNumLines())])
+        itf.close()
+        return matrix
+
+    def readMatrix(self, useCache=True):
+        itf = self.open()
+        matrix = itf.eMapReadMatrix(useCache=useCache)
+        self.assertEqual(itf.meta, {'offset': '1'})
+        itf.close()
+        return matrix
+
+    def cacheFiles(self):
+        return [name for name in os.listdir(self.directory) if name.endswith('.npy')]
+
+    def test_matrix(self):
+        numpy.testing.assert_array_equal(self.readMatrix(useCache=False), self.referenceMatrix())
+        self.assertEqual(self.cacheFiles(), [])
+
+    def test_ragged(self):
+        self.writeSolution(['1.0\t2.0', '3.0\t\t5.0', '', '1\t2\t3\t4\t5\t6'])
+        numpy.testing.assert_array_equal(self.readMatrix(useCache=False), self.referenceMatrix())
+
+    def test_cache(self):
+        reference = self.referenceMatrix()
+        numpy.testing.assert_array_equal(self.readMatrix(), reference)
+        self.assertEqual(len(self.cacheFiles()), 1)
+        cached = self.readMatrix()
+        self.assertIsInstance(cached, numpy.memmap)
+        numpy.testing.assert_array_equal(cached, reference)
+        del cached
+        self.writeSolution(['1.0\t2.0\t3.0\t4.0\t5.0\t6.0'])
+        os.utime(self.solutionPath, ns=(0, 0))
+        numpy.testing.assert_array_equal(self.readMatrix(), self.referenceMatrix())
+        self.assertEqual(len(self.cacheFiles()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
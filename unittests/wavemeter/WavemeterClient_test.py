@@ -0,0 +1,135 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import threading
+import time
+import unittest
+from urllib.parse import urlparse, parse_qs
+
+from PyQt5 import QtCore
+
+from modules.quantity import Q
+from wavemeter.WavemeterClient import WavemeterClient
+
+
+class WavemeterServer(ThreadingMixIn, HTTPServer):
+    """stand in for the wavemeter http server, channel n reads n + 0.5 GHz.
+    Channels in negativeReadings first read -1 GHz the given number of times."""
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), WavemeterRequestHandler)
+        self.requests = defaultdict(int)
+        self.courses = list()
+        self.negativeReadings = dict()
+        self.lock = threading.Lock()
+
+    @property
+    def address(self):
+        return "http://127.0.0.1:{0}".format(self.server_address[1])
+
+
+class WavemeterRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path != "/wavemeter/wavemeter/wavemeter-status" or 'channel' not in query:
+            self.send_error(404)
+            return
+        channel = int(query['channel'][0])
+        with self.server.lock:
+            self.server.requests[channel] += 1
+            if 'course' in query:
+                self.server.courses.append((channel, float(query['course'][0])))
+            negative = self.server.negativeReadings.get(channel, 0)
+            self.server.negativeReadings[channel] = max(0, negative - 1)
+        body = "{0}".format(-1.0 if negative else channel + 0.5).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class WavemeterClientTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+    def setUp(self):
+        self.server = WavemeterServer()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.client = WavemeterClient(self.server.address, pollInterval=0.05)
+
+    def tearDown(self):
+        self.client.timer.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def processEventsUntil(self, condition, timeout=5):
+        end = time.time() + timeout
+        while not condition() and time.time() < end:
+            self.app.processEvents(QtCore.QEventLoop.AllEvents, 10)
+        return condition()
+
+    def test_subscriptions(self):
+        readings = defaultdict(list)
+        first = lambda channel, result: readings[('first', channel)].append(result)
+        second = lambda channel, result: readings[('second', channel)].append(result)
+        for channel in (1, 2, 3):
+            self.client.subscribe(channel, first)
+        self.client.subscribe(2, second)
+        self.assertTrue(self.processEventsUntil(lambda: all(len(readings[('first', channel)]) >= 3 for channel in (1, 2, 3))))
+        self.assertEqual(readings[('first', 2)][0], Q(2.5, 'GHz'))
+        self.assertTrue(len(readings[('second', 2)]) >= 3)
+        for channel in (1, 2, 3):
+            self.client.unsubscribe(channel, first)
+        self.assertEqual(self.client.subscribedChannels(), {2})
+        self.client.unsubscribe(2, second)
+        self.assertFalse(self.client.timer.isActive())
+        self.assertTrue(self.processEventsUntil(lambda: not self.client.pending))
+        count = dict(self.server.requests)
+        self.processEventsUntil(lambda: False, 0.2)
+        self.assertEqual(dict(self.server.requests), count)
+
+    def test_cached_frequency(self):
+        self.client.pollInterval = 10
+        self.assertIsNone(self.client.frequency(4))
+        self.assertIsNone(self.client.frequency(4))
+        self.assertTrue(self.processEventsUntil(lambda: self.client.frequency(4) is not None))
+        self.assertEqual(self.client.frequency(4, Q(1, 's')), Q(4.5, 'GHz'))
+        self.assertEqual(self.server.requests[4], 1)
+        self.assertIsNone(self.client.cachedFrequency(4, Q(0, 's')))
+        self.client.frequency(4, course=Q(123.4, 'GHz'))
+        self.assertTrue(self.processEventsUntil(lambda: self.server.requests[4] == 2))
+        self.assertEqual(self.server.courses, [(4, 123.4)])
+
+    def test_async_retry(self):
+        results = list()
+        self.server.negativeReadings[5] = 3
+        self.client.asyncGetFrequency(5, results.append)
+        self.assertTrue(self.processEventsUntil(lambda: results))
+        self.assertEqual(results, [Q(5.5, 'GHz')])
+        self.assertEqual(self.server.requests[5], 4)
+
+    def test_error(self):
+        results = list()
+        self.client.address += "/missing"
+        self.client.asyncGetFrequency(1, results.append)
+        self.assertTrue(self.processEventsUntil(lambda: results))
+        self.assertEqual(results, [None])
+        self.assertIsNone(self.client.cachedFrequency(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,10 +4,8 @@
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
 
-import itertools
 from PyQt5 import QtCore
 import logging
-import math
 import os.path
 import socket
 import numpy
@@ -44,6 +42,16 @@ if hardwareDict and hardwareObjName==NIObjName:
 class HardwareException(Exception):
     pass
 
+
+def readLines(itf, channelCount):
+    """read all lines of the open itf file as matrix (lines x channels), nan is replaced by 0
+    and the lines are padded with zeros to channelCount"""
+    data = itf.eMapReadMatrix()
+    matrix = numpy.zeros((data.shape[0], max(channelCount, data.shape[1])))
+    matrix[:, :data.shape[1]] = data
+    matrix[numpy.isnan(matrix)] = 0
+    return matrix
+
 class NoneHardware(object):
     name = "No DAC Hardware"
     nativeShuttling = False
@@ -166,9 +174,10 @@ class VoltageBlender(QtCore.QObject):
             self.hardware = NoneHardware()
 
         self.itf = itfParser()
-        self.lines = list()  # a list of lines with numpy arrays
+        self.lines = numpy.zeros((0, 0))  # matrix lines x channels
+        self.linesHash = hash(None)
         self.adjustDict = SequenceDict()  # names of the lines presented as possible adjusts
-        self.adjustLines = []
+        self.adjustLines = numpy.zeros((0, 0))
         self.lineGain = 1.0
         self.globalGain = 1.0
         self.lineno = 0
@@ -182,6 +191,8 @@ class VoltageBlender(QtCore.QObject):
         self.adjustGain = 1.0
         self.localAdjustVoltages = list()
         self.uploadedDataHash = None
+        self.edgeCache = dict()      # interpolated lines of shuttling edges for edgeCacheHash
+        self.edgeCacheHash = None
         
     def currentData(self):
         return self.electrodes, self.aoNums, self.dsubNums, self.outputVoltage
@@ -196,30 +207,19 @@ class VoltageBlender(QtCore.QObject):
     def loadVoltage(self, path):
         channelCount = self.hardware.channelCount if self.hardware else 0
         self.itf.open(path)
-        self.lines = list()
-        for _ in range(self.itf.getNumLines()):
-            line = self.itf.eMapReadLine() 
-            for index, value in enumerate(line):
-                if math.isnan(value): line[index]=0
-            line = numpy.append( line, [0.0]*max(0, channelCount-len(line)))
-            self.lines.append( line )
+        self.lines = readLines(self.itf, channelCount)
+        self.linesHash = hash(self.lines.tobytes())
         self.tableHeader = self.itf.tableHeader
         self.itf.close()
         self.dataChanged.emit(0, 0, len(self.electrodes)-1, 3)
 
     def loadGlobalAdjust(self, path):
         channelCount = self.hardware.channelCount if self.hardware else 0
-        self.adjustLines = list()
         self.adjustDict = SequenceDict()
         itf = itfParser()
         itf.eMapFilePath = self.mappingpath
         itf.open(path)
-        for _ in range(itf.getNumLines()):
-            line = itf.eMapReadLine() 
-            for index, value in enumerate(line):
-                if math.isnan(value): line[index]=0
-            line = numpy.append( line, [0.0]*max(0, channelCount-len(line)))
-            self.adjustLines.append( line )
+        self.adjustLines = readLines(itf, channelCount)
         for name, value in itf.meta.items():
             try:
                 if int(value)<len(self.adjustLines):
@@ -235,18 +235,11 @@ class VoltageBlender(QtCore.QObject):
             path = record.path
             if index in forceupdate or record.solutionPath != record.path:
                 if os.path.exists(path):
-                    linelist = list()
                     itf = itfParser()
                     itf.eMapFilePath = self.mappingpath
                     itf.open(path)
-                    for _ in range(itf.getNumLines()):
-                        line = itf.eMapReadLine() 
-                        for index, value in enumerate(line):
-                            if math.isnan(value): line[index]=0
-                        line = numpy.append( line, [0.0]*max(0, channelCount-len(line)))
-                        linelist.append( line )
+                    record.solution = readLines(itf, channelCount)
                     itf.close()
-                    record.solution = linelist
                     record.solutionPath = path
                 else:
                     logging.getLogger(__name__).warning("Local Adjust file '{0}' not found".format(path))
@@ -280,17 +273,32 @@ class VoltageBlender(QtCore.QObject):
             self.lineno = lineno
             
     def calculateLine(self, lineno, lineGain, globalGain):
-        line = self.blendLines(lineno, lineGain)
-        localadjustline = self.blendLocalAdjustLines(lineno)
+        return self.calculateLines([lineno], lineGain, globalGain)[0]
+
+    def calculateLines(self, linenos, lineGain, globalGain):
+        """output voltages for all (fractional) line numbers in linenos as matrix (lines x channels)"""
         self.lineGain = lineGain
         self.globalGain = globalGain
-        #self.lineno = lineno
-        line = self.adjustLine( line )
-        if len(localadjustline) > 0:
-            line = numpy.add( line, localadjustline )
-        line *= self.globalGain
-        return line
-            
+        left, right, convexc = self.interpolationWeights(linenos)
+        lines = self.blendLineMatrix(self.lines, left, right, convexc)*lineGain
+        lines += self.adjustLine( numpy.zeros(lines.shape[1]) )
+        localadjust = self.blendLocalAdjustMatrix(left, right, convexc)
+        if localadjust is not None:
+            lines += localadjust
+        lines *= self.globalGain
+        return lines
+
+    @staticmethod
+    def interpolationWeights(linenos):
+        linenos = numpy.asarray(linenos, dtype=numpy.float64)
+        left = numpy.floor(linenos).astype(numpy.intp)
+        right = numpy.ceil(linenos).astype(numpy.intp)
+        return left, right, (linenos-left)[:, numpy.newaxis]
+
+    @staticmethod
+    def blendLineMatrix(matrix, left, right, convexc):
+        return matrix[left]*(1-convexc) + matrix[right]*convexc
+
     def shuttle(self, definition, cont):
         logger = logging.getLogger(__name__)
         if not self.hardware.nativeShuttling:
@@ -320,25 +328,28 @@ class VoltageBlender(QtCore.QObject):
         return (line+offset)
             
     def blendLines(self, lineno, lineGain):
-        if self.lines:
-            left = int(math.floor(lineno))
-            right = int(math.ceil(lineno))
-            convexc = lineno-left
-            return (self.lines[left]*(1-convexc) + self.lines[right]*convexc)*lineGain
+        if len(self.lines):
+            left, right, convexc = self.interpolationWeights([lineno])
+            return self.blendLineMatrix(self.lines, left, right, convexc)[0]*lineGain
         return None
     
     def blendLocalAdjustLines(self, lineno):
-        channelCount = self.hardware.channelCount if self.hardware else 0
-        left = int(math.floor(lineno))
-        right = int(math.ceil(lineno))
-        convexc = lineno-left
-        result = numpy.zeros(channelCount)
+        left, right, convexc = self.interpolationWeights([lineno])
+        result = self.blendLocalAdjustMatrix(left, right, convexc)
+        return result[0] if result is not None else numpy.zeros(self.hardware.channelCount if self.hardware else 0)
+
+    def blendLocalAdjustMatrix(self, left, right, convexc):
+        """sum of the local adjust solutions blended for all lines, None if there are no local adjusts"""
+        result = None
         for record in self.localAdjustVoltages:
-            if record.solution:
+            if record.solution is not None and len(record.solution):
                 if isfunction(record.gain.value):
-                    result = numpy.add(result, (record.solution[left]*(1-convexc)*record.gain.value(left) + record.solution[right]*convexc*record.gain.value(right)))
+                    gain = numpy.vectorize(record.gain.value, otypes=[numpy.float64])
+                    lines = (record.solution[left]*(1-convexc)*gain(left)[:, numpy.newaxis] +
+                             record.solution[right]*convexc*gain(right)[:, numpy.newaxis])
                 else:
-                    result = numpy.add(result, (record.solution[left]*(1-convexc) + record.solution[right]*convexc)*record.gainValue)
+                    lines = self.blendLineMatrix(record.solution, left, right, convexc)*record.gainValue
+                result = lines if result is None else result + lines
         return result
             
     def close(self):
@@ -349,27 +360,42 @@ class VoltageBlender(QtCore.QObject):
             self.dacController.writeShuttleLookup(edgeList, address)
     
     def writeData(self, shuttlingGraph):
-        towrite = list()
+        """calculate the interpolated lines of all edges and upload them. The lines of an edge are
+        cached and only recalculated if the edge or the data entering shuttlingDataHash changed."""
         startline = 1
         currentline = startline
         lineGain = float(self.lineGain)
         globalGain = float(self.globalGain)
         if shuttlingGraph:
+            dataHash = self.shuttlingDataHash()
+            if dataHash != self.edgeCacheHash:
+                self.edgeCache = dict()
+                self.edgeCacheHash = dataHash
+            edgeCache = dict()
+            towrite = list()
             for edge in shuttlingGraph:
-                towrite.extend( [self.calculateLine(lineno, lineGain, globalGain ) for lineno in edge.iLines() ] )
+                linenos = numpy.fromiter(edge.iLines(), dtype=numpy.float64)
+                key = linenos.tobytes()
+                lines = self.edgeCache.get(key)
+                if lines is None:
+                    lines = self.calculateLines(linenos, lineGain, globalGain)
+                edgeCache[key] = lines
+                towrite.append(lines)
                 edge.interpolStartLine = currentline
-                currentline = startline+len(towrite)
+                currentline += len(lines)
                 edge.interpolStopLine = currentline
-            data = self.dacController.writeVoltages(1, towrite )
+            self.edgeCache = edgeCache
+            data = self.dacController.writeVoltages(1, numpy.concatenate(towrite) )
             self.dacController.verifyVoltages(1, data )
-            self.uploadedDataHash = self.shuttlingDataHash()
+            self.uploadedDataHash = dataHash
 
     stateFields = ('lineGain', 'globalGain', 'adjustGain')
     def shuttlingDataHash(self):
-        h = hash(itertools.chain((getattr(self, field).to_tuple() for field in self.stateFields),
-                                 (q.to_tuple() for q in self.adjustDict.values()),
-                                 (q.to_tuple() for q in self.localAdjustVoltages)))
-        logging.getLogger(__name__).info("Shuttling Hash: {0:x}".format(h))
+        h = hash((tuple(float(getattr(self, field)) for field in self.stateFields),
+                  tuple((adjust.line, adjust.floatValue) for adjust in self.adjustDict.values()),
+                  tuple(hash(record) for record in self.localAdjustVoltages),
+                  self.linesHash))
+        logging.getLogger(__name__).info("Shuttling Hash: {0:x}".format(h & 0xffffffffffffffff))
         return h
     
     def shuttlingDataValid(self):
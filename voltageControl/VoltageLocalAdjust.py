@@ -95,8 +95,8 @@ class LocalAdjustRecord(object):
     @solution.setter
     def solution(self, sol):
         self._solution = sol
-        if self._solution:
-            hash( tuple( (hashlib.sha256(a.view(numpy.uint8)).hexdigest() for a in self._solution) ) )
+        if self._solution is not None:
+            self.solutionHash = hash(hashlib.sha256(numpy.ascontiguousarray(self._solution).view(numpy.uint8)).hexdigest())
         else:
             self.solutionHash = hash(self._solution)
             
@@ -0,0 +1,154 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Shared client for the HighFinesse wavemeter http server.
+
+One WavemeterClient per server address is shared by all users (wavemeterClient(address)).
+Subscribed channels are polled every pollInterval seconds. The server only offers the
+per channel status query, so the queries of one poll are pipelined over a single
+QNetworkAccessManager, and at most one plain query per channel is in flight. The last
+reading of every channel is cached with its time stamp and delivered to the subscribers
+of the channel and by the resultReceived signal.
+"""
+from collections import defaultdict
+from functools import partial
+import logging
+from time import time
+
+from PyQt5 import QtCore, QtNetwork
+
+from modules.quantity import Q
+
+
+class WavemeterClient(QtCore.QObject):
+    resultReceived = QtCore.pyqtSignal(object, object)   # channel, frequency
+    nMaxAttempts = 10
+
+    def __init__(self, address, pollInterval=1.0, parent=None):
+        super(WavemeterClient, self).__init__(parent)
+        self.address = address
+        self.am = QtNetwork.QNetworkAccessManager(self)
+        self.subscribers = defaultdict(list)
+        self.lastResult = dict()       # channel: (frequency, time)
+        self.pending = dict()          # channel: reply of the query without course
+        self.callbacks = defaultdict(list)
+        self.failureCount = defaultdict(int)
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.poll)
+        self.pollInterval = pollInterval
+
+    @property
+    def pollInterval(self):
+        return self.timer.interval() / 1000.
+
+    @pollInterval.setter
+    def pollInterval(self, seconds):
+        self.timer.setInterval(int(seconds * 1000))
+
+    def subscribe(self, channel, callback):
+        """callback(channel, frequency) is called with every reading of channel until unsubscribed"""
+        channel = int(channel)
+        if callback not in self.subscribers[channel]:
+            self.subscribers[channel].append(callback)
+        self.query(channel)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def unsubscribe(self, channel, callback):
+        channel = int(channel)
+        if callback in self.subscribers.get(channel, ()):
+            self.subscribers[channel].remove(callback)
+            if not self.subscribers[channel]:
+                self.subscribers.pop(channel)
+        if not self.subscribers:
+            self.timer.stop()
+
+    def subscribedChannels(self):
+        return set(self.subscribers.keys())
+
+    def poll(self):
+        for channel in list(self.subscribers.keys()):
+            self.query(channel)
+
+    def query(self, channel, course=None):
+        """query channel, course is the lock point to set (GHz magnitude). Queries without
+        course are skipped if one is already in flight for channel."""
+        channel = int(channel)
+        if course is None and channel in self.pending:
+            return
+        url = self.address + "/wavemeter/wavemeter/wavemeter-status?channel={0}".format(channel)
+        if course is not None:
+            url += "&course={0}".format(course.m_as('GHz'))
+        request = QtNetwork.QNetworkRequest(QtCore.QUrl(url))
+        request.setAttribute(QtNetwork.QNetworkRequest.HttpPipeliningAllowedAttribute, True)
+        reply = self.am.get(request)
+        reply.finished.connect(partial(self.onReply, channel, course, reply))
+        if course is None:
+            self.pending[channel] = reply
+
+    def onReply(self, channel, course, reply):
+        if self.pending.get(channel) is reply:
+            self.pending.pop(channel)
+        reply.finished.disconnect()  # necessary to make reply garbage collectable
+        reply.deleteLater()
+        result = None
+        if reply.error() == QtNetwork.QNetworkReply.NoError:
+            data = bytes(reply.readAll())
+            logging.getLogger(__name__).debug("reply channel {0}: '{1}'".format(channel, data))
+            try:
+                result = Q(float(data), 'GHz')
+            except ValueError:
+                logging.getLogger(__name__).warning("Invalid wavemeter reply '{0}' for channel {1}".format(data, channel))
+        else:
+            logging.getLogger(__name__).warning("Error {0} accessing wavemeter channel {1} at '{2}'".format(
+                reply.errorString(), channel, self.address))
+        if result is None:
+            for callback in self.callbacks.pop(channel, []):
+                callback(None)
+            return
+        if result.m < 0 and self.callbacks.get(channel) and self.failureCount[channel] < self.nMaxAttempts:
+            self.failureCount[channel] += 1
+            self.query(channel)
+            return
+        self.failureCount.pop(channel, None)
+        self.lastResult[channel] = (result, time())
+        self.resultReceived.emit(channel, result)
+        for callback in list(self.subscribers.get(channel, [])):
+            callback(channel, result)
+        for callback in self.callbacks.pop(channel, []):
+            callback(result)
+
+    def asyncGetFrequency(self, channel, callback):
+        """callback(frequency) is called once with the next reading of channel, None on error"""
+        channel = int(channel)
+        self.callbacks[channel].append(callback)
+        self.failureCount[channel] = 0
+        self.query(channel)
+
+    def cachedFrequency(self, channel, max_age=None):
+        """last reading of channel if it is younger than max_age (default 3 s), otherwise None"""
+        max_age = max_age if max_age is not None else Q(3, 's')
+        result, measureTime = self.lastResult.get(int(channel), (None, 0))
+        if result is not None and time() - measureTime < max_age.m_as('s'):
+            return result
+        return None
+
+    def frequency(self, channel, max_age=None, course=None):
+        """cached reading of channel younger than max_age. A new query is started if course is
+        given or the cached reading is older than pollInterval."""
+        if course is not None or self.cachedFrequency(channel, Q(self.pollInterval, 's')) is None:
+            self.query(channel, course)
+        return self.cachedFrequency(channel, max_age)
+
+
+_clients = dict()
+
+
+def wavemeterClient(address):
+    """WavemeterClient shared by all users of the wavemeter server at address"""
+    if address not in _clients:
+        _clients[address] = WavemeterClient(address)
+    return _clients[address]